@@ -3,7 +3,7 @@ Context processors for accounts app.
 Provides global template context variables for authenticated users.
 """
 
-from .models.schools import School, SchoolMembership
+from .services.membership_context import MembershipContext
 
 
 def user_context(request):
@@ -27,7 +27,7 @@ def user_context(request):
         if current_school:
             context["school_name"] = current_school.name
             # Get user role for this school
-            context["user_role"] = get_user_role_for_school(request.user, current_school)
+            context["user_role"] = get_user_role_for_school(request, current_school)
         else:
             context["school_name"] = "No School Selected"
             context["user_role"] = "guest"
@@ -43,23 +43,28 @@ def get_current_school(request):
     1. Session-stored school ID
     2. User's primary/default school
     3. First school the user belongs to
+
+    Memberships come from the request's MembershipContext, so this costs no query once
+    the context is loaded or cached.
     """
+    memberships = MembershipContext.for_request(request)
+
     # Option 1: From session (user switched schools)
     school_id = request.session.get("current_school_id")
     if school_id:
-        try:
-            return School.objects.get(id=school_id, memberships__user=request.user, memberships__is_active=True)
-        except School.DoesNotExist:
-            # Clean up invalid session data
-            request.session.pop("current_school_id", None)
+        membership = memberships.membership_for(int(school_id))
+        if membership:
+            return membership.school
+        # Clean up invalid session data
+        request.session.pop("current_school_id", None)
 
     # Option 2: From user's profile (if you have a default school field)
     # if hasattr(request.user, 'profile') and request.user.profile.default_school:
     #     return request.user.profile.default_school
 
     # Option 3: First school the user belongs to
-    first_school = School.objects.filter(memberships__user=request.user, memberships__is_active=True).first()
-    if first_school:
+    if memberships.school_ids:
+        first_school = memberships.membership_for(min(memberships.school_ids)).school
         # Store in session for consistency
         request.session["current_school_id"] = first_school.id
         return first_school
@@ -67,11 +72,11 @@ def get_current_school(request):
     return None
 
 
-def get_user_role_for_school(user, school):
+def get_user_role_for_school(request, school):
     """
     Get user's role in specific school.
 
     Returns the user's role (admin, teacher, student, etc.) for the given school.
     """
-    membership = SchoolMembership.objects.get(user=user, school=school, is_active=True)
-    return membership.role.lower()
+    role = MembershipContext.for_request(request).role_for(school)
+    return role.lower() if role else "guest"
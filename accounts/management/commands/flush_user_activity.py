@@ -0,0 +1,78 @@
+"""
+Django management command to write coalesced user activity to the database.
+
+SessionManagementMiddleware records activity in ActivityTracker instead of updating
+CustomUser.last_activity during the request. With the Redis cache run it every minute
+(cron) or keep it running with --loop: while it runs, web requests leave the flush to it,
+otherwise one request a minute flushes instead. With LocMemCache the pending activity
+lives in the web process, which flushes it once a minute itself, and this command sees
+none of it.
+
+Usage:
+    python manage.py flush_user_activity
+    python manage.py flush_user_activity --batch-size=1000
+    python manage.py flush_user_activity --loop --interval=60
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.services.activity_tracker import ActivityTracker
+
+
+class Command(BaseCommand):
+    """
+    Management command to flush pending user activity timestamps.
+
+    Without --loop the pending activity is written once and the command exits.
+    """
+
+    help = "Write pending user activity timestamps to the database in bulk"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ActivityTracker.FLUSH_BATCH_SIZE,
+            help=f"Users updated per UPDATE statement (default: {ActivityTracker.FLUSH_BATCH_SIZE})",
+        )
+
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep flushing instead of exiting",
+        )
+
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60.0,
+            help="Seconds to sleep between flushes with --loop (default: 60)",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        try:
+            # Requests resume flushing if no run follows within two intervals
+            heartbeat = 2 * max(options["interval"], ActivityTracker.FLUSH_INTERVAL)
+            while True:
+                result = ActivityTracker.flush(batch_size=options["batch_size"])
+                ActivityTracker.mark_flusher_alive(heartbeat)
+                if verbosity >= 1 and (result.users or not options["loop"]):
+                    self.stdout.write(
+                        self.style.SUCCESS(f"Flushed activity of {result.users} users in {result.batches} batches")
+                    )
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            raise CommandError(f"Error flushing user activity: {e}")
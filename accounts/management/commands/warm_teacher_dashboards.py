@@ -0,0 +1,36 @@
+"""
+Django management command to prebuild the dashboards of teachers teaching today.
+
+Dashboard sections are cached per teacher and rebuilt on the first visit of each day or
+after a change invalidates them. Run this early in the morning (cron) so teachers with
+sessions today open an already built dashboard.
+
+Usage:
+    python manage.py warm_teacher_dashboards
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.services.teacher_dashboard_service import TeacherDashboardService
+
+
+class Command(BaseCommand):
+    """
+    Management command to warm teacher dashboard caches.
+
+    Only teachers with a non-cancelled session today are warmed.
+    """
+
+    help = "Build the cached dashboards of teachers with sessions today"
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+
+        try:
+            warmed = TeacherDashboardService.warm_cache_for_today()
+        except Exception as e:
+            raise CommandError(f"Error warming teacher dashboards: {e}")
+
+        if verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(f"Warmed dashboards of {warmed} teachers"))
@@ -5,18 +5,20 @@ This module contains middleware for:
 1. Progressive verification requirements after grace period
 2. PWA detection and differentiated session management (24h web vs 7d PWA)
 3. User activity tracking and security headers
+4. The per-request membership context
 """
 
 from datetime import datetime, timedelta
 import logging
 
 from django.contrib import messages
-from django.contrib.auth import get_user_model
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
+from .services.activity_tracker import ActivityTracker
+from .services.membership_context import MembershipContext
 from .utils.pwa_detection import PWADetector
 
 logger = logging.getLogger(__name__)
@@ -261,6 +263,10 @@ class SessionManagementMiddleware:
     - Sets security headers for session cookies
     - Handles session duration changes when client type changes
 
+    Performance:
+    - PWA detection memoizes its user-agent analysis in the session (PWADetector.detect_cached)
+    - Activity is recorded in ActivityTracker and written in bulk once a minute
+
     Business Requirements:
     - FR-4.1: Web browser sessions = 24 hours
     - FR-4.2: PWA installation sessions = 7 days
@@ -276,8 +282,7 @@ class SessionManagementMiddleware:
 
     def __call__(self, request):
         # Process the request before view
-        self.configure_session_duration(request)
-        self.update_user_activity(request)
+        self.process_request(request)
 
         # Get response from view
         response = self.get_response(request)
@@ -287,6 +292,11 @@ class SessionManagementMiddleware:
 
         return response
 
+    def process_request(self, request):
+        """Configure the session and record activity before the view runs."""
+        self.configure_session_duration(request)
+        self.update_user_activity(request)
+
     def configure_session_duration(self, request):
         """
         Configure session duration based on PWA detection.
@@ -300,9 +310,9 @@ class SessionManagementMiddleware:
         if not hasattr(request, "user") or not request.user.is_authenticated:
             return
 
-        # Detect PWA mode
-        is_pwa = PWADetector.is_pwa_request(request)
-        session_duration = PWADetector.get_session_duration(request)
+        # Detect PWA mode (user-agent analysis is memoized in the session)
+        is_pwa = PWADetector.detect_cached(request)
+        session_duration = PWADetector.session_duration_for(is_pwa)
 
         # Get current session metadata
         current_pwa_session = request.session.get("is_pwa_session")
@@ -349,8 +359,10 @@ class SessionManagementMiddleware:
         """
         Update user activity tracking with rate limiting.
 
-        Only updates last_activity field every 5 minutes to avoid
-        excessive database writes while maintaining reasonable activity tracking.
+        Only records activity when the user's pending timestamp in ActivityTracker is more
+        than 5 minutes old; last_activity lags behind until the next bulk flush, run by the
+        flush_user_activity command or, when it is not running, by the first request after
+        the flush interval.
         """
         # Add defensive check - request.user might not be available yet
         if not hasattr(request, "user") or not request.user.is_authenticated:
@@ -359,20 +371,17 @@ class SessionManagementMiddleware:
         user = request.user
         now = timezone.now()
 
-        # Check if enough time has passed since last activity update
-        if user.last_activity is None or now - user.last_activity >= self.ACTIVITY_UPDATE_INTERVAL:
-            try:
-                # Update last_activity field efficiently
-                User = get_user_model()
-                User.objects.filter(pk=user.pk).update(last_activity=now)
+        try:
+            ActivityTracker.flush_if_due()
 
+            if ActivityTracker.record(user.pk, now, min_interval=self.ACTIVITY_UPDATE_INTERVAL):
                 # Update the current user instance to avoid stale data
                 user.last_activity = now
 
-                logger.debug(f"Updated activity for user {user.email}")
+                logger.debug(f"Recorded activity for user {user.email}")
 
-            except Exception as e:
-                logger.error(f"Failed to update user activity for {user.email}: {e}")
+        except Exception as e:
+            logger.error(f"Failed to update user activity for {user.email}: {e}")
 
     def set_security_headers(self, response, request):
         """
@@ -414,3 +423,19 @@ class SessionManagementMiddleware:
                     vary_header = header
 
         response["Vary"] = vary_header
+
+
+class MembershipContextMiddleware:
+    """
+    Attach the user's MembershipContext to the request as request.membership_context.
+
+    Nothing is loaded until a view, mixin or context processor reads it, so requests that
+    never look at school memberships pay nothing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.membership_context = MembershipContext(request.user)
+        return self.get_response(request)
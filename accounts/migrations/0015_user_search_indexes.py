@@ -0,0 +1,37 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ("name", "email", "username")
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Index the user columns searched by SchoolUserSearchService.
+
+    PostgreSQL gets pg_trgm GIN indexes, which serve icontains/istartswith and trigram
+    similarity. Other backends fall back to unindexed scans, as a substring match with a
+    leading wildcard cannot use a B-tree index.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS accounts_user_{column}_trgm "
+                f"ON accounts_customuser USING gin (UPPER({column}) gin_trgm_ops)"
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS accounts_user_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0014_revert_educational_system_to_charfield"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -9,6 +9,7 @@ from django.shortcuts import get_object_or_404
 
 from .models import School, SchoolRole
 from .models.permissions import StudentPermission
+from .services.membership_context import MembershipContext
 
 User = get_user_model()
 
@@ -112,8 +113,18 @@ class SchoolPermissionMixin:
     Mixin for views that require school-level permissions.
     Provides basic school access validation.
     Must be used with LoginRequiredMixin.
+
+    Membership checks read the request's MembershipContext instead of querying
+    SchoolMembership each time.
     """
 
+    def get_membership_context(self, user=None):
+        """The request's membership context, or a cached one for another user."""
+        request = getattr(self, "request", None)
+        if request is not None and (user is None or user is request.user):
+            return MembershipContext.for_request(request)
+        return MembershipContext(user)
+
     def get_school(self):
         """Get school from URL kwargs."""
         if hasattr(self, "_school"):
@@ -139,19 +150,21 @@ class SchoolPermissionMixin:
             return False
         if user.is_superuser:
             return True
-        # Check if user has school_memberships attribute (AnonymousUser doesn't)
-        if not hasattr(user, "school_memberships"):
-            return False
-        return user.school_memberships.filter(school=school, is_active=True).exists()
+        return self.get_membership_context(user).has_access(school)
+
+    def get_user_schools(self):
+        """Get schools where the user is an active member (all schools for staff)."""
+        if not hasattr(self, "request") or not self.request.user.is_authenticated:
+            return School.objects.none()
+
+        return self.get_membership_context().schools()
 
     def get_user_schools_by_role(self, role):
         """Get schools where user has a specific role."""
         if not hasattr(self, "request") or not self.request.user.is_authenticated:
             return School.objects.none()
 
-        return School.objects.filter(
-            memberships__user=self.request.user, memberships__role=role, memberships__is_active=True
-        )
+        return self.get_membership_context().schools_with_role(role)
 
     def has_school_permission(self, school, roles):
         """Check if user has specific role permissions for a school."""
@@ -161,10 +174,7 @@ class SchoolPermissionMixin:
         if self.request.user.is_superuser:
             return True
 
-        if isinstance(roles, str):
-            roles = [roles]
-
-        return self.request.user.school_memberships.filter(school=school, is_active=True, role__in=roles).exists()
+        return self.get_membership_context().has_role(school, roles)
 
 
 class IsSchoolOwnerOrAdminMixin(SchoolPermissionMixin):
@@ -178,9 +188,4 @@ class IsSchoolOwnerOrAdminMixin(SchoolPermissionMixin):
             return False
         if user.is_superuser:
             return True
-        # Check if user has school_memberships attribute (AnonymousUser doesn't)
-        if not hasattr(user, "school_memberships"):
-            return False
-        return user.school_memberships.filter(
-            school=school, is_active=True, role__in=[SchoolRole.SCHOOL_OWNER, SchoolRole.SCHOOL_ADMIN]
-        ).exists()
+        return self.get_membership_context(user).has_role(school, [SchoolRole.SCHOOL_OWNER, SchoolRole.SCHOOL_ADMIN])
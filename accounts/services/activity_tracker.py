@@ -0,0 +1,190 @@
+"""
+Coalesced user activity tracking
+
+SessionManagementMiddleware records activity here instead of issuing an UPDATE on the
+user row inside the request. Recorded timestamps are kept per user (only the newest one
+counts) and written to CustomUser.last_activity in bulk. A user is recorded again only
+once their pending timestamp is older than the middleware's interval, so most requests
+only read the pending entry.
+
+With the django-redis cache the pending timestamps live in a Redis sorted set (member:
+user id, score: epoch seconds), so every web worker shares it and ZADD GT keeps the newest
+value. The flush_user_activity management command writes them out of band (cron or
+--loop) and keeps a heartbeat key in the cache while it runs; as long as the heartbeat is
+present no request runs the UPDATE. Without it (the command is not scheduled, or stopped)
+requests fall back to flushing themselves, see flush_if_due.
+
+Other cache backends (locmem in development and tests) fall back to a dictionary stored
+in the default cache, which is fine for a single process but not atomic. That dictionary
+lives in the web process, where the management command cannot see it, so there requests
+always do the flush.
+
+A request flush is run by the first request after FLUSH_INTERVAL has passed; a timer key
+in the cache makes that happen once per interval for all processes sharing the cache.
+"""
+
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ActivityFlushResult:
+    """Outcome of one flush of pending activity."""
+
+    users: int = 0
+    batches: int = 0
+
+
+class ActivityTracker:
+    """Buffer of users' latest activity timestamps awaiting a bulk write."""
+
+    cache_prefix = "user_activity"
+    FLUSH_BATCH_SIZE = 500
+    # Seconds between flushes started by web requests (non-Redis caches only)
+    FLUSH_INTERVAL = 60
+
+    @classmethod
+    def pending_key(cls) -> str:
+        return f"{cls.cache_prefix}:pending"
+
+    @classmethod
+    def processing_key(cls) -> str:
+        return f"{cls.cache_prefix}:processing"
+
+    @classmethod
+    def flush_timer_key(cls) -> str:
+        return f"{cls.cache_prefix}:flush_timer"
+
+    @classmethod
+    def flusher_heartbeat_key(cls) -> str:
+        return f"{cls.cache_prefix}:flusher_heartbeat"
+
+    @classmethod
+    def mark_flusher_alive(cls, timeout: float) -> None:
+        """Tell web requests that an out-of-band flusher runs, for the next timeout seconds."""
+        cache.set(cls.flusher_heartbeat_key(), True, timeout)
+
+    @staticmethod
+    def _redis():
+        """The raw Redis connection behind the default cache, or None for other backends."""
+        if not settings.CACHES.get("default", {}).get("BACKEND", "").startswith("django_redis"):
+            return None
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+
+    @classmethod
+    def record(cls, user_id: int, when: datetime, min_interval: timedelta | None = None) -> bool:
+        """
+        Remember that a user was active at when, keeping only their newest timestamp.
+
+        With min_interval nothing is recorded while the user's pending timestamp is less
+        than min_interval older than when. Returns whether the timestamp was recorded.
+        """
+        timestamp = when.timestamp()
+        threshold = timestamp - min_interval.total_seconds() if min_interval else None
+        redis = cls._redis()
+        if redis is not None:
+            pending_key = cache.make_key(cls.pending_key())
+            if threshold is not None:
+                recorded = redis.zscore(pending_key, str(user_id))
+                if recorded is not None and recorded > threshold:
+                    return False
+            redis.zadd(pending_key, {str(user_id): timestamp}, gt=True)
+            return True
+
+        pending = cache.get(cls.pending_key(), {})
+        recorded = pending.get(user_id, 0)
+        if threshold is not None and recorded > threshold:
+            return False
+        if timestamp > recorded:
+            pending[user_id] = timestamp
+            cache.set(cls.pending_key(), pending, None)
+        return True
+
+    @classmethod
+    def pending(cls) -> dict[int, datetime]:
+        """Timestamps recorded since the last flush, by user id."""
+        redis = cls._redis()
+        if redis is not None:
+            entries = redis.zrange(cache.make_key(cls.pending_key()), 0, -1, withscores=True)
+            return {int(member): datetime.fromtimestamp(score, tz=UTC) for member, score in entries}
+        return {
+            user_id: datetime.fromtimestamp(timestamp, tz=UTC)
+            for user_id, timestamp in cache.get(cls.pending_key(), {}).items()
+        }
+
+    @classmethod
+    def _take_pending(cls) -> dict[int, float]:
+        """Detach the pending timestamps so new activity accumulates separately while they are written."""
+        redis = cls._redis()
+        if redis is None:
+            pending = cache.get(cls.pending_key(), {})
+            cache.delete(cls.pending_key())
+            return pending
+
+        pending_key = cache.make_key(cls.pending_key())
+        processing_key = cache.make_key(cls.processing_key())
+        # A processing set left behind by a crashed flush is written before anything newer
+        if not redis.exists(processing_key):
+            if not redis.exists(pending_key):
+                return {}
+            redis.rename(pending_key, processing_key)
+        return {int(member): score for member, score in redis.zrange(processing_key, 0, -1, withscores=True)}
+
+    @classmethod
+    def _release_processing(cls) -> None:
+        redis = cls._redis()
+        if redis is not None:
+            redis.delete(cache.make_key(cls.processing_key()))
+
+    @classmethod
+    def flush_if_due(cls) -> ActivityFlushResult | None:
+        """
+        Flush if FLUSH_INTERVAL has passed since the last flush started by a request.
+
+        With Redis this returns None while the flush_user_activity command's heartbeat is
+        present, leaving the UPDATE off the request path. cache.add is atomic, so only one
+        caller wins each interval; the others return None without touching the database.
+        """
+        if cls._redis() is not None and cache.get(cls.flusher_heartbeat_key()):
+            return None
+        if not cache.add(cls.flush_timer_key(), True, cls.FLUSH_INTERVAL):
+            return None
+        return cls.flush()
+
+    @classmethod
+    def flush(cls, batch_size: int | None = None) -> ActivityFlushResult:
+        """
+        Write all pending timestamps to CustomUser.last_activity.
+
+        One bulk UPDATE per batch_size users. If writing fails the timestamps stay in the
+        processing set (Redis) and are written by the next flush.
+        """
+        batch_size = batch_size or cls.FLUSH_BATCH_SIZE
+        pending = cls._take_pending()
+        result = ActivityFlushResult()
+        if not pending:
+            return result
+
+        User = get_user_model()
+        user_ids = sorted(pending)
+        for start in range(0, len(user_ids), batch_size):
+            batch = [
+                User(pk=user_id, last_activity=datetime.fromtimestamp(pending[user_id], tz=UTC))
+                for user_id in user_ids[start : start + batch_size]
+            ]
+            User.objects.bulk_update(batch, ["last_activity"])
+            result.users += len(batch)
+            result.batches += 1
+
+        cls._release_processing()
+        logger.debug(f"Flushed activity of {result.users} users in {result.batches} batches")
+        return result
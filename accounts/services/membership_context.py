@@ -0,0 +1,115 @@
+"""
+Membership context
+
+A user's active school memberships, loaded once per request instead of once per call site.
+MembershipContextMiddleware attaches a MembershipContext to every request; the context
+processor, dashboard, permission mixins and get_user_schools helpers all read from it.
+
+The memberships (with their schools) are loaded lazily on first use in a single query and
+kept in the cache for CACHE_TTL seconds. The handlers in user_membership_signals invalidate
+the entry whenever one of the user's memberships, or a school they belong to, changes, both
+right away and once the change has committed.
+"""
+
+from functools import cached_property
+
+from django.core.cache import cache
+from django.db.models import QuerySet
+
+from accounts.models import School, SchoolMembership
+
+
+class MembershipContext:
+    """Lazily loaded, cached view of one user's active school memberships."""
+
+    cache_prefix = "membership_context"
+    CACHE_TTL = 300  # 5 minutes
+
+    def __init__(self, user):
+        self.user = user
+
+    @classmethod
+    def cache_key(cls, user_id: int) -> str:
+        return f"{cls.cache_prefix}:{user_id}"
+
+    @classmethod
+    def for_request(cls, request) -> "MembershipContext":
+        """
+        The context attached by the middleware, or a new one for requests that bypassed it
+        or whose user changed since (sign in and sign out replace request.user).
+        """
+        context = getattr(request, "membership_context", None)
+        if context is None or context.user is not request.user:
+            context = cls(request.user)
+            request.membership_context = context
+        return context
+
+    @classmethod
+    def invalidate(cls, user_id: int) -> None:
+        """Drop the cached memberships of a user."""
+        cache.delete(cls.cache_key(user_id))
+
+    @classmethod
+    def invalidate_many(cls, user_ids) -> None:
+        """Drop the cached memberships of several users in one cache round trip."""
+        cache.delete_many([cls.cache_key(user_id) for user_id in user_ids])
+
+    @cached_property
+    def memberships(self) -> list[SchoolMembership]:
+        """Active memberships with their schools, oldest first."""
+        if not self.user.is_authenticated:
+            return []
+
+        key = self.cache_key(self.user.pk)
+        memberships = cache.get(key)
+        if memberships is None:
+            memberships = list(
+                SchoolMembership.objects.filter(user_id=self.user.pk, is_active=True)
+                .select_related("school")
+                .order_by("id")
+            )
+            cache.set(key, memberships, self.CACHE_TTL)
+        return memberships
+
+    @property
+    def school_ids(self) -> list[int]:
+        """Ids of the schools the user is an active member of."""
+        return list(dict.fromkeys(membership.school_id for membership in self.memberships))
+
+    @property
+    def primary_membership(self) -> SchoolMembership | None:
+        """The user's oldest active membership."""
+        return self.memberships[0] if self.memberships else None
+
+    def schools(self) -> QuerySet:
+        """Schools visible to the user: every school for staff, otherwise those they are a member of."""
+        if self.user.is_authenticated and (self.user.is_staff or self.user.is_superuser):
+            return School.objects.all()
+        return School.objects.filter(id__in=self.school_ids)
+
+    def membership_for(self, school) -> SchoolMembership | None:
+        """The user's oldest active membership in a school (instance or id)."""
+        school_id = getattr(school, "pk", school)
+        return next((membership for membership in self.memberships if membership.school_id == school_id), None)
+
+    def role_for(self, school) -> str | None:
+        """The user's role in a school, None if they are not an active member."""
+        membership = self.membership_for(school)
+        return membership.role if membership else None
+
+    def has_access(self, school) -> bool:
+        """Whether the user is an active member of a school."""
+        return self.membership_for(school) is not None
+
+    def has_role(self, school, roles) -> bool:
+        """Whether the user holds one of roles in a school."""
+        if isinstance(roles, str):
+            roles = [roles]
+        school_id = getattr(school, "pk", school)
+        return any(membership.school_id == school_id and membership.role in roles for membership in self.memberships)
+
+    def schools_with_role(self, role) -> QuerySet:
+        """Schools where the user holds role."""
+        return School.objects.filter(
+            id__in={membership.school_id for membership in self.memberships if membership.role == role}
+        )
@@ -2,7 +2,15 @@
 Teacher Dashboard Service
 
 Handles data aggregation and calculations for teacher dashboard API.
-Optimized for performance with proper query optimization and caching.
+
+Each dashboard section (teacher info, sessions, activities, earnings, quick stats) is
+cached on its own together with the day it was built for, so a change to one kind of data
+only rebuilds the section it appears in and day-relative sections never outlive their day.
+The handlers in teacher_dashboard_signals invalidate the affected sections whenever a
+teacher's sessions, payment entries, school activities, profile or memberships change,
+which lets the event-driven sections stay cached far longer than the old 5-minute blob.
+The warm_teacher_dashboards management command prebuilds the cache for teachers with
+sessions today.
 """
 
 from datetime import timedelta
@@ -11,16 +19,18 @@ import logging
 from typing import Any
 
 from django.core.cache import cache
-from django.db.models import Q, Sum
+from django.db.models import Case, Count, DurationField, ExpressionWrapper, F, Prefetch, Q, Sum, Value, When
 from django.utils import timezone
 
 from accounts.models import (
+    CustomUser,
     SchoolActivity,
     SchoolMembership,
     SchoolRole,
     TeacherProfile,
 )
 from finances.models import ClassSession, SessionStatus, TeacherPaymentEntry
+from finances.services.aggregation import conditional_aggregate
 
 logger = logging.getLogger(__name__)
 
@@ -28,40 +38,62 @@ logger = logging.getLogger(__name__)
 class TeacherDashboardService:
     """Service class for teacher dashboard data aggregation."""
 
+    cache_prefix = "teacher_dashboard"
+
+    # Section name to the method that builds it, in dashboard order
+    SECTIONS = {
+        "teacher_info": "_get_teacher_info",
+        "sessions": "_get_sessions_data",
+        "recent_activities": "_get_recent_activities",
+        "earnings": "_get_earnings_data",
+        "quick_stats": "_get_quick_stats",
+    }
+
+    # Sections kept up to date by signal invalidation; teacher_info also depends on
+    # courses and schools, so it keeps the short timeout as a safety net
+    MATERIALIZED_SECTIONS = ("sessions", "recent_activities", "earnings", "quick_stats")
+    MATERIALIZED_TIMEOUT = 60 * 60  # 1 hour
+
     def __init__(self, teacher_profile: TeacherProfile):
         self.teacher_profile = teacher_profile
         self.teacher_user = teacher_profile.user
         self.cache_timeout = 300  # 5 minutes cache
 
+    @classmethod
+    def section_key(cls, teacher_profile_id: int, section: str) -> str:
+        return f"{cls.cache_prefix}_{teacher_profile_id}:{section}"
+
     def get_consolidated_dashboard_data(self) -> dict[str, Any]:
         """
         Get all consolidated dashboard data for a teacher.
 
+        Sections are read from the cache in one round trip; only missing, invalidated or
+        previous-day sections are rebuilt.
+
         Returns:
             Dict containing all dashboard sections with optimized queries.
         """
         try:
-            # Check cache first
-            cache_key = f"teacher_dashboard_{self.teacher_profile.id}"
-            cached_data = cache.get(cache_key)
-
-            if cached_data:
-                logger.info(f"Returning cached dashboard data for teacher {self.teacher_profile.id}")
-                return cached_data  # type: ignore[no-any-return]
-
-            # Gather all data with optimized queries
-            dashboard_data = {
-                "teacher_info": self._get_teacher_info(),
-                "sessions": self._get_sessions_data(),
-                "recent_activities": self._get_recent_activities(),
-                "earnings": self._get_earnings_data(),
-                "quick_stats": self._get_quick_stats(),
-            }
-
-            # Cache the result
-            cache.set(cache_key, dashboard_data, self.cache_timeout)
-
-            logger.info(f"Generated dashboard data for teacher {self.teacher_profile.id}")
+            today = timezone.now().date()
+            keys = {section: self.section_key(self.teacher_profile.id, section) for section in self.SECTIONS}
+            cached = cache.get_many(list(keys.values()))
+
+            dashboard_data = {}
+            rebuilt = []
+            for section, builder in self.SECTIONS.items():
+                entry = cached.get(keys[section])
+                if entry is not None and entry["day"] == today:
+                    dashboard_data[section] = entry["data"]
+                else:
+                    dashboard_data[section] = getattr(self, builder)()
+                    rebuilt.append(section)
+
+            for section in rebuilt:
+                timeout = self.MATERIALIZED_TIMEOUT if section in self.MATERIALIZED_SECTIONS else self.cache_timeout
+                cache.set(keys[section], {"day": today, "data": dashboard_data[section]}, timeout)
+
+            if rebuilt:
+                logger.info(f"Rebuilt dashboard sections {rebuilt} for teacher {self.teacher_profile.id}")
             return dashboard_data
 
         except Exception as e:
@@ -109,24 +141,31 @@ class TeacherDashboardService:
     def _get_sessions_data(self) -> dict[str, list[dict[str, Any]]]:
         """Get sessions data organized by time periods."""
         today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())
-        week_start + timedelta(days=6)
-
-        # Base queryset for teacher's sessions
-        base_sessions = ClassSession.objects.filter(teacher=self.teacher_profile).prefetch_related("students")
+        window_start = today - timedelta(days=7)
+        window_end = today + timedelta(days=7)
+
+        # Every session of the surrounding two weeks in one query (plus one for the
+        # students), split into today / upcoming / recently completed in Python
+        sessions = list(
+            ClassSession.objects.filter(teacher=self.teacher_profile, date__gte=window_start, date__lte=window_end)
+            .prefetch_related(Prefetch("students", queryset=CustomUser.objects.only("id", "name")))
+            .order_by("date", "start_time")
+        )
 
         # Today's sessions
-        today_sessions = base_sessions.filter(date=today).order_by("start_time")
+        today_sessions = [session for session in sessions if session.date == today]
 
         # Upcoming sessions (next 7 days, excluding today)
-        upcoming_sessions = base_sessions.filter(
-            date__gt=today, date__lte=today + timedelta(days=7), status=SessionStatus.SCHEDULED
-        ).order_by("date", "start_time")
+        upcoming_sessions = [
+            session for session in sessions if session.date > today and session.status == SessionStatus.SCHEDULED
+        ]
 
         # Recent completed sessions (last 7 days)
-        recent_completed = base_sessions.filter(
-            date__gte=today - timedelta(days=7), date__lt=today, status=SessionStatus.COMPLETED
-        ).order_by("-date", "-start_time")[:10]
+        recent_completed = [
+            session
+            for session in reversed(sessions)
+            if session.date < today and session.status == SessionStatus.COMPLETED
+        ][:10]
 
         def serialize_session(session):
             return {
@@ -187,31 +226,43 @@ class TeacherDashboardService:
         last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
         last_month_end = current_month_start - timedelta(days=1)
 
-        # Current month earnings
-        current_month_total = TeacherPaymentEntry.objects.filter(
-            teacher=self.teacher_profile, session__date__gte=current_month_start, session__date__lte=today
-        ).aggregate(total=Sum("amount_earned"))["total"] or Decimal("0.00")
-
-        # Last month earnings
-        last_month_total = TeacherPaymentEntry.objects.filter(
-            teacher=self.teacher_profile, session__date__gte=last_month_start, session__date__lte=last_month_end
-        ).aggregate(total=Sum("amount_earned"))["total"] or Decimal("0.00")
-
-        # Pending amount (completed sessions without payment entries)
-        completed_sessions_without_payment = ClassSession.objects.filter(
+        # Current month, last month and all-time totals in a single query
+        totals = conditional_aggregate(
+            TeacherPaymentEntry.objects.filter(teacher=self.teacher_profile),
+            buckets={
+                "current_month": Q(session__date__gte=current_month_start, session__date__lte=today),
+                "last_month": Q(session__date__gte=last_month_start, session__date__lte=last_month_end),
+                "all": None,
+            },
+            metrics={"amount": (Sum, "amount_earned"), "hours": (Sum, "hours_taught")},
+        )
+        current_month_total = totals["current_month"]["amount"] or Decimal("0.00")
+        last_month_total = totals["last_month"]["amount"] or Decimal("0.00")
+        total_hours = totals["all"]["hours"] or Decimal("0.00")
+
+        # Pending amount (completed sessions without payment entries), estimated from the
+        # summed scheduled duration and the teacher's hourly rate. Sessions that cross
+        # midnight get a day added, as ClassSession.duration_hours does.
+        pending = ClassSession.objects.filter(
             teacher=self.teacher_profile, status=SessionStatus.COMPLETED, payment_entry__isnull=True
+        ).aggregate(
+            time_of_day=Sum(ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())),
+            overnight=Sum(
+                Case(
+                    When(end_time__lt=F("start_time"), then=Value(timedelta(days=1))),
+                    default=Value(timedelta(0)),
+                    output_field=DurationField(),
+                )
+            ),
         )
+        pending_duration = pending["time_of_day"]
+        if pending_duration is not None and pending["overnight"]:
+            pending_duration += pending["overnight"]
 
         pending_amount = Decimal("0.00")
-        for session in completed_sessions_without_payment:
-            # Estimate pending amount based on duration and hourly rate
+        if pending_duration:
             rate = self.teacher_profile.hourly_rate or Decimal("0.00")
-            pending_amount += session.duration_hours * rate
-
-        # Total hours taught (all time)
-        total_hours = TeacherPaymentEntry.objects.filter(teacher=self.teacher_profile).aggregate(
-            total_hours=Sum("hours_taught")
-        )["total_hours"] or Decimal("0.00")
+            pending_amount = Decimal(str(pending_duration.total_seconds() / 3600)) * rate
 
         # Recent payments (last 5)
         recent_payments = []
@@ -246,21 +297,19 @@ class TeacherDashboardService:
         week_start = today - timedelta(days=today.weekday())
         week_end = week_start + timedelta(days=6)
 
-        # Total students (count unique students from sessions)
-        unique_students = (
-            ClassSession.objects.filter(teacher=self.teacher_profile, status=SessionStatus.COMPLETED)
-            .values("students")
-            .distinct()
-            .count()
-        )
-
-        # Sessions today
-        sessions_today = ClassSession.objects.filter(teacher=self.teacher_profile, date=today).count()
+        # Total students (distinct attendees of completed sessions, read from the join table)
+        unique_students = ClassSession.students.through.objects.filter(
+            classsession__teacher=self.teacher_profile, classsession__status=SessionStatus.COMPLETED
+        ).aggregate(total=Count("customuser", distinct=True))["total"]
 
-        # Sessions this week
-        sessions_this_week = ClassSession.objects.filter(
-            teacher=self.teacher_profile, date__gte=week_start, date__lte=week_end
-        ).count()
+        # Sessions today and this week in a single query
+        counts = conditional_aggregate(
+            ClassSession.objects.filter(teacher=self.teacher_profile, date__gte=week_start, date__lte=week_end),
+            buckets={"today": Q(date=today), "week": None},
+            metrics={"count": (Count, "id")},
+        )
+        sessions_today = counts["today"]["count"]
+        sessions_this_week = counts["week"]["count"]
 
         return {
             "total_students": unique_students,
@@ -297,11 +346,11 @@ class TeacherDashboardService:
         }
 
     @classmethod
-    def invalidate_cache(cls, teacher_profile_id: int) -> None:
-        """Invalidate cached dashboard data for a teacher."""
-        cache_key = f"teacher_dashboard_{teacher_profile_id}"
-        cache.delete(cache_key)
-        logger.info(f"Invalidated dashboard cache for teacher {teacher_profile_id}")
+    def invalidate_cache(cls, teacher_profile_id: int, sections=None) -> None:
+        """Invalidate cached dashboard sections (all of them by default) for a teacher."""
+        sections = list(sections or cls.SECTIONS)
+        cache.delete_many([cls.section_key(teacher_profile_id, section) for section in sections])
+        logger.debug(f"Invalidated dashboard sections {sections} for teacher {teacher_profile_id}")
 
     @classmethod
     def warm_cache(cls, teacher_profile: TeacherProfile) -> None:
@@ -309,3 +358,21 @@ class TeacherDashboardService:
         service = cls(teacher_profile)
         service.get_consolidated_dashboard_data()
         logger.info(f"Warmed dashboard cache for teacher {teacher_profile.id}")
+
+    @classmethod
+    def warm_cache_for_today(cls) -> int:
+        """Warm the dashboards of every teacher with a (non-cancelled) session today."""
+        teachers = (
+            TeacherProfile.objects.filter(
+                id__in=ClassSession.objects.filter(date=timezone.now().date())
+                .exclude(status=SessionStatus.CANCELLED)
+                .values("teacher_id")
+            )
+            .select_related("user")
+            .order_by("id")
+        )
+        warmed = 0
+        for teacher_profile in teachers:
+            cls.warm_cache(teacher_profile)
+            warmed += 1
+        return warmed
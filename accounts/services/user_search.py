@@ -0,0 +1,150 @@
+"""
+School-scoped user search
+
+Searches school members in the database and returns only the requested page of ranked
+results, instead of loading every member of the user's schools and matching in Python.
+
+Matching is case-insensitive substring search over the user's name fields, email and
+username (and, for students, school year and guardian name/email). Results are ranked
+exact match first, then prefix match, then any other match; on PostgreSQL the pg_trgm
+similarity breaks ties within a rank. The 0015_user_search_indexes migration adds trigram
+GIN indexes on PostgreSQL, which serve the icontains filter. Other backends (SQLite in
+development) scan the members of the searched schools, as a substring match with a
+leading wildcard cannot use a B-tree index.
+"""
+
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from django.db.models.functions import Greatest
+
+from accounts.models import SchoolMembership, SchoolRole
+
+MIN_QUERY_LENGTH = 2
+DEFAULT_PAGE_SIZE = 20
+
+USER_SEARCH_FIELDS = ("user__name", "user__first_name", "user__last_name", "user__email", "user__username")
+GUARDIAN_SEARCH_FIELDS = (
+    "user__student_profile__guardian__user__name",
+    "user__student_profile__guardian__user__email",
+)
+STUDENT_SEARCH_FIELDS = (*USER_SEARCH_FIELDS, "user__student_profile__school_year", *GUARDIAN_SEARCH_FIELDS)
+
+
+def parse_page(value) -> int:
+    """1-based page number from a request parameter, defaulting to the first page."""
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+@dataclass
+class SearchPage:
+    """One page of ranked memberships."""
+
+    results: list[SchoolMembership]
+    page: int
+    has_more: bool
+    total: int | None = None
+
+
+class SchoolUserSearchService:
+    """Ranked, paginated search over school memberships."""
+
+    @staticmethod
+    def rank_memberships(memberships: QuerySet, query: str, fields: tuple[str, ...]) -> QuerySet:
+        """Filter memberships to those matching query in any of fields and order them by relevance."""
+        matches = Q()
+        for field in fields:
+            matches |= Q(**{f"{field}__icontains": query})
+
+        rank = Case(
+            *[When(**{f"{field}__iexact": query}, then=Value(0)) for field in fields],
+            *[When(**{f"{field}__istartswith": query}, then=Value(1)) for field in fields],
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+        memberships = memberships.filter(matches).annotate(search_rank=rank)
+        ordering = ["search_rank"]
+
+        if connection.vendor == "postgresql":
+            from django.contrib.postgres.search import TrigramSimilarity
+
+            memberships = memberships.annotate(
+                search_similarity=Greatest(*[TrigramSimilarity(field, query) for field in USER_SEARCH_FIELDS])
+            )
+            ordering.append("-search_similarity")
+
+        return memberships.order_by(*ordering, "user__name", "user_id", "id")
+
+    @classmethod
+    def search(
+        cls,
+        school_ids,
+        query: str,
+        roles: list[str] | None = None,
+        exclude_user=None,
+        include_inactive: bool = False,
+        page: int = 1,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        min_query_length: int = MIN_QUERY_LENGTH,
+        with_total: bool = False,
+    ) -> SearchPage:
+        """
+        Search the members of the given schools.
+
+        Args:
+            school_ids: Schools (ids or queryset) whose members are searched
+            query: Search text; shorter than min_query_length returns nothing
+            roles: Only memberships with one of these roles (all roles by default)
+            exclude_user: User left out of the results, usually the searcher
+            include_inactive: Also return deactivated users
+            page: 1-based page number
+            page_size: Results per page
+            min_query_length: Shortest query that is searched (at least 1)
+            with_total: Also count every match (one extra query)
+
+        Returns:
+            SearchPage with memberships (user and school selected) in rank order
+        """
+        query = (query or "").strip()
+        page = max(page, 1)
+        if len(query) < max(min_query_length, 1):
+            return SearchPage(results=[], page=page, has_more=False, total=0 if with_total else None)
+
+        memberships = SchoolMembership.objects.filter(school__in=school_ids).select_related("user", "school")
+        if not include_inactive:
+            memberships = memberships.filter(user__is_active=True)
+        if roles:
+            memberships = memberships.filter(role__in=roles)
+        if exclude_user is not None:
+            memberships = memberships.exclude(user=exclude_user)
+
+        fields = STUDENT_SEARCH_FIELDS if roles == [SchoolRole.STUDENT.value] else USER_SEARCH_FIELDS
+        memberships = cls.rank_memberships(memberships, query, fields)
+
+        start = (page - 1) * page_size
+        rows = list(memberships[start : start + page_size + 1])
+        total = None
+        if with_total:
+            has_more = len(rows) > page_size
+            # The page already tells the total unless it is full or past the last match
+            total = start + len(rows) if rows and not has_more else memberships.count()
+        return SearchPage(results=rows[:page_size], page=page, has_more=len(rows) > page_size, total=total)
+
+    @staticmethod
+    def membership_data(membership: SchoolMembership) -> dict:
+        """The user dictionary the chat views return for a membership."""
+        user = membership.user
+        return {
+            "id": user.id,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email,
+            "role": membership.role,
+            "school_id": membership.school_id,
+            "school_name": membership.school.name if membership.school else "",
+        }
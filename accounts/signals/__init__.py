@@ -4,5 +4,6 @@ Signals for the accounts app.
 
 # Import all signal modules to register them
 from .school_activity_signals import *  # noqa: F403
+from .teacher_dashboard_signals import *  # noqa: F403
 from .user_membership_signals import *  # noqa: F403
 from .verification_task_signals import *  # noqa: F403
@@ -0,0 +1,106 @@
+"""
+Django signals keeping the cached teacher dashboard sections in step with their data.
+Each handler invalidates only the sections the changed row appears in.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import SchoolActivity, SchoolMembership, TeacherCourse, TeacherProfile
+from accounts.services.teacher_dashboard_service import TeacherDashboardService
+from finances.models import ClassSession, TeacherPaymentEntry
+
+logger = logging.getLogger(__name__)
+
+# Sessions feed the session lists, the pending earnings estimate and the quick stats
+SESSION_SECTIONS = ("sessions", "earnings", "quick_stats")
+
+
+def invalidate_teacher_dashboards(teacher_profile_ids, sections) -> None:
+    """
+    Invalidate dashboard sections of the given teachers now and again after commit.
+
+    The immediate invalidation keeps reads inside the same transaction consistent; the
+    on-commit one discards any section another worker built from pre-commit data.
+    """
+    teacher_profile_ids = {teacher_id for teacher_id in teacher_profile_ids if teacher_id is not None}
+    if not teacher_profile_ids:
+        return
+
+    def invalidate():
+        for teacher_id in teacher_profile_ids:
+            TeacherDashboardService.invalidate_cache(teacher_id, sections)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def teacher_profile_ids_for_users(user_ids) -> list[int]:
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return []
+    return list(TeacherProfile.objects.filter(user_id__in=user_ids).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=ClassSession)
+@receiver(post_delete, sender=ClassSession)
+def invalidate_dashboard_on_session_change(sender, instance, **kwargs):
+    """Rebuild the session-derived sections of the session's teacher."""
+    invalidate_teacher_dashboards([instance.teacher_id], SESSION_SECTIONS)
+
+
+@receiver(m2m_changed, sender=ClassSession.students.through)
+def invalidate_dashboard_on_attendance_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Rebuild the session-derived sections when students are added to or removed from sessions."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        teacher_ids = [instance.teacher_id]
+    elif action == "pre_clear":
+        teacher_ids = ClassSession.objects.filter(students=instance).values_list("teacher_id", flat=True)
+    else:
+        teacher_ids = ClassSession.objects.filter(pk__in=pk_set).values_list("teacher_id", flat=True)
+    invalidate_teacher_dashboards(teacher_ids, SESSION_SECTIONS)
+
+
+@receiver(post_save, sender=TeacherPaymentEntry)
+@receiver(post_delete, sender=TeacherPaymentEntry)
+def invalidate_dashboard_on_payment_change(sender, instance, **kwargs):
+    """Rebuild the earnings of the entry's teacher."""
+    invalidate_teacher_dashboards([instance.teacher_id], ["earnings"])
+
+
+@receiver(post_save, sender=SchoolActivity)
+@receiver(post_delete, sender=SchoolActivity)
+def invalidate_dashboard_on_activity_change(sender, instance, **kwargs):
+    """Rebuild the activity feed of teachers who performed or were the target of the activity."""
+    teacher_ids = teacher_profile_ids_for_users([instance.actor_id, instance.target_user_id])
+    invalidate_teacher_dashboards(teacher_ids, ["recent_activities"])
+
+
+@receiver(post_save, sender=TeacherProfile)
+def invalidate_dashboard_on_profile_change(sender, instance, created, **kwargs):
+    """Rebuild the teacher info (and the rate-based pending earnings) of an updated profile."""
+    if created:
+        return
+    invalidate_teacher_dashboards([instance.pk], ["teacher_info", "earnings"])
+
+
+@receiver(post_save, sender=TeacherCourse)
+@receiver(post_delete, sender=TeacherCourse)
+def invalidate_dashboard_on_course_change(sender, instance, **kwargs):
+    """Rebuild the courses listed in the teacher info."""
+    invalidate_teacher_dashboards([instance.teacher_id], ["teacher_info"])
+
+
+@receiver(post_save, sender=SchoolMembership)
+@receiver(post_delete, sender=SchoolMembership)
+def invalidate_dashboard_on_membership_change(sender, instance, **kwargs):
+    """Rebuild the schools and the school-scoped activity feed of a teacher whose membership changed."""
+    invalidate_teacher_dashboards(
+        teacher_profile_ids_for_users([instance.user_id]), ["teacher_info", "recent_activities"]
+    )
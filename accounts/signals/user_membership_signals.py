@@ -1,16 +1,18 @@
 """
 Django signals for user school membership management.
-Ensures users always have at least one school membership.
+Ensures users always have at least one school membership, and keeps the cached
+MembershipContext of each user in step with their memberships.
 """
 
 import logging
 
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from accounts.models import School, SchoolMembership, SchoolRole
+from accounts.services.membership_context import MembershipContext
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -87,3 +89,44 @@ def ensure_user_has_school_membership(sender, instance, created, **kwargs):
         )
         # Don't re-raise in post_save to avoid breaking user creation
         # The user.clean() method will catch this on next validation
+
+
+def invalidate_membership_contexts(user_ids) -> None:
+    """
+    Drop the cached memberships of the given users now and again after commit.
+
+    The immediate invalidation keeps reads inside the same transaction consistent; the
+    on-commit one discards any list another request cached from pre-commit data, which
+    would otherwise keep a revoked membership granting access for CACHE_TTL.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def invalidate():
+        MembershipContext.invalidate_many(user_ids)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=SchoolMembership)
+@receiver(post_delete, sender=SchoolMembership)
+def invalidate_membership_context(sender, instance, **kwargs):
+    """Drop the cached memberships of a user whose membership changed."""
+    invalidate_membership_contexts([instance.user_id])
+
+
+@receiver(post_save, sender=School)
+def invalidate_school_members_context(sender, instance, created, **kwargs):
+    """Drop the cached memberships of a renamed or otherwise updated school's members."""
+    if created:
+        return
+    invalidate_membership_contexts(instance.memberships.values_list("user_id", flat=True))
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_user_membership_context(sender, instance, created, **kwargs):
+    """Make sure a new user never inherits a cache entry left under a reused id."""
+    if created:
+        MembershipContext.invalidate(instance.pk)
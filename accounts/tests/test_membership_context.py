@@ -0,0 +1,130 @@
+"""
+Tests for the per-request, cached membership context.
+
+The context processor, dashboard and permission mixins must share one lazily loaded list of
+the user's active memberships, and the cached list must follow membership and school changes.
+"""
+
+from unittest.mock import patch
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.urls import reverse
+
+from accounts.context_processors import user_context
+from accounts.models import CustomUser, School, SchoolMembership, SchoolRole
+from accounts.permissions import SchoolPermissionMixin
+from accounts.services.membership_context import MembershipContext
+from accounts.tests.test_base import BaseTestCase
+
+
+class MembershipContextTests(BaseTestCase):
+    """Test loading, caching and invalidation of a user's memberships"""
+
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name="First School")
+        self.other_school = School.objects.create(name="Second School")
+        self.user = CustomUser.objects.create_user(email="owner@test.com", name="Owner", first_name="Olivia")
+        SchoolMembership.objects.create(user=self.user, school=self.school, role=SchoolRole.SCHOOL_OWNER)
+        SchoolMembership.objects.create(user=self.user, school=self.school, role=SchoolRole.TEACHER)
+        SchoolMembership.objects.create(user=self.user, school=self.other_school, role=SchoolRole.TEACHER)
+        self.factory = RequestFactory()
+
+    def make_request(self):
+        request = self.factory.get("/")
+        request.user = self.user
+        request.session = SessionStore()
+        return request
+
+    def test_memberships_load_in_one_query_and_are_cached(self):
+        context = MembershipContext(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(context.school_ids, [self.school.id, self.other_school.id])
+            self.assertEqual(context.role_for(self.school), SchoolRole.SCHOOL_OWNER)
+            self.assertTrue(context.has_role(self.other_school, [SchoolRole.TEACHER]))
+            self.assertFalse(context.has_role(self.other_school, SchoolRole.SCHOOL_OWNER))
+            self.assertEqual(context.primary_membership.school.name, "First School")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(MembershipContext(self.user).school_ids, [self.school.id, self.other_school.id])
+
+    def test_context_processor_and_mixin_share_the_request_context(self):
+        request = self.make_request()
+        view = SchoolPermissionMixin()
+        view.request = request
+
+        with self.assertNumQueries(1):
+            context = user_context(request)
+            self.assertTrue(view.has_school_access(self.user, self.other_school))
+            self.assertTrue(view.has_school_permission(self.school, [SchoolRole.SCHOOL_OWNER]))
+            teacher_schools = view.get_user_schools_by_role(SchoolRole.TEACHER)
+        self.assertEqual(set(teacher_schools), {self.school, self.other_school})
+
+        self.assertEqual(context["school_name"], "First School")
+        self.assertEqual(context["user_role"], "school_owner")
+        self.assertEqual(context["user_first_name"], "Olivia")
+
+    def test_session_school_selects_the_current_school(self):
+        request = self.make_request()
+        request.session["current_school_id"] = self.other_school.id
+
+        context = user_context(request)
+
+        self.assertEqual(context["school_name"], "Second School")
+        self.assertEqual(context["user_role"], "teacher")
+
+    def test_membership_changes_invalidate_the_cache(self):
+        self.assertEqual(len(MembershipContext(self.user).memberships), 3)
+
+        SchoolMembership.objects.filter(school=self.other_school).get().delete()
+        self.assertEqual(MembershipContext(self.user).school_ids, [self.school.id])
+
+        membership = SchoolMembership.objects.filter(school=self.school, role=SchoolRole.SCHOOL_OWNER).get()
+        membership.is_active = False
+        membership.save()
+        self.assertEqual(MembershipContext(self.user).role_for(self.school), SchoolRole.TEACHER)
+
+    def test_membership_changes_invalidate_again_after_commit(self):
+        key = MembershipContext.cache_key(self.user.pk)
+        membership = SchoolMembership.objects.filter(school=self.other_school).get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.is_active = False
+            membership.save()
+            # Another request caches the memberships it read before the commit
+            cache.set(key, list(SchoolMembership.objects.filter(user=self.user)), MembershipContext.CACHE_TTL)
+
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(MembershipContext(self.user).school_ids, [self.school.id])
+
+    def test_school_updates_invalidate_member_caches(self):
+        self.assertEqual(MembershipContext(self.user).primary_membership.school.name, "First School")
+
+        self.school.name = "Renamed School"
+        self.school.save()
+
+        self.assertEqual(MembershipContext(self.user).primary_membership.school.name, "Renamed School")
+
+    def test_school_updates_invalidate_all_members_at_once(self):
+        teacher = CustomUser.objects.create_user(email="teacher@test.com", name="Teacher")
+        SchoolMembership.objects.create(user=teacher, school=self.school, role=SchoolRole.TEACHER)
+
+        with patch("accounts.services.membership_context.cache") as mocked_cache:
+            self.school.save()
+
+        mocked_cache.delete.assert_not_called()
+        mocked_cache.delete_many.assert_called_once()
+        self.assertEqual(
+            sorted(mocked_cache.delete_many.call_args.args[0]),
+            sorted(MembershipContext.cache_key(user_id) for user_id in (self.user.pk, teacher.pk)),
+        )
+
+    def test_middleware_attaches_context_to_requests(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("dashboard:dashboard"))
+
+        self.assertIsInstance(response.wsgi_request.membership_context, MembershipContext)
+        self.assertEqual(response.context["school_name"], "First School")
@@ -14,14 +14,19 @@ Tests cover all detection strategies and edge cases.
 """
 
 from datetime import timedelta
+from io import StringIO
 from unittest.mock import Mock, patch
 
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
 from django.http import HttpRequest, HttpResponse
 from django.test import Client, RequestFactory, TestCase, override_settings
 from django.utils import timezone
 
 from accounts.middleware import SessionManagementMiddleware
+from accounts.services.activity_tracker import ActivityTracker
 from accounts.tests.test_base import BaseTestCase
 from accounts.tests.test_utils import get_unique_email, get_unique_phone_number
 from accounts.utils.pwa_detection import PWADetector
@@ -251,6 +256,8 @@ class SessionManagementMiddlewareTest(BaseTestCase):
     """Test session management middleware functionality"""
 
     def setUp(self):
+        # Recorded activity is rate-limited through the cache
+        cache.clear()
         self.factory = RequestFactory()
         self.middleware = SessionManagementMiddleware(self._dummy_get_response)
         self.user = User.objects.create_user(
@@ -608,3 +615,149 @@ class PWADetectionSecurityTest(TestCase):
         # Detection info should also handle large values
         info = PWADetector.get_detection_info(request)
         self.assertIsInstance(info, dict)
+
+
+class CachedDetectionTest(TestCase):
+    """Test the session-memoized detection used by the middleware"""
+
+    MOBILE_USER_AGENT = "Mozilla/5.0 (Linux; Android 12; Pixel 6) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36"
+    DESKTOP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/88.0.4324.96 Safari/537.36"
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.session = SessionStore()
+
+    def make_request(self, **headers):
+        request = self.factory.get("/", **headers)
+        request.session = self.session
+        return request
+
+    def test_matches_uncached_detection(self):
+        cases = [
+            {"HTTP_X_PWA_MODE": "standalone"},
+            {"HTTP_X_PWA_MODE": "browser", "HTTP_USER_AGENT": self.MOBILE_USER_AGENT},
+            {"HTTP_USER_AGENT": self.MOBILE_USER_AGENT},
+            {"HTTP_USER_AGENT": self.DESKTOP_USER_AGENT},
+            {"HTTP_USER_AGENT": "Mozilla/5.0 (Linux; Android 12) Firefox/120.0", "HTTP_ACCEPT": "text/html"},
+        ]
+        for headers in cases:
+            with self.subTest(headers=headers):
+                request = self.make_request(**headers)
+                self.assertEqual(PWADetector.detect_cached(request), PWADetector.is_pwa_request(request))
+
+    def test_user_agent_analysis_runs_once_per_user_agent(self):
+        with patch.object(PWADetector, "_check_user_agent", wraps=PWADetector._check_user_agent) as check:
+            self.assertFalse(PWADetector.detect_cached(self.make_request(HTTP_USER_AGENT=self.DESKTOP_USER_AGENT)))
+            self.assertFalse(PWADetector.detect_cached(self.make_request(HTTP_USER_AGENT=self.DESKTOP_USER_AGENT)))
+            self.assertEqual(check.call_count, 1)
+
+            self.assertTrue(PWADetector.detect_cached(self.make_request(HTTP_USER_AGENT=self.MOBILE_USER_AGENT)))
+            self.assertEqual(check.call_count, 2)
+
+    def test_explicit_headers_override_the_memo(self):
+        PWADetector.detect_cached(self.make_request(HTTP_USER_AGENT=self.MOBILE_USER_AGENT))
+
+        request = self.make_request(HTTP_USER_AGENT=self.MOBILE_USER_AGENT, HTTP_X_PWA_MODE="browser")
+
+        self.assertFalse(PWADetector.detect_cached(request))
+
+
+class CoalescedActivityTest(BaseTestCase):
+    """Test that activity is buffered by the middleware and written in bulk"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.stale = timezone.now() - timedelta(hours=1)
+        created = [
+            User.objects.create_user(email=get_unique_email("activity"), name=f"User {index}") for index in range(3)
+        ]
+        User.objects.filter(pk__in=[user.pk for user in created]).update(last_activity=self.stale)
+        self.users = list(User.objects.filter(pk__in=[user.pk for user in created]).order_by("pk"))
+
+    def make_request(self, user):
+        request = self.factory.get("/")
+        request.user = user
+        request.session = SessionStore()
+        return request
+
+    def test_requests_record_activity_without_writing_users(self):
+        middleware = SessionManagementMiddleware(lambda request: HttpResponse("OK"))
+
+        with self.assertNumQueries(0):
+            for user in self.users:
+                middleware(self.make_request(user))
+
+        self.assertEqual(set(ActivityTracker.pending()), {user.pk for user in self.users})
+        self.assertEqual(set(User.objects.values_list("last_activity", flat=True)), {self.stale})
+
+    def test_pending_activity_limits_recording(self):
+        """The pending timestamp, not the unflushed last_activity, rate-limits recording"""
+        interval = SessionManagementMiddleware.ACTIVITY_UPDATE_INTERVAL
+        now = timezone.now()
+        user_id = self.users[0].pk
+
+        self.assertTrue(ActivityTracker.record(user_id, now, min_interval=interval))
+        self.assertFalse(ActivityTracker.record(user_id, now + timedelta(minutes=1), min_interval=interval))
+        self.assertEqual(ActivityTracker.pending(), {user_id: now})
+
+        self.assertTrue(ActivityTracker.record(user_id, now + interval, min_interval=interval))
+        self.assertEqual(ActivityTracker.pending(), {user_id: now + interval})
+
+    def test_requests_flush_once_per_interval(self):
+        middleware = SessionManagementMiddleware(lambda request: HttpResponse("OK"))
+        for user in self.users:
+            middleware(self.make_request(user))
+        self.assertFalse(User.objects.exclude(last_activity=self.stale).exists())
+
+        # The flush timer expires: the next request writes everything pending
+        cache.delete(ActivityTracker.flush_timer_key())
+        middleware(self.make_request(self.users[0]))
+
+        self.assertFalse(User.objects.filter(last_activity=self.stale).exists())
+        # Flushed before the request's own activity was recorded
+        self.assertEqual(set(ActivityTracker.pending()), {self.users[0].pk})
+
+    def test_requests_leave_the_redis_flush_to_a_running_command(self):
+        ActivityTracker.mark_flusher_alive(120)
+
+        with patch.object(ActivityTracker, "_redis", return_value=Mock()), self.assertNumQueries(0):
+            self.assertIsNone(ActivityTracker.flush_if_due())
+
+        self.assertIsNone(cache.get(ActivityTracker.flush_timer_key()))
+
+    def test_requests_flush_redis_when_the_command_is_not_running(self):
+        redis = Mock()
+        redis.exists.return_value = False
+
+        with patch.object(ActivityTracker, "_redis", return_value=redis):
+            self.assertIsNotNone(ActivityTracker.flush_if_due())
+
+        self.assertTrue(cache.get(ActivityTracker.flush_timer_key()))
+
+    def test_flush_writes_latest_timestamps_in_bulk(self):
+        now = timezone.now()
+        ActivityTracker.record(self.users[0].pk, now - timedelta(minutes=1))
+        ActivityTracker.record(self.users[0].pk, now)
+        ActivityTracker.record(self.users[0].pk, now - timedelta(minutes=2))
+        ActivityTracker.record(self.users[1].pk, now - timedelta(minutes=3))
+
+        with self.assertNumQueries(1):
+            result = ActivityTracker.flush()
+
+        self.assertEqual(result.users, 2)
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).last_activity, now)
+        self.assertEqual(User.objects.get(pk=self.users[1].pk).last_activity, now - timedelta(minutes=3))
+        self.assertEqual(User.objects.get(pk=self.users[2].pk).last_activity, self.stale)
+        self.assertEqual(ActivityTracker.pending(), {})
+
+    def test_flush_command(self):
+        for user in self.users:
+            ActivityTracker.record(user.pk, timezone.now())
+        out = StringIO()
+
+        call_command("flush_user_activity", batch_size=2, stdout=out)
+
+        self.assertIn("Flushed activity of 3 users in 2 batches", out.getvalue())
+        self.assertTrue(cache.get(ActivityTracker.flusher_heartbeat_key()))
+        self.assertFalse(User.objects.filter(last_activity=self.stale).exists())
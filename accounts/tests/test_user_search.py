@@ -0,0 +1,165 @@
+"""
+Tests for the school-scoped user search used by the chat and people pages.
+
+Search must be filtered, ranked and paginated by the database so that its cost does not
+depend on how many members the user's schools have.
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from waffle.testutils import override_switch
+
+from accounts.models import CustomUser, GuardianProfile, School, SchoolMembership, SchoolRole, StudentProfile
+from accounts.services.user_search import SchoolUserSearchService
+from accounts.tests.test_base import BaseTestCase
+
+
+class SchoolUserSearchServiceTests(BaseTestCase):
+    """Test filtering, ranking and pagination of school member search"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="School 1")
+        self.other_school = School.objects.create(name="School 2")
+        self.admin = self.add_member("admin@test.com", "Admin User", SchoolRole.SCHOOL_ADMIN)
+
+    def add_member(self, email, name, role=SchoolRole.TEACHER, school=None, **user_fields):
+        user = CustomUser.objects.create_user(email=email, name=name, **user_fields)
+        SchoolMembership.objects.create(user=user, school=school or self.school, role=role)
+        return user
+
+    def search(self, query, **kwargs):
+        return SchoolUserSearchService.search([self.school.id], query, exclude_user=self.admin, **kwargs)
+
+    def test_ranks_exact_then_prefix_then_substring_matches(self):
+        substring = self.add_member("x@test.com", "Anna Marian")
+        prefix = self.add_member("y@test.com", "Mariana")
+        exact = self.add_member("z@test.com", "Maria")
+
+        results = self.search("maria")
+
+        self.assertEqual([membership.user for membership in results.results], [exact, prefix, substring])
+
+    def test_matches_email_and_username_within_the_users_schools(self):
+        by_email = self.add_member("teacher.joao@test.com", "Teacher")
+        by_username = self.add_member("other@test.com", "Other", username="joao99")
+        self.add_member("joao@elsewhere.com", "Joao", school=self.other_school)
+        self.add_member("inactive.joao@test.com", "Joao", is_active=False)
+
+        results = self.search("JOAO")
+
+        self.assertEqual({membership.user for membership in results.results}, {by_email, by_username})
+
+    def test_short_queries_return_nothing(self):
+        self.add_member("a@test.com", "A")
+
+        self.assertEqual(self.search("a").results, [])
+
+    def test_pages_are_fetched_from_the_database(self):
+        for index in range(25):
+            self.add_member(f"student{index:02d}@test.com", f"Student {index:02d}")
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.search("student", page_size=10)
+        self.assertEqual(len(queries), 1)
+        third = self.search("student", page=3, page_size=10)
+
+        self.assertTrue(first.has_more)
+        self.assertEqual(len(first.results), 10)
+        self.assertEqual(first.results[0].user.name, "Student 00")
+        self.assertFalse(third.has_more)
+        self.assertEqual([membership.user.name for membership in third.results][-1], "Student 24")
+        self.assertEqual(len(third.results), 5)
+
+    def test_total_counts_every_match(self):
+        for index in range(25):
+            self.add_member(f"student{index:02d}@test.com", f"Student {index:02d}")
+
+        first = self.search("student", page_size=10, with_total=True)
+        third = self.search("student", page=3, page_size=10, with_total=True)
+        short = self.search("5", page_size=10, min_query_length=1, with_total=True)
+
+        self.assertEqual((first.total, third.total), (25, 25))
+        self.assertEqual({membership.user.name for membership in short.results}, {"Student 05", "Student 15"})
+        self.assertEqual(short.total, 2)
+        self.assertIsNone(self.search("student").total)
+
+    def test_student_search_includes_guardian_fields(self):
+        guardian_user = CustomUser.objects.create_user(email="parent@test.com", name="Beatriz Costa")
+        guardian = GuardianProfile.objects.create(user=guardian_user)
+        student = self.add_member("kid@test.com", "Kid", role=SchoolRole.STUDENT)
+        StudentProfile.objects.create(
+            user=student,
+            guardian=guardian,
+            educational_system=self.default_educational_system,
+            birth_date="2012-01-01",
+            school_year="6",
+        )
+        self.add_member("costa@test.com", "Teacher Costa")
+
+        results = self.search("costa", roles=[SchoolRole.STUDENT.value])
+
+        self.assertEqual([membership.user for membership in results.results], [student])
+
+
+@override_switch("chat_feature", active=True)
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class UserSearchViewTests(BaseTestCase):
+    """Test the chat and people search endpoints"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="School 1")
+        self.admin = CustomUser.objects.create_user(email="admin@test.com", name="Admin")
+        SchoolMembership.objects.create(user=self.admin, school=self.school, role=SchoolRole.SCHOOL_ADMIN)
+        self.client.force_login(self.admin)
+
+    def add_students(self, count, start=0):
+        for index in range(start, start + count):
+            user = CustomUser.objects.create_user(email=f"pupil{index:02d}@test.com", name=f"Pupil {index:02d}")
+            SchoolMembership.objects.create(user=user, school=self.school, role=SchoolRole.STUDENT)
+            StudentProfile.objects.create(
+                user=user,
+                educational_system=self.default_educational_system,
+                birth_date="2012-01-01",
+                school_year="6",
+            )
+
+    def test_chat_search_is_paginated(self):
+        self.add_students(25)
+
+        first = self.client.get(reverse("chat_user_search"), {"search": "pupil"}).json()
+        second = self.client.get(reverse("chat_user_search"), {"search": "pupil", "page": 2}).json()
+
+        self.assertEqual(len(first["users"]), 20)
+        self.assertTrue(first["has_more"])
+        self.assertEqual(first["users"][0]["school_name"], "School 1")
+        self.assertEqual(len(second["users"]), 5)
+        self.assertFalse(second["has_more"])
+
+    def test_people_search_queries_do_not_grow_with_results(self):
+        self.add_students(3)
+        # Warm the membership cache so both measured requests start from the same state
+        self.client.post(reverse("people"), {"action": "search_students", "search": "pupil"})
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.post(reverse("people"), {"action": "search_students", "search": "pupil"})
+        self.assertEqual(len(response.context["students"]), 3)
+
+        self.add_students(9, start=3)
+
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(reverse("people"), {"action": "search_students", "search": "pupil"})
+        self.assertEqual(len(response.context["students"]), 12)
+        self.assertEqual(len(many), len(few))
+
+    def test_people_search_accepts_one_character_and_pages(self):
+        self.add_students(55)
+
+        first = self.client.post(reverse("people"), {"action": "search_students", "search": "pupil"})
+        second = self.client.post(reverse("people"), {"action": "search_students", "search": "pupil", "page": 2})
+        short = self.client.post(reverse("people"), {"action": "search_students", "search": "5"})
+
+        self.assertEqual(len(first.context["students"]), 50)
+        self.assertEqual(first.context["student_stats"]["total"], 55)
+        self.assertContains(first, "Showing 50 of 55 students")
+        self.assertEqual(len(second.context["students"]), 5)
+        self.assertEqual(len(short.context["students"]), 10)
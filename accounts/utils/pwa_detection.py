@@ -14,8 +14,13 @@ Detection Strategies (in priority order):
 2. Cookie-based Detection - pwa_mode cookie set by client-side JS
 3. User-Agent Analysis - WebView indicators, mobile Safari patterns
 4. Request Characteristics - Missing referer on GET requests
+
+detect_cached() is the per-request entry point used by SessionManagementMiddleware: it
+stores the user-agent analysis in the session under a hash of the User-Agent, so the
+patterns only run again when the client's User-Agent changes.
 """
 
+import hashlib
 import logging
 import re
 
@@ -36,6 +41,9 @@ class PWADetector:
     WEB_SESSION_DURATION = 24 * 60 * 60  # 24 hours = 86400 seconds
     PWA_SESSION_DURATION = 7 * 24 * 60 * 60  # 7 days = 604800 seconds
 
+    # Session key holding the memoized user-agent analysis
+    SESSION_DETECTION_KEY = "pwa_user_agent_detection"
+
     # User-Agent patterns that indicate PWA/WebView usage
     PWA_USER_AGENT_PATTERNS = [
         r".*wv\).*",  # WebView indicators (Android)
@@ -87,6 +95,67 @@ class PWADetector:
         logger.debug("Request classified as web browser")
         return False
 
+    @classmethod
+    def detect_cached(cls, request: HttpRequest) -> bool:
+        """
+        Same result as is_pwa_request, with the user-agent analysis memoized in the session.
+
+        Headers and cookie are still checked on every request since they are cheap and
+        may change between requests; the User-Agent patterns only run when the
+        User-Agent hash differs from the one stored in the session.
+
+        Args:
+            request: Django HttpRequest object with a session
+
+        Returns:
+            bool: True if request is from PWA, False for web browser
+        """
+        has_explicit_header, is_pwa_header = cls._check_pwa_headers(request)
+        if has_explicit_header:
+            return is_pwa_header
+
+        if cls._check_pwa_cookie(request):
+            return True
+
+        pwa_user_agent, mobile_user_agent = cls._user_agent_traits(request)
+        if pwa_user_agent:
+            return True
+
+        return cls._is_navigation_without_referer(request) and mobile_user_agent
+
+    @classmethod
+    def session_duration_for(cls, is_pwa: bool) -> int:
+        """Session duration in seconds for an already detected client type."""
+        return cls.PWA_SESSION_DURATION if is_pwa else cls.WEB_SESSION_DURATION
+
+    @staticmethod
+    def user_agent_hash(user_agent: str) -> str:
+        """Short, stable fingerprint of a User-Agent string."""
+        return hashlib.sha256(user_agent.encode()).hexdigest()[:16]
+
+    @classmethod
+    def _user_agent_traits(cls, request: HttpRequest) -> tuple[bool, bool]:
+        """
+        Memoized (matches PWA patterns, is mobile) analysis of the request's User-Agent.
+
+        The result is kept in the session next to the User-Agent hash it was computed for.
+        """
+        user_agent = request.headers.get("user-agent", "")
+        user_agent_hash = cls.user_agent_hash(user_agent)
+
+        memo = request.session.get(cls.SESSION_DETECTION_KEY)
+        if isinstance(memo, dict) and memo.get("user_agent_hash") == user_agent_hash:
+            return memo["pwa_user_agent"], memo["mobile_user_agent"]
+
+        pwa_user_agent = cls._check_user_agent(request)
+        mobile_user_agent = cls._is_mobile_user_agent(user_agent)
+        request.session[cls.SESSION_DETECTION_KEY] = {
+            "user_agent_hash": user_agent_hash,
+            "pwa_user_agent": pwa_user_agent,
+            "mobile_user_agent": mobile_user_agent,
+        }
+        return pwa_user_agent, mobile_user_agent
+
     @classmethod
     def get_session_duration(cls, request: HttpRequest) -> int:
         """
@@ -201,20 +270,28 @@ class PWADetector:
         """
         # Check for missing referer on GET requests
         # PWA navigation often lacks referer due to app context
-        if request.method == "GET":
-            referer = request.headers.get("referer")
-            accept = request.headers.get("accept", "")
-
-            # If no referer and requesting HTML content, might be PWA
-            if not referer and "text/html" in accept:
-                logger.debug("Potential PWA detected: GET request with no referer")
-                # This is a weak signal, so we're conservative
-                # Only consider PWA if other indicators are also present
-                user_agent = request.headers.get("user-agent", "")
-                return "Mobile" in user_agent or "Android" in user_agent
+        if cls._is_navigation_without_referer(request):
+            logger.debug("Potential PWA detected: GET request with no referer")
+            # This is a weak signal, so we're conservative
+            # Only consider PWA if other indicators are also present
+            return cls._is_mobile_user_agent(request.headers.get("user-agent", ""))
 
         return False
 
+    @staticmethod
+    def _is_navigation_without_referer(request: HttpRequest) -> bool:
+        """GET request for HTML content without a referer."""
+        return (
+            request.method == "GET"
+            and not request.headers.get("referer")
+            and "text/html" in request.headers.get("accept", "")
+        )
+
+    @staticmethod
+    def _is_mobile_user_agent(user_agent: str) -> bool:
+        """Whether a User-Agent names a mobile device."""
+        return "Mobile" in user_agent or "Android" in user_agent
+
     @classmethod
     def get_detection_info(cls, request: HttpRequest) -> dict:
         """
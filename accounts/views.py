@@ -49,6 +49,7 @@ from .models import School, SchoolMembership, SchoolSettings, TeacherInvitation
 from .models.profiles import StudentProfile
 from .models.schools import SchoolRole
 from .permissions import IsSchoolOwnerOrAdminMixin, SchoolPermissionMixin
+from .services.membership_context import MembershipContext
 from .services.otp_service import OTPService
 
 User = get_user_model()
@@ -1647,16 +1648,6 @@ class SchoolSettingsView(IsSchoolOwnerOrAdminMixin, SchoolPermissionMixin, FormV
         # Continue with normal dispatch
         return super().dispatch(request, *args, **kwargs)
 
-    def get_user_schools_by_role(self, role):
-        """Helper method to get schools by role"""
-        # Defensive check: ensure user is authenticated before querying
-        if not self.request.user.is_authenticated:
-            return School.objects.none()
-
-        return School.objects.filter(
-            memberships__user=self.request.user, memberships__role=role, memberships__is_active=True
-        )
-
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs["school"] = self.school
@@ -1738,12 +1729,9 @@ class BaseStudentCreateView(LoginRequiredMixin, View):
         except ValidationError:
             raise ValidationError(f"Invalid email format: {email}")
 
-    def _get_user_schools(self, user):
+    def _get_user_schools(self, request):
         """Get schools accessible to the current user"""
-        if user.is_staff or user.is_superuser:
-            return School.objects.all()
-        school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-        return School.objects.filter(id__in=school_ids)
+        return MembershipContext.for_request(request).schools()
 
     def _render_error(self, request, error_message):
         """Render error message template"""
@@ -1820,7 +1808,7 @@ class StudentSeparateCreateView(BaseStudentCreateView):
                 return self._render_error(request, error_msg)
 
             # Get user's schools and educational system
-            user_schools = self._get_user_schools(request.user)
+            user_schools = self._get_user_schools(request)
             with transaction.atomic():
                 # Temporarily disconnect the task creation signal to prevent orphaned tasks
                 from django.db.models.signals import post_save
@@ -1955,7 +1943,7 @@ class StudentGuardianOnlyCreateView(BaseStudentCreateView):
                 return self._render_error(request, error_msg)
 
             # Get user's schools and educational system
-            user_schools = self._get_user_schools(request.user)
+            user_schools = self._get_user_schools(request)
             with transaction.atomic():
                 # Temporarily disconnect the task creation signal to prevent orphaned tasks
                 from django.db.models.signals import post_save
@@ -2073,7 +2061,7 @@ class StudentAdultCreateView(BaseStudentCreateView):
                 return self._render_error(request, error_msg)
 
             # Get user's schools and educational system
-            user_schools = self._get_user_schools(request.user)
+            user_schools = self._get_user_schools(request)
             with transaction.atomic():
                 # Temporarily disconnect the task creation signal to prevent orphaned tasks
                 from django.db.models.signals import post_save
@@ -85,6 +85,7 @@ MIDDLEWARE = [
     "accounts.middleware.SessionManagementMiddleware",  # PWA detection and session management - MOVED AFTER AuthenticationMiddleware
     "django.contrib.messages.middleware.MessageMiddleware",  # Must come before custom middleware that uses messages
     "sesame.middleware.AuthenticationMiddleware",  # Magic link authentication - must come after AuthenticationMiddleware
+    "accounts.middleware.MembershipContextMiddleware",  # Lazy per-request school memberships - must come after auth
     "accounts.middleware.ProgressiveVerificationMiddleware",  # Progressive verification - must come after auth and messages
     "accounts.middleware.VerificationCompletionMiddleware",  # Handle verification completion
     "waffle.middleware.WaffleMiddleware",  # Feature flags middleware
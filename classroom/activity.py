@@ -0,0 +1,73 @@
+"""
+Denormalized channel activity: the last message pointer and per-participant unread counts.
+
+Every path that inserts messages reports them to ChannelActivityService.record_messages:
+the Message post_save handler for single creates and the write-behind buffer for its
+bulk inserts. Channel lists then read both values from the channel row and the
+participant's ChannelReadState instead of querying messages per channel.
+"""
+
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Channel, ChannelReadState, Message
+
+
+class ChannelActivityService:
+    """Maintenance of Channel.last_message and ChannelReadState.unread_count."""
+
+    @staticmethod
+    def record_messages(messages: Iterable[Message]) -> None:
+        """
+        Point each channel at its newest saved message, unless it already points at a newer
+        one, and count the messages as unread for every participant except their senders.
+
+        One channel UPDATE and one read-state UPDATE per channel, however many messages.
+        """
+        by_channel = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel_id].append(message)
+
+        now = timezone.now()
+        for channel_id, channel_messages in by_channel.items():
+            newest = max(channel_messages, key=lambda message: (message.timestamp, message.pk))
+            # Buffers of several processes and direct creates commit in any order; never move back
+            Channel.objects.filter(
+                Q(last_message__isnull=True)
+                | Q(last_message__timestamp__lt=newest.timestamp)
+                | Q(last_message__timestamp=newest.timestamp, last_message_id__lt=newest.pk),
+                pk=channel_id,
+            ).update(last_message_id=newest.pk, updated_at=now)
+
+            total = len(channel_messages)
+            sent = Counter(message.sender_id for message in channel_messages)
+            ChannelReadState.objects.filter(channel_id=channel_id).update(
+                unread_count=F("unread_count")
+                + Case(
+                    *[When(user_id=sender_id, then=Value(total - count)) for sender_id, count in sent.items()],
+                    default=Value(total),
+                    output_field=IntegerField(),
+                )
+            )
+
+    @staticmethod
+    def ensure_read_states(channel_id: int, user_ids: Iterable[int]) -> None:
+        """Create the read state of new participants, starting with nothing unread."""
+        ChannelReadState.objects.bulk_create(
+            [ChannelReadState(channel_id=channel_id, user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def mark_read(channel_id: int, user_id: int) -> None:
+        """Reset the user's unread count for the channel."""
+        updated = ChannelReadState.objects.filter(channel_id=channel_id, user_id=user_id).update(
+            unread_count=0, last_read_at=timezone.now()
+        )
+        if not updated:
+            ChannelReadState.objects.get_or_create(
+                channel_id=channel_id, user_id=user_id, defaults={"last_read_at": timezone.now()}
+            )
@@ -8,7 +8,7 @@ class ChannelAdmin(admin.ModelAdmin):
     list_display = ("name", "is_direct", "created_at", "updated_at")
     list_filter = ("is_direct",)
     search_fields = ("name",)
-    filter_horizontal = ("participants", "online")
+    filter_horizontal = ("participants",)
 
 
 @admin.register(Message)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ClassroomConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "classroom"
+
+    def ready(self):
+        """Import signal handlers when Django starts."""
+        import classroom.signals  # noqa
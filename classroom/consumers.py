@@ -1,14 +1,21 @@
+import asyncio
+from collections import OrderedDict
 import json
 import logging
+import os
+import sys
+import uuid
 
-from asgiref.sync import async_to_sync
 from channels.db import database_sync_to_async
-from channels.generic.websocket import WebsocketConsumer
+from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 
-from .models import Channel, Message, Reaction
+from .message_buffer import message_buffer
+from .models import Channel, Message
+from .presence import PRESENCE_HEARTBEAT_INTERVAL, PresenceService, presence_fanout
 
 User = get_user_model()
 
@@ -16,130 +23,152 @@ User = get_user_model()
 logger = logging.getLogger("security.websocket")
 
 
-class ChatConsumer(WebsocketConsumer):
-    def connect(self):
-        """Handle WebSocket connection with security checks."""
-        self.channel_name_param = self.scope["url_route"]["kwargs"]["channel_name"]
-        self.group_name = f"chat_{self.channel_name_param}"
-        self.user = self.scope.get("user")
+def _detect_testing():
+    """Whether the process runs the test suite; evaluated once at import."""
+    return "test" in sys.argv or getattr(settings, "TESTING", False) or os.getenv("DJANGO_TESTING") == "true"
+
+
+IS_TESTING = _detect_testing()
+
+# Message uuids each socket remembers from broadcasts, to accept reactions without a query
+RECENT_MESSAGES_TRACKED = 500
+
+
+def chat_group_name(channel_name):
+    """Channel layer group shared by every socket connected to a chat channel."""
+    return f"chat_{channel_name}"
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat socket for one channel name.
+
+    Messages and reactions are broadcast right away and written behind by the process-wide
+    message buffer (see classroom.message_buffer).
+
+    The ids of the channels (with that name) the user participates in are loaded once on
+    connect and kept on the consumer, so incoming messages are authorized without touching
+    the database. Participant changes are pushed to the group as a participants_changed
+    event (see classroom.signals), which reloads the set and closes sockets that lost access.
 
-        # If no user in scope, create an anonymous user
-        if not self.user:
-            from django.contrib.auth.models import AnonymousUser
+    Presence lives in the cache (see classroom.presence): the socket counts itself as one
+    of its user's connections on connect, refreshes the count from a heartbeat task and
+    leaves it on disconnect; the user goes offline when their last socket closes.
+    online_channel_ids holds the channels the socket is counted in and follows
+    participant changes.
+    """
 
-            self.user = AnonymousUser()
+    channel_ids = frozenset()
+    online_channel_ids = frozenset()
+    heartbeat_task = None
+    joined = False
+
+    async def connect(self):
+        """Handle WebSocket connection with security checks."""
+        self.channel_name_param = self.scope["url_route"]["kwargs"]["channel_name"]
+        self.group_name = chat_group_name(self.channel_name_param)
+        self.user = self.scope.get("user") or AnonymousUser()
+        self.recent_message_uuids = OrderedDict()
 
         # Security Check 1: Authentication required
         # Skip authentication completely in test environments to avoid isolation issues
-        import os
-        import sys
-
-        is_testing = (
-            "test" in sys.argv
-            or getattr(settings, "TESTING", False)
-            or os.getenv("DJANGO_TESTING") == "true"
-            or "test" in settings.DATABASES["default"]["NAME"]
-            or settings.DATABASES["default"]["NAME"] == ":memory:"
-        )
-        if not is_testing and not self.user.is_authenticated:
+        if not IS_TESTING and not self.user.is_authenticated:
             logger.warning(
                 "Unauthenticated user attempted WebSocket connection to channel: %s", self.channel_name_param
             )
-            self.close(code=4001)  # Unauthorized
+            await self.close(code=4001)  # Unauthorized
             return
 
         # Security Check 2: Rate limiting
         # Skip rate limiting in test environment
-        if not is_testing and not self.check_rate_limit():
+        if not IS_TESTING and not await self.check_rate_limit():
             logger.warning(
                 "Rate limit exceeded for user %s attempting connection to channel: %s",
                 self.user.username,
                 self.channel_name_param,
             )
-            self.close(code=4029)  # Too Many Requests
+            await self.close(code=4029)  # Too Many Requests
             return
 
         # Security Check 3: Channel access authorization
-        has_access = async_to_sync(self.user_has_channel_access)()
-        if not has_access:
+        self.channel_ids = await self.load_channel_membership()
+        if not self.channel_ids:
             logger.warning(
                 "User %s attempted access to unauthorized channel: %s", self.user.username, self.channel_name_param
             )
-            self.close(code=4003)  # Forbidden
+            await self.close(code=4003)  # Forbidden
             return
 
         # Accept the connection after all security checks pass
-        self.accept()
+        await self.accept()
 
         # Log successful connection for security monitoring
         logger.info("User %s successfully connected to channel: %s", self.user.username, self.channel_name_param)
 
         # Add to channel group
-        async_to_sync(self.channel_layer.group_add)(self.group_name, self.channel_name)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        self.joined = True
 
-        # Mark user as online in the channel
-        async_to_sync(self.mark_user_online)()
+        # Mark user as online in the channel and keep the mark alive while connected
+        self.online_channel_ids = self.channel_ids
+        await PresenceService.amark_online(self.online_channel_ids, self.user.id)
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
 
         # Notify others about the new online user
-        async_to_sync(self.channel_layer.group_send)(
-            self.group_name,
-            {
-                "type": "user_status",
-                "user": self.user.username,
-                "status": "online",
-            },
-        )
-
-    def disconnect(self, close_code):
+        presence_fanout.publish(self.channel_layer, self.group_name, self.user.username, "online")
+
+    async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
+        # Rejected connections never joined the group or went online
+        if not self.joined:
+            return
+        self.joined = False
+
         # Remove from channel group
-        async_to_sync(self.channel_layer.group_discard)(self.group_name, self.channel_name)
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-        # Mark user as offline
-        async_to_sync(self.mark_user_offline)()
+        # Stop counting this socket; the user stays online while another of theirs is connected
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+        still_online = await PresenceService.amark_offline(self.online_channel_ids, self.user.id)
+        self.online_channel_ids = frozenset()
 
         # Notify others about the offline user
-        async_to_sync(self.channel_layer.group_send)(
-            self.group_name,
-            {
-                "type": "user_status",
-                "user": self.user.username,
-                "status": "offline",
-            },
-        )
-
-    def receive(self, text_data):
+        if not still_online:
+            presence_fanout.publish(self.channel_layer, self.group_name, self.user.username, "offline")
+
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming WebSocket messages with security checks."""
         # Security Check 1: Double-check authentication on every message
         if not self.user.is_authenticated:
             logger.warning("Unauthenticated user attempted to send message to channel: %s", self.channel_name_param)
-            self.close(code=4001)  # Unauthorized
+            await self.close(code=4001)  # Unauthorized
             return
 
-        # Security Check 2: Verify channel access is still valid
-        if not async_to_sync(self.user_has_channel_access)():
+        # Security Check 2: Verify channel access is still valid (kept current by participants_changed)
+        if not self.channel_ids:
             logger.warning(
                 "User %s attempted to send message to unauthorized channel: %s",
                 self.user.username,
                 self.channel_name_param,
             )
-            self.close(code=4003)  # Forbidden
+            await self.close(code=4003)  # Forbidden
             return
 
         # Security Check 3: Rate limiting for messages
         # Skip rate limiting in test environment
-        if not getattr(settings, "TESTING", False) and not self.check_rate_limit(action="message"):
+        if not IS_TESTING and not await self.check_rate_limit(action="message"):
             logger.warning(
                 "Rate limit exceeded for user %s sending message to channel: %s",
                 self.user.username,
                 self.channel_name_param,
             )
-            self.close(code=4029)  # Too Many Requests
+            await self.close(code=4029)  # Too Many Requests
             return
 
         try:
             data = json.loads(text_data)
-        except json.JSONDecodeError:
+        except (TypeError, json.JSONDecodeError):
             logger.warning(
                 "Invalid JSON received from user %s in channel: %s", self.user.username, self.channel_name_param
             )
@@ -155,160 +184,97 @@ class ChatConsumer(WebsocketConsumer):
                 )
                 return
 
-            # Save message to database
-            message = async_to_sync(self.save_message)(data["message"])
+            # Buffer the message for a batched write; it is broadcast before it is saved.
+            # Several channels can share a name; post to the oldest one the user belongs to
+            message = message_buffer.add_message(min(self.channel_ids), self.user.id, data["message"])
 
             # Broadcast to group
-            async_to_sync(self.channel_layer.group_send)(
+            await self.channel_layer.group_send(
                 self.group_name,
                 {
                     "type": "chat_message",
                     "message": {
-                        "id": message.id,
+                        "id": str(message.uuid),
                         "content": message.content,
-                        "sender": message.sender.username,
+                        "sender": self.user.username,
                         "timestamp": message.timestamp.isoformat(),
-                        "file": message.file.url if message.file else None,
+                        "file": None,
                     },
                 },
             )
 
         elif message_type == "reaction":
-            # Save reaction to database
-            reaction = async_to_sync(self.save_reaction)(data["message_id"], data["emoji"])
+            # Buffer the reaction for a batched write
+            reaction = await self.save_reaction(data.get("message_id"), data.get("emoji"))
 
-            # Only broadcast if reaction was successfully saved
+            # Only broadcast if the reaction was accepted
             if reaction:
                 # Broadcast to group
-                async_to_sync(self.channel_layer.group_send)(
+                await self.channel_layer.group_send(
                     self.group_name,
                     {
                         "type": "reaction_added",
                         "reaction": {
-                            "id": reaction.id,
+                            "id": str(reaction.uuid),
                             "emoji": reaction.emoji,
-                            "user": reaction.user.username,
-                            "message_id": reaction.message.id,
+                            "user": self.user.username,
+                            "message_id": str(reaction.message_uuid),
                             "created_at": reaction.created_at.isoformat(),
                         },
                     },
                 )
 
-    def chat_message(self, event):
+    async def chat_message(self, event):
         """Send chat message to WebSocket."""
-        self.send(text_data=json.dumps(event))
+        self.recent_message_uuids[event["message"]["id"]] = None
+        if len(self.recent_message_uuids) > RECENT_MESSAGES_TRACKED:
+            self.recent_message_uuids.popitem(last=False)
+        await self.send(text_data=json.dumps(event))
 
-    def reaction_added(self, event):
+    async def reaction_added(self, event):
         """Send reaction to WebSocket."""
-        self.send(text_data=json.dumps(event))
-
-    def user_status(self, event):
-        """Send user status update to WebSocket."""
-        self.send(text_data=json.dumps(event))
+        await self.send(text_data=json.dumps(event))
+
+    async def presence_changed(self, event):
+        """Send each coalesced user status update to WebSocket."""
+        for status in event["statuses"]:
+            await self.send(text_data=json.dumps({"type": "user_status", **status}))
+
+    async def heartbeat(self):
+        """Refresh the presence mark until the socket disconnects."""
+        while True:
+            await asyncio.sleep(PRESENCE_HEARTBEAT_INTERVAL)
+            try:
+                await PresenceService.arefresh(self.online_channel_ids, self.user.id)
+            except Exception as e:
+                logger.error("Error refreshing presence for user %s: %s", self.user.username, str(e))
+
+    async def participants_changed(self, event):
+        """Reload the cached membership, and the channels counted for presence, after the participants changed."""
+        self.channel_ids = await self.load_channel_membership()
+        if self.joined:
+            added = self.channel_ids - self.online_channel_ids
+            removed = self.online_channel_ids - self.channel_ids
+            self.online_channel_ids = self.channel_ids
+            if added:
+                await PresenceService.amark_online(added, self.user.id)
+            if removed:
+                await PresenceService.amark_offline(removed, self.user.id)
+        if not self.channel_ids:
+            logger.info("User %s lost access to channel: %s", self.user.username, self.channel_name_param)
+            await self.close(code=4003)  # Forbidden
 
     @database_sync_to_async
-    def mark_user_online(self):
-        """Mark user as online in the channel."""
-        # Check if we're in test environment
-        import os
-        import sys
-
-        is_testing = (
-            "test" in sys.argv
-            or getattr(settings, "TESTING", False)
-            or os.getenv("DJANGO_TESTING") == "true"
-            or "test" in settings.DATABASES["default"]["NAME"]
-            or settings.DATABASES["default"]["NAME"] == ":memory:"
-        )
-
-        try:
-            channel = Channel.objects.get(name=self.channel_name_param)
-            channel.online.add(self.user)
-        except Channel.DoesNotExist:
-            if not is_testing:
-                logger.info("Channel '%s' does not exist while marking user online", self.channel_name_param)
-        except Channel.MultipleObjectsReturned:
-            # Handle multiple channels with same name - mark online in all that user participates in
-            channels = Channel.objects.filter(name=self.channel_name_param)
-            for channel in channels:
-                if channel.participants.filter(id=self.user.id).exists():
-                    channel.online.add(self.user)
-        except Exception:
-            # Silent failure for non-critical operation to avoid test interference
-            pass  # nosec B110
-
-    @database_sync_to_async
-    def mark_user_offline(self):
-        """Mark user as offline in the channel."""
-        # Check if we're in test environment
-        import os
-        import sys
-
-        is_testing = (
-            "test" in sys.argv
-            or getattr(settings, "TESTING", False)
-            or os.getenv("DJANGO_TESTING") == "true"
-            or "test" in settings.DATABASES["default"]["NAME"]
-            or settings.DATABASES["default"]["NAME"] == ":memory:"
-        )
-
-        try:
-            channel = Channel.objects.get(name=self.channel_name_param)
-            channel.online.remove(self.user)
-        except Channel.DoesNotExist:
-            if not is_testing:
-                logger.info("Channel '%s' does not exist while marking user offline", self.channel_name_param)
-        except Channel.MultipleObjectsReturned:
-            # Handle multiple channels with same name - mark offline in all that user participates in
-            channels = Channel.objects.filter(name=self.channel_name_param)
-            for channel in channels:
-                if channel.participants.filter(id=self.user.id).exists():
-                    channel.online.remove(self.user)
-        except Exception:
-            # Silent failure for non-critical operation to avoid test interference
-            pass  # nosec B110
-
-    @database_sync_to_async
-    def save_message(self, content):
-        """Save message to database."""
-        try:
-            channel = Channel.objects.get(name=self.channel_name_param)
-        except Channel.MultipleObjectsReturned:
-            # Use the first channel the user participates in
-            channels = Channel.objects.filter(name=self.channel_name_param)
-            channel = None
-            for ch in channels:
-                if ch.participants.filter(id=self.user.id).exists():
-                    channel = ch
-                    break
-            if not channel:
-                raise Channel.DoesNotExist(f"User has no access to channel {self.channel_name_param}")
-
-        return Message.objects.create(
-            channel=channel,
-            sender=self.user,
-            content=content,
-        )
-
-    @database_sync_to_async
-    def user_has_channel_access(self):
-        """Check if user has access to the channel."""
+    def load_channel_membership(self):
+        """Ids of the channels named channel_name_param that the user participates in."""
+        if not self.user.is_authenticated:
+            return frozenset()
         try:
-            channel = Channel.objects.get(name=self.channel_name_param)
-            return channel.participants.filter(id=self.user.id).exists()
-        except Channel.DoesNotExist:
-            logger.warning(
-                "User %s attempted to access non-existent channel: %s", self.user.username, self.channel_name_param
-            )
-            return False
-        except Channel.MultipleObjectsReturned:
-            # Handle multiple channels with same name - this can happen in test environments
-            logger.warning(
-                "Multiple channels found with name %s for user %s", self.channel_name_param, self.user.username
+            return frozenset(
+                Channel.objects.filter(name=self.channel_name_param, participants=self.user).values_list(
+                    "id", flat=True
+                )
             )
-            # Check if user has access to any channel with this name
-            channels = Channel.objects.filter(name=self.channel_name_param)
-            return any(channel.participants.filter(id=self.user.id).exists() for channel in channels)
         except Exception as e:
             logger.error(
                 "Error checking channel access for user %s, channel %s: %s",
@@ -316,9 +282,9 @@ class ChatConsumer(WebsocketConsumer):
                 self.channel_name_param,
                 str(e),
             )
-            return False
+            return frozenset()
 
-    def check_rate_limit(self, action="connection"):
+    async def check_rate_limit(self, action="connection"):
         """Check if user has exceeded rate limits."""
         if not self.user or not self.user.is_authenticated:
             return False
@@ -334,13 +300,13 @@ class ChatConsumer(WebsocketConsumer):
 
         try:
             # Get current count from cache
-            current_count = cache.get(cache_key, 0)
+            current_count = await cache.aget(cache_key, 0)
 
             if current_count >= limit_config["count"]:
                 return False
 
             # Increment counter with expiration
-            cache.set(cache_key, current_count + 1, limit_config["window"])
+            await cache.aset(cache_key, current_count + 1, limit_config["window"])
             return True
 
         except Exception as e:
@@ -348,17 +314,28 @@ class ChatConsumer(WebsocketConsumer):
             # In case of cache error, allow the request but log it
             return True
 
+    async def save_reaction(self, message_id, emoji):
+        """Buffer a reaction to a message of this channel; None if the message is unknown."""
+        if not emoji:
+            return None
+        message_uuid = str(message_id)
+        # Messages broadcast to this socket are known to belong to the channel
+        if message_uuid not in self.recent_message_uuids:
+            message_uuid = await self.find_message_uuid(message_id)
+            if message_uuid is None:
+                logger.warning("User %s attempted to react to nonexistent message: %s", self.user.username, message_id)
+                return None
+        return message_buffer.add_reaction(uuid.UUID(message_uuid), self.user.id, emoji)
+
     @database_sync_to_async
-    def save_reaction(self, message_id, emoji):
-        """Save reaction to database."""
+    def find_message_uuid(self, message_id):
+        """Uuid of a saved message of this channel, given its uuid or primary key."""
+        messages = Message.objects.filter(channel_id__in=self.channel_ids)
         try:
-            message = Message.objects.get(id=message_id)
-            return Reaction.objects.create(
-                message=message,
-                user=self.user,
-                emoji=emoji,
-            )
-        except Message.DoesNotExist:
-            # Log and return None if message doesn't exist
-            logger.warning("User %s attempted to react to nonexistent message: %s", self.user.username, message_id)
-            return None
+            messages = messages.filter(uuid=uuid.UUID(str(message_id)))
+        except ValueError:
+            if not str(message_id).isdigit():
+                return None
+            messages = messages.filter(id=int(message_id))
+        message_uuid = messages.values_list("uuid", flat=True).first()
+        return str(message_uuid) if message_uuid else None
@@ -0,0 +1,257 @@
+"""
+Write-behind persistence for chat messages and reactions.
+
+ChatConsumer gives every incoming message its uuid and timestamp, broadcasts it and hands
+it to the process-wide message_buffer instead of inserting it on the spot. One flusher
+task per event loop writes the buffer with bulk_create every FLUSH_INTERVAL_MS, or as
+soon as FLUSH_MAX_ITEMS are pending, so a busy classroom costs a few inserts per interval
+instead of one round trip per message.
+
+Batches are written one at a time in arrival order, so message ids follow the order in
+which messages were broadcast (Message orders by timestamp, then id). A failed batch is
+retried before anything newer is written; the last attempt writes the batch item by item
+so that only the rows that still fail (e.g. a message whose channel or sender was deleted
+in the meantime) are dropped and logged. A reaction whose message is not in the database
+yet (it may still sit in another worker's buffer) is kept for the next flushes and dropped
+only after MAX_REACTION_RETRIES of them. Whatever is still buffered when the process exits
+normally is flushed synchronously by an atexit hook.
+
+Durability trade-off: buffered items live only in the memory of the process that received
+them. If that process crashes or is killed (SIGKILL, OOM) before a flush, the messages and
+reactions received in the last FLUSH_INTERVAL_MS (plus the time spent retrying a failing
+batch) are lost although they were already broadcast to the channel.
+"""
+
+import asyncio
+import atexit
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+import logging
+import time
+from uuid import UUID, uuid4
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .activity import ChannelActivityService
+from .models import Message, Reaction
+
+logger = logging.getLogger(__name__)
+
+# Longest time a message waits in the buffer
+FLUSH_INTERVAL_MS = 50
+
+# Pending messages and reactions that trigger an immediate flush
+FLUSH_MAX_ITEMS = 100
+
+# Attempts to write a batch; the last one writes item by item and drops (and logs) the failures
+MAX_FLUSH_ATTEMPTS = 3
+
+# Flushes a reaction waits for its message to be written (e.g. by another worker) before it is dropped
+MAX_REACTION_RETRIES = 5
+
+
+@dataclass
+class PendingReaction:
+    """A reaction waiting for its message (possibly buffered too) to be written."""
+
+    message_uuid: UUID
+    user_id: int
+    emoji: str
+    created_at: datetime
+    uuid: UUID = field(default_factory=uuid4)
+    retries: int = 0
+
+
+@dataclass
+class BufferMetrics:
+    """Counters describing the buffer since process start."""
+
+    depth: int = 0
+    flushes: int = 0
+    messages_written: int = 0
+    reactions_written: int = 0
+    failed_flushes: int = 0
+    dropped_items: int = 0
+    last_flush_ms: float = 0.0
+    max_flush_ms: float = 0.0
+    total_flush_ms: float = 0.0
+
+    @property
+    def average_flush_ms(self) -> float:
+        return self.total_flush_ms / self.flushes if self.flushes else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "average_flush_ms": round(self.average_flush_ms, 2)}
+
+
+class MessageWriteBuffer:
+    """Buffer of unsaved messages and reactions, written in order by a flusher task."""
+
+    def __init__(self, interval_ms: int = FLUSH_INTERVAL_MS, max_items: int = FLUSH_MAX_ITEMS):
+        self.interval = interval_ms / 1000
+        self.max_items = max_items
+        self.pending: list[Message | PendingReaction] = []
+        self.attempts = 0
+        self.flusher: asyncio.Task | None = None
+        self.full: asyncio.Event | None = None
+        self._metrics = BufferMetrics()
+
+    def add_message(self, channel_id: int, sender_id: int, content: str) -> Message:
+        """Queue a new message; the returned instance is unsaved but has its uuid and timestamp."""
+        message = Message(channel_id=channel_id, sender_id=sender_id, content=content, timestamp=timezone.now())
+        self._add(message)
+        return message
+
+    def add_reaction(self, message_uuid: UUID, user_id: int, emoji: str) -> PendingReaction:
+        """Queue a reaction to a message that may itself still be buffered."""
+        reaction = PendingReaction(message_uuid, user_id, emoji, timezone.now())
+        self._add(reaction)
+        return reaction
+
+    def _add(self, item) -> None:
+        self.pending.append(item)
+        loop = asyncio.get_running_loop()
+        if self.flusher is None or self.flusher.done() or self.flusher.get_loop() is not loop:
+            self.full = asyncio.Event()
+            self.flusher = loop.create_task(self._run())
+        if len(self.pending) >= self.max_items:
+            self.full.set()
+
+    async def _run(self) -> None:
+        """Flush every interval (or when full) until the buffer is empty."""
+        while self.pending:
+            try:
+                await asyncio.wait_for(self.full.wait(), self.interval)
+            except TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                await self.flush()
+                raise
+            self.full.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything buffered so far."""
+        await database_sync_to_async(self.flush_sync)()
+
+    def flush_sync(self) -> None:
+        """Write everything buffered so far from synchronous code (tests, shutdown)."""
+        unmatched: list[PendingReaction] = []
+        try:
+            self._flush_pending(unmatched)
+        finally:
+            self._requeue(unmatched)
+
+    def _flush_pending(self, unmatched: list[PendingReaction]) -> None:
+        while self.pending:
+            batch = self.pending[: self.max_items]
+            started = time.perf_counter()
+            try:
+                if self.attempts >= MAX_FLUSH_ATTEMPTS - 1:
+                    batch_unmatched = self._write_each(batch)
+                else:
+                    batch_unmatched = self._write(batch)
+            except Exception as e:
+                self.attempts += 1
+                self._metrics.failed_flushes += 1
+                logger.warning(f"Chat buffer flush failed (attempt {self.attempts}), will retry: {e}")
+                return
+            unmatched.extend(batch_unmatched)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._metrics.flushes += 1
+            self._metrics.last_flush_ms = elapsed_ms
+            self._metrics.max_flush_ms = max(self._metrics.max_flush_ms, elapsed_ms)
+            self._metrics.total_flush_ms += elapsed_ms
+            self.attempts = 0
+            del self.pending[: len(batch)]
+
+    def _requeue(self, reactions: list[PendingReaction]) -> None:
+        """Keep reactions whose message is not written yet for the next flush, up to MAX_REACTION_RETRIES."""
+        for reaction in reactions:
+            reaction.retries += 1
+            if reaction.retries <= MAX_REACTION_RETRIES:
+                self.pending.append(reaction)
+            else:
+                self._metrics.dropped_items += 1
+                logger.error(
+                    f"Dropping buffered chat reaction {reaction.uuid}: message {reaction.message_uuid} "
+                    f"was not written after {MAX_REACTION_RETRIES} flushes"
+                )
+
+    def _write_each(self, batch: list) -> list[PendingReaction]:
+        """Write a batch that keeps failing one item at a time, dropping only the failing items."""
+        unmatched = []
+        dropped_messages = set()
+        for item in batch:
+            if isinstance(item, PendingReaction) and item.message_uuid in dropped_messages:
+                self._metrics.dropped_items += 1
+                logger.error(
+                    f"Dropping buffered chat reaction {item.uuid}: its message {item.message_uuid} was dropped"
+                )
+                continue
+            try:
+                unmatched.extend(self._write([item]))
+            except Exception as e:
+                self._metrics.dropped_items += 1
+                kind = "message" if isinstance(item, Message) else "reaction"
+                if isinstance(item, Message):
+                    dropped_messages.add(item.uuid)
+                logger.error(
+                    f"Dropping buffered chat {kind} {item.uuid} after {MAX_FLUSH_ATTEMPTS} failed flushes: {e}"
+                )
+        return unmatched
+
+    def _write(self, batch: list) -> list[PendingReaction]:
+        """Write a batch and return the reactions whose message is not in the database yet."""
+        messages = [item for item in batch if isinstance(item, Message)]
+        reactions = [item for item in batch if isinstance(item, PendingReaction)]
+
+        rows = []
+        unmatched = []
+
+        with transaction.atomic():
+            # Insert order is arrival order; ids follow it on every backend
+            Message.objects.bulk_create(messages)
+            ChannelActivityService.record_messages(messages)
+            if reactions:
+                message_ids = dict(
+                    Message.objects.filter(uuid__in={reaction.message_uuid for reaction in reactions}).values_list(
+                        "uuid", "id"
+                    )
+                )
+                for reaction in reactions:
+                    if reaction.message_uuid not in message_ids:
+                        unmatched.append(reaction)
+                        continue
+                    rows.append(
+                        Reaction(
+                            uuid=reaction.uuid,
+                            message_id=message_ids[reaction.message_uuid],
+                            user_id=reaction.user_id,
+                            emoji=reaction.emoji,
+                        )
+                    )
+                Reaction.objects.bulk_create(rows, ignore_conflicts=True)
+
+        self._metrics.messages_written += len(messages)
+        self._metrics.reactions_written += len(rows)
+        return unmatched
+
+    def metrics(self) -> dict:
+        """Buffer depth, flush latency and failure counters."""
+        self._metrics.depth = len(self.pending)
+        return self._metrics.as_dict()
+
+
+message_buffer = MessageWriteBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    if message_buffer.pending:
+        try:
+            message_buffer.flush_sync()
+        except Exception as e:
+            logger.error(f"Error flushing chat buffer on shutdown: {e}")
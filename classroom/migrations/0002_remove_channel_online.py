@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='channel',
+            name='online',
+        ),
+    ]
@@ -0,0 +1,41 @@
+import uuid
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def assign_message_uuids(apps, schema_editor):
+    Message = apps.get_model("classroom", "Message")
+    messages = list(Message.objects.only("id"))
+    for message in messages:
+        message.uuid = uuid.uuid4()
+    Message.objects.bulk_update(messages, ["uuid"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("classroom", "0002_remove_channel_online"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="uuid",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_message_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="message",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterModelOptions(
+            name="message",
+            options={"ordering": ["timestamp", "id"]},
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_channel_activity(apps, schema_editor):
+    """Point channels at their newest message and start every participant with nothing unread."""
+    Channel = apps.get_model("classroom", "Channel")
+    ChannelReadState = apps.get_model("classroom", "ChannelReadState")
+    Message = apps.get_model("classroom", "Message")
+
+    newest = Message.objects.filter(channel=models.OuterRef("pk")).order_by("-timestamp", "-id").values("id")[:1]
+    Channel.objects.update(last_message_id=models.Subquery(newest))
+
+    Participant = Channel.participants.through
+    read_states = [
+        ChannelReadState(channel_id=channel_id, user_id=user_id)
+        for channel_id, user_id in Participant.objects.values_list("channel_id", "customuser_id").iterator()
+    ]
+    ChannelReadState.objects.bulk_create(read_states, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0003_message_uuid_and_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='channel',
+            name='last_message',
+            field=models.ForeignKey(blank=True, help_text='Most recent message in this channel', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='classroom.message'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['channel', 'timestamp', 'id'], name='classroom_msg_history_idx'),
+        ),
+        migrations.AddField(
+            model_name='channelreadstate',
+            name='channel',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='classroom.channel'),
+        ),
+        migrations.AddField(
+            model_name='channelreadstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='channelreadstate',
+            unique_together={('channel', 'user')},
+        ),
+        migrations.RunPython(backfill_channel_activity, migrations.RunPython.noop),
+    ]
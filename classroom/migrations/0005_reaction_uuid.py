@@ -0,0 +1,31 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def assign_reaction_uuids(apps, schema_editor):
+    Reaction = apps.get_model("classroom", "Reaction")
+    reactions = list(Reaction.objects.only("id"))
+    for reaction in reactions:
+        reaction.uuid = uuid.uuid4()
+    Reaction.objects.bulk_update(reactions, ["uuid"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("classroom", "0004_channel_last_message_and_read_states"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reaction",
+            name="uuid",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_reaction_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="reaction",
+            name="uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -1,6 +1,9 @@
+import uuid
+
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.utils import timezone
 
 
 class Channel(models.Model):
@@ -13,11 +16,14 @@ class Channel(models.Model):
         related_name="channels",
         help_text="Users who are members of this channel",
     )
-    online = models.ManyToManyField(
-        settings.AUTH_USER_MODEL,
-        related_name="online_channels",
+    # Kept current on every insert (see ChannelActivityService) so channel lists need no per-channel query
+    last_message = models.ForeignKey(
+        "Message",
+        on_delete=models.SET_NULL,
+        null=True,
         blank=True,
-        help_text="Users who are currently connected to this channel",
+        related_name="+",
+        help_text="Most recent message in this channel",
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -41,8 +47,10 @@ class Message(models.Model):
 
     channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="messages")
+    # Assigned when the message is received so it can be broadcast before it is written
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     file = models.FileField(
         upload_to="chat_attachments/",
         null=True,
@@ -51,17 +59,39 @@ class Message(models.Model):
     )
 
     class Meta:
-        ordering = ["timestamp"]
+        # Buffered messages are inserted in arrival order, so the id breaks timestamp ties
+        ordering = ["timestamp", "id"]
+        indexes = [
+            # Keyset pagination of a channel's history
+            models.Index(fields=["channel", "timestamp", "id"], name="classroom_msg_history_idx"),
+        ]
 
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
 
 
+class ChannelReadState(models.Model):
+    """How far a participant has read a channel, with the count of messages since."""
+
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name="read_states")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="chat_read_states")
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ["channel", "user"]
+
+    def __str__(self):
+        return f"{self.user} in {self.channel}: {self.unread_count} unread"
+
+
 class Reaction(models.Model):
     """A reaction (emoji) to a message."""
 
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name="reactions")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reactions")
+    # Assigned when the reaction is received so it can be broadcast before it is written
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     emoji = models.CharField(max_length=10)  # Most emojis are 2-4 bytes
     created_at = models.DateTimeField(auto_now_add=True)
 
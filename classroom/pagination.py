@@ -0,0 +1,67 @@
+"""
+Keyset pagination of channel message history.
+
+Pages are read backwards from the newest message along the (channel, timestamp, id)
+index. The cursor names the oldest message of the page just returned, so each page is an
+index range scan of page_size rows however deep the user scrolls, and no COUNT(*) runs.
+"""
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Q, QuerySet
+
+from .models import Message
+
+DEFAULT_PAGE_SIZE = 50
+
+
+@dataclass
+class MessagePage:
+    """One page of history, oldest message first."""
+
+    messages: list[Message]
+    next_cursor: str | None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(message: Message) -> str:
+    """Opaque cursor pointing just before message."""
+    return base64.urlsafe_b64encode(f"{message.timestamp.isoformat()}|{message.pk}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Timestamp and id encoded in a cursor; raises ValueError for malformed cursors."""
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def message_page(messages: QuerySet, before: str | None = None, page_size: int = DEFAULT_PAGE_SIZE) -> MessagePage:
+    """
+    The page_size messages preceding the before cursor (the newest ones without a cursor).
+
+    Args:
+        messages: A single channel's messages, with any select/prefetch_related applied
+        before: Cursor returned as next_cursor by the previous page
+        page_size: Messages per page
+
+    Raises:
+        ValueError: If before is not a valid cursor
+    """
+    messages = messages.order_by("-timestamp", "-id")
+    if before:
+        timestamp, pk = decode_cursor(before)
+        messages = messages.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    rows = list(messages[: page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    rows.reverse()
+    return MessagePage(messages=rows, next_cursor=encode_cursor(rows[0]) if has_more else None)
@@ -0,0 +1,183 @@
+"""
+Chat presence kept in the cache instead of the database.
+
+Every connected chat socket marks its user online in its channels by incrementing a
+per channel and user count of connections, so a user with several tabs or devices stays
+online until their last socket closes. The count expires after PRESENCE_TTL and is
+refreshed every PRESENCE_HEARTBEAT_INTERVAL while a socket lives, so connections of a
+crashed worker, which never decrement it, stop counting once the surviving sockets close.
+In production the default cache is Redis; the same keys work on the local memory cache
+used in development and tests.
+
+Status changes are not sent to the channel group one by one: PresenceFanout collects
+them per group for PRESENCE_FANOUT_DELAY and publishes a single presence_changed event,
+so a quick reconnect reaches the other sockets as its final status only.
+"""
+
+import asyncio
+from collections.abc import Iterable
+import contextlib
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a presence mark survives without a heartbeat
+PRESENCE_TTL = 90
+
+# Seconds between heartbeats of a connected socket; well below the TTL
+PRESENCE_HEARTBEAT_INTERVAL = 30
+
+# Seconds status changes are collected per group before one event is sent
+PRESENCE_FANOUT_DELAY = 0.25
+
+
+class PresenceService:
+    """Who is online in which chat channel, one expiring connection count per channel and user."""
+
+    cache_prefix = "chat_presence"
+
+    @classmethod
+    def key(cls, channel_id: int, user_id: int) -> str:
+        return f"{cls.cache_prefix}:{channel_id}:{user_id}:connections"
+
+    @classmethod
+    def _keys(cls, channel_ids: Iterable[int], user_id: int) -> list[str]:
+        return [cls.key(channel_id, user_id) for channel_id in channel_ids]
+
+    @classmethod
+    def mark_online(cls, channel_ids: Iterable[int], user_id: int) -> None:
+        """Count one more connection of the user in the channels and keep them online for PRESENCE_TTL."""
+        for key in cls._keys(channel_ids, user_id):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # No connection yet; if another socket creates the count first, add to it
+                if not cache.add(key, 1, PRESENCE_TTL):
+                    cache.incr(key)
+            cache.touch(key, PRESENCE_TTL)
+
+    @classmethod
+    def mark_offline(cls, channel_ids: Iterable[int], user_id: int) -> bool:
+        """Count one connection fewer; returns whether the user still has one in any of the channels."""
+        still_online = False
+        for key in cls._keys(channel_ids, user_id):
+            # A count that already expired is left alone
+            with contextlib.suppress(ValueError):
+                still_online = cache.decr(key) > 0 or still_online
+        return still_online
+
+    @classmethod
+    def refresh(cls, channel_ids: Iterable[int], user_id: int) -> None:
+        """Keep the user online in the channels for another PRESENCE_TTL (heartbeat)."""
+        for key in cls._keys(channel_ids, user_id):
+            if not cache.touch(key, PRESENCE_TTL):
+                cache.add(key, 1, PRESENCE_TTL)
+
+    @classmethod
+    async def amark_online(cls, channel_ids: Iterable[int], user_id: int) -> None:
+        for key in cls._keys(channel_ids, user_id):
+            try:
+                await cache.aincr(key)
+            except ValueError:
+                if not await cache.aadd(key, 1, PRESENCE_TTL):
+                    await cache.aincr(key)
+            await cache.atouch(key, PRESENCE_TTL)
+
+    @classmethod
+    async def amark_offline(cls, channel_ids: Iterable[int], user_id: int) -> bool:
+        still_online = False
+        for key in cls._keys(channel_ids, user_id):
+            with contextlib.suppress(ValueError):
+                still_online = await cache.adecr(key) > 0 or still_online
+        return still_online
+
+    @classmethod
+    async def arefresh(cls, channel_ids: Iterable[int], user_id: int) -> None:
+        for key in cls._keys(channel_ids, user_id):
+            if not await cache.atouch(key, PRESENCE_TTL):
+                await cache.aadd(key, 1, PRESENCE_TTL)
+
+    @classmethod
+    def online_user_ids(cls, channel_participants: dict[int, Iterable[int]]) -> dict[int, set[int]]:
+        """
+        Online participants for many channels with a single cache round trip.
+
+        Args:
+            channel_participants: Participant user ids per channel id
+
+        Returns:
+            The ids of the online participants per channel id
+        """
+        keys = {
+            cls.key(channel_id, user_id): (channel_id, user_id)
+            for channel_id, user_ids in channel_participants.items()
+            for user_id in user_ids
+        }
+        online = {channel_id: set() for channel_id in channel_participants}
+        for key, connections in cache.get_many(list(keys)).items():
+            if connections > 0:
+                channel_id, user_id = keys[key]
+                online[channel_id].add(user_id)
+        return online
+
+    @classmethod
+    def annotate_online(cls, channels: Iterable) -> list:
+        """
+        Set online_users on each channel to its online participants.
+
+        The channels' participants should be prefetched; presence itself costs one cache
+        lookup for all channels.
+        """
+        channels = list(channels)
+        participants = {channel.id: list(channel.participants.all()) for channel in channels}
+        online = cls.online_user_ids(
+            {channel_id: [user.id for user in users] for channel_id, users in participants.items()}
+        )
+        for channel in channels:
+            channel.online_users = [user for user in participants[channel.id] if user.id in online[channel.id]]
+        return channels
+
+
+class PresenceFanout:
+    """Coalesce presence changes per channel group into one group_send."""
+
+    def __init__(self, delay: float = PRESENCE_FANOUT_DELAY):
+        self.delay = delay
+        # Pending statuses per (event loop, group); the latest status per user wins
+        self.pending: dict[tuple[int, str], dict[str, str]] = {}
+        # Strong references to scheduled flushes; the event loop only keeps weak ones
+        self.tasks: set[asyncio.Task] = set()
+
+    def publish(self, channel_layer, group_name: str, username: str, status: str) -> None:
+        """Queue a status change; the first change of a window schedules the flush."""
+        loop = asyncio.get_running_loop()
+        key = (id(loop), group_name)
+        if key not in self.pending:
+            self.pending[key] = {}
+            task = loop.create_task(self._flush(channel_layer, key))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        self.pending[key][username] = status
+
+    async def _flush(self, channel_layer, key: tuple[int, str]) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            statuses = self.pending.pop(key, {})
+        if not statuses:
+            return
+        try:
+            await channel_layer.group_send(
+                key[1],
+                {
+                    "type": "presence_changed",
+                    "statuses": [{"user": username, "status": status} for username, status in statuses.items()],
+                },
+            )
+        except Exception as e:
+            logger.error(f"Error publishing presence changes to {key[1]}: {e}")
+
+
+presence_fanout = PresenceFanout()
@@ -0,0 +1,88 @@
+"""
+Signal handlers for chat channels.
+
+ChatConsumer authorizes incoming messages against the membership it loaded on connect.
+Whenever a channel's participants change, the channel's group is told to reload it once
+the change is committed.
+
+Messages saved one at a time update their channel's last message and unread counts here;
+bulk inserts by the write-behind buffer report to ChannelActivityService themselves.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .activity import ChannelActivityService
+from .consumers import chat_group_name
+from .models import Channel, ChannelReadState, Message
+
+logger = logging.getLogger(__name__)
+
+
+def notify_participants_changed(channel_names):
+    """Ask every socket connected to the named channels to reload its membership."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for name in set(channel_names):
+        try:
+            async_to_sync(channel_layer.group_send)(chat_group_name(name), {"type": "participants_changed"})
+        except Exception as e:
+            logger.error(f"Error notifying chat channel {name} of participant changes: {e}")
+
+
+@receiver(m2m_changed, sender=Channel.participants.through)
+def handle_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Notify the affected channels after participants were added, removed or cleared."""
+    if reverse:
+        # instance is a user; channel names must be read before a clear removes the rows
+        if action == "pre_clear":
+            names = list(instance.channels.values_list("name", flat=True))
+        elif action in ("post_add", "post_remove"):
+            names = list(Channel.objects.filter(pk__in=pk_set).values_list("name", flat=True))
+        else:
+            return
+    elif action in ("post_add", "post_remove", "post_clear"):
+        names = [instance.name]
+    else:
+        return
+
+    if names:
+        transaction.on_commit(lambda: notify_participants_changed(names))
+
+
+@receiver(post_delete, sender=Channel)
+def handle_channel_deleted(sender, instance, **kwargs):
+    """Disconnect sockets whose channel was deleted."""
+    name = instance.name
+    transaction.on_commit(lambda: notify_participants_changed([name]))
+
+
+@receiver(m2m_changed, sender=Channel.participants.through)
+def sync_read_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Give new participants a read state and drop those of removed participants."""
+    if action == "post_add":
+        if reverse:
+            for channel_id in pk_set:
+                ChannelActivityService.ensure_read_states(channel_id, [instance.pk])
+        else:
+            ChannelActivityService.ensure_read_states(instance.pk, pk_set)
+    elif action == "post_remove":
+        if reverse:
+            ChannelReadState.objects.filter(user=instance, channel_id__in=pk_set).delete()
+        else:
+            ChannelReadState.objects.filter(channel=instance, user_id__in=pk_set).delete()
+    elif action == "post_clear":
+        ChannelReadState.objects.filter(**{"user" if reverse else "channel": instance}).delete()
+
+
+@receiver(post_save, sender=Message)
+def record_message_activity(sender, instance, created, **kwargs):
+    """Update the channel's last message and unread counts for a newly saved message."""
+    if created:
+        ChannelActivityService.record_messages([instance])
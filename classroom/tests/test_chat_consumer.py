@@ -0,0 +1,93 @@
+"""
+Tests for the asynchronous ChatConsumer.
+
+Channel access is checked once on connect and cached per socket; messages must then be
+authorized without database queries, and participant changes must reach connected
+sockets through the channel layer.
+"""
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from accounts.models import CustomUser
+from classroom.consumers import ChatConsumer
+from classroom.message_buffer import message_buffer
+from classroom.models import Channel, Message
+
+application = URLRouter([path("ws/chat/<str:channel_name>/", ChatConsumer.as_asgi())])
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatConsumerTests(TestCase):
+    """Test connection authorization, messaging and membership invalidation"""
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(email="alice@test.com", name="Alice")
+        self.bob = CustomUser.objects.create_user(email="bob@test.com", name="Bob")
+        self.outsider = CustomUser.objects.create_user(email="outsider@test.com", name="Outsider")
+        self.channel = Channel.objects.create(name="maths")
+        self.channel.participants.add(self.alice, self.bob)
+
+    async def connect(self, user, channel_name="maths"):
+        communicator = WebsocketCommunicator(application, f"/ws/chat/{channel_name}/")
+        communicator.scope["user"] = user
+        connected, close_code = await communicator.connect()
+        return communicator, connected, close_code
+
+    async def test_non_participant_is_rejected(self):
+        _communicator, connected, close_code = await self.connect(self.outsider)
+
+        self.assertFalse(connected)
+        self.assertEqual(close_code, 4003)
+
+    async def test_messages_are_saved_and_broadcast(self):
+        alice, connected, _ = await self.connect(self.alice)
+        self.assertTrue(connected)
+        self.assertEqual((await alice.receive_json_from())["status"], "online")
+        bob, _, _ = await self.connect(self.bob)
+        await alice.receive_json_from()
+        await bob.receive_json_from()
+
+        await alice.send_json_to({"type": "message", "message": "Hello"})
+
+        for communicator in (alice, bob):
+            event = await communicator.receive_json_from()
+            self.assertEqual(event["type"], "chat_message")
+            self.assertEqual(event["message"]["content"], "Hello")
+        await message_buffer.flush()
+        message = await Message.objects.aget()
+        self.assertEqual(str(message.uuid), event["message"]["id"])
+        self.assertEqual(message.channel_id, self.channel.id)
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_membership_is_cached_per_connection(self):
+        alice, _, _ = await self.connect(self.alice)
+        await alice.receive_json_from()
+
+        # Without the commit-time notification the socket keeps its cached membership,
+        # proving incoming messages are not re-authorized against the database
+        await self.channel.participants.aremove(self.alice)
+        await alice.send_json_to({"type": "message", "message": "Hello"})
+
+        event = await alice.receive_json_from()
+        self.assertEqual(event["message"]["content"], "Hello")
+        await message_buffer.flush()
+        await alice.disconnect()
+
+    async def test_removed_participant_is_disconnected(self):
+        alice, _, _ = await self.connect(self.alice)
+        await alice.receive_json_from()
+
+        def remove_alice():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.channel.participants.remove(self.alice)
+
+        await sync_to_async(remove_alice)()
+
+        output = await alice.receive_output()
+        self.assertEqual(output, {"type": "websocket.close", "code": 4003})
+        await alice.disconnect()
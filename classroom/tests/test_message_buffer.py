@@ -0,0 +1,152 @@
+"""
+Tests for write-behind chat persistence.
+
+Buffered messages must be written in arrival order with few queries, reactions must be
+able to point at messages that are still buffered, and failed flushes must be retried in
+order; only items that still fail on their own after the last attempt are dropped.
+"""
+
+from unittest.mock import patch
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from accounts.models import CustomUser
+from classroom.consumers import ChatConsumer
+from classroom.message_buffer import MAX_FLUSH_ATTEMPTS, MAX_REACTION_RETRIES, MessageWriteBuffer
+from classroom.models import Channel, Message, Reaction
+
+application = URLRouter([path("ws/chat/<str:channel_name>/", ChatConsumer.as_asgi())])
+
+
+class MessageWriteBufferTests(TestCase):
+    """Test batching, ordering and failure handling of MessageWriteBuffer"""
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(email="alice@test.com", name="Alice")
+        self.bob = CustomUser.objects.create_user(email="bob@test.com", name="Bob")
+        self.channel = Channel.objects.create(name="maths")
+        self.buffer = MessageWriteBuffer(max_items=50)
+
+    def add(self, *items):
+        """Queue items outside an event loop, as the flusher task is not needed here"""
+        with patch.object(self.buffer, "_add", side_effect=self.buffer.pending.append):
+            return [
+                self.buffer.add_message(self.channel.id, sender.id, content)
+                if content is not None
+                else self.buffer.add_reaction(target.uuid, sender.id, "👍")
+                for sender, content, target in items
+            ]
+
+    def test_flush_writes_in_arrival_order_with_bulk_inserts(self):
+        first, second, third = self.add(
+            (self.alice, "first", None), (self.bob, "second", None), (self.alice, "third", None)
+        )
+        self.add((self.bob, None, first))
+
+        # Messages insert, channel activity updates, reaction target lookup, reaction insert (plus the savepoint pair)
+        with self.assertNumQueries(7):
+            self.buffer.flush_sync()
+
+        self.assertEqual(list(Message.objects.values_list("uuid", flat=True)), [first.uuid, second.uuid, third.uuid])
+        self.assertEqual(Reaction.objects.get().message.uuid, first.uuid)
+        metrics = self.buffer.metrics()
+        self.assertEqual((metrics["depth"], metrics["messages_written"], metrics["reactions_written"]), (0, 3, 1))
+        self.assertEqual(metrics["flushes"], 1)
+
+    def test_failed_flush_keeps_items_for_retry(self):
+        (message,) = self.add((self.alice, "hello", None))
+
+        with patch.object(Message.objects, "bulk_create", side_effect=RuntimeError("db down")):
+            self.buffer.flush_sync()
+
+        self.assertEqual(self.buffer.metrics()["depth"], 1)
+        self.assertEqual(self.buffer.metrics()["failed_flushes"], 1)
+        self.assertFalse(Message.objects.exists())
+
+        self.buffer.flush_sync()
+        self.assertEqual(Message.objects.get().uuid, message.uuid)
+
+    def test_last_attempt_drops_only_the_failing_items(self):
+        first, bad, last = self.add((self.alice, "first", None), (self.bob, "bad", None), (self.alice, "last", None))
+        self.add((self.bob, None, bad), (self.bob, None, first))
+        original = Message.objects.bulk_create
+
+        def reject_bad(messages, *args, **kwargs):
+            if any(message.content == "bad" for message in messages):
+                raise RuntimeError("sender deleted")
+            return original(messages, *args, **kwargs)
+
+        with patch.object(Message.objects, "bulk_create", side_effect=reject_bad):
+            for _ in range(MAX_FLUSH_ATTEMPTS):
+                self.buffer.flush_sync()
+
+        self.assertEqual(list(Message.objects.values_list("uuid", flat=True)), [first.uuid, last.uuid])
+        self.assertEqual(Reaction.objects.get().message.uuid, first.uuid)
+        metrics = self.buffer.metrics()
+        # The dropped message and the reaction to it
+        self.assertEqual((metrics["depth"], metrics["failed_flushes"], metrics["dropped_items"]), (0, 2, 2))
+
+    def test_reaction_waits_for_a_message_buffered_elsewhere(self):
+        # The message is still in another worker's buffer when the reaction is flushed
+        elsewhere = Message(channel=self.channel, sender=self.alice, content="elsewhere")
+        self.add((self.bob, None, elsewhere))
+
+        self.buffer.flush_sync()
+
+        self.assertFalse(Reaction.objects.exists())
+        metrics = self.buffer.metrics()
+        self.assertEqual((metrics["depth"], metrics["reactions_written"], metrics["dropped_items"]), (1, 0, 0))
+
+        elsewhere.save()
+        self.buffer.flush_sync()
+
+        self.assertEqual(Reaction.objects.get().message, elsewhere)
+        metrics = self.buffer.metrics()
+        self.assertEqual((metrics["depth"], metrics["reactions_written"], metrics["dropped_items"]), (0, 1, 0))
+
+    def test_reaction_to_a_message_that_never_arrives_is_dropped(self):
+        never = Message(channel=self.channel, sender=self.alice, content="never")
+        self.add((self.bob, None, never))
+
+        for _ in range(MAX_REACTION_RETRIES + 1):
+            self.buffer.flush_sync()
+
+        self.assertFalse(Reaction.objects.exists())
+        metrics = self.buffer.metrics()
+        self.assertEqual((metrics["depth"], metrics["reactions_written"], metrics["dropped_items"]), (0, 0, 1))
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ConsumerWriteBehindTests(TestCase):
+    """Test that the consumer broadcasts first and writes through the buffer"""
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(email="alice@test.com", name="Alice")
+        self.channel = Channel.objects.create(name="maths")
+        self.channel.participants.add(self.alice)
+
+    async def test_messages_and_reactions_are_flushed_by_the_flusher_task(self):
+        communicator = WebsocketCommunicator(application, "/ws/chat/maths/")
+        communicator.scope["user"] = self.alice
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        for content in ("one", "two"):
+            await communicator.send_json_to({"type": "message", "message": content})
+        broadcasts = [await communicator.receive_json_from() for _ in range(2)]
+        await communicator.send_json_to(
+            {"type": "reaction", "message_id": broadcasts[0]["message"]["id"], "emoji": "👍"}
+        )
+        reaction = await communicator.receive_json_from()
+        self.assertEqual(reaction["reaction"]["message_id"], broadcasts[0]["message"]["id"])
+        reaction_uuid = reaction["reaction"]["id"]
+
+        # The flusher task writes both messages and the reaction once its interval has passed
+        await communicator.receive_nothing(timeout=0.2)
+        contents = [message.content async for message in Message.objects.all()]
+        self.assertEqual(contents, ["one", "two"])
+        self.assertEqual(str((await Reaction.objects.aget(message__content="one")).uuid), reaction_uuid)
+        await communicator.disconnect()
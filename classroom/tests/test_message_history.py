@@ -0,0 +1,139 @@
+"""
+Tests for keyset-paginated message history and denormalized channel activity.
+
+Deep history pages must cost the same as the first one, and the channel list must read
+last messages and unread counts without a query per channel.
+"""
+
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from waffle.testutils import override_switch
+
+from accounts.models import CustomUser
+from classroom.message_buffer import MessageWriteBuffer
+from classroom.models import Channel, ChannelReadState, Message
+
+
+@override_switch("chat_feature", active=True)
+class MessageHistoryTests(TestCase):
+    """Test cursor pagination, last message pointers and unread counters"""
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(email="alice@test.com", name="Alice")
+        self.bob = CustomUser.objects.create_user(email="bob@test.com", name="Bob")
+        self.channel = Channel.objects.create(name="maths")
+        self.channel.participants.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+    def create_messages(self, count, channel=None, sender=None):
+        # Pairs of messages share a timestamp so the id has to break ties
+        start = timezone.now() - timedelta(days=1)
+        return [
+            Message.objects.create(
+                channel=channel or self.channel,
+                sender=sender or self.bob,
+                content=f"message {index}",
+                timestamp=start + timedelta(seconds=index // 2),
+            )
+            for index in range(count)
+        ]
+
+    def fetch(self, **params):
+        response = self.client.get(reverse("chat_messages", args=[self.channel.id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_cover_history_without_gaps(self):
+        messages = self.create_messages(120)
+
+        pages = [self.fetch()]
+        while pages[-1]["has_more"]:
+            pages.append(self.fetch(before=pages[-1]["next_cursor"]))
+
+        self.assertEqual([len(page["messages"]) for page in pages], [50, 50, 20])
+        seen = [message["id"] for page in reversed(pages) for message in page["messages"]]
+        self.assertEqual(seen, [message.id for message in messages])
+        self.assertNotIn("total_pages", pages[0])
+
+    def test_deep_pages_cost_the_same_queries(self):
+        self.create_messages(120)
+        first = self.fetch()
+        second = self.fetch(before=first["next_cursor"])
+
+        # Session and user, channel, one page of messages, reactions, session save
+        with self.assertNumQueries(8):
+            self.fetch(before=second["next_cursor"])
+        with self.assertNumQueries(8):
+            self.fetch(before=first["next_cursor"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("chat_messages", args=[self.channel.id]), {"before": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_inserts_maintain_last_message_and_unread_counts(self):
+        messages = self.create_messages(3)
+        Message.objects.create(channel=self.channel, sender=self.alice, content="reply")
+
+        self.channel.refresh_from_db()
+        self.assertEqual(self.channel.last_message.content, "reply")
+        unread = dict(ChannelReadState.objects.values_list("user_id", "unread_count"))
+        self.assertEqual(unread, {self.alice.id: 3, self.bob.id: 1})
+
+        buffer = MessageWriteBuffer()
+        buffer.pending.extend(
+            Message(channel=self.channel, sender=sender, content="buffered", timestamp=timezone.now())
+            for sender in (self.alice, self.alice, self.bob)
+        )
+        buffer.flush_sync()
+
+        self.channel.refresh_from_db()
+        self.assertEqual(self.channel.last_message, Message.objects.last())
+        self.assertNotIn(self.channel.last_message, messages)
+        unread = dict(ChannelReadState.objects.values_list("user_id", "unread_count"))
+        self.assertEqual(unread, {self.alice.id: 4, self.bob.id: 3})
+
+        self.fetch()
+        self.assertEqual(ChannelReadState.objects.get(user=self.alice).unread_count, 0)
+
+    def test_older_batch_does_not_move_last_message_back(self):
+        newest = Message.objects.create(channel=self.channel, sender=self.alice, content="newest")
+
+        # A batch received earlier by another process commits after the newer message
+        buffer = MessageWriteBuffer()
+        buffer.pending.append(
+            Message(
+                channel=self.channel,
+                sender=self.bob,
+                content="older",
+                timestamp=newest.timestamp - timedelta(seconds=1),
+            )
+        )
+        buffer.flush_sync()
+
+        self.channel.refresh_from_db()
+        self.assertEqual(self.channel.last_message, newest)
+        self.assertEqual(ChannelReadState.objects.get(user=self.alice).unread_count, 1)
+
+    def test_channel_list_queries_do_not_grow_with_channels(self):
+        self.create_messages(2)
+        response = self.client.get(reverse("chat_channels"))
+        (channel,) = response.json()["channels"]
+        self.assertEqual(channel["last_message"]["content"], "message 1")
+        self.assertEqual(channel["unread_count"], 2)
+
+        # Session and user, one channel query with last messages and unread counts, participants, session save
+        with self.assertNumQueries(7):
+            self.client.get(reverse("chat_channels"))
+
+        for index in range(5):
+            other = Channel.objects.create(name=f"channel {index}")
+            other.participants.add(self.alice, self.bob)
+            self.create_messages(2, channel=other)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse("chat_channels"))
+        self.assertEqual(len(response.json()["channels"]), 6)
@@ -0,0 +1,161 @@
+"""
+Tests for cache-backed chat presence.
+
+Presence must never touch the database, expire without heartbeats, answer for many
+channels in one lookup and reach connected sockets as coalesced status events.
+"""
+
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from accounts.models import CustomUser
+from classroom.consumers import ChatConsumer
+from classroom.models import Channel
+from classroom.presence import PresenceService
+
+application = URLRouter([path("ws/chat/<str:channel_name>/", ChatConsumer.as_asgi())])
+
+
+class PresenceServiceTests(TestCase):
+    """Test marking and looking up online users"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(email="alice@test.com", name="Alice")
+        self.bob = CustomUser.objects.create_user(email="bob@test.com", name="Bob")
+        self.maths = Channel.objects.create(name="maths")
+        self.maths.participants.add(self.alice, self.bob)
+        self.science = Channel.objects.create(name="science")
+        self.science.participants.add(self.alice, self.bob)
+
+    def test_online_users_for_many_channels(self):
+        PresenceService.mark_online([self.maths.id, self.science.id], self.alice.id)
+        PresenceService.mark_online([self.science.id], self.bob.id)
+
+        with self.assertNumQueries(0):
+            online = PresenceService.online_user_ids(
+                {
+                    self.maths.id: [self.alice.id, self.bob.id],
+                    self.science.id: [self.alice.id, self.bob.id],
+                }
+            )
+
+        self.assertEqual(online, {self.maths.id: {self.alice.id}, self.science.id: {self.alice.id, self.bob.id}})
+
+        PresenceService.mark_offline([self.science.id], self.alice.id)
+        online = PresenceService.online_user_ids({self.science.id: [self.alice.id, self.bob.id]})
+        self.assertEqual(online, {self.science.id: {self.bob.id}})
+
+    def test_user_stays_online_until_the_last_connection_closes(self):
+        PresenceService.mark_online([self.maths.id], self.alice.id)
+        PresenceService.mark_online([self.maths.id], self.alice.id)
+
+        self.assertTrue(PresenceService.mark_offline([self.maths.id], self.alice.id))
+        self.assertEqual(
+            PresenceService.online_user_ids({self.maths.id: [self.alice.id]}), {self.maths.id: {self.alice.id}}
+        )
+
+        self.assertFalse(PresenceService.mark_offline([self.maths.id], self.alice.id))
+        self.assertEqual(PresenceService.online_user_ids({self.maths.id: [self.alice.id]}), {self.maths.id: set()})
+
+    def test_marks_expire_without_heartbeat(self):
+        with patch("classroom.presence.PRESENCE_TTL", 0):
+            PresenceService.mark_online([self.maths.id], self.alice.id)
+
+        self.assertEqual(PresenceService.online_user_ids({self.maths.id: [self.alice.id]}), {self.maths.id: set()})
+
+    def test_annotate_online_uses_prefetched_participants(self):
+        PresenceService.mark_online([self.maths.id], self.bob.id)
+        channels = Channel.objects.prefetch_related("participants").order_by("name")
+
+        with self.assertNumQueries(2):
+            maths, science = PresenceService.annotate_online(channels)
+
+        self.assertEqual(maths.online_users, [self.bob])
+        self.assertEqual(science.online_users, [])
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ConsumerPresenceTests(TestCase):
+    """Test presence maintained by connected sockets"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(email="alice@test.com", name="Alice")
+        self.bob = CustomUser.objects.create_user(email="bob@test.com", name="Bob")
+        self.channel = Channel.objects.create(name="maths")
+        self.channel.participants.add(self.alice, self.bob)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(application, "/ws/chat/maths/")
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def online(self):
+        return PresenceService.online_user_ids({self.channel.id: [self.alice.id, self.bob.id]})[self.channel.id]
+
+    async def test_connect_and_disconnect_update_presence(self):
+        alice = await self.connect(self.alice)
+        await alice.receive_json_from()
+        self.assertEqual(self.online(), {self.alice.id})
+
+        await alice.disconnect()
+        self.assertEqual(self.online(), set())
+
+    async def test_closing_one_of_two_sockets_keeps_the_user_online(self):
+        bob = await self.connect(self.bob)
+        await bob.receive_json_from()
+        first = await self.connect(self.alice)
+        second = await self.connect(self.alice)
+        self.assertEqual(await bob.receive_json_from(), {"type": "user_status", "user": "alice", "status": "online"})
+
+        await first.disconnect()
+        self.assertEqual(self.online(), {self.alice.id, self.bob.id})
+        self.assertTrue(await bob.receive_nothing())
+
+        await second.disconnect()
+        self.assertEqual(self.online(), {self.bob.id})
+        self.assertEqual(await bob.receive_json_from(), {"type": "user_status", "user": "alice", "status": "offline"})
+        await bob.disconnect()
+
+    async def test_participant_changes_update_presence(self):
+        alice = await self.connect(self.alice)
+        await alice.receive_json_from()
+        # A second channel with the same name is served by the same socket
+        other = await Channel.objects.acreate(name="maths")
+
+        def change_participants(change):
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+
+        await sync_to_async(change_participants)(lambda: other.participants.add(self.alice))
+        await alice.receive_nothing()
+        online = await sync_to_async(PresenceService.online_user_ids)({other.id: [self.alice.id]})
+        self.assertEqual(online, {other.id: {self.alice.id}})
+
+        await sync_to_async(change_participants)(lambda: self.channel.participants.remove(self.alice))
+        await alice.receive_nothing()
+        self.assertEqual(self.online(), set())
+
+        await alice.disconnect()
+        online = await sync_to_async(PresenceService.online_user_ids)({other.id: [self.alice.id]})
+        self.assertEqual(online, {other.id: set()})
+
+    async def test_status_changes_are_coalesced(self):
+        alice = await self.connect(self.alice)
+        bob = await self.connect(self.bob)
+        await bob.disconnect()
+
+        # Both changes arrive together in one group event, in order of first change
+        self.assertEqual(await alice.receive_json_from(), {"type": "user_status", "user": "alice", "status": "online"})
+        self.assertEqual(await alice.receive_json_from(), {"type": "user_status", "user": "bob", "status": "offline"})
+        self.assertTrue(await alice.receive_nothing())
+        await alice.disconnect()
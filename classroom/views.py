@@ -10,8 +10,8 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Prefetch
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.utils.decorators import method_decorator
@@ -20,24 +20,23 @@ from django.views.decorators.http import require_http_methods
 from waffle.decorators import waffle_switch
 from waffle.mixins import WaffleSwitchMixin
 
-from accounts.models import School, SchoolMembership
+from accounts.models import SchoolMembership
+from accounts.services.membership_context import MembershipContext
+from accounts.services.user_search import SchoolUserSearchService, parse_page
 
-from .models import Channel, Message, Reaction
+from .activity import ChannelActivityService
+from .models import Channel, ChannelReadState, Message, Reaction
+from .pagination import message_page
+from .presence import PresenceService
 
 User = get_user_model()
 
 logger = logging.getLogger(__name__)
 
 
-def get_user_schools(user):
-    """Get all schools where the user is a member."""
-    if user.is_staff or user.is_superuser:
-        # Staff/superuser can see all schools
-        return School.objects.all()
-
-    # Get schools through SchoolMembership
-    school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-    return School.objects.filter(id__in=school_ids)
+def get_user_schools(request):
+    """Get all schools where the user is a member (staff/superuser can see all schools)."""
+    return MembershipContext.for_request(request).schools()
 
 
 def get_school_users(schools, exclude_user=None):
@@ -45,7 +44,7 @@ def get_school_users(schools, exclude_user=None):
     # Get all school memberships for these schools
     memberships = (
         SchoolMembership.objects.filter(school__in=schools)
-        .select_related("user")
+        .select_related("user", "school")
         .order_by("user__first_name", "user__last_name")
     )
 
@@ -53,24 +52,11 @@ def get_school_users(schools, exclude_user=None):
         memberships = memberships.exclude(user=exclude_user)
 
     # Extract users and add their role from the membership
-    users_data = []
-    for membership in memberships:
-        user = membership.user
-        if user.is_active:  # Only include active users
-            users_data.append(
-                {
-                    "id": user.id,
-                    "username": user.username,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "email": user.email,
-                    "role": membership.role,
-                    "school_id": membership.school_id,
-                    "school_name": membership.school.name if membership.school else "",
-                }
-            )
-
-    return users_data
+    return [
+        SchoolUserSearchService.membership_data(membership)
+        for membership in memberships
+        if membership.user.is_active  # Only include active users
+    ]
 
 
 @method_decorator(login_required, name="dispatch")
@@ -86,32 +72,22 @@ class ChatUserSearchView(WaffleSwitchMixin, View):
             return JsonResponse({"users": []})
 
         # Get schools where current user is a member
-        user_schools = get_user_schools(request.user)
+        user_schools = get_user_schools(request)
 
         if not user_schools.exists():
             return JsonResponse({"users": []})
 
-        # Get all users from these schools
-        school_users = get_school_users(user_schools, exclude_user=request.user)
-
-        # Filter users based on search query
-        filtered_users = []
-        query_lower = query.lower()
-
-        for user_data in school_users:
-            # Search in name, email, or username
-            if (
-                query_lower in user_data["first_name"].lower()
-                or query_lower in user_data["last_name"].lower()
-                or query_lower in user_data["email"].lower()
-                or query_lower in user_data["username"].lower()
-            ):
-                filtered_users.append(user_data)
-
-        # Limit results to 20
-        filtered_users = filtered_users[:20]
+        results = SchoolUserSearchService.search(
+            user_schools, query, exclude_user=request.user, page=parse_page(request.GET.get("page"))
+        )
 
-        return JsonResponse({"users": filtered_users})
+        return JsonResponse(
+            {
+                "users": [SchoolUserSearchService.membership_data(membership) for membership in results.results],
+                "page": results.page,
+                "has_more": results.has_more,
+            }
+        )
 
 
 @method_decorator(login_required, name="dispatch")
@@ -121,25 +97,33 @@ class ChatChannelsView(WaffleSwitchMixin, View):
     waffle_switch = "chat_feature"
 
     def get(self, request):
-        # Get channels where user is a participant
+        # Get channels where user is a participant, with their last message and unread count in the same query
         channels = (
             Channel.objects.filter(participants=request.user)
+            .select_related("last_message__sender")
+            .annotate(
+                unread_count=Coalesce(
+                    Subquery(
+                        ChannelReadState.objects.filter(channel=OuterRef("pk"), user=request.user).values(
+                            "unread_count"
+                        )[:1]
+                    ),
+                    0,
+                )
+            )
             .prefetch_related(
                 Prefetch(
                     "participants", queryset=User.objects.only("id", "username", "first_name", "last_name", "email")
                 ),
-                Prefetch("online", queryset=User.objects.only("id", "username", "first_name", "last_name")),
             )
             .order_by("-updated_at")
         )
 
         channels_data = []
-        for channel in channels:
+        for channel in PresenceService.annotate_online(channels):
             # Get last message
             last_message = None
-            last_message_obj = (
-                Message.objects.filter(channel=channel).select_related("sender").order_by("-timestamp").first()
-            )
+            last_message_obj = channel.last_message
             if last_message_obj:
                 last_message = {
                     "id": last_message_obj.id,
@@ -168,7 +152,7 @@ class ChatChannelsView(WaffleSwitchMixin, View):
 
             # Get online users
             online = []
-            for user in channel.online.all():
+            for user in channel.online_users:
                 online.append(
                     {
                         "id": user.id,
@@ -188,6 +172,7 @@ class ChatChannelsView(WaffleSwitchMixin, View):
                     "participants": participants,
                     "online": online,
                     "last_message": last_message,
+                    "unread_count": channel.unread_count,
                 }
             )
 
@@ -204,7 +189,7 @@ class ChatChannelsView(WaffleSwitchMixin, View):
                 return JsonResponse({"error": "No participants specified"}, status=400)
 
             # Verify all participants are from same schools as current user
-            user_schools = get_user_schools(request.user)
+            user_schools = get_user_schools(request)
             school_users_data = get_school_users(user_schools)
             valid_user_ids = {user_data["id"] for user_data in school_users_data}
 
@@ -311,22 +296,22 @@ class ChatMessagesView(WaffleSwitchMixin, View):
         # Verify user is participant in this channel
         channel = get_object_or_404(Channel.objects.filter(participants=request.user), id=channel_id)
 
-        # Get messages with pagination
-        page_size = 50
-        page = int(request.GET.get("page", 1))
-
-        messages_queryset = (
-            Message.objects.filter(channel=channel)
-            .select_related("sender")
-            .prefetch_related("reactions__user")
-            .order_by("-timestamp")
-        )
+        # Get messages with keyset pagination: newest page first, older pages via the before cursor
+        before = request.GET.get("before")
+        try:
+            messages_page = message_page(
+                Message.objects.filter(channel=channel).select_related("sender").prefetch_related("reactions__user"),
+                before=before,
+            )
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
 
-        paginator = Paginator(messages_queryset, page_size)
-        messages_page = paginator.get_page(page)
+        # Loading the latest page counts as reading the channel
+        if not before:
+            ChannelActivityService.mark_read(channel.id, request.user.id)
 
         messages_data = []
-        for message in reversed(messages_page):  # Reverse to show oldest first on page
+        for message in messages_page.messages:  # Oldest first on page
             # Get reactions for this message
             reactions = []
             for reaction in message.reactions.all():
@@ -347,6 +332,7 @@ class ChatMessagesView(WaffleSwitchMixin, View):
             messages_data.append(
                 {
                     "id": message.id,
+                    "uuid": str(message.uuid),
                     "content": message.content,
                     "timestamp": message.timestamp.isoformat(),
                     "sender": {
@@ -364,9 +350,8 @@ class ChatMessagesView(WaffleSwitchMixin, View):
             {
                 "messages": messages_data,
                 "channel_id": channel.id,
-                "has_more": messages_page.has_next(),
-                "page": page,
-                "total_pages": paginator.num_pages,
+                "has_more": messages_page.has_more,
+                "next_cursor": messages_page.next_cursor,
             }
         )
 
@@ -543,21 +528,22 @@ class ChatView(WaffleSwitchMixin, View):
                 Prefetch(
                     "participants", queryset=User.objects.only("id", "username", "first_name", "last_name", "email")
                 ),
-                Prefetch("online", queryset=User.objects.only("id", "username", "first_name", "last_name")),
             )
             .order_by("-updated_at")
         )
 
+        channels = PresenceService.annotate_online(channels)
+
         # Get initial channel and messages if any
-        selected_channel = channels.first() if channels else None
+        selected_channel = channels[0] if channels else None
         messages = []
         if selected_channel:
-            messages = (
+            messages = message_page(
                 Message.objects.filter(channel=selected_channel)
                 .select_related("sender")
                 .prefetch_related("reactions__user")
-                .order_by("timestamp")[:50]
-            )
+            ).messages
+            ChannelActivityService.mark_read(selected_channel.id, request.user.id)
 
         return render(
             request,
@@ -592,12 +578,10 @@ class ChatView(WaffleSwitchMixin, View):
         channel_id = request.POST.get("channel_id")
         channel = get_object_or_404(Channel, id=channel_id, participants=request.user)
 
-        messages = (
-            Message.objects.filter(channel=channel)
-            .select_related("sender")
-            .prefetch_related("reactions__user")
-            .order_by("timestamp")[:50]
-        )
+        messages = message_page(
+            Message.objects.filter(channel=channel).select_related("sender").prefetch_related("reactions__user")
+        ).messages
+        ChannelActivityService.mark_read(channel.id, request.user.id)
 
         return render(
             request,
@@ -619,11 +603,9 @@ class ChatView(WaffleSwitchMixin, View):
 
         channel = get_object_or_404(Channel, id=channel_id, participants=request.user)
 
+        # Saving the message also moves the channel's last message and timestamp
         message = Message.objects.create(channel=channel, sender=request.user, content=content)
 
-        # Update channel timestamp
-        channel.save()
-
         # Broadcast via WebSocket (same as before)
         try:
             from asgiref.sync import async_to_sync
@@ -668,7 +650,7 @@ class ChatView(WaffleSwitchMixin, View):
             return JsonResponse({"error": "Participant ID required"}, status=400)
 
         # Verify participant is from same schools as current user
-        user_schools = get_user_schools(request.user)
+        user_schools = get_user_schools(request)
         school_users_data = get_school_users(user_schools)
         valid_user_ids = {user_data["id"] for user_data in school_users_data}
 
@@ -684,9 +666,9 @@ class ChatView(WaffleSwitchMixin, View):
 
         if existing_dm:
             # Return existing DM channel list
-            channels = (
+            channels = PresenceService.annotate_online(
                 Channel.objects.filter(participants=request.user)
-                .prefetch_related("participants", "online")
+                .prefetch_related("participants")
                 .order_by("-updated_at")
             )
 
@@ -706,10 +688,8 @@ class ChatView(WaffleSwitchMixin, View):
         channel.participants.add(request.user.id, participant_id)
 
         # Return updated channel list
-        channels = (
-            Channel.objects.filter(participants=request.user)
-            .prefetch_related("participants", "online")
-            .order_by("-updated_at")
+        channels = PresenceService.annotate_online(
+            Channel.objects.filter(participants=request.user).prefetch_related("participants").order_by("-updated_at")
         )
 
         return render(
@@ -737,7 +717,7 @@ class ChatView(WaffleSwitchMixin, View):
             )
 
         # Get schools where current user is a member
-        user_schools = get_user_schools(request.user)
+        user_schools = get_user_schools(request)
 
         if not user_schools.exists():
             return render(
@@ -749,32 +729,19 @@ class ChatView(WaffleSwitchMixin, View):
                 },
             )
 
-        # Get all users from these schools
-        school_users = get_school_users(user_schools, exclude_user=request.user)
-
-        # Filter users based on search query
-        filtered_users = []
-        query_lower = query.lower()
-
-        for user_data in school_users:
-            # Search in name, email, or username
-            if (
-                query_lower in user_data["first_name"].lower()
-                or query_lower in user_data["last_name"].lower()
-                or query_lower in user_data["email"].lower()
-                or query_lower in user_data["username"].lower()
-            ):
-                filtered_users.append(user_data)
-
-        # Limit results to 20
-        filtered_users = filtered_users[:20]
+        results = SchoolUserSearchService.search(
+            user_schools, query, exclude_user=request.user, page=parse_page(request.POST.get("page"))
+        )
 
         return render(
             request,
             "classroom/partials/user_search_results.html",
             {
-                "search_results": filtered_users,
+                "search_results": [
+                    SchoolUserSearchService.membership_data(membership) for membership in results.results
+                ],
                 "query": query,
+                "has_more": results.has_more,
             },
         )
 
@@ -785,7 +752,7 @@ class ChatView(WaffleSwitchMixin, View):
 @require_http_methods(["GET"])
 def chat_school_users(request):
     """Get all users from the same schools as current user."""
-    user_schools = get_user_schools(request.user)
+    user_schools = get_user_schools(request)
     school_users = get_school_users(user_schools, exclude_user=request.user)
 
     return JsonResponse(
@@ -0,0 +1,392 @@
+"""
+Query-count and latency benchmarks for the hot views and services.
+
+BenchmarkDataSeeder fills the database with a configurable volume of schools, teachers,
+students, classes and purchase transactions; BenchmarkSuite then runs each scenario and
+records its query count, median wall time and peak Python memory. Results are plain
+dicts so they can be stored as JSON and compared against a baseline with
+compare_results. The run_benchmarks command wraps all of this against a throwaway
+test database.
+
+Seeding goes through bulk_create rather than the row-by-row test factories so that
+tens of thousands of rows take seconds rather than minutes.
+"""
+
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import date, time, timedelta
+from decimal import Decimal
+import statistics
+import time as time_module
+import tracemalloc
+from typing import Any
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from waffle.models import Switch
+
+from accounts.models import CustomUser, School, SchoolMembership, SchoolRole, StudentProfile, TeacherProfile
+from dashboard.views import PeopleView
+from finances.models import PurchaseTransaction, TransactionPaymentStatus, TransactionType
+from finances.services.fraud_detection_service import FraudDetectionService
+from finances.services.payment_analytics_service import PaymentAnalyticsService
+from finances.services.payment_metrics_service import PaymentMetricsRollupService
+from finances.services.payment_services import TeacherPaymentCalculator
+from scheduler.class_time_services import ClassTimeIndexService
+from scheduler.models import ClassSchedule, ClassStatus, ReminderType, TeacherAvailability, WeekDay
+from scheduler.reminder_services import ReminderBackgroundTaskService
+from scheduler.scheduling_rules_services import AvailabilityCalculationService
+
+SEED_BATCH_SIZE = 1000
+
+# Seeded classes are spread over this many days either side of today
+CLASS_WINDOW_DAYS = 30
+
+# Seeded transactions are spread over this many days before today
+TRANSACTION_WINDOW_DAYS = 90
+
+# Wall-time changes below this many milliseconds are treated as noise
+MIN_TIME_DELTA_MS = 1.0
+
+
+@dataclass(frozen=True)
+class BenchmarkScale:
+    """Number of rows of each kind to seed."""
+
+    schools: int
+    teachers: int
+    students: int
+    classes: int
+    transactions: int
+
+
+SCALES = {
+    "small": BenchmarkScale(schools=2, teachers=20, students=50, classes=500, transactions=200),
+    "default": BenchmarkScale(schools=50, teachers=2000, students=10000, classes=50000, transactions=20000),
+}
+
+
+@dataclass
+class BenchmarkDataset:
+    """Handles on the seeded rows that scenarios act on."""
+
+    school: School
+    admin_user: CustomUser
+    teacher: TeacherProfile
+    student: CustomUser
+    scale: BenchmarkScale
+    today: date
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements for one scenario."""
+
+    name: str
+    queries: int
+    wall_time_ms: float
+    peak_memory_kb: float
+    iterations: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class Regression:
+    """A metric that got worse than the baseline allows."""
+
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    change_percent: float | None = field(default=None)
+
+    def __str__(self) -> str:
+        change = f" ({self.change_percent:+.1f}%)" if self.change_percent is not None else ""
+        return f"{self.name}: {self.metric} {self.baseline} -> {self.current}{change}"
+
+
+class BenchmarkDataSeeder:
+    """Seed a realistic data volume with bulk inserts."""
+
+    def __init__(self, scale: BenchmarkScale, today: date | None = None):
+        self.scale = scale
+        self.today = today or timezone.now().date()
+        # Scenarios log in with force_login, so one unusable hash serves every seeded user
+        self.password = make_password(None)
+
+    def seed(self) -> BenchmarkDataset:
+        scale = self.scale
+        schools = School.objects.bulk_create(
+            [
+                School(name=f"Benchmark School {index}", contact_email=f"school{index}@benchmark.test")
+                for index in range(scale.schools)
+            ]
+        )
+
+        admin_user = CustomUser.objects.create_user(email="admin@benchmark.test", name="Benchmark Admin")
+        SchoolMembership.objects.create(user=admin_user, school=schools[0], role=SchoolRole.SCHOOL_OWNER)
+
+        teacher_users = self._create_users("teacher", scale.teachers)
+        student_users = self._create_users("student", scale.students)
+
+        teachers = TeacherProfile.objects.bulk_create(
+            [TeacherProfile(user=user, hourly_rate=Decimal("20.00")) for user in teacher_users],
+            batch_size=SEED_BATCH_SIZE,
+        )
+        StudentProfile.objects.bulk_create(
+            [
+                StudentProfile(user=user, name=user.name, school_year=str(7 + index % 6), birth_date=date(2010, 1, 1))
+                for index, user in enumerate(student_users)
+            ],
+            batch_size=SEED_BATCH_SIZE,
+        )
+        SchoolMembership.objects.bulk_create(
+            [
+                SchoolMembership(user=user, school=schools[index % len(schools)], role=SchoolRole.TEACHER)
+                for index, user in enumerate(teacher_users)
+            ]
+            + [
+                SchoolMembership(user=user, school=schools[index % len(schools)], role=SchoolRole.STUDENT)
+                for index, user in enumerate(student_users)
+            ],
+            batch_size=SEED_BATCH_SIZE,
+        )
+        TeacherAvailability.objects.bulk_create(
+            [
+                TeacherAvailability(
+                    teacher=teacher,
+                    school=schools[index % len(schools)],
+                    day_of_week=day,
+                    start_time=time(9, 0),
+                    end_time=time(18, 0),
+                )
+                for index, teacher in enumerate(teachers)
+                for day in (WeekDay.MONDAY, WeekDay.TUESDAY, WeekDay.WEDNESDAY, WeekDay.THURSDAY, WeekDay.FRIDAY)
+            ],
+            batch_size=SEED_BATCH_SIZE,
+        )
+
+        self._create_classes(schools, teachers, student_users, admin_user)
+        self._create_transactions(student_users)
+        Switch.objects.update_or_create(name="schedule_feature", defaults={"active": True})
+
+        return BenchmarkDataset(
+            school=schools[0],
+            admin_user=admin_user,
+            teacher=teachers[0],
+            student=student_users[0],
+            scale=scale,
+            today=self.today,
+        )
+
+    def _create_users(self, kind: str, count: int) -> list[CustomUser]:
+        return CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    email=f"{kind}{index}@benchmark.test",
+                    name=f"Benchmark {kind.title()} {index}",
+                    password=self.password,
+                )
+                for index in range(count)
+            ],
+            batch_size=SEED_BATCH_SIZE,
+        )
+
+    def _create_classes(self, schools, teachers, students, admin_user) -> None:
+        """Spread classes evenly across teachers, days around today and working hours."""
+        window_days = 2 * CLASS_WINDOW_DAYS + 1
+        # Memberships were assigned round-robin, so this matches each school to its own students
+        students_by_school = [students[offset :: len(schools)] for offset in range(len(schools))]
+        classes = []
+        for index in range(self.scale.classes):
+            teacher_index = index % len(teachers)
+            school_index = teacher_index % len(schools)
+            school_students = students_by_school[school_index]
+            student = school_students[index % len(school_students)]
+            # The n-th class of a teacher gets its own day/hour slot; rotating by teacher spreads the days
+            sequence = index // len(teachers)
+            day_offset = (sequence + teacher_index) % window_days - CLASS_WINDOW_DAYS
+            scheduled_date = self.today + timedelta(days=day_offset)
+            start_hour = 8 + (sequence // window_days) % 11
+            classes.append(
+                ClassSchedule(
+                    teacher=teachers[teacher_index],
+                    student=student,
+                    school=schools[school_index],
+                    title=f"Benchmark Class {index}",
+                    scheduled_date=scheduled_date,
+                    start_time=time(start_hour, 0),
+                    end_time=time(start_hour + 1, 0),
+                    duration_minutes=60,
+                    booked_by=admin_user,
+                    status=ClassStatus.COMPLETED if scheduled_date < self.today else ClassStatus.SCHEDULED,
+                )
+            )
+        ClassTimeIndexService.apply_utc_bounds(classes)
+        ClassSchedule.objects.bulk_create(classes, batch_size=SEED_BATCH_SIZE)
+
+    def _create_transactions(self, students) -> None:
+        statuses = [TransactionPaymentStatus.COMPLETED] * 8 + [
+            TransactionPaymentStatus.FAILED,
+            TransactionPaymentStatus.PENDING,
+        ]
+        created = PurchaseTransaction.objects.bulk_create(
+            [
+                PurchaseTransaction(
+                    student=students[index % len(students)],
+                    transaction_type=TransactionType.PACKAGE,
+                    amount=Decimal(50 + index % 200),
+                    payment_status=statuses[index % len(statuses)],
+                    stripe_payment_intent_id=f"pi_benchmark_{index}",
+                )
+                for index in range(self.scale.transactions)
+            ],
+            batch_size=SEED_BATCH_SIZE,
+        )
+
+        # created_at is auto_now_add, so spread the history with one update per day
+        now = timezone.now()
+        ids = [transaction.id for transaction in created]
+        for offset in range(min(TRANSACTION_WINDOW_DAYS, len(ids))):
+            PurchaseTransaction.objects.filter(id__in=ids[offset::TRANSACTION_WINDOW_DAYS]).update(
+                created_at=now - timedelta(days=offset)
+            )
+
+        # bulk_create skips the signals that keep the rollup current
+        PaymentMetricsRollupService.rebuild()
+
+
+class BenchmarkSuite:
+    """Run benchmark scenarios against a seeded dataset."""
+
+    def __init__(self, dataset: BenchmarkDataset, iterations: int = 5):
+        self.dataset = dataset
+        self.iterations = iterations
+
+    def scenarios(self) -> dict[str, Callable[[], Any]]:
+        dataset = self.dataset
+        admin_client = Client()
+        admin_client.force_login(dataset.admin_user)
+        teacher_client = Client()
+        teacher_client.force_login(dataset.teacher.user)
+
+        def students_partial():
+            request = RequestFactory().get("/people/")
+            request.user = dataset.admin_user
+            request.session = admin_client.session
+            return PeopleView()._render_students_partial(request)
+
+        def available_slots():
+            next_week = dataset.today + timedelta(days=1)
+            return AvailabilityCalculationService().get_available_slots_with_rules(
+                dataset.teacher, dataset.school, next_week, 60, end_date=next_week + timedelta(days=6)
+            )
+
+        return {
+            "dashboard_admin": lambda: admin_client.get(reverse("dashboard:dashboard")),
+            "dashboard_teacher": lambda: teacher_client.get(reverse("dashboard:dashboard")),
+            "calendar_week": lambda: admin_client.get(reverse("calendar")),
+            "people_students_partial": students_partial,
+            "available_slots_week": available_slots,
+            "reminders_24h": lambda: ReminderBackgroundTaskService.find_classes_needing_reminders(
+                ReminderType.REMINDER_24H
+            ),
+            "payment_dashboard_metrics": lambda: PaymentAnalyticsService().get_dashboard_metrics(days=30),
+            "fraud_batch_analysis": lambda: FraudDetectionService().run_batch_analysis(
+                hours_back=24, admin_user=dataset.admin_user
+            ),
+            "teacher_monthly_total": lambda: TeacherPaymentCalculator.calculate_monthly_total(
+                dataset.teacher, dataset.school, dataset.today.year, dataset.today.month
+            ),
+        }
+
+    def run(self, names: list[str] | None = None) -> list[BenchmarkResult]:
+        scenarios = self.scenarios()
+        unknown = set(names or []) - set(scenarios)
+        if unknown:
+            raise ValueError(f"Unknown benchmark scenarios: {', '.join(sorted(unknown))}")
+
+        return [self.measure(name, scenarios[name]) for name in (names or scenarios)]
+
+    def measure(self, name: str, func: Callable[[], Any]) -> BenchmarkResult:
+        """
+        Measure one scenario.
+
+        A warm-up call fills caches and one-off lazy state first, so the numbers
+        describe the steady-state request. Queries and peak memory come from a single
+        call; wall time is the median over the configured iterations.
+        """
+        response = func()
+        status_code = getattr(response, "status_code", 200)
+        if status_code != 200:
+            raise RuntimeError(f"Scenario {name} returned HTTP {status_code}")
+
+        with CaptureQueriesContext(connection) as context:
+            func()
+        queries = len(context.captured_queries)
+
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        timings = []
+        for _ in range(self.iterations):
+            started = time_module.perf_counter()
+            func()
+            timings.append((time_module.perf_counter() - started) * 1000)
+
+        return BenchmarkResult(
+            name=name,
+            queries=queries,
+            wall_time_ms=round(statistics.median(timings), 3),
+            peak_memory_kb=round(peak / 1024, 1),
+            iterations=self.iterations,
+        )
+
+
+def build_report(results: list[BenchmarkResult], scale: BenchmarkScale) -> dict[str, Any]:
+    """JSON-serialisable report for a benchmark run."""
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "database": connection.vendor,
+        "scale": asdict(scale),
+        "results": {result.name: result.as_dict() for result in results},
+    }
+
+
+def compare_results(
+    current: dict[str, Any], baseline: dict[str, Any], threshold_percent: float = 20.0
+) -> list[Regression]:
+    """
+    Flag scenarios that regressed against a baseline report.
+
+    Query counts are deterministic, so any increase is a regression. Wall time and peak
+    memory are noisy and only count when they grow by more than threshold_percent.
+    Scenarios missing from either report are ignored.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+
+        if result["queries"] > previous["queries"]:
+            regressions.append(Regression(name, "queries", previous["queries"], result["queries"]))
+
+        for metric in ("wall_time_ms", "peak_memory_kb"):
+            before, after = previous[metric], result[metric]
+            if metric == "wall_time_ms" and after - before < MIN_TIME_DELTA_MS:
+                continue
+            if before > 0 and (after - before) / before * 100 > threshold_percent:
+                regressions.append(Regression(name, metric, before, after, (after - before) / before * 100))
+
+    return regressions
@@ -0,0 +1,140 @@
+"""
+Django management command to run the query-count and latency benchmarks.
+
+Seeds a throwaway test database (never the configured one), measures every scenario
+in dashboard.benchmarks and writes the results as JSON. With --compare the run is
+checked against a stored baseline and the command fails when a scenario regressed.
+
+Usage:
+    python manage.py run_benchmarks --output=benchmarks.json
+    python manage.py run_benchmarks --scale=small --only dashboard_admin calendar_week
+    python manage.py run_benchmarks --compare=baseline.json --threshold=25
+    python manage.py run_benchmarks --scale=small --classes=5000
+"""
+
+from dataclasses import replace
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dashboard.benchmarks import SCALES, BenchmarkDataSeeder, BenchmarkSuite, build_report, compare_results
+
+
+class Command(BaseCommand):
+    """
+    Management command to benchmark the hot views and services.
+
+    Exits with an error when --compare finds a regression, so it can gate CI.
+    """
+
+    help = "Benchmark query counts, wall time and peak memory of the hot views and services"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--scale",
+            choices=sorted(SCALES),
+            default="default",
+            help="Seed data volume preset (default: default)",
+        )
+
+        for name in ("schools", "teachers", "students", "classes", "transactions"):
+            parser.add_argument(f"--{name}", type=int, help=f"Override the number of seeded {name}")
+
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=5,
+            help="Timed runs per scenario; the median is reported (default: 5)",
+        )
+
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            metavar="SCENARIO",
+            help="Run only these scenarios",
+        )
+
+        parser.add_argument(
+            "--output",
+            help="Write the JSON report to this file instead of stdout",
+        )
+
+        parser.add_argument(
+            "--compare",
+            help="Baseline JSON report to check for regressions",
+        )
+
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20.0,
+            help="Percent growth in wall time or memory that counts as a regression (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1")
+
+        overrides = {
+            name: options[name]
+            for name in ("schools", "teachers", "students", "classes", "transactions")
+            if options[name] is not None
+        }
+        if any(value < 1 for value in overrides.values()):
+            raise CommandError("Seed counts must be at least 1")
+        scale = replace(SCALES[options["scale"]], **overrides)
+
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = json.loads(Path(options["compare"]).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Error reading baseline {options['compare']}: {e}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if verbosity >= 1:
+                self.stdout.write(f"Seeding {scale}...")
+            dataset = BenchmarkDataSeeder(scale).seed()
+
+            results = []
+            for result in BenchmarkSuite(dataset, iterations=options["iterations"]).run(options["only"]):
+                results.append(result)
+                if verbosity >= 1:
+                    self.stdout.write(
+                        f"  {result.name}: {result.queries} queries, {result.wall_time_ms} ms, "
+                        f"{result.peak_memory_kb} KiB peak"
+                    )
+        except ValueError as e:
+            raise CommandError(str(e))
+        except Exception as e:
+            raise CommandError(f"Error running benchmarks: {e}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = build_report(results, scale)
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2) + "\n")
+            if verbosity >= 1:
+                self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if baseline is not None:
+            regressions = compare_results(report, baseline, options["threshold"])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(self.style.ERROR(f"  {regression}"))
+                raise CommandError(f"{len(regressions)} benchmark regressions against {options['compare']}")
+            if verbosity >= 1:
+                self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
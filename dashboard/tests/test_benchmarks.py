@@ -0,0 +1,85 @@
+"""
+Tests for the benchmark harness.
+
+The harness runs here at a tiny scale only to check that seeding produces consistent
+data, that every scenario succeeds and that baseline comparison flags the right metrics.
+"""
+
+from django.test import TestCase
+
+from accounts.models import SchoolMembership, SchoolRole
+from dashboard.benchmarks import (
+    BenchmarkDataSeeder,
+    BenchmarkResult,
+    BenchmarkScale,
+    BenchmarkSuite,
+    build_report,
+    compare_results,
+)
+from scheduler.models import ClassSchedule
+
+TINY_SCALE = BenchmarkScale(schools=2, teachers=4, students=6, classes=40, transactions=20)
+
+
+class BenchmarkSuiteTests(TestCase):
+    """Test seeding and running the benchmark scenarios"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = BenchmarkDataSeeder(TINY_SCALE).seed()
+
+    def test_seeded_classes_stay_within_school(self):
+        """Every seeded class pairs a teacher and student from the class's school"""
+        self.assertEqual(ClassSchedule.objects.count(), TINY_SCALE.classes)
+        memberships = set(SchoolMembership.objects.values_list("user_id", "school_id", "role"))
+
+        for schedule in ClassSchedule.objects.select_related("teacher"):
+            self.assertIn((schedule.teacher.user_id, schedule.school_id, SchoolRole.TEACHER), memberships)
+            self.assertIn((schedule.student_id, schedule.school_id, SchoolRole.STUDENT), memberships)
+
+    def test_every_scenario_runs(self):
+        """All scenarios succeed and report their measurements"""
+        results = BenchmarkSuite(self.dataset, iterations=1).run()
+
+        self.assertEqual([result.name for result in results], list(BenchmarkSuite(self.dataset).scenarios()))
+        for result in results:
+            self.assertGreaterEqual(result.queries, 0)
+            self.assertGreater(result.wall_time_ms, 0)
+
+    def test_unknown_scenario_rejected(self):
+        with self.assertRaises(ValueError):
+            BenchmarkSuite(self.dataset).run(["no_such_scenario"])
+
+
+class CompareResultsTests(TestCase):
+    """Test regression detection against a baseline report"""
+
+    def report(self, queries=10, wall_time_ms=100.0, peak_memory_kb=500.0):
+        return build_report(
+            [BenchmarkResult("dashboard_admin", queries, wall_time_ms, peak_memory_kb, iterations=5)], TINY_SCALE
+        )
+
+    def test_any_extra_query_is_a_regression(self):
+        regressions = compare_results(self.report(queries=11), self.report())
+
+        self.assertEqual([(r.name, r.metric) for r in regressions], [("dashboard_admin", "queries")])
+
+    def test_time_and_memory_use_threshold(self):
+        """Growth within the threshold passes, growth beyond it is flagged"""
+        self.assertEqual(compare_results(self.report(wall_time_ms=115.0), self.report(), threshold_percent=20), [])
+
+        regressions = compare_results(
+            self.report(wall_time_ms=130.0, peak_memory_kb=700.0), self.report(), threshold_percent=20
+        )
+        self.assertEqual([r.metric for r in regressions], ["wall_time_ms", "peak_memory_kb"])
+        self.assertAlmostEqual(regressions[0].change_percent, 30.0)
+
+    def test_tiny_time_changes_ignored(self):
+        """Sub-millisecond jitter on fast scenarios is not a regression"""
+        self.assertEqual(compare_results(self.report(wall_time_ms=0.9), self.report(wall_time_ms=0.3)), [])
+
+    def test_improvements_and_new_scenarios_pass(self):
+        current = self.report(queries=5, wall_time_ms=50.0)
+        current["results"]["new_scenario"] = current["results"]["dashboard_admin"]
+
+        self.assertEqual(compare_results(current, self.report()), [])
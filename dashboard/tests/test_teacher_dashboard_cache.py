@@ -0,0 +1,190 @@
+"""
+Tests for the per-section teacher dashboard cache.
+
+Dashboard sections are built with a fixed number of queries however many sessions a
+teacher has, cached per section and invalidated by signals when the underlying sessions,
+payment entries or school activities change.
+"""
+
+from datetime import time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import ActivityType, School, SchoolActivity, SchoolMembership, SchoolRole, TeacherProfile
+from accounts.services.teacher_dashboard_service import TeacherDashboardService
+from finances.models import ClassSession, SessionStatus, SessionType, TeacherPaymentEntry
+from finances.services.payroll_engine import PayrollEngine
+
+User = get_user_model()
+
+
+class TeacherDashboardCacheTest(TestCase):
+    """Test section caching, signal invalidation and cache warming"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.school = School.objects.create(name="Test School", contact_email="school@example.com")
+        self.teacher_profile = self.create_teacher("teacher@example.com")
+        self.students = [
+            User.objects.create_user(email=f"student{index}@example.com", name=f"Student {index}") for index in range(3)
+        ]
+
+    def create_teacher(self, email):
+        user = User.objects.create_user(email=email, name="Test Teacher")
+        SchoolMembership.objects.create(user=user, school=self.school, role=SchoolRole.TEACHER, is_active=True)
+        return TeacherProfile.objects.create(user=user, hourly_rate=Decimal("30.00"))
+
+    def create_session(
+        self,
+        day,
+        status=SessionStatus.COMPLETED,
+        teacher_profile=None,
+        students=(),
+        start=time(10, 0),
+        end=time(11, 30),
+    ):
+        session = ClassSession.objects.create(
+            teacher=teacher_profile or self.teacher_profile,
+            school=self.school,
+            date=day,
+            start_time=start,
+            end_time=end,
+            session_type=SessionType.INDIVIDUAL,
+            grade_level="7",
+            status=status,
+        )
+        session.students.set(students)
+        return session
+
+    def pay(self, session, amount):
+        return TeacherPaymentEntry.objects.create(
+            session=session,
+            teacher=session.teacher,
+            school=self.school,
+            billing_period=session.date.strftime("%Y-%m"),
+            hours_taught=Decimal("1.50"),
+            rate_applied=amount / Decimal("1.5"),
+            amount_earned=amount,
+        )
+
+    def cached_sections(self):
+        keys = {
+            TeacherDashboardService.section_key(self.teacher_profile.id, section): section
+            for section in TeacherDashboardService.SECTIONS
+        }
+        return {keys[key] for key in cache.get_many(list(keys))}
+
+    def build(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = TeacherDashboardService(self.teacher_profile).get_consolidated_dashboard_data()
+        return data, len(queries)
+
+    def test_earnings_and_stats_come_from_aggregates(self):
+        paid = self.create_session(self.today, students=self.students[:2])
+        self.pay(paid, Decimal("45.00"))
+        self.create_session(self.today - timedelta(days=1), students=self.students[1:])
+        self.create_session(self.today - timedelta(days=2), students=self.students[:1])
+
+        data, small_queries = self.build()
+
+        earnings = data["earnings"]
+        self.assertEqual(earnings["current_month_total"] + earnings["last_month_total"], Decimal("45.00"))
+        self.assertEqual(earnings["total_hours_taught"], Decimal("1.50"))
+        self.assertEqual(earnings["pending_amount"], Decimal("90.00"))
+        self.assertEqual(data["quick_stats"]["total_students"], 3)
+        self.assertEqual(data["quick_stats"]["sessions_today"], 1)
+        self.assertEqual(len(data["sessions"]["recent_completed"]), 2)
+        self.assertEqual(data["sessions"]["today"][0]["student_names"], ["Student 0", "Student 1"])
+
+        for days_ago in range(3, 9):
+            self.create_session(self.today - timedelta(days=days_ago), students=self.students)
+        TeacherDashboardService.invalidate_cache(self.teacher_profile.id)
+
+        data, large_queries = self.build()
+
+        self.assertEqual(large_queries, small_queries)
+        self.assertEqual(data["earnings"]["pending_amount"], Decimal("360.00"))
+
+    def test_pending_amount_counts_sessions_that_cross_midnight(self):
+        overnight = self.create_session(self.today - timedelta(days=1), start=time(23, 0), end=time(0, 30))
+        self.create_session(self.today)
+
+        data, _queries = self.build()
+
+        self.assertEqual(overnight.duration_hours, Decimal("1.5"))
+        # Two sessions of 1.5 hours at 30.00 per hour
+        self.assertEqual(data["earnings"]["pending_amount"], Decimal("90.00"))
+
+    def test_cached_sections_are_served_without_queries(self):
+        first, _queries = self.build()
+        self.assertEqual(self.cached_sections(), set(TeacherDashboardService.SECTIONS))
+
+        second, queries = self.build()
+
+        self.assertEqual(queries, 0)
+        self.assertEqual(second, first)
+
+    def test_sections_from_a_previous_day_are_rebuilt(self):
+        self.build()
+        key = TeacherDashboardService.section_key(self.teacher_profile.id, "quick_stats")
+        cache.set(key, {"day": self.today - timedelta(days=1), "data": {"sessions_today": 99}})
+
+        data, _queries = self.build()
+
+        self.assertEqual(data["quick_stats"]["sessions_today"], 0)
+
+    def test_signals_invalidate_only_affected_sections(self):
+        self.build()
+        session = self.create_session(self.today)
+        # Creating a session also records a school activity for its teacher
+        self.assertEqual(self.cached_sections(), {"teacher_info"})
+
+        self.build()
+        self.pay(session, Decimal("45.00"))
+        self.assertEqual(self.cached_sections(), set(TeacherDashboardService.SECTIONS) - {"earnings"})
+
+        self.build()
+        SchoolActivity.objects.create(
+            school=self.school,
+            activity_type=ActivityType.CLASS_COMPLETED,
+            actor=self.teacher_profile.user,
+            description="Done",
+        )
+        self.assertEqual(self.cached_sections(), set(TeacherDashboardService.SECTIONS) - {"recent_activities"})
+
+        self.build()
+        session.students.add(self.students[0])
+        self.assertEqual(self.cached_sections(), {"teacher_info", "recent_activities"})
+
+    def test_payroll_bulk_insert_invalidates_earnings(self):
+        self.create_session(self.today)
+        self.build()
+
+        PayrollEngine.run()
+
+        self.assertNotIn("earnings", self.cached_sections())
+        data, _queries = self.build()
+        self.assertEqual(data["earnings"]["pending_amount"], Decimal("0.00"))
+
+    def test_command_warms_teachers_with_sessions_today(self):
+        self.create_session(self.today, status=SessionStatus.SCHEDULED)
+        idle_teacher = self.create_teacher("idle@example.com")
+        self.create_session(self.today, status=SessionStatus.CANCELLED, teacher_profile=idle_teacher)
+        cache.clear()
+
+        out = StringIO()
+        call_command("warm_teacher_dashboards", stdout=out)
+
+        self.assertIn("Warmed dashboards of 1 teachers", out.getvalue())
+        self.assertEqual(self.cached_sections(), set(TeacherDashboardService.SECTIONS))
+        idle_key = TeacherDashboardService.section_key(idle_teacher.id, "sessions")
+        self.assertIsNone(cache.get(idle_key))
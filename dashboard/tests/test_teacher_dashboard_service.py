@@ -123,8 +123,8 @@ class TeacherDashboardServiceTest(BaseTestCase):
     @patch("accounts.services.teacher_dashboard_service.cache")
     def test_get_consolidated_dashboard_data_uses_cache(self, mock_cache):
         """Test that dashboard data uses caching correctly."""
-        # Mock cache.get to return None (cache miss)
-        mock_cache.get.return_value = None
+        # Mock cache.get_many to return nothing (cache miss)
+        mock_cache.get_many.return_value = {}
 
         # Mock the individual data methods
         with (
@@ -142,12 +142,16 @@ class TeacherDashboardServiceTest(BaseTestCase):
 
             self.service.get_consolidated_dashboard_data()
 
-            # Verify cache was checked
-            cache_key = f"teacher_dashboard_{self.teacher_profile.id}"
-            mock_cache.get.assert_called_once_with(cache_key)
+            # Verify every section was checked in one round trip
+            mock_cache.get_many.assert_called_once_with(
+                [
+                    TeacherDashboardService.section_key(self.teacher_profile.id, section)
+                    for section in TeacherDashboardService.SECTIONS
+                ]
+            )
 
-            # Verify cache was set
-            mock_cache.set.assert_called_once()
+            # Verify every rebuilt section was cached
+            self.assertEqual(mock_cache.set.call_count, len(TeacherDashboardService.SECTIONS))
 
     @patch("accounts.services.teacher_dashboard_service.cache")
     def test_get_consolidated_dashboard_data_returns_cached_data(self, mock_cache):
@@ -160,8 +164,12 @@ class TeacherDashboardServiceTest(BaseTestCase):
             "quick_stats": {"total_students": 5, "sessions_today": 0},
         }
 
-        # Mock cache.get to return cached data
-        mock_cache.get.return_value = cached_data
+        # Mock cache.get_many to return every section as cached today
+        today = timezone.now().date()
+        mock_cache.get_many.return_value = {
+            TeacherDashboardService.section_key(self.teacher_profile.id, section): {"day": today, "data": data}
+            for section, data in cached_data.items()
+        }
 
         with patch.object(self.service, "_get_sessions_data") as mock_sessions:
             # This shouldn't be called if cache hit occurs
@@ -336,9 +344,8 @@ class TeacherDashboardServiceTest(BaseTestCase):
         ):
             initial_data = self.service.get_consolidated_dashboard_data()
 
-        # Clear cache manually
-        cache_key = f"teacher_dashboard_{self.teacher_profile.id}"
-        cache.delete(cache_key)
+        # Invalidate the cached sections
+        TeacherDashboardService.invalidate_cache(self.teacher_profile.id)
 
         # Get data again (should regenerate cache)
         with (
@@ -19,15 +19,19 @@ from django.utils.html import escape
 from django.views import View
 from django.views.decorators.csrf import csrf_protect
 
-from accounts.models import CustomUser, InvitationStatus, School, SchoolMembership, TeacherInvitation
+from accounts.models import CustomUser, InvitationStatus, SchoolMembership, TeacherInvitation
 from accounts.models.enums import SchoolRole
 from accounts.models.profiles import StudentProfile, TeacherProfile
+from accounts.services.membership_context import MembershipContext
 from finances.models import PurchaseTransaction
 from scheduler.models import ClassSchedule
 from tasks.models import Task
 
 logger = logging.getLogger("accounts.auth")
 
+# Students per page of people page search results
+STUDENT_SEARCH_PAGE_SIZE = 50
+
 
 @method_decorator(csrf_protect, name="dispatch")
 class DashboardView(LoginRequiredMixin, View):
@@ -37,7 +41,7 @@ class DashboardView(LoginRequiredMixin, View):
         """Render appropriate dashboard template based on user role"""
 
         # Get user's active school membership to determine role
-        active_membership = SchoolMembership.objects.filter(user=request.user, is_active=True).first()
+        active_membership = MembershipContext.for_request(request).primary_membership
 
         if active_membership:
             role = active_membership.role
@@ -231,14 +235,7 @@ class InvitationsView(LoginRequiredMixin, View):
     def get(self, request):
         """Render invitations page with server-side data"""
 
-        # Get user's schools - using same logic as PeopleView
-        def get_user_schools(user):
-            if user.is_staff or user.is_superuser:
-                return School.objects.all()
-            school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-            return School.objects.filter(id__in=school_ids)
-
-        user_schools = get_user_schools(request.user)
+        user_schools = MembershipContext.for_request(request).schools()
 
         # Check if this is a partial request for invitations list
         if request.GET.get("load_invitations"):
@@ -307,14 +304,7 @@ class InvitationsView(LoginRequiredMixin, View):
             if not email:
                 return render(request, "shared/partials/error_message.html", {"error": "Email is required"})
 
-            # Get user's schools
-            def get_user_schools(user):
-                if user.is_staff or user.is_superuser:
-                    return School.objects.all()
-                school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-                return School.objects.filter(id__in=school_ids)
-
-            user_schools = get_user_schools(request.user)
+            user_schools = MembershipContext.for_request(request).schools()
 
             if not user_schools.exists():
                 return render(
@@ -426,14 +416,7 @@ class InvitationsView(LoginRequiredMixin, View):
     def _render_invitations_list(self, request):
         """Render invitations list partial for HTMX updates"""
 
-        # Get user's schools - using same logic as main view
-        def get_user_schools(user):
-            if user.is_staff or user.is_superuser:
-                return School.objects.all()
-            school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-            return School.objects.filter(id__in=school_ids)
-
-        user_schools = get_user_schools(request.user)
+        user_schools = MembershipContext.for_request(request).schools()
 
         # Fetch invitations
         invitations_queryset = (
@@ -476,14 +459,7 @@ class PeopleView(LoginRequiredMixin, View):
     def get(self, request):
         """Render people management page with initial data server-side"""
 
-        # Get user's schools - using same logic as API views
-        def get_user_schools(user):
-            if user.is_staff or user.is_superuser:
-                return School.objects.all()
-            school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-            return School.objects.filter(id__in=school_ids)
-
-        user_schools = get_user_schools(request.user)
+        user_schools = MembershipContext.for_request(request).schools()
 
         # Get teachers data with profiles
         teacher_memberships = SchoolMembership.objects.filter(
@@ -616,14 +592,7 @@ class PeopleView(LoginRequiredMixin, View):
             if not email:
                 return render(request, "shared/partials/error_message.html", {"error": "Email is required"})
 
-            # Get user's schools
-            def get_user_schools(user):
-                if user.is_staff or user.is_superuser:
-                    return School.objects.all()
-                school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-                return School.objects.filter(id__in=school_ids)
-
-            user_schools = get_user_schools(request.user)
+            user_schools = MembershipContext.for_request(request).schools()
 
             # Check if user exists
             try:
@@ -774,18 +743,11 @@ class PeopleView(LoginRequiredMixin, View):
 
     def _render_teachers_partial(self, request):
         """Render teachers list partial for HTMX updates"""
-        from accounts.models import School, SchoolMembership
+        from accounts.models import SchoolMembership
         from accounts.models.enums import SchoolRole
         from accounts.models.profiles import TeacherProfile
 
-        # Get user's schools
-        def get_user_schools(user):
-            if user.is_staff or user.is_superuser:
-                return School.objects.all()
-            school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-            return School.objects.filter(id__in=school_ids)
-
-        user_schools = get_user_schools(request.user)
+        user_schools = MembershipContext.for_request(request).schools()
 
         # Get teachers data with profiles
         teacher_memberships = SchoolMembership.objects.filter(
@@ -838,34 +800,35 @@ class PeopleView(LoginRequiredMixin, View):
 
     def _render_students_partial(self, request, search_query=None):
         """Render students list partial for HTMX updates"""
-        from django.db.models import Q
+        from django.db.models import prefetch_related_objects
 
-        from accounts.models import School, SchoolMembership
+        from accounts.models import SchoolMembership
         from accounts.models.enums import SchoolRole
         from accounts.models.profiles import StudentProfile
+        from accounts.services.user_search import SchoolUserSearchService, parse_page
 
-        # Get user's schools
-        def get_user_schools(user):
-            if user.is_staff or user.is_superuser:
-                return School.objects.all()
-            school_ids = SchoolMembership.objects.filter(user=user).values_list("school_id", flat=True)
-            return School.objects.filter(id__in=school_ids)
-
-        user_schools = get_user_schools(request.user)
+        user_schools = MembershipContext.for_request(request).schools()
+        results = None
 
-        # Get students data with profiles
-        student_memberships = SchoolMembership.objects.filter(
-            school__in=user_schools, role=SchoolRole.STUDENT.value
-        ).select_related("user", "school")
-
-        # Apply search filter if provided
         if search_query:
-            # Search across student and guardian fields
-            student_memberships = student_memberships.filter(
-                Q(user__name__icontains=search_query)
-                | Q(user__email__icontains=search_query)
-                | Q(user__student_profile__school_year__icontains=search_query)
+            # Ranked search across student and guardian fields, one page straight from the database.
+            # Any query length is searched: a single character is a valid school year.
+            results = SchoolUserSearchService.search(
+                user_schools,
+                search_query,
+                roles=[SchoolRole.STUDENT.value],
+                include_inactive=True,
+                page=parse_page(request.POST.get("page")),
+                page_size=STUDENT_SEARCH_PAGE_SIZE,
+                min_query_length=1,
+                with_total=True,
             )
+            student_memberships = results.results
+            prefetch_related_objects(student_memberships, "user__student_profile__guardian__user")
+        else:
+            student_memberships = SchoolMembership.objects.filter(
+                school__in=user_schools, role=SchoolRole.STUDENT.value
+            ).select_related("user__student_profile__guardian__user", "school")
 
         students = []
         for membership in student_memberships:
@@ -891,44 +854,26 @@ class PeopleView(LoginRequiredMixin, View):
                 guardian_info = None
                 created_at = user.date_joined  # Fallback to user creation date if no profile
 
-            # Include guardian info in search
-            student_data = {
-                "id": user.id,
-                "email": user.email,
-                "name": user.name,
-                "full_name": user.get_full_name(),
-                "school_year": school_year,
-                "account_type": account_type,
-                "guardian": guardian_info,
-                "school": {"id": membership.school.id, "name": membership.school.name},
-                "status": "active" if user.is_active else "inactive",
-                "date_joined": created_at,
-            }
-
-            # Add student to results if no search or if search matches
-            if not search_query:
-                students.append(student_data)
-            else:
-                # Check if search matches any student field
-                student_matches = any(
-                    search_query.lower() in str(value).lower() for value in [user.name, user.email, school_year]
-                )
-
-                # Check if search matches guardian fields
-                guardian_matches = False
-                if guardian_info:
-                    guardian_matches = any(
-                        search_query.lower() in str(value).lower()
-                        for value in [guardian_info.get("name", ""), guardian_info.get("email", "")]
-                    )
-
-                if student_matches or guardian_matches:
-                    students.append(student_data)
+            students.append(
+                {
+                    "id": user.id,
+                    "email": user.email,
+                    "name": user.name,
+                    "full_name": user.get_full_name(),
+                    "school_year": school_year,
+                    "account_type": account_type,
+                    "guardian": guardian_info,
+                    "school": {"id": membership.school.id, "name": membership.school.name},
+                    "status": "active" if user.is_active else "inactive",
+                    "date_joined": created_at,
+                }
+            )
 
-        # Sort students by newest first (by created_at date)
-        students.sort(key=lambda x: x["date_joined"], reverse=True)
+        if not search_query:
+            # Newest first (by created_at date); search results keep their relevance order
+            students.sort(key=lambda x: x["date_joined"], reverse=True)
 
-        student_stats = {"total": len(students)}
+        student_stats = {"total": results.total if results else len(students)}
 
         return render(
             request,
@@ -936,6 +881,8 @@ class PeopleView(LoginRequiredMixin, View):
             {
                 "students": students,
                 "student_stats": student_stats,
+                "search_query": search_query or "",
+                "search_page": results,
             },
         )
 
@@ -7,6 +7,8 @@ from .models import (
     ClassSession,
     FamilyBudgetControl,
     HourConsumption,
+    HourLedgerEntry,
+    HourLedgerEntryType,
     PricingPlan,
     PurchaseApprovalRequest,
     PurchaseTransaction,
@@ -16,6 +18,7 @@ from .models import (
     TeacherPaymentEntry,
 )
 from .services import TeacherPaymentCalculator
+from .services.hour_ledger import HourLedger
 
 
 @admin.register(SchoolBillingSettings)
@@ -472,6 +475,60 @@ class StudentAccountBalanceAdmin(admin.ModelAdmin):
         else:
             return format_html('<span style="color: green;">€{}</span>', obj.balance_amount)
 
+    def save_model(self, request, obj, form, change):
+        """Record manual edits of an existing balance as an adjustment entry in the hour ledger."""
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+
+        current = StudentAccountBalance.objects.get(pk=obj.pk)
+        HourLedger.post(
+            obj,
+            HourLedgerEntryType.ADJUSTMENT,
+            hours_purchased=obj.hours_purchased - current.hours_purchased,
+            hours_consumed=obj.hours_consumed - current.hours_consumed,
+            amount=obj.balance_amount - current.balance_amount,
+            description=f"Manual adjustment by {request.user}",
+        )
+
+
+@admin.register(HourLedgerEntry)
+class HourLedgerEntryAdmin(admin.ModelAdmin):
+    """Read-only admin interface for the hour ledger."""
+
+    list_display = [
+        "student_account",
+        "entry_type",
+        "hours_purchased",
+        "hours_consumed",
+        "amount",
+        "purchase_transaction",
+        "created_at",
+    ]
+    list_filter = [
+        "entry_type",
+        "created_at",
+    ]
+    search_fields = [
+        "student_account__student__name",
+        "student_account__student__email",
+        "description",
+    ]
+    list_select_related = ["student_account__student", "purchase_transaction"]
+    raw_id_fields = ["student_account", "purchase_transaction", "hour_consumption"]
+
+    def has_add_permission(self, request):
+        """Entries are only written by the hour ledger."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Entries are append-only."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Entries are append-only."""
+        return False
+
 
 @admin.register(PurchaseTransaction)
 class PurchaseTransactionAdmin(admin.ModelAdmin):
@@ -620,15 +677,26 @@ class PurchaseTransactionAdmin(admin.ModelAdmin):
     @admin.action(description="Mark selected transactions as failed")
     def mark_failed(self, request, queryset):
         """Mark selected transactions as failed."""
-        updated = queryset.update(payment_status="failed")
+        updated = self._set_payment_status(queryset, "failed")
         self.message_user(request, f"{updated} transactions marked as failed.")
 
     @admin.action(description="Mark selected transactions as refunded")
     def mark_refunded(self, request, queryset):
         """Mark selected transactions as refunded."""
-        updated = queryset.update(payment_status="refunded")
+        updated = self._set_payment_status(queryset, "refunded")
         self.message_user(request, f"{updated} transactions marked as refunded.")
 
+    @staticmethod
+    def _set_payment_status(queryset, status):
+        """Save each transaction so the signals keep the daily payment metrics in step."""
+        updated = 0
+        for transaction in queryset:
+            if transaction.payment_status != status:
+                transaction.payment_status = status
+                transaction.save(update_fields=["payment_status", "updated_at"])
+                updated += 1
+        return updated
+
     def get_queryset(self, request):
         """Optimize queryset with select_related."""
         return super().get_queryset(request).select_related("student")
@@ -20,7 +20,25 @@ class FinancesConfig(AppConfig):
             from . import signals
 
         # Register cross-app signal connections using app registry
-        from django.db.models.signals import post_save
+        from django.db.models.signals import post_delete, post_save, pre_save
+
+        # Keep the daily payment metrics rollup in step with transactions
+        PurchaseTransaction = self.get_model("PurchaseTransaction")
+        pre_save.connect(
+            signals.capture_payment_metric_state,
+            sender=PurchaseTransaction,
+            dispatch_uid="finances_payment_metrics_capture",
+        )
+        post_save.connect(
+            signals.update_payment_metrics,
+            sender=PurchaseTransaction,
+            dispatch_uid="finances_payment_metrics_update",
+        )
+        post_delete.connect(
+            signals.remove_payment_metrics,
+            sender=PurchaseTransaction,
+            dispatch_uid="finances_payment_metrics_remove",
+        )
 
         # Connect to lesson completion signals safely
         try:
@@ -0,0 +1,78 @@
+"""
+Django management command to rebuild the daily payment metrics rollup.
+
+The rollup is maintained incrementally from PurchaseTransaction signals; this command
+backfills it after deployment and repairs drift caused by queryset updates that bypass
+signals or by students changing schools.
+
+Usage:
+    python manage.py rebuild_payment_metrics
+    python manage.py rebuild_payment_metrics --days=7
+    python manage.py rebuild_payment_metrics --start-date=2025-01-01 --end-date=2025-06-30
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finances.services.payment_metrics_service import PaymentMetricsRollupService
+
+
+class Command(BaseCommand):
+    """
+    Management command to rebuild daily payment metrics.
+
+    Without arguments the whole history is recomputed.
+    """
+
+    help = "Rebuild or backfill the daily payment metrics rollup"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Rebuild only the last N days (UTC)",
+        )
+
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            help="First UTC day to rebuild (YYYY-MM-DD)",
+        )
+
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="Last UTC day to rebuild (YYYY-MM-DD)",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+        start_date = options["start_date"]
+        end_date = options["end_date"]
+
+        if options["days"] is not None:
+            if start_date or end_date:
+                raise CommandError("--days cannot be combined with --start-date or --end-date")
+            if options["days"] < 1:
+                raise CommandError("--days must be at least 1")
+            start_date = timezone.now().date() - timedelta(days=options["days"] - 1)
+
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start-date must not be after --end-date")
+
+        if verbosity >= 1:
+            self.stdout.write(
+                f"Rebuilding payment metrics from {start_date or 'the beginning'} to {end_date or 'today'}..."
+            )
+
+        try:
+            rows = PaymentMetricsRollupService.rebuild(start_date=start_date, end_date=end_date)
+        except Exception as e:
+            raise CommandError(f"Error rebuilding payment metrics: {e}")
+
+        if verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily payment metric rows"))
@@ -0,0 +1,72 @@
+"""
+Django management command to reconcile student balances with the hour ledger.
+
+Every balance change is recorded as an HourLedgerEntry; this command recomputes all
+balances from their entries in one grouped query and reports accounts that drifted (e.g.
+after raw SQL or queryset updates that bypassed HourLedger). With --fix the drift is
+corrected in bulk.
+
+Usage:
+    python manage.py reconcile_hour_ledger
+    python manage.py reconcile_hour_ledger --fix
+    python manage.py reconcile_hour_ledger --fix --batch-size=1000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finances.services.hour_ledger import HourLedger
+
+
+class Command(BaseCommand):
+    """
+    Management command to reconcile student account balances.
+
+    Without --fix the command only reports mismatched accounts.
+    """
+
+    help = "Recompute student account balances from the hour ledger"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Correct balances that disagree with their ledger entries",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=HourLedger.RECONCILE_BATCH_SIZE,
+            help=f"Accounts read and updated per batch (default: {HourLedger.RECONCILE_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        try:
+            result = HourLedger.reconcile(fix=options["fix"], batch_size=options["batch_size"])
+        except Exception as e:
+            raise CommandError(f"Error reconciling hour ledger: {e}")
+
+        if verbosity >= 2:
+            for account_id in result.mismatched_account_ids:
+                self.stdout.write(f"Account {account_id} does not match its ledger")
+
+        if verbosity >= 1:
+            mismatched = len(result.mismatched_account_ids)
+            if not mismatched:
+                self.stdout.write(self.style.SUCCESS(f"All {result.accounts_checked} balances match the ledger"))
+            elif result.fixed:
+                self.stdout.write(self.style.SUCCESS(f"Fixed {mismatched} of {result.accounts_checked} balances"))
+            else:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{mismatched} of {result.accounts_checked} balances do not match the ledger "
+                        "(run with --fix to correct them)"
+                    )
+                )
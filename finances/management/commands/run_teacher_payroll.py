@@ -0,0 +1,107 @@
+"""
+Django management command to create teacher payment entries for completed sessions.
+
+Sessions are paid in chunks, each in its own transaction. An interrupted run leaves a
+checkpoint behind and the next run with the same filters resumes after it; failed chunks
+are reported and retried by the next run.
+
+Usage:
+    python manage.py run_teacher_payroll
+    python manage.py run_teacher_payroll --start-date=2025-06-01 --end-date=2025-06-30
+    python manage.py run_teacher_payroll --school=3 --chunk-size=1000
+    python manage.py run_teacher_payroll --restart
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finances.services.payroll_engine import PayrollEngine
+
+
+class Command(BaseCommand):
+    """
+    Management command to run teacher payroll.
+
+    Without arguments every unpaid completed session is processed.
+    """
+
+    help = "Create teacher payment entries for completed sessions in chunked transactions"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--school",
+            type=int,
+            help="Only pay sessions of the school with this ID",
+        )
+
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            help="First session date to pay (YYYY-MM-DD)",
+        )
+
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="Last session date to pay (YYYY-MM-DD)",
+        )
+
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=PayrollEngine.CHUNK_SIZE,
+            help=f"Sessions computed and inserted per transaction (default: {PayrollEngine.CHUNK_SIZE})",
+        )
+
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint of an interrupted run and start from the first session",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+        start_date = options["start_date"]
+        end_date = options["end_date"]
+
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start-date must not be after --end-date")
+
+        try:
+            result = PayrollEngine.run(
+                school=options["school"],
+                start_date=start_date,
+                end_date=end_date,
+                chunk_size=options["chunk_size"],
+                resume=not options["restart"],
+            )
+        except Exception as e:
+            raise CommandError(f"Error running teacher payroll: {e}")
+
+        if verbosity >= 1 and result.resumed_from:
+            self.stdout.write(f"Resumed after session {result.resumed_from}")
+
+        if verbosity >= 2:
+            for error in result.errors:
+                self.stdout.write(f"Session {error['session_id']}: {error['error']}")
+
+        for error in result.chunk_errors:
+            self.stderr.write(
+                f"Sessions {error['first_session_id']}-{error['last_session_id']} were not paid: {error['error']}"
+            )
+
+        if verbosity >= 1:
+            message = (
+                f"Created {result.processed_count} payment entries for {result.total_sessions} sessions "
+                f"in {result.chunks_committed} chunks"
+            )
+            if result.completed:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                failed = len(result.errors) + sum(error["session_count"] for error in result.chunk_errors)
+                self.stdout.write(self.style.WARNING(f"{message}; {failed} sessions failed"))
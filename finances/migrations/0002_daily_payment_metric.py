@@ -0,0 +1,95 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:16
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0014_revert_educational_system_to_charfield"),
+        ("finances", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyPaymentMetric",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField(help_text="UTC day the transactions were created", verbose_name="date")),
+                (
+                    "transaction_type",
+                    models.CharField(
+                        choices=[("package", "Package"), ("subscription", "Subscription")],
+                        max_length=20,
+                        verbose_name="transaction type",
+                    ),
+                ),
+                (
+                    "payment_status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                            ("cancelled", "Cancelled"),
+                            ("refunded", "Refunded"),
+                        ],
+                        max_length=20,
+                        verbose_name="payment status",
+                    ),
+                ),
+                ("transaction_count", models.PositiveIntegerField(default=0, verbose_name="transaction count")),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14, verbose_name="total amount"
+                    ),
+                ),
+                (
+                    "min_amount",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True, verbose_name="minimum amount"
+                    ),
+                ),
+                (
+                    "max_amount",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True, verbose_name="maximum amount"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="updated at")),
+                (
+                    "school",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="School of the purchasing student, if any",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_payment_metrics",
+                        to="accounts.school",
+                        verbose_name="school",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Payment Metric",
+                "verbose_name_plural": "Daily Payment Metrics",
+                "ordering": ["-date"],
+                "indexes": [models.Index(fields=["date", "payment_status"], name="finances_da_date_e3592f_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("school__isnull", False)),
+                        fields=("date", "school", "transaction_type", "payment_status"),
+                        name="unique_daily_payment_metric_per_school",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("school__isnull", True)),
+                        fields=("date", "transaction_type", "payment_status"),
+                        name="unique_daily_payment_metric_without_school",
+                    ),
+                ],
+            },
+        ),
+    ]
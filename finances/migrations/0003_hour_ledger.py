@@ -0,0 +1,139 @@
+# Generated by Django 5.2.5 on 2026-10-16 20:09
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def create_opening_entries(apps, schema_editor):
+    """Open the ledger of every existing balance with its current values."""
+    StudentAccountBalance = apps.get_model("finances", "StudentAccountBalance")
+    HourLedgerEntry = apps.get_model("finances", "HourLedgerEntry")
+    HourLedgerEntry.objects.bulk_create(
+        (
+            HourLedgerEntry(
+                student_account_id=balance.id,
+                entry_type="opening",
+                hours_purchased=balance.hours_purchased,
+                hours_consumed=balance.hours_consumed,
+                amount=balance.balance_amount,
+                description="Opening balance",
+            )
+            for balance in StudentAccountBalance.objects.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("finances", "0002_daily_payment_metric"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HourLedgerEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "entry_type",
+                    models.CharField(
+                        choices=[
+                            ("opening", "Opening Balance"),
+                            ("purchase", "Purchase"),
+                            ("payment", "Payment"),
+                            ("consumption", "Consumption"),
+                            ("refund", "Refund"),
+                            ("expiration", "Expiration"),
+                            ("payment_refund", "Payment Refund"),
+                            ("adjustment", "Adjustment"),
+                        ],
+                        help_text="Kind of change recorded by this entry",
+                        max_length=20,
+                        verbose_name="entry type",
+                    ),
+                ),
+                (
+                    "hours_purchased",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        help_text="Change to the account's purchased hours",
+                        max_digits=7,
+                        verbose_name="hours purchased delta",
+                    ),
+                ),
+                (
+                    "hours_consumed",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        help_text="Change to the account's consumed hours",
+                        max_digits=7,
+                        verbose_name="hours consumed delta",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        help_text="Change to the account's balance in euros",
+                        max_digits=8,
+                        verbose_name="amount delta",
+                    ),
+                ),
+                (
+                    "description",
+                    models.CharField(
+                        blank=True, help_text="Why the balance changed", max_length=255, verbose_name="description"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="created at")),
+                (
+                    "hour_consumption",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Consumption this entry relates to (if any)",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_entries",
+                        to="finances.hourconsumption",
+                        verbose_name="hour consumption",
+                    ),
+                ),
+                (
+                    "purchase_transaction",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Purchase this entry relates to (if any)",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_entries",
+                        to="finances.purchasetransaction",
+                        verbose_name="purchase transaction",
+                    ),
+                ),
+                (
+                    "student_account",
+                    models.ForeignKey(
+                        help_text="Student account this entry applies to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to="finances.studentaccountbalance",
+                        verbose_name="student account",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Hour Ledger Entry",
+                "verbose_name_plural": "Hour Ledger Entries",
+                "ordering": ["-created_at", "-id"],
+                "indexes": [
+                    models.Index(fields=["student_account", "created_at"], name="finances_ho_student_787c6c_idx"),
+                    models.Index(fields=["entry_type"], name="finances_ho_entry_t_bdacaa_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(create_opening_entries, migrations.RunPython.noop),
+    ]
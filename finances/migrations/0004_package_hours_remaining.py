@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-16 20:14
+
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_hours_remaining(apps, schema_editor):
+    """Set each package's remaining hours to its included hours minus its unrefunded consumption."""
+    PurchaseTransaction = apps.get_model("finances", "PurchaseTransaction")
+    packages = (
+        PurchaseTransaction.objects.filter(transaction_type="package")
+        .annotate(
+            consumed=Sum("hour_consumptions__hours_consumed", filter=models.Q(hour_consumptions__is_refunded=False))
+        )
+        .only("id", "metadata")
+    )
+    updated = []
+    for package in packages.iterator(chunk_size=1000):
+        metadata = package.metadata or {}
+        hours = metadata.get("hours_included", metadata.get("hours"))
+        if hours is None:
+            continue
+        try:
+            hours = max(Decimal(str(hours)), Decimal("0.00"))
+        except (ValueError, TypeError, InvalidOperation):
+            continue
+        package.hours_remaining = hours - (package.consumed or Decimal("0.00"))
+        updated.append(package)
+    PurchaseTransaction.objects.bulk_update(updated, ["hours_remaining"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("finances", "0003_hour_ledger"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchasetransaction",
+            name="hours_remaining",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                help_text="Package hours not yet consumed (null for transactions without an hour allowance)",
+                max_digits=7,
+                null=True,
+                verbose_name="hours remaining",
+            ),
+        ),
+        migrations.RunPython(backfill_hours_remaining, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="purchasetransaction",
+            index=models.Index(
+                condition=models.Q(
+                    ("payment_status", "completed"),
+                    models.Q(("hours_remaining__isnull", True), ("hours_remaining__gt", 0), _connector="OR"),
+                ),
+                fields=["student", "expires_at", "created_at"],
+                name="purchase_active_package_fifo",
+            ),
+        ),
+    ]
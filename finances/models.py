@@ -547,6 +547,27 @@ class StudentAccountBalance(models.Model):
         remaining = self.remaining_hours
         return f"Account Balance for {self.student.name}: €{self.balance_amount} ({remaining}h remaining)"
 
+    def save(self, *args, **kwargs):
+        """
+        Record the starting values of a new balance as its opening ledger entry.
+
+        Afterwards the columns only change through HourLedger, which appends an entry and
+        applies it with an F() update, so the balance always equals the sum of its entries.
+        """
+        is_new = self._state.adding
+
+        super().save(*args, **kwargs)
+
+        if is_new and any((self.hours_purchased, self.hours_consumed, self.balance_amount)):
+            HourLedgerEntry.objects.create(
+                student_account=self,
+                entry_type=HourLedgerEntryType.OPENING,
+                hours_purchased=self.hours_purchased,
+                hours_consumed=self.hours_consumed,
+                amount=self.balance_amount,
+                description="Opening balance",
+            )
+
     @property
     def remaining_hours(self) -> Decimal:
         """
@@ -574,6 +595,27 @@ class TransactionPaymentStatus(models.TextChoices):
     REFUNDED = "refunded", _("Refunded")
 
 
+# Packages that can still be drawn from, besides not having expired. Matches the condition of
+# the partial FIFO index on PurchaseTransaction; unmetered transactions (subscriptions) have
+# no hours_remaining.
+ACTIVE_PACKAGE_CONDITION = models.Q(payment_status=TransactionPaymentStatus.COMPLETED) & (
+    models.Q(hours_remaining__isnull=True) | models.Q(hours_remaining__gt=0)
+)
+
+
+class PurchaseTransactionQuerySet(models.QuerySet):
+    """FIFO selection of the packages hours are deducted from."""
+
+    def active_packages(self, now=None):
+        """Completed, unexpired transactions with hours left, oldest first (served by the partial FIFO index)."""
+        now = now or timezone.now()
+        return (
+            self.filter(ACTIVE_PACKAGE_CONDITION)
+            .filter(models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=now))
+            .order_by("created_at", "id")
+        )
+
+
 class PurchaseTransaction(models.Model):
     """
     Comprehensive transaction tracking for all student purchases.
@@ -645,6 +687,17 @@ class PurchaseTransaction(models.Model):
         help_text=_("Additional transaction data in JSON format"),
     )
 
+    # Hours left to draw from a package, maintained by HourLedger as sessions consume and
+    # refund them (null for unmetered transactions such as subscriptions)
+    hours_remaining: models.DecimalField = models.DecimalField(
+        _("hours remaining"),
+        max_digits=7,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text=_("Package hours not yet consumed (null for transactions without an hour allowance)"),
+    )
+
     # Parent approval integration
     approval_request: models.ForeignKey = models.ForeignKey(  # type: ignore[misc]
         "PurchaseApprovalRequest",
@@ -660,6 +713,8 @@ class PurchaseTransaction(models.Model):
     created_at: models.DateTimeField = models.DateTimeField(_("created at"), auto_now_add=True)
     updated_at: models.DateTimeField = models.DateTimeField(_("updated at"), auto_now=True)
 
+    objects = PurchaseTransactionQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Purchase Transaction")
         verbose_name_plural = _("Purchase Transactions")
@@ -670,6 +725,11 @@ class PurchaseTransaction(models.Model):
             models.Index(fields=["created_at"]),
             models.Index(fields=["stripe_payment_intent_id"]),
             models.Index(fields=["expires_at"]),
+            models.Index(
+                fields=["student", "expires_at", "created_at"],
+                condition=ACTIVE_PACKAGE_CONDITION,
+                name="purchase_active_package_fifo",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -678,6 +738,12 @@ class PurchaseTransaction(models.Model):
             f"€{self.amount} ({self.transaction_type.upper()} - {self.payment_status.upper()})"
         )
 
+    def save(self, *args, **kwargs):
+        """Start a new package with all of its hours remaining."""
+        if self._state.adding and self.hours_remaining is None:
+            self.hours_remaining = self.package_hours
+        super().save(*args, **kwargs)
+
     @property
     def is_expired(self) -> bool:
         """
@@ -689,6 +755,25 @@ class PurchaseTransaction(models.Model):
             return False
         return timezone.now() > self.expires_at  # type: ignore[no-any-return]
 
+    @property
+    def package_hours(self) -> Decimal | None:
+        """
+        Hours included in a package, from its metadata ("hours_included" or "hours").
+
+        None for transactions without an hour allowance: subscriptions and packages whose
+        metadata does not state their hours, which are drawn from without limit.
+        """
+        metadata = self.metadata or {}
+        if self.transaction_type != TransactionType.PACKAGE:
+            return None
+        hours = metadata.get("hours_included", metadata.get("hours"))
+        if hours is None:
+            return None
+        try:
+            return max(Decimal(str(hours)), Decimal("0.00"))
+        except (ValueError, TypeError, ArithmeticError):
+            return None
+
     def mark_completed(self) -> None:
         """
         Mark the transaction as completed and save to database.
@@ -709,6 +794,79 @@ class PurchaseTransaction(models.Model):
             raise ValidationError(_("Subscription transactions should not have an expiration date"))
 
 
+class DailyPaymentMetric(models.Model):
+    """
+    Daily rollup of purchase transactions for analytics dashboards.
+
+    One row per UTC day, school, transaction type and payment status. Rows are kept
+    up to date incrementally from PurchaseTransaction signals and can be rebuilt with
+    the rebuild_payment_metrics management command.
+    """
+
+    date: models.DateField = models.DateField(_("date"), help_text=_("UTC day the transactions were created"))
+
+    school: models.ForeignKey = models.ForeignKey(
+        "accounts.School",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="daily_payment_metrics",
+        verbose_name=_("school"),
+        help_text=_("School of the purchasing student, if any"),
+    )
+
+    transaction_type: models.CharField = models.CharField(
+        _("transaction type"),
+        max_length=20,
+        choices=TransactionType,
+    )
+
+    payment_status: models.CharField = models.CharField(
+        _("payment status"),
+        max_length=20,
+        choices=TransactionPaymentStatus,
+    )
+
+    transaction_count: models.PositiveIntegerField = models.PositiveIntegerField(_("transaction count"), default=0)
+
+    total_amount: models.DecimalField = models.DecimalField(
+        _("total amount"), max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+
+    min_amount: models.DecimalField = models.DecimalField(
+        _("minimum amount"), max_digits=10, decimal_places=2, null=True, blank=True
+    )
+
+    max_amount: models.DecimalField = models.DecimalField(
+        _("maximum amount"), max_digits=10, decimal_places=2, null=True, blank=True
+    )
+
+    updated_at: models.DateTimeField = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Daily Payment Metric")
+        verbose_name_plural = _("Daily Payment Metrics")
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "school", "transaction_type", "payment_status"],
+                condition=models.Q(school__isnull=False),
+                name="unique_daily_payment_metric_per_school",
+            ),
+            models.UniqueConstraint(
+                fields=["date", "transaction_type", "payment_status"],
+                condition=models.Q(school__isnull=True),
+                name="unique_daily_payment_metric_without_school",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["date", "payment_status"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.date} {self.transaction_type}/{self.payment_status}: {self.transaction_count}"
+
+
 class PricingPlanManager(models.Manager):
     """Manager for PricingPlan model."""
 
@@ -941,15 +1099,22 @@ class HourConsumption(models.Model):
     def save(self, *args, **kwargs):
         """
         Override save to update student account balance when consumption is created.
+
+        The row and its ledger entries are written in one transaction, so a consumption is
+        never left behind without the hours it charged.
         """
+        from django.db import transaction
+
+        from finances.services.hour_ledger import HourLedger
+
         is_new = self.pk is None
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-        # Update student account balance on creation
-        if is_new:
-            self.student_account.hours_consumed += self.hours_consumed
-            self.student_account.save(update_fields=["hours_consumed", "updated_at"])
+            # Update student account balance on creation
+            if is_new:
+                HourLedger.consume(self)
 
     @property
     def hours_difference(self) -> Decimal:
@@ -976,6 +1141,10 @@ class HourConsumption(models.Model):
         Raises:
             ValueError: If consumption has already been refunded
         """
+        from django.db import transaction
+
+        from finances.services.hour_ledger import HourLedger
+
         if self.is_refunded:
             raise ValueError("This consumption has already been refunded")
 
@@ -983,14 +1152,18 @@ class HourConsumption(models.Model):
 
         # Only process refund if there are hours to refund (positive difference)
         if refund_hours > Decimal("0.00"):
-            # Update the student account balance
-            self.student_account.hours_consumed -= refund_hours  # type: ignore[attr-defined]
-            self.student_account.save(update_fields=["hours_consumed", "updated_at"])  # type: ignore[attr-defined]
+            with transaction.atomic():
+                # Mark this consumption as refunded, unless a concurrent refund got there first
+                claimed = HourConsumption.objects.filter(pk=self.pk, is_refunded=False).update(
+                    is_refunded=True, refund_reason=reason, updated_at=timezone.now()
+                )
+                if not claimed:
+                    raise ValueError("This consumption has already been refunded")
+                self.is_refunded = True
+                self.refund_reason = reason
 
-            # Mark this consumption as refunded
-            self.is_refunded = True
-            self.refund_reason = reason
-            self.save(update_fields=["is_refunded", "refund_reason", "updated_at"])
+                # Update the student account balance
+                HourLedger.restore(self, refund_hours, description=reason)
 
             return refund_hours
 
@@ -1015,6 +1188,119 @@ class HourConsumption(models.Model):
                 raise ValidationError(_("Student account must belong to a student in the class session"))
 
 
+class HourLedgerEntryType(models.TextChoices):
+    """Kinds of change recorded in the hour ledger."""
+
+    OPENING = "opening", _("Opening Balance")
+    PURCHASE = "purchase", _("Purchase")
+    PAYMENT = "payment", _("Payment")
+    CONSUMPTION = "consumption", _("Consumption")
+    REFUND = "refund", _("Refund")
+    EXPIRATION = "expiration", _("Expiration")
+    PAYMENT_REFUND = "payment_refund", _("Payment Refund")
+    ADJUSTMENT = "adjustment", _("Adjustment")
+
+
+class HourLedgerEntry(models.Model):
+    """
+    Append-only record of one change to a student account balance.
+
+    Each entry holds signed deltas for the three balance columns. HourLedger writes the
+    entry and applies the same deltas to StudentAccountBalance with an F() update, so
+    concurrent bookings, refunds and payments never overwrite each other, and the
+    reconcile_hour_ledger command can rebuild every balance from its entries.
+    """
+
+    student_account: models.ForeignKey = models.ForeignKey(
+        StudentAccountBalance,
+        on_delete=models.CASCADE,
+        related_name="ledger_entries",
+        verbose_name=_("student account"),
+        help_text=_("Student account this entry applies to"),
+    )
+
+    entry_type: models.CharField = models.CharField(
+        _("entry type"),
+        max_length=20,
+        choices=HourLedgerEntryType,
+        help_text=_("Kind of change recorded by this entry"),
+    )
+
+    hours_purchased: models.DecimalField = models.DecimalField(
+        _("hours purchased delta"),
+        max_digits=7,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text=_("Change to the account's purchased hours"),
+    )
+
+    hours_consumed: models.DecimalField = models.DecimalField(
+        _("hours consumed delta"),
+        max_digits=7,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text=_("Change to the account's consumed hours"),
+    )
+
+    amount: models.DecimalField = models.DecimalField(
+        _("amount delta"),
+        max_digits=8,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text=_("Change to the account's balance in euros"),
+    )
+
+    purchase_transaction: models.ForeignKey = models.ForeignKey(
+        PurchaseTransaction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_entries",
+        verbose_name=_("purchase transaction"),
+        help_text=_("Purchase this entry relates to (if any)"),
+    )
+
+    hour_consumption: models.ForeignKey = models.ForeignKey(
+        HourConsumption,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ledger_entries",
+        verbose_name=_("hour consumption"),
+        help_text=_("Consumption this entry relates to (if any)"),
+    )
+
+    description: models.CharField = models.CharField(
+        _("description"),
+        max_length=255,
+        blank=True,
+        help_text=_("Why the balance changed"),
+    )
+
+    created_at: models.DateTimeField = models.DateTimeField(_("created at"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Hour Ledger Entry")
+        verbose_name_plural = _("Hour Ledger Entries")
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["student_account", "created_at"]),
+            models.Index(fields=["entry_type"]),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.get_entry_type_display()} for account {self.student_account_id}: "  # type: ignore[attr-defined]
+            f"{self.hours_purchased:+}h purchased, {self.hours_consumed:+}h consumed, €{self.amount:+}"
+        )
+
+    def save(self, *args, **kwargs):
+        """Entries are immutable once written; corrections are new ADJUSTMENT entries."""
+        if not self._state.adding:
+            raise ValueError("Hour ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+
 class Receipt(models.Model):
     """
     Receipt model for tracking generated receipts for student purchases.
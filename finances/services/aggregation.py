@@ -0,0 +1,110 @@
+"""
+Single-pass conditional aggregation for reports.
+
+Reports often break one queryset down into several overlapping buckets (completed vs
+failed, individual vs group vs trial). Instead of one count() or Python sum per bucket,
+conditional_aggregate compiles every bucket and metric into filtered aggregates of a
+single aggregate() call, so a report costs one query however many buckets it has.
+
+Example:
+    totals = conditional_aggregate(
+        entries,
+        buckets={"all": None, "trial": Q(session__is_trial=True)},
+        metrics={"count": (Count, "id"), "hours": (Sum, "hours_taught")},
+    )
+    totals["trial"]["hours"]
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any
+
+from django.db.models import Aggregate, Q, QuerySet
+
+# Metric spec: (aggregate class, field or expression it aggregates)
+Metric = tuple[type[Aggregate], Any]
+
+
+def conditional_aggregate(
+    queryset: QuerySet,
+    buckets: dict[str, Q | None],
+    metrics: dict[str, Metric],
+) -> dict[str, dict[str, Any]]:
+    """
+    Evaluate every metric for every bucket in one aggregate() query.
+
+    Args:
+        queryset: Rows to aggregate
+        buckets: Bucket name to filter (None aggregates the whole queryset)
+        metrics: Metric name to (aggregate class, expression)
+
+    Returns:
+        Dict mapping bucket name to {metric name: value}; counts default to 0 and
+        other aggregates to None when a bucket is empty
+    """
+    aliases = {}
+    expressions = {}
+    for bucket_index, (bucket, condition) in enumerate(buckets.items()):
+        for metric_index, (metric, (aggregate_class, expression)) in enumerate(metrics.items()):
+            alias = f"bucket{bucket_index}_metric{metric_index}"
+            aliases[alias] = (bucket, metric)
+            expressions[alias] = aggregate_class(expression, filter=condition)
+
+    row = queryset.order_by().aggregate(**expressions)
+
+    results: dict[str, dict[str, Any]] = {bucket: {} for bucket in buckets}
+    for alias, (bucket, metric) in aliases.items():
+        results[bucket][metric] = row[alias]
+    return results
+
+
+@dataclass(frozen=True)
+class SessionTotals:
+    """Count, hours and amount for one group of teacher payment entries."""
+
+    count: int
+    hours: Decimal
+    amount: Decimal
+
+    @classmethod
+    def from_aggregate(cls, values: dict[str, Any]) -> "SessionTotals":
+        return cls(
+            count=values["count"],
+            hours=values["hours"] or Decimal("0.00"),
+            amount=values["amount"] or Decimal("0.00"),
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"count": self.count, "hours": self.hours, "amount": self.amount}
+
+
+@dataclass(frozen=True)
+class TransactionStatusCounts:
+    """Purchase transaction counts by outcome."""
+
+    total: int
+    completed: int
+    failed: int
+    pending: int
+
+    @property
+    def success_rate(self) -> float:
+        return round(self.completed / self.total * 100, 2) if self.total else 0.0
+
+    @property
+    def failure_rate(self) -> float:
+        return round(self.failed / self.total * 100, 2) if self.total else 0.0
+
+
+@dataclass(frozen=True)
+class ExpirationMetrics:
+    """Package expiration KPIs for a period."""
+
+    total_packages: int
+    expired_packages: int
+    average_package_lifetime: float
+    hours_lost_to_expiration: Decimal
+
+    @property
+    def expiration_rate(self) -> float:
+        return self.expired_packages / self.total_packages if self.total_packages > 0 else 0
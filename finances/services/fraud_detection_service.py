@@ -7,9 +7,14 @@ to detect potentially fraudulent activities and generate appropriate alerts.
 
 from datetime import timedelta
 from decimal import Decimal
+import json
 import logging
 from typing import Any
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+
 # Cross-app models will be loaded at runtime using apps.get_model()
 from django.utils import timezone
 
@@ -229,34 +234,31 @@ class FraudDetectionService:
             cutoff_time = timezone.now() - timedelta(hours=hours_back)
 
             # Get recent completed transactions
-            recent_transactions = PurchaseTransaction.objects.filter(
-                created_at__gte=cutoff_time, payment_status=TransactionPaymentStatus.COMPLETED
-            ).select_related("student")
+            recent_transactions = list(
+                PurchaseTransaction.objects.filter(
+                    created_at__gte=cutoff_time, payment_status=TransactionPaymentStatus.COMPLETED
+                ).select_related("student")
+            )
 
             analyzed_count = 0
             alerts_generated = []
             high_risk_transactions = []
 
-            for transaction in recent_transactions:
-                try:
-                    analysis = self.analyze_transaction(transaction, admin_user)
-                    if analysis["success"]:
-                        analyzed_count += 1
-
-                        if analysis["risk_score"] >= Decimal("60.00"):
-                            high_risk_transactions.append(
-                                {
-                                    "transaction_id": transaction.id,
-                                    "risk_score": analysis["risk_score"],
-                                    "user_email": transaction.student.email,  # type: ignore[attr-defined]
-                                }
-                            )
+            for transaction, analysis in zip(
+                recent_transactions, self.analyze_transactions_batch(recent_transactions, admin_user), strict=True
+            ):
+                analyzed_count += 1
 
-                        alerts_generated.extend(analysis["alerts_generated"])
+                if analysis["risk_score"] >= Decimal("60.00"):
+                    high_risk_transactions.append(
+                        {
+                            "transaction_id": transaction.id,
+                            "risk_score": analysis["risk_score"],
+                            "user_email": transaction.student.email,  # type: ignore[attr-defined]
+                        }
+                    )
 
-                except Exception as e:
-                    logger.error(f"Error analyzing transaction {transaction.id} in batch: {e}")
-                    continue
+                alerts_generated.extend(analysis["alerts_generated"])
 
             # Log batch analysis admin action
             if admin_user:
@@ -293,6 +295,226 @@ class FraudDetectionService:
                 "message": "An error occurred during batch fraud analysis",
             }
 
+    def analyze_transactions_batch(
+        self,
+        transactions: list[PurchaseTransaction],
+        admin_user=None,  # CustomUser instance
+    ) -> list[dict[str, Any]]:
+        """
+        Analyze many transactions at once with the same rules as analyze_transaction.
+
+        Per-user counters and amount statistics are loaded with two grouped aggregate
+        queries for the whole batch and alerts are written with bulk_create, so the
+        query count does not depend on the number of transactions.
+
+        Args:
+            transactions: Transactions to analyze, with their students loaded
+            admin_user: Administrator performing the analysis
+
+        Returns:
+            One analysis dict per transaction, in input order
+        """
+        if not transactions:
+            return []
+
+        now = timezone.now()
+        user_stats = self._load_batch_user_stats({t.student_id for t in transactions}, now)  # type: ignore[attr-defined]
+        history_start = now - timedelta(days=90)
+
+        analyses = []
+        pending_alerts: list[tuple[PurchaseTransaction, dict[str, Any]]] = []
+        for transaction in transactions:
+            stats = user_stats.get(transaction.student_id, {})  # type: ignore[attr-defined]
+            results = [
+                self._score_multiple_payment_methods(stats.get("payment_methods_count", 0)),
+                self._score_high_value_transactions(stats.get("high_value_count", 0)),
+                self._score_rapid_transactions(stats.get("rapid_count", 0)),
+                self._score_failed_attempts(stats.get("failed_count", 0)),
+                self._score_new_user_high_value(now - transaction.student.date_joined, transaction.amount),  # type: ignore[attr-defined]
+                self._score_unusual_amount(
+                    transaction.amount,
+                    *self._history_without(
+                        stats,
+                        transaction,
+                        include=transaction.payment_status == TransactionPaymentStatus.COMPLETED
+                        and transaction.created_at >= history_start,
+                    ),
+                ),
+            ]
+
+            risk_factors = [result for result in results if result["risk_score"] > 0]
+            pending_alerts.extend(
+                (transaction, result) for result in risk_factors if result.get("generate_alert", False)
+            )
+            analyses.append(
+                {
+                    "success": True,
+                    "transaction_id": transaction.id,
+                    "risk_score": min(sum((r["risk_score"] for r in risk_factors), Decimal("0.00")), Decimal("100.00")),
+                    "risk_factors": risk_factors,
+                    "alerts_generated": [],
+                    "alert_count": 0,
+                }
+            )
+
+        for analysis_index, alert in self._bulk_generate_fraud_alerts(pending_alerts, transactions, admin_user):
+            analyses[analysis_index]["alerts_generated"].append(alert)
+            analyses[analysis_index]["alert_count"] += 1
+
+        return analyses
+
+    def _load_batch_user_stats(self, user_ids: set[int], now) -> dict[int, dict[str, Any]]:
+        """Load every per-user counter the fraud rules need for a batch in two grouped queries."""
+        rapid_window = now - timedelta(minutes=float(self.THRESHOLDS["rapid_transactions"]["time_window_minutes"]))  # type: ignore[arg-type]
+        failed_window = now - timedelta(
+            hours=float(self.THRESHOLDS["failed_attempts_threshold"]["time_window_hours"])  # type: ignore[arg-type]
+        )
+        last_24h = now - timedelta(hours=24)
+        completed = Q(payment_status=TransactionPaymentStatus.COMPLETED)
+
+        stats: dict[int, dict[str, Any]] = {}
+        for row in (
+            PurchaseTransaction.objects.filter(student_id__in=user_ids, created_at__gte=now - timedelta(days=90))
+            .values("student_id")
+            .annotate(
+                rapid_count=Count("id", filter=Q(created_at__gte=rapid_window)),
+                failed_count=Count(
+                    "id", filter=Q(created_at__gte=failed_window, payment_status=TransactionPaymentStatus.FAILED)
+                ),
+                high_value_count=Count(
+                    "id",
+                    filter=completed
+                    & Q(
+                        created_at__gte=last_24h,
+                        amount__gte=self.THRESHOLDS["high_value_transactions_24h"]["amount"],
+                    ),
+                ),
+                history_count=Count("id", filter=completed),
+                history_sum=Sum("amount", filter=completed),
+                history_sum_squares=Sum(
+                    F("amount") * F("amount"),
+                    filter=completed,
+                    output_field=DecimalField(max_digits=24, decimal_places=4),
+                ),
+            )
+        ):
+            stats[row.pop("student_id")] = row
+
+        for row in (
+            StoredPaymentMethod.objects.filter(student_id__in=user_ids, created_at__gte=last_24h)
+            .values("student_id")
+            .annotate(payment_methods_count=Count("id"))
+        ):
+            stats.setdefault(row["student_id"], {})["payment_methods_count"] = row["payment_methods_count"]
+
+        return stats
+
+    @staticmethod
+    def _history_without(
+        stats: dict[str, Any], transaction: PurchaseTransaction, include: bool
+    ) -> tuple[Decimal | None, Decimal | None]:
+        """Mean and standard deviation of the 90-day history excluding the transaction itself."""
+        count = stats.get("history_count", 0)
+        total = stats.get("history_sum") or Decimal("0.00")
+        total_squares = stats.get("history_sum_squares") or Decimal("0.00")
+        if include:
+            count -= 1
+            total -= transaction.amount
+            total_squares -= transaction.amount * transaction.amount
+
+        if count < 3:
+            return None, None
+
+        mean_amount = total / count
+        variance = max(total_squares / count - mean_amount * mean_amount, Decimal("0"))
+        return mean_amount, variance ** Decimal("0.5")
+
+    def _bulk_generate_fraud_alerts(
+        self,
+        pending_alerts: list[tuple[PurchaseTransaction, dict[str, Any]]],
+        transactions: list[PurchaseTransaction],
+        admin_user=None,  # CustomUser instance
+    ) -> list[tuple[int, dict[str, Any]]]:
+        """Create alerts for a batch with the same 24-hour dedup as _generate_fraud_alert."""
+        if not pending_alerts:
+            return []
+
+        try:
+            index_by_transaction = {transaction.id: index for index, transaction in enumerate(transactions)}
+            seen = set(
+                FraudAlert.objects.filter(
+                    target_user_id__in={transaction.student_id for transaction, _ in pending_alerts},  # type: ignore[attr-defined]
+                    status=FraudAlertStatus.ACTIVE,
+                    created_at__gte=timezone.now() - timedelta(hours=24),
+                ).values_list("target_user_id", "alert_type")
+            )
+
+            alerts = []
+            alert_transactions = []
+            for transaction, risk_data in pending_alerts:
+                key = (transaction.student_id, risk_data.get("alert_type", "unknown"))  # type: ignore[attr-defined]
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                alert = FraudAlert(
+                    severity=risk_data.get("severity", FraudAlertSeverity.MEDIUM),
+                    alert_type=risk_data.get("alert_type", "unknown_pattern"),
+                    description=self._format_alert_description(risk_data),
+                    target_user_id=transaction.student_id,  # type: ignore[attr-defined]
+                    detection_data=self._serialize_detection_data(risk_data),
+                    risk_score=risk_data.get("risk_score", Decimal("0.00")),
+                )
+                # bulk_create bypasses save(), which normally assigns the ID
+                alert.alert_id = alert._generate_alert_id()
+                alerts.append(alert)
+                alert_transactions.append(transaction)
+
+            with db_transaction.atomic():
+                FraudAlert.objects.bulk_create(alerts)
+                FraudAlert.related_transactions.through.objects.bulk_create(
+                    [
+                        FraudAlert.related_transactions.through(
+                            fraudalert_id=alert.pk, purchasetransaction_id=transaction.id
+                        )
+                        for alert, transaction in zip(alerts, alert_transactions, strict=True)
+                    ]
+                )
+                if admin_user:
+                    AdminAction.objects.bulk_create(
+                        [
+                            AdminAction(
+                                action_type=AdminActionType.FRAUD_ALERT,
+                                action_description=f"Fraud detection analysis for user {alert.target_user_id}",
+                                admin_user=admin_user,
+                                target_user_id=alert.target_user_id,
+                                success=True,
+                                result_message=f"Fraud alert generated: {alert.alert_id}",
+                                action_data={"alert_id": alert.alert_id, "risk_score": float(alert.risk_score)},
+                            )
+                            for alert in alerts
+                        ]
+                    )
+
+            logger.info(f"Generated {len(alerts)} fraud alerts in batch")
+
+            return [
+                (
+                    index_by_transaction[transaction.id],
+                    {
+                        "alert_id": alert.alert_id,
+                        "severity": alert.severity,
+                        "alert_type": alert.alert_type,
+                        "risk_score": alert.risk_score,
+                    },
+                )
+                for alert, transaction in zip(alerts, alert_transactions, strict=True)
+            ]
+
+        except Exception as e:
+            logger.error(f"Error generating fraud alerts in batch: {e}")
+            return []
+
     def get_active_alerts(self, severity: str | None = None, limit: int = 50) -> dict[str, Any]:
         """
         Get active fraud alerts with optional filtering.
@@ -358,6 +580,10 @@ class FraudDetectionService:
         # Count unique payment methods used in last 24 hours
         payment_methods_count = StoredPaymentMethod.objects.filter(student=user, created_at__gte=last_24h).count()  # type: ignore[misc]
 
+        return self._score_multiple_payment_methods(payment_methods_count)
+
+    def _score_multiple_payment_methods(self, payment_methods_count: int) -> dict[str, Any]:
+        """Score the number of payment methods added in the last 24 hours."""
         threshold = self.THRESHOLDS["multiple_cards_24h"]
         risk_score = Decimal("0.00")
         generate_alert = False
@@ -390,6 +616,11 @@ class FraudDetectionService:
             payment_status=TransactionPaymentStatus.COMPLETED,
         ).count()
 
+        return self._score_high_value_transactions(high_value_count)
+
+    def _score_high_value_transactions(self, high_value_count: int) -> dict[str, Any]:
+        """Score the number of completed high-value transactions in the last 24 hours."""
+        threshold = self.THRESHOLDS["high_value_transactions_24h"]
         risk_score = Decimal("0.00")
         generate_alert = False
 
@@ -420,6 +651,11 @@ class FraudDetectionService:
 
         rapid_count = PurchaseTransaction.objects.filter(student=user, created_at__gte=time_window).count()  # type: ignore[misc]
 
+        return self._score_rapid_transactions(rapid_count)
+
+    def _score_rapid_transactions(self, rapid_count: int) -> dict[str, Any]:
+        """Score the number of transactions inside the rapid-fire window."""
+        threshold = self.THRESHOLDS["rapid_transactions"]
         risk_score = Decimal("0.00")
         generate_alert = False
 
@@ -452,6 +688,11 @@ class FraudDetectionService:
             student=user, created_at__gte=time_window, payment_status=TransactionPaymentStatus.FAILED
         ).count()
 
+        return self._score_failed_attempts(failed_count)
+
+    def _score_failed_attempts(self, failed_count: int) -> dict[str, Any]:
+        """Score the number of failed payments inside the failed-attempts window."""
+        threshold = self.THRESHOLDS["failed_attempts_threshold"]
         risk_score = Decimal("0.00")
         generate_alert = False
 
@@ -476,12 +717,15 @@ class FraudDetectionService:
 
     def _check_new_user_high_value(self, transaction: PurchaseTransaction) -> dict[str, Any]:
         """Check for high-value transactions from new users."""
-        user = transaction.student
-        threshold = self.THRESHOLDS["new_user_high_value"]
+        user_age = timezone.now() - transaction.student.date_joined  # type: ignore[attr-defined]
+
+        return self._score_new_user_high_value(user_age, transaction.amount)
 
-        user_age = timezone.now() - user.date_joined  # type: ignore[attr-defined]
+    def _score_new_user_high_value(self, user_age: timedelta, amount: Decimal) -> dict[str, Any]:
+        """Score a transaction amount against the age of the account that made it."""
+        threshold = self.THRESHOLDS["new_user_high_value"]
         is_new_user = user_age.days <= threshold["days_old"]
-        is_high_value = transaction.amount >= threshold["amount_threshold"]
+        is_high_value = amount >= threshold["amount_threshold"]
 
         risk_score = Decimal("0.00")
         generate_alert = False
@@ -489,7 +733,7 @@ class FraudDetectionService:
         if is_new_user and is_high_value:
             risk_score = Decimal("45.00")
             generate_alert = True
-        elif is_new_user and transaction.amount >= threshold["amount_threshold"] / 2:  # type: ignore[operator]
+        elif is_new_user and amount >= threshold["amount_threshold"] / 2:  # type: ignore[operator]
             risk_score = Decimal("20.00")
 
         return {
@@ -498,7 +742,7 @@ class FraudDetectionService:
             "generate_alert": generate_alert,
             "details": {
                 "user_age_days": user_age.days,
-                "transaction_amount": transaction.amount,
+                "transaction_amount": amount,
                 "threshold_days": threshold["days_old"],
                 "threshold_amount": threshold["amount_threshold"],
             },
@@ -517,6 +761,20 @@ class FraudDetectionService:
         ).exclude(id=transaction.id)
 
         if historical_transactions.count() < 3:
+            return self._score_unusual_amount(transaction.amount, None, None)
+
+        # Calculate mean and standard deviation
+        amounts = [t.amount for t in historical_transactions]
+        mean_amount = sum(amounts) / len(amounts)
+
+        variance = sum((x - mean_amount) ** 2 for x in amounts) / len(amounts)
+        return self._score_unusual_amount(transaction.amount, mean_amount, variance ** Decimal("0.5"))
+
+    def _score_unusual_amount(
+        self, amount: Decimal, mean_amount: Decimal | None, std_dev: Decimal | None
+    ) -> dict[str, Any]:
+        """Score how far an amount deviates from the user's history; None means too little history."""
+        if mean_amount is None or std_dev is None:
             # Not enough history to determine patterns
             return {
                 "check_type": "unusual_amount_patterns",
@@ -525,14 +783,7 @@ class FraudDetectionService:
                 "details": {"insufficient_history": True},
             }
 
-        # Calculate mean and standard deviation
-        amounts = [t.amount for t in historical_transactions]
-        mean_amount = sum(amounts) / len(amounts)
-
-        variance = sum((x - mean_amount) ** 2 for x in amounts) / len(amounts)
-        std_dev = variance ** Decimal("0.5")
-
-        deviation = Decimal("0.00") if std_dev == 0 else abs(transaction.amount - mean_amount) / std_dev
+        deviation = Decimal("0.00") if std_dev == 0 else abs(amount - mean_amount) / std_dev
 
         threshold = self.THRESHOLDS["unusual_amount_patterns"]
         risk_score = Decimal("0.00")
@@ -549,7 +800,7 @@ class FraudDetectionService:
             "risk_score": risk_score,
             "generate_alert": generate_alert,
             "details": {
-                "transaction_amount": transaction.amount,
+                "transaction_amount": amount,
                 "historical_mean": mean_amount,
                 "standard_deviation": std_dev,
                 "deviation_score": deviation,
@@ -632,7 +883,7 @@ class FraudDetectionService:
                 alert_type=risk_data.get("alert_type", "unknown_pattern"),
                 description=self._format_alert_description(risk_data),
                 target_user=target_user,
-                detection_data=risk_data,
+                detection_data=self._serialize_detection_data(risk_data),
                 risk_score=risk_data.get("risk_score", Decimal("0.00")),
             )
 
@@ -664,6 +915,11 @@ class FraudDetectionService:
             logger.error(f"Error generating fraud alert: {e}")
             return None
 
+    @staticmethod
+    def _serialize_detection_data(risk_data: dict[str, Any]) -> dict[str, Any]:
+        """Make risk data JSON-safe; details carry Decimals that JSONField cannot encode."""
+        return json.loads(json.dumps(risk_data, cls=DjangoJSONEncoder))
+
     def _format_alert_description(self, risk_data: dict[str, Any]) -> str:
         """Format a user-friendly alert description."""
         alert_type = risk_data.get("alert_type", "unknown")
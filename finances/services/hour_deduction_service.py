@@ -13,6 +13,7 @@ import logging
 
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import QuerySet
 from django.utils import timezone
 
 from finances.models import (
@@ -23,6 +24,8 @@ from finances.models import (
     TransactionPaymentStatus,
 )
 
+from .hour_ledger import HourLedger
+
 logger = logging.getLogger(__name__)
 
 
@@ -77,15 +80,16 @@ class HourDeductionService:
         if session_hours <= Decimal("0.00"):
             raise ValidationError("Session duration must be greater than 0")
 
-        # Validate all students have sufficient balance
-        HourDeductionService._validate_all_students_balance(students, session_hours)
-
-        # Deduct hours atomically for all students
+        # Validate and deduct for all students at once, with their packages and balances locked
+        # in the ledger's order (packages first), as single bookings and refunds lock them
         with transaction.atomic():
-            consumption_records = []
-            for student in students:
-                consumption = HourDeductionService._deduct_hours_for_student(student, session, session_hours)
-                consumption_records.append(consumption)
+            packages = HourLedger.lock_active_packages([student.id for student in students])
+            balances = HourDeductionService._lock_balances(students)
+
+            HourDeductionService._validate_group_balances(students, balances, packages, session_hours)
+            consumption_records = HourDeductionService._deduct_hours_for_group(
+                session, students, balances, packages, session_hours
+            )
 
             logger.info(
                 f"Successfully deducted {session_hours} hours for {len(students)} students in session {session.id}"
@@ -94,12 +98,42 @@ class HourDeductionService:
         return consumption_records
 
     @staticmethod
-    def _validate_all_students_balance(students: list, required_hours: Decimal) -> None:
+    def _lock_balances(students: list) -> dict[int, StudentAccountBalance]:
+        """
+        Get (creating missing ones) and lock the balances of several students.
+
+        The balances are locked in one select_for_update ordered by id, so concurrent
+        bookings of overlapping groups always lock them in the same order. Callers lock the
+        students' packages first, like every other HourLedger write.
+
+        Args:
+            students: List of student users
+
+        Returns:
+            Dict[int, StudentAccountBalance]: Locked balances by student id
+        """
+        StudentAccountBalance.objects.bulk_create(
+            [StudentAccountBalance(student=student) for student in students], ignore_conflicts=True
+        )
+        balances = (
+            StudentAccountBalance.objects.select_for_update()
+            .filter(student__in=students)
+            .order_by("id")
+            .select_related("student")
+        )
+        return {balance.student_id: balance for balance in balances}
+
+    @staticmethod
+    def _validate_group_balances(
+        students: list, balances: dict[int, StudentAccountBalance], packages: dict, required_hours: Decimal
+    ) -> None:
         """
-        Validate that all students have sufficient balance for the session.
+        Validate preloaded balances and active packages of all students in a session.
 
         Args:
             students: List of student users
+            balances: Balances by student id, as returned by _lock_balances
+            packages: Active packages by student id, as returned by HourLedger.lock_active_packages
             required_hours: Hours required for the session
 
         Raises:
@@ -107,7 +141,71 @@ class HourDeductionService:
             PackageExpiredError: If any student has expired packages
         """
         for student in students:
-            HourDeductionService._validate_student_balance(student, required_hours)
+            remaining_hours = balances[student.id].remaining_hours
+            if remaining_hours < required_hours:
+                raise InsufficientBalanceError(
+                    f"Student {student.name} has insufficient balance. "
+                    f"Required: {required_hours}h, Available: {remaining_hours}h"
+                )
+
+            if not packages[student.id]:
+                any_packages = PurchaseTransaction.objects.filter(
+                    student=student, payment_status=TransactionPaymentStatus.COMPLETED
+                ).exists()
+
+                if any_packages:
+                    raise PackageExpiredError(
+                        f"Student {student.name} has no active packages (all packages have expired)"
+                    )
+                else:
+                    raise InsufficientBalanceError(f"Student {student.name} has no tutoring packages purchased")
+
+    @staticmethod
+    def _deduct_hours_for_group(
+        session: ClassSession,
+        students: list,
+        balances: dict[int, StudentAccountBalance],
+        packages: dict,
+        hours: Decimal,
+    ) -> list[HourConsumption]:
+        """
+        Deduct hours from all students of a session and create their consumption records.
+
+        The consumption rows are bulk-created and charged to the balances and packages
+        through HourLedger.consume_many, so the cost does not grow with the group size.
+
+        Args:
+            session: ClassSession object
+            students: List of student users
+            balances: Locked balances by student id
+            packages: Locked active packages by student id
+            hours: Hours to deduct from each student
+
+        Returns:
+            List[HourConsumption]: Created consumption records
+        """
+        consumptions = HourConsumption.objects.bulk_create(
+            [
+                HourConsumption(
+                    student_account=balances[student.id],
+                    class_session=session,
+                    # Oldest active package (FIFO); hours spill over to the next ones if needed
+                    purchase_transaction_id=packages[student.id][0][0],
+                    hours_consumed=hours,
+                    hours_originally_reserved=hours,
+                )
+                for student in students
+            ]
+        )
+        HourLedger.consume_many(consumptions, packages=packages)
+
+        for consumption in consumptions:
+            logger.info(
+                f"Deducted {hours} hours from {consumption.student_account.student.name}'s account "  # type: ignore[attr-defined]
+                f"(transaction {consumption.purchase_transaction_id})"
+            )
+
+        return consumptions
 
     @staticmethod
     def _validate_student_balance(student, required_hours: Decimal) -> None:
@@ -141,8 +239,7 @@ class HourDeductionService:
             )
 
         # Check if student has any active (non-expired) packages
-        active_packages = HourDeductionService._get_active_packages_for_student(student)
-        if not active_packages:
+        if not HourDeductionService._get_active_packages_for_student(student).exists():
             # Check if student has any packages at all
             any_packages = PurchaseTransaction.objects.filter(
                 student=student, payment_status=TransactionPaymentStatus.COMPLETED
@@ -154,27 +251,17 @@ class HourDeductionService:
                 raise InsufficientBalanceError(f"Student {student.name} has no tutoring packages purchased")
 
     @staticmethod
-    def _get_active_packages_for_student(student) -> list[PurchaseTransaction]:
+    def _get_active_packages_for_student(student) -> QuerySet[PurchaseTransaction]:
         """
-        Get active (non-expired) packages for a student ordered by creation date (FIFO).
+        Get active (non-expired, with hours left) packages for a student ordered by creation date (FIFO).
 
         Args:
             student: Student user object
 
         Returns:
-            List[PurchaseTransaction]: Active packages in FIFO order
+            QuerySet[PurchaseTransaction]: Active packages in FIFO order, served by the partial FIFO index
         """
-        from django.db import models
-
-        now = timezone.now()
-        return list(
-            PurchaseTransaction.objects.filter(student=student, payment_status=TransactionPaymentStatus.COMPLETED)
-            .filter(
-                # Include packages with no expiration (subscriptions) or not yet expired
-                models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=now)
-            )
-            .order_by("created_at")  # FIFO order
-        )
+        return PurchaseTransaction.objects.active_packages().filter(student=student)
 
     @staticmethod
     def _deduct_hours_for_student(student, session: ClassSession, hours: Decimal) -> HourConsumption:
@@ -193,14 +280,12 @@ class HourDeductionService:
         balance = StudentAccountBalance.objects.get(student=student)
 
         # Get the oldest active package (FIFO)
-        active_packages = HourDeductionService._get_active_packages_for_student(student)
-        if not active_packages:
+        purchase_transaction = HourDeductionService._get_active_packages_for_student(student).first()
+        if purchase_transaction is None:
             raise PackageExpiredError(f"No active packages found for student {student.name}")
 
-        # Use oldest package for consumption tracking
-        purchase_transaction = active_packages[0]
-
-        # Create consumption record (this will automatically update balance via model save method)
+        # Create consumption record; its save draws the hours from the oldest packages onwards
+        # (FIFO, spanning packages when needed) and updates the balance
         consumption = HourConsumption.objects.create(
             student_account=balance,
             class_session=session,
@@ -225,43 +310,52 @@ class HourDeductionService:
         Returns:
             Dict: Summary of refund operation
         """
-        # Get all consumption records for this session
-        consumptions = HourConsumption.objects.filter(
-            class_session=session,
-            is_refunded=False,  # Only process non-refunded consumptions
-        )
-
-        if not consumptions.exists():
-            logger.info(f"No consumption records found to refund for session {session.id}")
-            return {"refunded_count": 0, "total_hours_refunded": Decimal("0.00"), "students_refunded": []}
-
         refund_summary = {"refunded_count": 0, "total_hours_refunded": Decimal("0.00"), "students_refunded": []}
 
         with transaction.atomic():
-            for consumption in consumptions:
-                # For session cancellation, refund all consumed hours
-                refunded_hours = consumption.hours_consumed
+            # Lock all of the session's unrefunded consumption records at once, so a concurrent
+            # cancellation waits and then finds nothing left to refund
+            consumptions = list(
+                HourConsumption.objects.select_for_update(of=("self",))
+                .filter(
+                    class_session=session,
+                    is_refunded=False,  # Only process non-refunded consumptions
+                    hours_consumed__gt=Decimal("0.00"),
+                )
+                .select_related("student_account__student")
+                .order_by("id")
+            )
 
-                if refunded_hours > Decimal("0.00"):
-                    # Update the student account balance
-                    consumption.student_account.hours_consumed -= refunded_hours  # type: ignore[attr-defined]
-                    consumption.student_account.save(update_fields=["hours_consumed", "updated_at"])  # type: ignore[attr-defined]
+            if not consumptions:
+                logger.info(f"No consumption records found to refund for session {session.id}")
+                return refund_summary
 
-                    # Mark consumption as refunded
-                    consumption.is_refunded = True
-                    consumption.refund_reason = reason
-                    consumption.save(update_fields=["is_refunded", "refund_reason", "updated_at"])
+            # Mark consumptions as refunded
+            HourConsumption.objects.filter(pk__in=[consumption.pk for consumption in consumptions]).update(
+                is_refunded=True, refund_reason=reason, updated_at=timezone.now()
+            )
 
-                    refund_summary["refunded_count"] += 1  # type: ignore[operator]
-                    refund_summary["total_hours_refunded"] += refunded_hours
-                    refund_summary["students_refunded"].append(  # type: ignore[attr-defined]
-                        {"student_name": consumption.student_account.student.name, "hours_refunded": refunded_hours}  # type: ignore[attr-defined]
-                    )
+            # For session cancellation, refund all consumed hours to the balances and the
+            # packages the hours came from
+            HourLedger.restore_many(
+                [(consumption, consumption.hours_consumed) for consumption in consumptions], description=reason
+            )
 
-                    logger.info(
-                        f"Refunded {refunded_hours} hours to {consumption.student_account.student.name} "  # type: ignore[attr-defined]
-                        f"for session {session.id}"
-                    )
+            for consumption in consumptions:
+                consumption.is_refunded = True
+                consumption.refund_reason = reason
+                refunded_hours = consumption.hours_consumed
+
+                refund_summary["refunded_count"] += 1  # type: ignore[operator]
+                refund_summary["total_hours_refunded"] += refunded_hours
+                refund_summary["students_refunded"].append(  # type: ignore[attr-defined]
+                    {"student_name": consumption.student_account.student.name, "hours_refunded": refunded_hours}  # type: ignore[attr-defined]
+                )
+
+                logger.info(
+                    f"Refunded {refunded_hours} hours to {consumption.student_account.student.name} "  # type: ignore[attr-defined]
+                    f"for session {session.id}"
+                )
 
         logger.info(
             f"Completed refund for session {session.id}: "
@@ -298,8 +392,8 @@ class HourDeductionService:
             can_book = remaining_hours >= duration_hours
 
             # Check for active packages
-            active_packages = HourDeductionService._get_active_packages_for_student(student)
-            has_active_packages = len(active_packages) > 0
+            active_package_count = HourDeductionService._get_active_packages_for_student(student).count()
+            has_active_packages = active_package_count > 0
 
             result = {
                 "can_book": can_book and has_active_packages,
@@ -307,7 +401,7 @@ class HourDeductionService:
                 "hours_available": remaining_hours,
                 "hours_remaining_after": remaining_hours - duration_hours if can_book else remaining_hours,
                 "has_active_packages": has_active_packages,
-                "active_package_count": len(active_packages),
+                "active_package_count": active_package_count,
             }
 
             # Add reason if booking is not allowed
@@ -405,9 +499,8 @@ class HourDeductionService:
             refund_amount = min(excess_hours, consumption.hours_consumed)
 
             if refund_amount > Decimal("0.00"):
-                # Update student account balance
-                consumption.student_account.hours_consumed -= refund_amount  # type: ignore[attr-defined]
-                consumption.student_account.save(update_fields=["hours_consumed", "updated_at"])  # type: ignore[attr-defined]
+                # Update student account balance and packages
+                HourLedger.restore(consumption, refund_amount, description=f"Partial refund: {reason}")
 
                 # Update consumption record
                 consumption.hours_consumed -= refund_amount
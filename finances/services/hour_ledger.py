@@ -0,0 +1,434 @@
+"""
+Hour ledger for student account balances
+
+Every change to a StudentAccountBalance (purchases, session consumption, refunds,
+expirations, manual adjustments) is recorded as an append-only HourLedgerEntry and applied
+to the balance row with an F() expression in the same transaction. The UPDATE is computed
+by the database, so concurrent bookings and webhooks for the same student never lose each
+other's changes and no row has to be locked while Python code runs.
+
+Consumption is also tracked per package: PurchaseTransaction.hours_remaining is drawn down
+oldest package first (FIFO) and restored newest first on refunds, with one locking read of
+the student's active packages and one UPDATE for however many packages a deduction spans.
+Each package a consumption draws from gets its own ledger entry, which is how refunds find
+the packages to give the hours back to. Writes that touch both always change the packages
+before the balance rows, so bookings and refunds running at once lock them in one order.
+
+Because the entries are the source of truth, reconcile() can recompute every balance from
+them in bulk (see the reconcile_hour_ledger management command).
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from finances.models import (
+    HourLedgerEntry,
+    HourLedgerEntryType,
+    PurchaseTransaction,
+    StudentAccountBalance,
+    TransactionPaymentStatus,
+)
+from finances.services.payment_metrics_service import PaymentMetricsRollupService
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+BALANCE_FIELDS = ["hours_purchased", "hours_consumed", "balance_amount", "updated_at"]
+
+
+@dataclass
+class LedgerReconciliation:
+    """Outcome of comparing balances with the sums of their ledger entries."""
+
+    accounts_checked: int = 0
+    mismatched_account_ids: list[int] = field(default_factory=list)
+    fixed: bool = False
+
+
+class HourLedger:
+    """Append-only, F()-applied changes to student account balances."""
+
+    RECONCILE_BATCH_SIZE = 500
+
+    @staticmethod
+    def get_account(student) -> StudentAccountBalance:
+        """
+        The student's balance, created if missing.
+
+        Two requests creating the first balance of a student at the same time both pass the
+        lookup; the loser of the unique constraint re-reads the winner's row.
+        """
+        try:
+            return StudentAccountBalance.objects.get(student=student)
+        except StudentAccountBalance.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                return StudentAccountBalance.objects.create(student=student)
+        except IntegrityError:
+            return StudentAccountBalance.objects.get(student=student)
+
+    @classmethod
+    def post(
+        cls,
+        account: StudentAccountBalance,
+        entry_type: str,
+        *,
+        hours_purchased: Decimal = ZERO,
+        hours_consumed: Decimal = ZERO,
+        amount: Decimal = ZERO,
+        description: str = "",
+        refresh: bool = True,
+        **relations,
+    ) -> HourLedgerEntry:
+        """
+        Record a change to an account and apply it to the balance row.
+
+        The deltas are signed: a refund of consumed hours is a negative hours_consumed.
+        relations may set purchase_transaction(_id) and hour_consumption(_id). With refresh
+        the passed account instance is reloaded so callers see the committed values.
+        """
+        entry = HourLedgerEntry(
+            student_account=account,
+            entry_type=entry_type,
+            hours_purchased=hours_purchased,
+            hours_consumed=hours_consumed,
+            amount=amount,
+            description=description[:255],
+            **relations,
+        )
+        cls._apply(account, [entry], refresh=refresh)
+        return entry
+
+    @classmethod
+    def _apply(cls, account: StudentAccountBalance, entries: list[HourLedgerEntry], refresh: bool = True) -> None:
+        """Write one account's entries and apply them, reloading the account with refresh."""
+        cls.post_batch(entries)
+        if refresh:
+            account.refresh_from_db(fields=BALANCE_FIELDS)
+
+    @staticmethod
+    def post_batch(entries: list[HourLedgerEntry]) -> None:
+        """
+        Write entries for any number of accounts and apply them: one INSERT for the entries
+        and one UPDATE adding each account's summed deltas to its balance row.
+        """
+        if not entries:
+            return
+
+        totals: dict[int, tuple[Decimal, Decimal, Decimal]] = {}
+        for entry in entries:
+            purchased, consumed, amount = totals.get(entry.student_account_id, (ZERO, ZERO, ZERO))
+            totals[entry.student_account_id] = (
+                purchased + entry.hours_purchased,
+                consumed + entry.hours_consumed,
+                amount + entry.amount,
+            )
+
+        def delta(index: int) -> Case:
+            return Case(
+                *(When(pk=account_id, then=Value(values[index])) for account_id, values in totals.items()),
+                default=Value(ZERO),
+                output_field=DecimalField(max_digits=8, decimal_places=2),
+            )
+
+        with transaction.atomic():
+            HourLedgerEntry.objects.bulk_create(entries)
+            StudentAccountBalance.objects.filter(pk__in=totals).update(
+                hours_purchased=F("hours_purchased") + delta(0),
+                hours_consumed=F("hours_consumed") + delta(1),
+                balance_amount=F("balance_amount") + delta(2),
+                updated_at=timezone.now(),
+            )
+
+    @staticmethod
+    def adjust_packages(changes: dict[int, Decimal]) -> None:
+        """Add signed deltas to the hours_remaining of several packages in one UPDATE."""
+        changes = {package_id: delta for package_id, delta in changes.items() if package_id and delta}
+        if not changes:
+            return
+        PurchaseTransaction.objects.filter(pk__in=changes).update(
+            hours_remaining=F("hours_remaining")
+            + Case(
+                *(When(pk=package_id, then=Value(delta)) for package_id, delta in changes.items()),
+                default=Value(ZERO),
+                output_field=DecimalField(max_digits=7, decimal_places=2),
+            )
+        )
+
+    @staticmethod
+    def lock_active_packages(student_ids) -> dict[int, list[tuple[int, Decimal | None]]]:
+        """
+        Active packages of several students as (id, hours_remaining), oldest first, read in one
+        query on the partial FIFO index. On PostgreSQL the rows are locked, always in FIFO
+        order, until the surrounding transaction ends.
+        """
+        packages: dict[int, list[tuple[int, Decimal | None]]] = {student_id: [] for student_id in student_ids}
+        rows = (
+            PurchaseTransaction.objects.active_packages()
+            .filter(student_id__in=packages)
+            .select_for_update()
+            .values_list("id", "student_id", "hours_remaining")
+        )
+        for package_id, student_id, remaining in rows:
+            packages[student_id].append((package_id, remaining))
+        return packages
+
+    @staticmethod
+    def _draw(
+        packages: list[tuple[int, Decimal | None]], hours: Decimal, first_package_id: int | None = None
+    ) -> dict[int | None, Decimal]:
+        """
+        Split hours over packages oldest first, first_package_id (when active) before the
+        others. Hours no package can cover are charged to first_package_id, or to the oldest
+        package, leaving it overdrawn, as the account balance itself may be.
+        """
+        ordered = sorted(packages, key=lambda package: package[0] != first_package_id)
+
+        allocations: dict[int | None, Decimal] = {}
+        needed = hours
+        for package_id, remaining in ordered:
+            if needed <= ZERO:
+                break
+            # Unmetered transactions (subscriptions) cover whatever is left
+            taken = needed if remaining is None else min(remaining, needed)
+            if taken > ZERO:
+                allocations[package_id] = taken
+                needed -= taken
+
+        if needed > ZERO:
+            overdrawn_id = first_package_id or (ordered[0][0] if ordered else None)
+            allocations[overdrawn_id] = allocations.get(overdrawn_id, ZERO) + needed
+        return allocations
+
+    @classmethod
+    def allocate(
+        cls, student_id: int, hours: Decimal, first_package_id: int | None = None
+    ) -> dict[int | None, Decimal]:
+        """
+        Draw hours from a student's active packages, oldest first, and return the hours
+        taken per package id: one locking read and one UPDATE however many packages it spans.
+        """
+        with transaction.atomic():
+            packages = cls.lock_active_packages([student_id])[student_id]
+            allocations = cls._draw(packages, hours, first_package_id)
+            cls.adjust_packages({package_id: -taken for package_id, taken in allocations.items()})
+        return allocations
+
+    @classmethod
+    def consume(cls, consumption) -> list[HourLedgerEntry]:
+        """Charge a new HourConsumption to its account and packages; see consume_many."""
+        entries = cls.consume_many([consumption])
+        consumption.student_account.refresh_from_db(fields=BALANCE_FIELDS)
+        return entries
+
+    @classmethod
+    def consume_many(cls, consumptions, packages=None) -> list[HourLedgerEntry]:
+        """
+        Charge new HourConsumption rows, of any number of students, to their accounts and
+        packages in a fixed number of queries.
+
+        Each consumption draws from its own purchase transaction first, then the student's
+        other active packages oldest first; one CONSUMPTION entry is written per package drawn
+        from. packages may pass the students' packages as returned by lock_active_packages
+        when the caller has already locked them.
+        """
+        if not consumptions:
+            return []
+
+        entries = []
+        changes: dict[int | None, Decimal] = {}
+        with transaction.atomic():
+            if packages is None:
+                packages = cls.lock_active_packages(
+                    {consumption.student_account.student_id for consumption in consumptions}
+                )
+
+            for consumption in consumptions:
+                student_id = consumption.student_account.student_id
+                available = packages.get(student_id, [])
+                allocations = cls._draw(available, consumption.hours_consumed, consumption.purchase_transaction_id)
+                # Later consumptions of the same student must not draw the same hours again
+                packages[student_id] = [
+                    (package_id, remaining if remaining is None else remaining - allocations.get(package_id, ZERO))
+                    for package_id, remaining in available
+                ]
+
+                for package_id, taken in allocations.items():
+                    changes[package_id] = changes.get(package_id, ZERO) - taken
+                    entries.append(
+                        HourLedgerEntry(
+                            student_account=consumption.student_account,
+                            entry_type=HourLedgerEntryType.CONSUMPTION,
+                            hours_consumed=taken,
+                            hour_consumption=consumption,
+                            purchase_transaction_id=package_id,
+                        )
+                    )
+
+            cls.adjust_packages(changes)
+            cls.post_batch(entries)
+        return entries
+
+    @classmethod
+    def restore(cls, consumption, hours: Decimal, description: str = "") -> list[HourLedgerEntry]:
+        """Give hours of a consumption back to its account and packages; see restore_many."""
+        entries = cls.restore_many([(consumption, hours)], description=description)
+        consumption.student_account.refresh_from_db(fields=BALANCE_FIELDS)
+        return entries
+
+    @classmethod
+    def restore_many(cls, refunds, description: str = "") -> list[HourLedgerEntry]:
+        """
+        Give hours back for several consumptions, as (consumption, hours) pairs, to their
+        accounts and packages in a fixed number of queries.
+
+        Hours go back to the packages each consumption drew from, newest package first, as
+        recorded in its ledger entries; hours beyond those (consumptions recorded before the
+        ledger) go back to the consumption's own purchase transaction.
+        """
+        if not refunds:
+            return []
+
+        charged: dict[int, list[tuple[int, Decimal]]] = {consumption.pk: [] for consumption, _hours in refunds}
+        rows = (
+            HourLedgerEntry.objects.filter(hour_consumption__in=charged, purchase_transaction__isnull=False)
+            .values("hour_consumption", "purchase_transaction")
+            .annotate(net=Sum("hours_consumed"))
+            .filter(net__gt=0)
+            .order_by("-purchase_transaction__created_at", "-purchase_transaction")
+        )
+        for row in rows:
+            charged[row["hour_consumption"]].append((row["purchase_transaction"], row["net"]))
+
+        entries = []
+        changes: dict[int | None, Decimal] = {}
+        for consumption, hours in refunds:
+            returned: dict[int | None, Decimal] = {}
+            remaining = hours
+            for package_id, net in charged[consumption.pk]:
+                if remaining <= ZERO:
+                    break
+                amount = min(net, remaining)
+                returned[package_id] = amount
+                remaining -= amount
+            if remaining > ZERO:
+                package_id = consumption.purchase_transaction_id
+                returned[package_id] = returned.get(package_id, ZERO) + remaining
+
+            for package_id, amount in returned.items():
+                changes[package_id] = changes.get(package_id, ZERO) + amount
+                entries.append(
+                    HourLedgerEntry(
+                        student_account=consumption.student_account,
+                        entry_type=HourLedgerEntryType.REFUND,
+                        hours_consumed=-amount,
+                        hour_consumption=consumption,
+                        purchase_transaction_id=package_id,
+                        description=description[:255],
+                    )
+                )
+
+        with transaction.atomic():
+            cls.adjust_packages(changes)
+            cls.post_batch(entries)
+        return entries
+
+    @classmethod
+    def credit_purchase(cls, purchase_transaction) -> HourLedgerEntry:
+        """
+        Credit a completed purchase to its student's balance: the amount paid plus, for
+        packages, the hours bought. Callers must credit a purchase once; complete_purchase()
+        does so only for the caller that moves it to COMPLETED.
+        """
+        account = cls.get_account(purchase_transaction.student)
+        hours = purchase_transaction.package_hours or ZERO
+        return cls.post(
+            account,
+            HourLedgerEntryType.PURCHASE if hours else HourLedgerEntryType.PAYMENT,
+            hours_purchased=hours,
+            amount=purchase_transaction.amount,
+            purchase_transaction=purchase_transaction,
+            description=f"Purchase transaction {purchase_transaction.id}",
+        )
+
+    @classmethod
+    def complete_purchase(cls, purchase_transaction) -> HourLedgerEntry | None:
+        """
+        Move a purchase to COMPLETED and credit it, unless it already was completed.
+
+        The status change is a conditional UPDATE, so when the webhook, the confirmation
+        endpoint and redelivered events race for the same purchase exactly one UPDATE changes
+        the row and only that caller credits it; the others get None. Unlike
+        select_for_update this also holds on SQLite.
+        """
+        with transaction.atomic():
+            previous_status = (
+                PurchaseTransaction.objects.filter(pk=purchase_transaction.pk)
+                .values_list("payment_status", flat=True)
+                .first()
+            )
+            claimed = (
+                PurchaseTransaction.objects.filter(pk=purchase_transaction.pk)
+                .exclude(payment_status=TransactionPaymentStatus.COMPLETED)
+                .update(payment_status=TransactionPaymentStatus.COMPLETED, updated_at=timezone.now())
+            )
+            if not claimed:
+                return None
+            purchase_transaction.payment_status = TransactionPaymentStatus.COMPLETED
+
+            # update() bypasses the signals that keep the payment metrics rollup in step
+            try:
+                with transaction.atomic():
+                    PaymentMetricsRollupService.apply_status_change(purchase_transaction, previous_status)
+            except Exception as e:
+                logger.error(f"Error updating payment metrics for transaction {purchase_transaction.pk}: {e}")
+
+            return cls.credit_purchase(purchase_transaction)
+
+    @classmethod
+    def reconcile(cls, fix: bool = False, batch_size: int | None = None) -> LedgerReconciliation:
+        """
+        Recompute every balance from its ledger entries in one grouped query and report (or,
+        with fix, bulk-update) the accounts whose columns disagree with their entries.
+
+        Fixes are applied as F() corrections of the observed difference rather than absolute
+        values, so postings that land while the command runs are not overwritten.
+        """
+        batch_size = batch_size or cls.RECONCILE_BATCH_SIZE
+        result = LedgerReconciliation()
+
+        balances = StudentAccountBalance.objects.annotate(
+            ledger_purchased=Coalesce(Sum("ledger_entries__hours_purchased"), ZERO),
+            ledger_consumed=Coalesce(Sum("ledger_entries__hours_consumed"), ZERO),
+            ledger_amount=Coalesce(Sum("ledger_entries__amount"), ZERO),
+        ).only("id", "hours_purchased", "hours_consumed", "balance_amount")
+
+        mismatched = []
+        for balance in balances.iterator(chunk_size=batch_size):
+            result.accounts_checked += 1
+            if (balance.hours_purchased, balance.hours_consumed, balance.balance_amount) != (
+                balance.ledger_purchased,
+                balance.ledger_consumed,
+                balance.ledger_amount,
+            ):
+                result.mismatched_account_ids.append(balance.id)
+                balance.hours_purchased = F("hours_purchased") + (balance.ledger_purchased - balance.hours_purchased)
+                balance.hours_consumed = F("hours_consumed") + (balance.ledger_consumed - balance.hours_consumed)
+                balance.balance_amount = F("balance_amount") + (balance.ledger_amount - balance.balance_amount)
+                mismatched.append(balance)
+
+        if fix and mismatched:
+            StudentAccountBalance.objects.bulk_update(
+                mismatched, ["hours_purchased", "hours_consumed", "balance_amount"], batch_size=batch_size
+            )
+            result.fixed = True
+            logger.warning(f"Reconciled {len(mismatched)} student balances with the hour ledger")
+
+        return result
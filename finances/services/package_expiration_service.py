@@ -21,17 +21,34 @@ import logging
 from django.conf import settings
 from django.core.mail import send_mail
 from django.db import transaction
-from django.db.models import Count, Sum
+from django.db.models import (
+    Avg,
+    Count,
+    DecimalField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
 from finances.models import (
-    HourConsumption,
+    HourLedgerEntry,
+    HourLedgerEntryType,
     PurchaseTransaction,
     StudentAccountBalance,
     TransactionPaymentStatus,
     TransactionType,
 )
 
+from .aggregation import ExpirationMetrics, conditional_aggregate
+from .hour_ledger import HourLedger
+
 logger = logging.getLogger(__name__)
 
 
@@ -150,7 +167,7 @@ class PackageExpirationService:
     @staticmethod
     def get_expired_packages_outside_grace_period(grace_hours: int = 24) -> list[PurchaseTransaction]:
         """
-        Get packages that expired outside the grace period.
+        Get packages that expired outside the grace period and still have hours to expire.
 
         Args:
             grace_hours: Grace period in hours
@@ -166,6 +183,7 @@ class PackageExpirationService:
                 transaction_type=TransactionType.PACKAGE,
                 payment_status=TransactionPaymentStatus.COMPLETED,
                 expires_at__lt=grace_cutoff,
+                hours_remaining__gt=0,
             ).select_related("student")
         )
 
@@ -178,18 +196,39 @@ class PackageExpirationService:
             package: Package transaction to calculate for
 
         Returns:
-            Decimal: Hours to expire (total hours - consumed hours)
+            Decimal: Hours to expire (the package's remaining hours, never negative)
         """
-        # Get total hours from package metadata
-        total_hours = Decimal(str(package.metadata.get("hours_included", 0)))
+        return max(package.hours_remaining or Decimal("0.00"), Decimal("0.00"))
 
-        # Get consumed hours for this package
-        consumed_hours = HourConsumption.objects.filter(purchase_transaction=package).aggregate(
-            total=Sum("hours_consumed")
-        )["total"] or Decimal("0.00")
+    @staticmethod
+    def hours_to_expire_expression() -> Greatest:
+        """calculate_hours_to_expire as a SQL expression, for aggregating over many packages."""
+        return Greatest(
+            Coalesce(F("hours_remaining"), Value(Decimal("0.00"))),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
 
-        # Return remaining hours to expire
-        return max(total_hours - consumed_hours, Decimal("0.00"))
+    @staticmethod
+    def hours_expired_expression() -> Coalesce:
+        """
+        Hours a package loses to expiration, as a SQL expression: the hours already written off
+        by its EXPIRATION ledger entries plus those still left to expire.
+        """
+        written_off = (
+            HourLedgerEntry.objects.filter(
+                purchase_transaction=OuterRef("pk"), entry_type=HourLedgerEntryType.EXPIRATION
+            )
+            .order_by()
+            .values("purchase_transaction")
+            .annotate(hours=Sum("hours_purchased"))
+            .values("hours")
+        )
+        return Coalesce(
+            PackageExpirationService.hours_to_expire_expression() - Subquery(written_off),
+            PackageExpirationService.hours_to_expire_expression(),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
 
     @staticmethod
     @transaction.atomic
@@ -207,11 +246,27 @@ class PackageExpirationService:
             # Calculate hours to expire
             hours_to_expire = PackageExpirationService.calculate_hours_to_expire(package)
 
+            # Zero the package in the same transaction as its ledger entry. The condition on the
+            # remaining hours makes re-runs (and concurrent runs) expire a package only once.
+            if hours_to_expire > Decimal("0.00"):
+                claimed = PurchaseTransaction.objects.filter(
+                    pk=package.pk, hours_remaining=package.hours_remaining
+                ).update(hours_remaining=Decimal("0.00"), updated_at=timezone.now())
+                if not claimed:
+                    hours_to_expire = Decimal("0.00")
+
             # Update student balance if there are hours to expire
             if hours_to_expire > Decimal("0.00"):
+                package.hours_remaining = Decimal("0.00")
                 balance = StudentAccountBalance.objects.get(student=package.student)  # type: ignore[misc]
-                balance.hours_purchased -= hours_to_expire
-                balance.save(update_fields=["hours_purchased", "updated_at"])
+                HourLedger.post(
+                    balance,
+                    HourLedgerEntryType.EXPIRATION,
+                    hours_purchased=-hours_to_expire,
+                    purchase_transaction=package,
+                    description=f"Package {package.id} expired",
+                    refresh=False,
+                )
 
             # Create audit log
             audit_log = (
@@ -527,9 +582,15 @@ class PackageExpirationService:
 
             # Update student balance
             balance = StudentAccountBalance.objects.get(student=expired_package.student)  # type: ignore[misc]
-            balance.hours_purchased += new_hours
-            balance.balance_amount += new_amount
-            balance.save(update_fields=["hours_purchased", "balance_amount", "updated_at"])
+            HourLedger.post(
+                balance,
+                HourLedgerEntryType.PURCHASE,
+                hours_purchased=new_hours,
+                amount=new_amount,
+                purchase_transaction=new_package,
+                description=f"Renewal of package {expired_package.id}",
+                refresh=False,
+            )
 
             # Create audit log
             audit_log = (
@@ -576,27 +637,23 @@ class PackageExpirationService:
             created_at__lte=end_date,
         )
 
-        # Calculate metrics
-        total_packages = packages.count()
-        expired_packages = packages.filter(expires_at__lt=timezone.now()).count()
-        expiring_soon = packages.filter(
-            expires_at__gte=timezone.now(), expires_at__lte=timezone.now() + timedelta(days=30)
-        ).count()
-
-        # Calculate hours expired
-        hours_expired = Decimal("0.00")
-        for package in packages.filter(expires_at__lt=timezone.now()):
-            hours_expired += PackageExpirationService.calculate_hours_to_expire(package)
-
-        # Count affected students
-        students_affected = packages.filter(expires_at__lt=timezone.now()).values("student").distinct().count()
+        # Calculate all metrics in one aggregate query
+        now = timezone.now()
+        expired = Q(expires_at__lt=now)
+        totals = packages.order_by().aggregate(
+            total_packages=Count("id"),
+            expired_packages=Count("id", filter=expired),
+            expiring_soon=Count("id", filter=Q(expires_at__gte=now, expires_at__lte=now + timedelta(days=30))),
+            hours_expired=Sum(PackageExpirationService.hours_expired_expression(), filter=expired),
+            students_affected=Count("student", filter=expired, distinct=True),
+        )
 
         return {
-            "total_packages": total_packages,
-            "expired_packages": expired_packages,
-            "expiring_soon": expiring_soon,
-            "hours_expired": hours_expired,
-            "students_affected": students_affected,
+            "total_packages": totals["total_packages"],
+            "expired_packages": totals["expired_packages"],
+            "expiring_soon": totals["expiring_soon"],
+            "hours_expired": totals["hours_expired"] or Decimal("0.00"),
+            "students_affected": totals["students_affected"],
             "report_period": {"start_date": start_date, "end_date": end_date},
         }
 
@@ -612,12 +669,16 @@ class PackageExpirationService:
         Returns:
             List[Dict]: Student's expiration history
         """
-        expired_packages = PurchaseTransaction.objects.filter(
-            student=student,
-            transaction_type=TransactionType.PACKAGE,
-            payment_status=TransactionPaymentStatus.COMPLETED,
-            expires_at__lt=timezone.now(),
-        ).order_by("-expires_at")[:limit]
+        expired_packages = (
+            PurchaseTransaction.objects.filter(
+                student=student,
+                transaction_type=TransactionType.PACKAGE,
+                payment_status=TransactionPaymentStatus.COMPLETED,
+                expires_at__lt=timezone.now(),
+            )
+            .annotate(hours_expired=PackageExpirationService.hours_expired_expression())
+            .order_by("-expires_at")[:limit]
+        )
 
         history = []
         for package in expired_packages:
@@ -627,7 +688,7 @@ class PackageExpirationService:
                     "package_id": package.id,
                     "amount": package.amount,
                     "expired_at": package.expires_at,
-                    "hours_expired": PackageExpirationService.calculate_hours_to_expire(package),
+                    "hours_expired": package.hours_expired,
                 }
             )
 
@@ -644,41 +705,43 @@ class PackageExpirationService:
         Returns:
             Dict: Expiration metrics
         """
-        start_date = timezone.now() - timedelta(days=period_days)
+        now = timezone.now()
+        start_date = now - timedelta(days=period_days)
 
-        # Get packages in period
         packages = PurchaseTransaction.objects.filter(
             transaction_type=TransactionType.PACKAGE,
             payment_status=TransactionPaymentStatus.COMPLETED,
             created_at__gte=start_date,
+        ).annotate(
+            hours_expired=PackageExpirationService.hours_expired_expression(),
+            lifetime=ExpressionWrapper(F("expires_at") - F("created_at"), output_field=DurationField()),
         )
 
-        total_packages = packages.count()
-        expired_packages = packages.filter(expires_at__lt=timezone.now()).count()
-
-        # Calculate expiration rate
-        expiration_rate = expired_packages / total_packages if total_packages > 0 else 0
-
-        # Calculate average package lifetime
-        lifetimes = []
-        for package in packages.filter(expires_at__isnull=False):
-            lifetime = (package.expires_at - package.created_at).days
-            lifetimes.append(lifetime)
-
-        average_lifetime = sum(lifetimes) / len(lifetimes) if lifetimes else 0
-
-        # Calculate hours lost to expiration
-        hours_lost = Decimal("0.00")
-        for package in packages.filter(expires_at__lt=timezone.now()):
-            hours_lost += PackageExpirationService.calculate_hours_to_expire(package)
+        expired = Q(expires_at__lt=now)
+        totals = conditional_aggregate(
+            packages,
+            buckets={"all": None, "expired": expired, "with_expiry": Q(expires_at__isnull=False)},
+            metrics={
+                "count": (Count, "id"),
+                "hours_expired": (Sum, "hours_expired"),
+                "lifetime": (Avg, "lifetime"),
+            },
+        )
+        average_lifetime = totals["with_expiry"]["lifetime"]
+        metrics = ExpirationMetrics(
+            total_packages=totals["all"]["count"],
+            expired_packages=totals["expired"]["count"],
+            average_package_lifetime=average_lifetime / timedelta(days=1) if average_lifetime else 0,
+            hours_lost_to_expiration=totals["expired"]["hours_expired"] or Decimal("0.00"),
+        )
 
         # Estimate revenue impact (simplified)
-        revenue_impact = hours_lost * Decimal("15.00")  # Assume €15/hour average
+        revenue_impact = metrics.hours_lost_to_expiration * Decimal("15.00")  # Assume €15/hour average
 
         return {
-            "expiration_rate": expiration_rate,
-            "average_package_lifetime": average_lifetime,
-            "hours_lost_to_expiration": hours_lost,
+            "expiration_rate": metrics.expiration_rate,
+            "average_package_lifetime": metrics.average_package_lifetime,
+            "hours_lost_to_expiration": metrics.hours_lost_to_expiration,
             "revenue_impact": revenue_impact,
         }
 
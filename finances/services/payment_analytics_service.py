@@ -7,15 +7,17 @@ for administrative oversight of the Aprende Comigo platform.
 """
 
 import datetime
-from datetime import timedelta
+from datetime import UTC, timedelta
 from decimal import Decimal
 import logging
 from typing import Any
 
-from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 
 from finances.models import (
+    DailyPaymentMetric,
     PurchaseTransaction,
     StudentAccountBalance,
     TransactionPaymentStatus,
@@ -24,6 +26,8 @@ from finances.models import (
     WebhookEventStatus,
 )
 
+from .aggregation import TransactionStatusCounts
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +41,9 @@ class PaymentAnalyticsService:
     - Failure pattern detection
     - Webhook processing monitoring
     - Performance metrics
+
+    Transaction metrics read the DailyPaymentMetric rollup for whole UTC days and
+    only scan PurchaseTransaction for the partial day at the start of a window.
     """
 
     def __init__(self):
@@ -54,20 +61,25 @@ class PaymentAnalyticsService:
         Returns:
             Dict containing success rate metrics
         """
-        queryset = PurchaseTransaction.objects.all()
-
-        # Apply time filtering
+        cutoff_time = None
         if hours:
             cutoff_time = timezone.now() - timedelta(hours=hours)
-            queryset = queryset.filter(created_at__gte=cutoff_time)
         elif days:
             cutoff_time = timezone.now() - timedelta(days=days)
-            queryset = queryset.filter(created_at__gte=cutoff_time)
 
-        # Calculate metrics
-        total_transactions = queryset.count()
+        status_counts = {
+            status: totals["count"]
+            for (status,), totals in self._aggregate_window(cutoff_time, group_by=("payment_status",)).items()
+        }
+        counts = TransactionStatusCounts(
+            total=sum(status_counts.values()),
+            completed=status_counts.get(TransactionPaymentStatus.COMPLETED, 0),
+            failed=status_counts.get(TransactionPaymentStatus.FAILED, 0),
+            pending=status_counts.get(TransactionPaymentStatus.PENDING, 0)
+            + status_counts.get(TransactionPaymentStatus.PROCESSING, 0),
+        )
 
-        if total_transactions == 0:
+        if counts.total == 0:
             return {
                 "total_transactions": 0,
                 "successful_transactions": 0,
@@ -77,24 +89,13 @@ class PaymentAnalyticsService:
                 "failure_rate": 0.0,
             }
 
-        successful_transactions = queryset.filter(payment_status=TransactionPaymentStatus.COMPLETED).count()
-
-        failed_transactions = queryset.filter(payment_status=TransactionPaymentStatus.FAILED).count()
-
-        pending_transactions = queryset.filter(
-            payment_status__in=[TransactionPaymentStatus.PENDING, TransactionPaymentStatus.PROCESSING]
-        ).count()
-
-        success_rate = (successful_transactions / total_transactions) * 100
-        failure_rate = (failed_transactions / total_transactions) * 100
-
         return {
-            "total_transactions": total_transactions,
-            "successful_transactions": successful_transactions,
-            "failed_transactions": failed_transactions,
-            "pending_transactions": pending_transactions,
-            "success_rate": round(success_rate, 2),
-            "failure_rate": round(failure_rate, 2),
+            "total_transactions": counts.total,
+            "successful_transactions": counts.completed,
+            "failed_transactions": counts.failed,
+            "pending_transactions": counts.pending,
+            "success_rate": counts.success_rate,
+            "failure_rate": counts.failure_rate,
         }
 
     def get_revenue_trends(self, days: int = 30) -> dict[str, Any]:
@@ -109,19 +110,16 @@ class PaymentAnalyticsService:
         """
         cutoff_date = timezone.now() - timedelta(days=days)
 
-        # Get successful transactions only
-        transactions = PurchaseTransaction.objects.filter(
-            payment_status=TransactionPaymentStatus.COMPLETED, created_at__gte=cutoff_date
-        ).order_by("created_at")
+        # Successful transactions only, grouped by day
+        daily_totals = self._aggregate_window(
+            cutoff_date, group_by=("date",), payment_status=TransactionPaymentStatus.COMPLETED
+        )
+        daily_revenue: dict[datetime.date, Decimal] = {
+            transaction_date: totals["total"] for (transaction_date,), totals in daily_totals.items()
+        }
 
         # Calculate total revenue
-        total_revenue = transactions.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
-
-        # Group by date for daily trends
-        daily_revenue: dict[datetime.date, Decimal] = {}
-        for transaction in transactions:
-            transaction_date = transaction.created_at.date()
-            daily_revenue[transaction_date] = daily_revenue.get(transaction_date, Decimal("0.00")) + transaction.amount
+        total_revenue = sum(daily_revenue.values(), Decimal("0.00"))
 
         # Convert to list format for API response - work backwards from today
         daily_data = []
@@ -148,14 +146,15 @@ class PaymentAnalyticsService:
         Returns:
             Dict with revenue by transaction type
         """
-        queryset = PurchaseTransaction.objects.filter(payment_status=TransactionPaymentStatus.COMPLETED)
-
-        if hours:
-            cutoff_time = timezone.now() - timedelta(hours=hours)
-            queryset = queryset.filter(created_at__gte=cutoff_time)
+        cutoff_time = timezone.now() - timedelta(hours=hours) if hours else None
 
         # Group by transaction type
-        type_breakdown = queryset.values("transaction_type").annotate(revenue=Sum("amount"))
+        type_breakdown = [
+            {"transaction_type": transaction_type, "revenue": totals["total"]}
+            for (transaction_type,), totals in self._aggregate_window(
+                cutoff_time, group_by=("transaction_type",), payment_status=TransactionPaymentStatus.COMPLETED
+            ).items()
+        ]
 
         result = {
             "package": Decimal("0.00"),
@@ -188,13 +187,11 @@ class PaymentAnalyticsService:
         Returns:
             Dict containing transaction value metrics
         """
-        queryset = PurchaseTransaction.objects.filter(payment_status=TransactionPaymentStatus.COMPLETED)
+        cutoff_time = timezone.now() - timedelta(hours=hours) if hours else None
 
-        if hours:
-            cutoff_time = timezone.now() - timedelta(hours=hours)
-            queryset = queryset.filter(created_at__gte=cutoff_time)
+        totals = self._aggregate_window(cutoff_time, payment_status=TransactionPaymentStatus.COMPLETED).get(())
 
-        if not queryset.exists():
+        if not totals or not totals["count"]:
             return {
                 "total_successful_transactions": 0,
                 "total_revenue": Decimal("0.00"),
@@ -203,20 +200,12 @@ class PaymentAnalyticsService:
                 "lowest_transaction": Decimal("0.00"),
             }
 
-        aggregates = queryset.aggregate(
-            total_transactions=Count("id"),
-            total_revenue=Sum("amount"),
-            average_value=Avg("amount"),
-            highest_value=Max("amount"),
-            lowest_value=Min("amount"),
-        )
-
         return {
-            "total_successful_transactions": aggregates["total_transactions"],
-            "total_revenue": aggregates["total_revenue"] or Decimal("0.00"),
-            "average_transaction_value": aggregates["average_value"] or Decimal("0.00"),
-            "highest_transaction": aggregates["highest_value"] or Decimal("0.00"),
-            "lowest_transaction": aggregates["lowest_value"] or Decimal("0.00"),
+            "total_successful_transactions": totals["count"],
+            "total_revenue": totals["total"],
+            "average_transaction_value": totals["total"] / totals["count"],
+            "highest_transaction": totals["max"] or Decimal("0.00"),
+            "lowest_transaction": totals["min"] or Decimal("0.00"),
         }
 
     def get_failure_analysis(self, days: int = 7) -> dict[str, Any]:
@@ -231,21 +220,20 @@ class PaymentAnalyticsService:
         """
         cutoff_date = timezone.now() - timedelta(days=days)
 
-        all_transactions = PurchaseTransaction.objects.filter(created_at__gte=cutoff_date)
+        daily_totals = self._aggregate_window(cutoff_date, group_by=("date", "payment_status"))
 
-        failed_transactions = all_transactions.filter(payment_status=TransactionPaymentStatus.FAILED)
+        total_transactions = sum(totals["count"] for totals in daily_totals.values())
 
-        total_transactions = all_transactions.count()
-        total_failures = failed_transactions.count()
+        # Daily failure breakdown
+        daily_failures: dict[datetime.date, int] = {
+            transaction_date: totals["count"]
+            for (transaction_date, status), totals in daily_totals.items()
+            if status == TransactionPaymentStatus.FAILED
+        }
+        total_failures = sum(daily_failures.values())
 
         overall_failure_rate = (total_failures / total_transactions * 100) if total_transactions > 0 else 0
 
-        # Daily failure breakdown
-        daily_failures: dict[datetime.date, int] = {}
-        for transaction in failed_transactions:
-            transaction_date = transaction.created_at.date()
-            daily_failures[transaction_date] = daily_failures.get(transaction_date, 0) + 1
-
         # Convert to list format - work backwards from today
         daily_data = []
         today = timezone.now().date()
@@ -420,22 +408,80 @@ class PaymentAnalyticsService:
         """
         last_24h = timezone.now() - timedelta(hours=24)
 
-        recent_transactions = PurchaseTransaction.objects.filter(created_at__gte=last_24h)
+        status_counts = {
+            status: totals["count"]
+            for (status,), totals in self._aggregate_window(last_24h, group_by=("payment_status",)).items()
+        }
 
         recent_webhooks = WebhookEventLog.objects.filter(created_at__gte=last_24h)
 
         return {
-            "recent_transactions": recent_transactions.count(),
-            "recent_successful_payments": recent_transactions.filter(
-                payment_status=TransactionPaymentStatus.COMPLETED
-            ).count(),
-            "recent_failed_payments": recent_transactions.filter(
-                payment_status=TransactionPaymentStatus.FAILED
-            ).count(),
+            "recent_transactions": sum(status_counts.values()),
+            "recent_successful_payments": status_counts.get(TransactionPaymentStatus.COMPLETED, 0),
+            "recent_failed_payments": status_counts.get(TransactionPaymentStatus.FAILED, 0),
             "recent_webhook_events": recent_webhooks.count(),
             "recent_webhook_failures": recent_webhooks.filter(status=WebhookEventStatus.FAILED).count(),
         }
 
+    def _aggregate_window(
+        self, cutoff: datetime.datetime | None, group_by: tuple[str, ...] = (), **filters: Any
+    ) -> dict[tuple, dict[str, Any]]:
+        """
+        Transaction count, total, min and max since `cutoff`, grouped by rollup dimensions.
+
+        Whole UTC days come from DailyPaymentMetric; the partial first day of the window is
+        aggregated from PurchaseTransaction. `group_by` and `filters` use rollup field names
+        (date, school_id, transaction_type, payment_status).
+
+        Returns:
+            Dict mapping group values (as a tuple) to {"count", "total", "min", "max"}
+        """
+        rollup = DailyPaymentMetric.objects.order_by().filter(**filters)
+        partial_day = None
+        if cutoff is not None:
+            first_full_day = cutoff.astimezone(UTC).date() + timedelta(days=1)
+            rollup = rollup.filter(date__gte=first_full_day)
+            partial_day = (
+                PurchaseTransaction.objects.order_by()
+                .filter(
+                    created_at__gte=cutoff,
+                    created_at__lt=datetime.datetime.combine(first_full_day, datetime.time.min, tzinfo=UTC),
+                    **filters,
+                )
+                .annotate(date=TruncDate("created_at", tzinfo=UTC))
+            )
+
+        rollup_aggregates = {
+            "count": Sum("transaction_count"),
+            "total": Sum("total_amount"),
+            "min": Min("min_amount"),
+            "max": Max("max_amount"),
+        }
+        rows = self._grouped(rollup, group_by, rollup_aggregates)
+        if partial_day is not None:
+            raw_aggregates = {"count": Count("id"), "total": Sum("amount"), "min": Min("amount"), "max": Max("amount")}
+            rows += self._grouped(partial_day, group_by, raw_aggregates)
+
+        results: dict[tuple, dict[str, Any]] = {}
+        for row in rows:
+            if not row["count"]:
+                continue
+            key = tuple(row[field] for field in group_by)
+            totals = results.setdefault(key, {"count": 0, "total": Decimal("0.00"), "min": None, "max": None})
+            totals["count"] += row["count"]
+            totals["total"] += row["total"] or Decimal("0.00")
+            if row["min"] is not None:
+                totals["min"] = row["min"] if totals["min"] is None else min(totals["min"], row["min"])
+            if row["max"] is not None:
+                totals["max"] = row["max"] if totals["max"] is None else max(totals["max"], row["max"])
+        return results
+
+    @staticmethod
+    def _grouped(queryset, group_by: tuple[str, ...], aggregates: dict[str, Any]) -> list[dict[str, Any]]:
+        if not group_by:
+            return [queryset.aggregate(**aggregates)]
+        return list(queryset.values(*group_by).annotate(**aggregates))
+
     def get_student_analytics(self, student_id: int, days: int = 30) -> dict[str, Any]:
         """
         Get analytics for a specific student.
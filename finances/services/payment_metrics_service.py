@@ -0,0 +1,196 @@
+"""
+Daily payment metrics rollup.
+
+Keeps DailyPaymentMetric rows in step with PurchaseTransaction so payment analytics
+read a handful of pre-aggregated rows per day instead of scanning every transaction.
+Changes are applied incrementally from model signals; rebuild() recomputes any date
+range from scratch and is exposed through the rebuild_payment_metrics command.
+
+Transactions are attributed to the purchasing student's earliest active student
+membership. A student whose memberships change keeps older rows under the previous
+school until the range is rebuilt.
+"""
+
+from dataclasses import dataclass, replace
+from datetime import UTC, date
+from decimal import Decimal
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Min, OuterRef, QuerySet, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+from accounts.models import SchoolMembership, SchoolRole
+from finances.models import DailyPaymentMetric, PurchaseTransaction
+
+logger = logging.getLogger(__name__)
+
+# Saves that touch none of these fields cannot move a transaction between rollup rows
+ROLLUP_FIELDS = frozenset({"payment_status", "transaction_type", "amount"})
+
+
+@dataclass(frozen=True)
+class RollupEntry:
+    """The rollup row a transaction counts towards, plus its amount."""
+
+    date: date
+    school_id: int | None
+    transaction_type: str
+    payment_status: str
+    amount: Decimal
+
+    @property
+    def key(self) -> dict:
+        return {
+            "date": self.date,
+            "school_id": self.school_id,
+            "transaction_type": self.transaction_type,
+            "payment_status": self.payment_status,
+        }
+
+
+class PaymentMetricsRollupService:
+    """Incremental maintenance and rebuild of the daily payment metrics rollup."""
+
+    @staticmethod
+    def student_school_id(student_id: int) -> int | None:
+        return (
+            SchoolMembership.objects.filter(user_id=student_id, role=SchoolRole.STUDENT, is_active=True)
+            .order_by("id")
+            .values_list("school_id", flat=True)
+            .first()
+        )
+
+    @classmethod
+    def entry_for(cls, purchase_transaction: PurchaseTransaction, school_id: int | None) -> RollupEntry:
+        return RollupEntry(
+            date=purchase_transaction.created_at.astimezone(UTC).date(),
+            school_id=school_id,
+            transaction_type=purchase_transaction.transaction_type,
+            payment_status=purchase_transaction.payment_status,
+            amount=Decimal(purchase_transaction.amount),
+        )
+
+    @classmethod
+    def apply_change(cls, old: RollupEntry | None, new: RollupEntry | None) -> None:
+        """Move one transaction from its old rollup row to its new one."""
+        if old == new:
+            return
+        if old is not None:
+            cls._remove(old)
+        if new is not None:
+            cls._add(new)
+
+    @classmethod
+    def apply_status_change(cls, purchase_transaction: PurchaseTransaction, previous_status: str) -> None:
+        """Move a transaction whose status was changed with QuerySet.update(), which sends no signals."""
+        new = cls.entry_for(purchase_transaction, cls.student_school_id(purchase_transaction.student_id))  # type: ignore[attr-defined]
+        cls.apply_change(replace(new, payment_status=previous_status), new)
+
+    @classmethod
+    def _add(cls, entry: RollupEntry) -> None:
+        amount = Value(entry.amount)
+        updates = {
+            "transaction_count": F("transaction_count") + 1,
+            "total_amount": F("total_amount") + amount,
+            "min_amount": Case(When(min_amount__lte=entry.amount, then=F("min_amount")), default=amount),
+            "max_amount": Case(When(max_amount__gte=entry.amount, then=F("max_amount")), default=amount),
+        }
+        if DailyPaymentMetric.objects.filter(**entry.key).update(**updates):
+            return
+
+        try:
+            with transaction.atomic():
+                DailyPaymentMetric.objects.create(
+                    **entry.key,
+                    transaction_count=1,
+                    total_amount=entry.amount,
+                    min_amount=entry.amount,
+                    max_amount=entry.amount,
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            DailyPaymentMetric.objects.filter(**entry.key).update(**updates)
+
+    @classmethod
+    def _remove(cls, entry: RollupEntry) -> None:
+        metric = DailyPaymentMetric.objects.filter(**entry.key).first()
+        if metric is None:
+            return
+
+        DailyPaymentMetric.objects.filter(pk=metric.pk).update(
+            transaction_count=F("transaction_count") - 1, total_amount=F("total_amount") - entry.amount
+        )
+        # Extremes cannot be decremented; recompute them only when the removed amount was one
+        if entry.amount in (metric.min_amount, metric.max_amount):
+            extremes = (
+                cls._raw_queryset()
+                .filter(
+                    rollup_date=entry.date,
+                    rollup_school_id=entry.school_id,
+                    transaction_type=entry.transaction_type,
+                    payment_status=entry.payment_status,
+                )
+                .aggregate(min_amount=Min("amount"), max_amount=Max("amount"))
+            )
+            DailyPaymentMetric.objects.filter(pk=metric.pk).update(**extremes)
+
+    @staticmethod
+    def _raw_queryset() -> QuerySet:
+        """Transactions annotated with the rollup day and school they belong to."""
+        school = (
+            SchoolMembership.objects.filter(user_id=OuterRef("student_id"), role=SchoolRole.STUDENT, is_active=True)
+            .order_by("id")
+            .values("school_id")[:1]
+        )
+        return PurchaseTransaction.objects.order_by().annotate(
+            rollup_date=TruncDate("created_at", tzinfo=UTC), rollup_school_id=Subquery(school)
+        )
+
+    @classmethod
+    def rebuild(cls, start_date: date | None = None, end_date: date | None = None) -> int:
+        """
+        Recompute rollup rows for a UTC date range (everything by default).
+
+        Returns:
+            Number of rollup rows written
+        """
+        metrics = DailyPaymentMetric.objects.all()
+        raw = cls._raw_queryset()
+        if start_date:
+            metrics = metrics.filter(date__gte=start_date)
+            raw = raw.filter(rollup_date__gte=start_date)
+        if end_date:
+            metrics = metrics.filter(date__lte=end_date)
+            raw = raw.filter(rollup_date__lte=end_date)
+
+        rows = raw.values("rollup_date", "rollup_school_id", "transaction_type", "payment_status").annotate(
+            transaction_count=Count("id"),
+            total_amount=Sum("amount"),
+            min_amount=Min("amount"),
+            max_amount=Max("amount"),
+        )
+
+        with transaction.atomic():
+            metrics.delete()
+            created = DailyPaymentMetric.objects.bulk_create(
+                [
+                    DailyPaymentMetric(
+                        date=row["rollup_date"],
+                        school_id=row["rollup_school_id"],
+                        transaction_type=row["transaction_type"],
+                        payment_status=row["payment_status"],
+                        transaction_count=row["transaction_count"],
+                        total_amount=row["total_amount"],
+                        min_amount=row["min_amount"],
+                        max_amount=row["max_amount"],
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=500,
+            )
+
+        logger.info(
+            f"Rebuilt {len(created)} daily payment metric rows ({start_date or 'start'} to {end_date or 'now'})"
+        )
+        return len(created)
@@ -18,11 +18,12 @@ import stripe
 
 from finances.models import (
     PurchaseTransaction,
-    StudentAccountBalance,
     TransactionPaymentStatus,
     TransactionType,
 )
 
+from .hour_ledger import HourLedger
+from .streaming_fraud_scorer import StreamingFraudScorer
 from .stripe_base import StripeService
 
 logger = logging.getLogger(__name__)
@@ -178,9 +179,7 @@ class PaymentService:
 
             # Find corresponding transaction in database
             try:
-                purchase_transaction = PurchaseTransaction.objects.select_for_update().get(
-                    stripe_payment_intent_id=payment_intent_id
-                )
+                purchase_transaction = PurchaseTransaction.objects.get(stripe_payment_intent_id=payment_intent_id)
             except PurchaseTransaction.DoesNotExist:
                 logger.error(f"Transaction not found for payment intent {payment_intent_id}")
                 return {
@@ -189,8 +188,8 @@ class PaymentService:
                     "message": "Transaction record not found in database",
                 }
 
-            # Check if transaction is already completed (idempotency)
-            if purchase_transaction.payment_status == TransactionPaymentStatus.COMPLETED:
+            # Complete and credit the transaction; if the webhook got there first this is a no-op (idempotency)
+            if not self._credit_account(purchase_transaction):
                 logger.info(
                     f"Transaction {purchase_transaction.id} is already completed - returning success (idempotent)"
                 )
@@ -201,18 +200,7 @@ class PaymentService:
                     "message": "Transaction already completed",
                 }
 
-            # Use atomic transaction for consistency
-            with transaction.atomic():
-                # Update transaction status
-                purchase_transaction.payment_status = TransactionPaymentStatus.COMPLETED
-                purchase_transaction.save(update_fields=["payment_status", "updated_at"])
-
-                # Credit hours to student account if it's a package transaction
-                if purchase_transaction.transaction_type == TransactionType.PACKAGE:
-                    self._credit_hours_to_account(purchase_transaction)
-
-                # Update account balance with payment amount
-                self._update_account_balance(purchase_transaction)
+            StreamingFraudScorer().record_outcome(purchase_transaction)
 
             logger.info(f"Payment completion confirmed for transaction {purchase_transaction.id}")
 
@@ -284,6 +272,8 @@ class PaymentService:
 
                 purchase_transaction.save(update_fields=["payment_status", "metadata", "updated_at"])
 
+            StreamingFraudScorer().record_outcome(purchase_transaction)
+
             logger.info(f"Payment failure handled for transaction {purchase_transaction.id}")
 
             return {"success": True, "transaction_id": purchase_transaction.id, "payment_intent_id": payment_intent_id}
@@ -501,57 +491,25 @@ class PaymentService:
             metadata=metadata,
         )
 
-    def _credit_hours_to_account(self, purchase_transaction: PurchaseTransaction) -> None:
+    def _credit_account(self, purchase_transaction: PurchaseTransaction) -> bool:
         """
-        Credit hours to student account from completed package transaction.
+        Complete a transaction and credit it to the student's account balance.
 
-        Args:
-            purchase_transaction: Completed transaction containing hour information
-        """
-        # Get or create student account balance
-        student_balance, _created = StudentAccountBalance.objects.get_or_create(
-            student=purchase_transaction.student,
-            defaults={
-                "hours_purchased": Decimal("0.00"),
-                "hours_consumed": Decimal("0.00"),
-                "balance_amount": Decimal("0.00"),
-            },
-        )
-
-        # Extract hours from metadata
-        hours_to_add = Decimal("0.00")
-        if "hours" in purchase_transaction.metadata:
-            try:
-                hours_to_add = Decimal(str(purchase_transaction.metadata["hours"]))
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid hours value in transaction {purchase_transaction.id} metadata")
+        The payment amount, and for packages the hours from the transaction metadata, are
+        posted as one hour ledger entry.
 
-        # Add hours to account
-        if hours_to_add > 0:
-            student_balance.hours_purchased += hours_to_add
-            student_balance.save(update_fields=["hours_purchased", "updated_at"])
-
-            logger.info(f"Added {hours_to_add} hours to account for student {purchase_transaction.student.id}")  # type: ignore[attr-defined]
+        Args:
+            purchase_transaction: Transaction whose payment succeeded
 
-    def _update_account_balance(self, purchase_transaction: PurchaseTransaction) -> None:
+        Returns:
+            False, crediting nothing, if the transaction was already completed
         """
-        Update student account balance with payment amount.
+        entry = HourLedger.complete_purchase(purchase_transaction)
+        if entry is None:
+            return False
 
-        Args:
-            purchase_transaction: Completed transaction
-        """
-        # Get or create student account balance
-        student_balance, _created = StudentAccountBalance.objects.get_or_create(
-            student=purchase_transaction.student,
-            defaults={
-                "hours_purchased": Decimal("0.00"),
-                "hours_consumed": Decimal("0.00"),
-                "balance_amount": Decimal("0.00"),
-            },
+        logger.info(
+            f"Added {entry.hours_purchased} hours and €{entry.amount} to account "
+            f"for student {purchase_transaction.student_id}"  # type: ignore[attr-defined]
         )
-
-        # Add payment amount to balance
-        student_balance.balance_amount += purchase_transaction.amount
-        student_balance.save(update_fields=["balance_amount", "updated_at"])
-
-        logger.info(f"Added €{purchase_transaction.amount} to balance for student {purchase_transaction.student.id}")  # type: ignore[attr-defined]
+        return True
@@ -3,18 +3,12 @@ Services for calculating teacher payments and managing billing logic.
 """
 
 from decimal import Decimal
-from typing import Any, cast
 
 from django.db import models, transaction
 
-from ..models import (
-    ClassSession,
-    CompensationRuleType,
-    SchoolBillingSettings,
-    TeacherCompensationRule,
-    TeacherPaymentEntry,
-    TrialCostAbsorption,
-)
+from ..models import ClassSession, TeacherCompensationRule, TeacherPaymentEntry
+from .aggregation import SessionTotals, conditional_aggregate
+from .payroll_engine import CompensationRuleIndex, PayrollEngine
 
 
 class TeacherPaymentCalculator:
@@ -27,6 +21,9 @@ class TeacherPaymentCalculator:
         """
         Get the applicable hourly rate for a given session.
 
+        Rates are resolved by CompensationRuleIndex, the same rules the payroll engine
+        applies to whole months of sessions.
+
         Args:
             session: The class session to calculate rate for
 
@@ -34,66 +31,7 @@ class TeacherPaymentCalculator:
             Tuple of (rate, compensation_rule) where rate is the hourly rate
             and compensation_rule is the rule that was applied (or None for trial classes)
         """
-        # Handle trial classes based on school settings
-        if session.is_trial:
-            try:
-                billing_settings = SchoolBillingSettings.objects.get(school=session.school)  # type: ignore[misc]
-                if billing_settings.trial_cost_absorption == TrialCostAbsorption.SCHOOL:
-                    return Decimal("0.00"), None
-                elif billing_settings.trial_cost_absorption == TrialCostAbsorption.TEACHER:
-                    # Continue with normal calculation
-                    pass
-                elif billing_settings.trial_cost_absorption == TrialCostAbsorption.SPLIT:
-                    # Calculate normal rate and then split it
-                    rate, rule = TeacherPaymentCalculator._get_session_rate(session)
-                    return rate * Decimal("0.5"), rule
-            except SchoolBillingSettings.DoesNotExist:
-                # Default to school absorbing cost
-                return Decimal("0.00"), None
-
-        return TeacherPaymentCalculator._get_session_rate(session)
-
-    @staticmethod
-    def _get_session_rate(session: ClassSession) -> tuple[Decimal, TeacherCompensationRule | None]:
-        """Internal method to get the base rate for a session."""
-        # Get all active compensation rules for this teacher at this school
-        rules = TeacherCompensationRule.objects.filter(  # type: ignore[misc]
-            teacher=session.teacher,
-            school=session.school,
-            is_active=True,
-            effective_from__lte=session.date,
-        ).filter(models.Q(effective_until__isnull=True) | models.Q(effective_until__gte=session.date))
-
-        # Priority 1: Group class rate (if it's a group session)
-        if session.session_type == "group":
-            group_rule = rules.filter(rule_type=CompensationRuleType.GROUP_CLASS).first()
-            if group_rule and group_rule.rate_per_hour:
-                return group_rule.rate_per_hour, group_rule
-
-        # Priority 2: Grade-specific rate
-        grade_rule = rules.filter(
-            rule_type=CompensationRuleType.GRADE_SPECIFIC, grade_level=session.grade_level
-        ).first()
-        if grade_rule and grade_rule.rate_per_hour:
-            return grade_rule.rate_per_hour, grade_rule
-
-        # Priority 3: General grade-specific rate (if session has mixed grades)
-        if session.grade_level == "mixed":
-            # For mixed grade sessions, use the highest grade-specific rate available
-            highest_grade_rule = (
-                rules.filter(rule_type=CompensationRuleType.GRADE_SPECIFIC, rate_per_hour__isnull=False)
-                .order_by("-rate_per_hour")
-                .first()
-            )
-            if highest_grade_rule:
-                return highest_grade_rule.rate_per_hour, highest_grade_rule
-
-        # Priority 4: Teacher's default hourly rate from TeacherProfile
-        if session.teacher.hourly_rate:  # type: ignore[attr-defined]
-            return session.teacher.hourly_rate, None  # type: ignore[attr-defined]
-
-        # Default: No rate found
-        return Decimal("0.00"), None
+        return CompensationRuleIndex.for_session(session).applicable_rate(session)
 
     @staticmethod
     @transaction.atomic
@@ -114,38 +52,8 @@ class TeacherPaymentCalculator:
         if hasattr(session, "payment_entry"):
             return session.payment_entry
 
-        # Get the applicable rate
-        rate, rule = TeacherPaymentCalculator.get_applicable_rate(session)
-
-        # Calculate hours and amount
-        hours = session.duration_hours
-        amount = rate * hours
-
-        # Determine billing period (YYYY-MM format)
-        billing_period = session.date.strftime("%Y-%m")
-
-        # Create calculation notes
-        notes = f"Rate: €{rate}/hour, Hours: {hours}, Session: {session.get_session_type_display()}"
-        if session.is_trial:
-            notes += " (Trial session)"
-        if rule:
-            notes += f", Rule: {rule.get_rule_type_display()}"
-            if rule.grade_level:
-                notes += f" Grade {rule.grade_level}"
-
-        # Create payment entry
-        payment_entry = TeacherPaymentEntry.objects.create(
-            session=session,
-            teacher=cast(Any, session.teacher),
-            school=cast(Any, session.school),
-            billing_period=billing_period,
-            hours_taught=hours,
-            rate_applied=rate,
-            amount_earned=amount,
-            compensation_rule=rule,
-            calculation_notes=notes,
-        )
-
+        payment_entry = PayrollEngine.build_entry(session, CompensationRuleIndex.for_session(session))
+        payment_entry.save()
         return payment_entry
 
     @staticmethod
@@ -169,38 +77,35 @@ class TeacherPaymentCalculator:
             teacher=teacher, school=school, billing_period=billing_period
         )
 
-        # Calculate totals
-        total_hours = sum(entry.hours_taught for entry in payment_entries)
-        total_amount = sum(entry.amount_earned for entry in payment_entries)
-        session_count = payment_entries.count()
-
-        # Break down by session type
-        individual_entries = payment_entries.filter(session__session_type="individual")
-        group_entries = payment_entries.filter(session__session_type="group")
-        trial_entries = payment_entries.filter(session__is_trial=True)
+        # Totals and the per-session-type breakdown in a single query
+        totals = {
+            name: SessionTotals.from_aggregate(values)
+            for name, values in conditional_aggregate(
+                payment_entries,
+                buckets={
+                    "all": None,
+                    "individual": models.Q(session__session_type="individual"),
+                    "group": models.Q(session__session_type="group"),
+                    "trial": models.Q(session__is_trial=True),
+                },
+                metrics={
+                    "count": (models.Count, "id"),
+                    "hours": (models.Sum, "hours_taught"),
+                    "amount": (models.Sum, "amount_earned"),
+                },
+            ).items()
+        }
 
         return {
             "billing_period": billing_period,
             "teacher": teacher,
             "school": school,
-            "total_hours": total_hours,
-            "total_amount": total_amount,
-            "session_count": session_count,
-            "individual_sessions": {
-                "count": individual_entries.count(),
-                "hours": sum(entry.hours_taught for entry in individual_entries),
-                "amount": sum(entry.amount_earned for entry in individual_entries),
-            },
-            "group_sessions": {
-                "count": group_entries.count(),
-                "hours": sum(entry.hours_taught for entry in group_entries),
-                "amount": sum(entry.amount_earned for entry in group_entries),
-            },
-            "trial_sessions": {
-                "count": trial_entries.count(),
-                "hours": sum(entry.hours_taught for entry in trial_entries),
-                "amount": sum(entry.amount_earned for entry in trial_entries),
-            },
+            "total_hours": totals["all"].hours,
+            "total_amount": totals["all"].amount,
+            "session_count": totals["all"].count,
+            "individual_sessions": totals["individual"].as_dict(),
+            "group_sessions": totals["group"].as_dict(),
+            "trial_sessions": totals["trial"].as_dict(),
             "payment_entries": payment_entries,
         }
 
@@ -209,43 +114,22 @@ class BulkPaymentProcessor:
     """Service for processing payments in bulk."""
 
     @staticmethod
-    @transaction.atomic
-    def process_completed_sessions(school=None, start_date=None, end_date=None) -> dict:
+    def process_completed_sessions(school=None, start_date=None, end_date=None, chunk_size=None) -> dict:
         """
         Process payment calculations for all completed sessions in a date range.
 
+        Delegates to PayrollEngine, which resolves rates from preloaded compensation rules
+        and inserts the entries in chunked transactions instead of one long transaction.
+
         Args:
             school: Optional school to filter by
             start_date: Optional start date
             end_date: Optional end date
+            chunk_size: Optional number of sessions per transaction
 
         Returns:
             Dictionary with processing results
         """
-        # Build query for completed sessions without payment entries
-        sessions_query = ClassSession.objects.filter(status="completed", payment_entry__isnull=True)
-
-        if school:
-            sessions_query = sessions_query.filter(school=school)
-        if start_date:
-            sessions_query = sessions_query.filter(date__gte=start_date)
-        if end_date:
-            sessions_query = sessions_query.filter(date__lte=end_date)
-
-        sessions = sessions_query.select_related("teacher", "school")
-
-        processed_count = 0
-        errors = []
-
-        for session in sessions:
-            try:
-                TeacherPaymentCalculator.calculate_session_payment(session)
-                processed_count += 1
-            except Exception as e:
-                errors.append({"session_id": session.id, "session": str(session), "error": str(e)})
-
-        return {
-            "total_sessions": sessions.count(),
-            "processed_count": processed_count,
-            "errors": errors,
-        }
+        return PayrollEngine.run(
+            school=school, start_date=start_date, end_date=end_date, chunk_size=chunk_size
+        ).as_dict()
@@ -0,0 +1,312 @@
+"""
+Set-based payroll engine for teacher payment entries
+
+Month-end payroll used to calculate every completed session on its own inside one
+transaction, querying TeacherCompensationRule and SchoolBillingSettings per session. The
+engine instead loads every active rule for the teachers and schools being paid in one
+query, indexed by (teacher, school) and resolved against each session's date in memory,
+builds the TeacherPaymentEntry rows in Python and inserts them with bulk_create.
+
+Sessions are read in primary-key order, one chunk at a time, and each chunk is inserted in
+its own short transaction. After every committed chunk the id of the last session paid
+without a gap is stored as a checkpoint in the cache, so a run that is interrupted resumes
+after it. A chunk that fails to insert (for example because a session was paid
+concurrently) is rolled back and reported without stopping the run; its sessions, like any
+session whose entry could not be built, are still unpaid and are picked up again by the
+next run. bulk_create sends no post_save signals, so the cached dashboard earnings of the
+teachers in each committed chunk are invalidated here.
+
+The checkpoint is only as durable as the cache: with the LocMemCache used in development it
+lives in the process that ran the payroll, so a new process starts from the first unpaid
+session instead of resuming. That is slower but still correct, as paid sessions are
+filtered out.
+
+CompensationRuleIndex is the only implementation of the rate rules;
+TeacherPaymentCalculator resolves single sessions through it too.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+import logging
+
+from django.core.cache import cache
+from django.db import models, transaction
+
+from ..models import (
+    ClassSession,
+    CompensationRuleType,
+    SchoolBillingSettings,
+    SessionStatus,
+    SessionType,
+    TeacherCompensationRule,
+    TeacherPaymentEntry,
+    TrialCostAbsorption,
+)
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+PAYROLL_CHECKPOINT_TIMEOUT = 7 * 24 * 60 * 60
+
+
+@dataclass
+class PayrollRun:
+    """Outcome of a payroll run."""
+
+    total_sessions: int = 0
+    processed_count: int = 0
+    chunks_committed: int = 0
+    resumed_from: int | None = None
+    checkpoint: int | None = None
+    errors: list[dict] = field(default_factory=list)
+    chunk_errors: list[dict] = field(default_factory=list)
+
+    @property
+    def completed(self) -> bool:
+        return not self.errors and not self.chunk_errors
+
+    def as_dict(self) -> dict:
+        return {
+            "total_sessions": self.total_sessions,
+            "processed_count": self.processed_count,
+            "chunks_committed": self.chunks_committed,
+            "resumed_from": self.resumed_from,
+            "checkpoint": self.checkpoint,
+            "errors": self.errors,
+            "chunk_errors": self.chunk_errors,
+        }
+
+
+class CompensationRuleIndex:
+    """Active compensation rules by (teacher, school), resolved per session date."""
+
+    def __init__(self, rules, trial_cost_absorption: dict[int, str]):
+        self.rules: dict[tuple[int, int], list[TeacherCompensationRule]] = defaultdict(list)
+        for rule in rules:
+            self.rules[(rule.teacher_id, rule.school_id)].append(rule)
+        self.trial_cost_absorption = trial_cost_absorption
+
+    @classmethod
+    def load(cls, sessions: models.QuerySet, start_date: date | None = None, end_date: date | None = None):
+        """
+        Load the rules and billing settings that can apply to the given sessions.
+
+        Two queries regardless of how many sessions, teachers or schools are involved; the
+        session queryset is only used as a subquery.
+        """
+        rules = TeacherCompensationRule.objects.filter(
+            is_active=True,
+            teacher_id__in=sessions.values("teacher_id"),
+            school_id__in=sessions.values("school_id"),
+        )
+        if end_date:
+            rules = rules.filter(effective_from__lte=end_date)
+        if start_date:
+            rules = rules.filter(models.Q(effective_until__isnull=True) | models.Q(effective_until__gte=start_date))
+
+        settings = SchoolBillingSettings.objects.filter(school_id__in=sessions.values("school_id")).values_list(
+            "school_id", "trial_cost_absorption"
+        )
+        return cls(rules.order_by("id"), dict(settings))
+
+    @classmethod
+    def for_session(cls, session: ClassSession):
+        """The rules and billing settings for a single session."""
+        return cls.load(ClassSession.objects.filter(pk=session.pk), session.date, session.date)
+
+    def rules_on(self, teacher_id: int, school_id: int, day: date) -> list[TeacherCompensationRule]:
+        """The teacher's rules at the school that are in effect on the given day."""
+        return [
+            rule
+            for rule in self.rules.get((teacher_id, school_id), ())
+            if rule.effective_from <= day and (rule.effective_until is None or rule.effective_until >= day)
+        ]
+
+    def session_rate(self, session: ClassSession) -> tuple[Decimal, TeacherCompensationRule | None]:
+        """
+        Base hourly rate for a session: the group class rule for group sessions, then the
+        rule for the session's grade, then the highest grade rule for mixed grades, then the
+        teacher's default hourly rate.
+        """
+        rules = self.rules_on(session.teacher_id, session.school_id, session.date)  # type: ignore[attr-defined]
+
+        if session.session_type == SessionType.GROUP:
+            for rule in rules:
+                if rule.rule_type == CompensationRuleType.GROUP_CLASS:
+                    if rule.rate_per_hour:
+                        return rule.rate_per_hour, rule
+                    break
+
+        grade_rules = [rule for rule in rules if rule.rule_type == CompensationRuleType.GRADE_SPECIFIC]
+        for rule in grade_rules:
+            if rule.grade_level == session.grade_level:
+                if rule.rate_per_hour:
+                    return rule.rate_per_hour, rule
+                break
+
+        if session.grade_level == "mixed":
+            rated = [rule for rule in grade_rules if rule.rate_per_hour is not None]
+            if rated:
+                highest = max(rated, key=lambda rule: rule.rate_per_hour)
+                return highest.rate_per_hour, highest
+
+        if session.teacher.hourly_rate:  # type: ignore[attr-defined]
+            return session.teacher.hourly_rate, None  # type: ignore[attr-defined]
+
+        return ZERO, None
+
+    def applicable_rate(self, session: ClassSession) -> tuple[Decimal, TeacherCompensationRule | None]:
+        """
+        Hourly rate for a session after trial cost absorption: trial sessions are paid in full
+        when the teacher absorbs their cost, at half rate when it is split and not at all when
+        the school absorbs it (the default without billing settings).
+        """
+        if session.is_trial:
+            absorption = self.trial_cost_absorption.get(session.school_id)  # type: ignore[attr-defined]
+            if absorption == TrialCostAbsorption.SPLIT:
+                rate, rule = self.session_rate(session)
+                return rate * Decimal("0.5"), rule
+            if absorption != TrialCostAbsorption.TEACHER:
+                return ZERO, None
+
+        return self.session_rate(session)
+
+
+class PayrollEngine:
+    """Bulk calculation of teacher payment entries for completed sessions."""
+
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def unpaid_sessions(school=None, start_date: date | None = None, end_date: date | None = None):
+        """Completed sessions without a payment entry, optionally filtered."""
+        sessions = ClassSession.objects.filter(status=SessionStatus.COMPLETED, payment_entry__isnull=True)
+        if school:
+            sessions = sessions.filter(school=school)
+        if start_date:
+            sessions = sessions.filter(date__gte=start_date)
+        if end_date:
+            sessions = sessions.filter(date__lte=end_date)
+        return sessions
+
+    @staticmethod
+    def checkpoint_key(school=None, start_date: date | None = None, end_date: date | None = None) -> str:
+        school_id = getattr(school, "pk", school)
+        return f"payroll_checkpoint:{school_id or 'all'}:{start_date or ''}:{end_date or ''}"
+
+    @staticmethod
+    def build_entry(session: ClassSession, rules: CompensationRuleIndex) -> TeacherPaymentEntry:
+        """The unsaved payment entry for a completed session."""
+        rate, rule = rules.applicable_rate(session)
+        hours = session.duration_hours
+
+        notes = f"Rate: €{rate}/hour, Hours: {hours}, Session: {session.get_session_type_display()}"
+        if session.is_trial:
+            notes += " (Trial session)"
+        if rule:
+            notes += f", Rule: {rule.get_rule_type_display()}"
+            if rule.grade_level:
+                notes += f" Grade {rule.grade_level}"
+
+        return TeacherPaymentEntry(
+            session=session,
+            teacher_id=session.teacher_id,  # type: ignore[attr-defined]
+            school_id=session.school_id,  # type: ignore[attr-defined]
+            billing_period=session.date.strftime("%Y-%m"),
+            hours_taught=hours,
+            rate_applied=rate,
+            amount_earned=rate * hours,
+            compensation_rule=rule,
+            calculation_notes=notes,
+        )
+
+    @classmethod
+    def run(
+        cls,
+        school=None,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        chunk_size: int | None = None,
+        resume: bool = True,
+    ) -> PayrollRun:
+        """
+        Create payment entries for every unpaid completed session in the range.
+
+        Args:
+            school: Optional school to filter by
+            start_date: Optional first session date
+            end_date: Optional last session date
+            chunk_size: Sessions computed and inserted per transaction
+            resume: Continue after the checkpoint left by an interrupted run
+
+        Returns:
+            PayrollRun with counts, the checkpoint and per-session and per-chunk errors
+        """
+        # Imported here: the dashboard service imports finances.services itself
+        from accounts.services.teacher_dashboard_service import TeacherDashboardService
+
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        sessions = cls.unpaid_sessions(school, start_date, end_date)
+        key = cls.checkpoint_key(school, start_date, end_date)
+
+        result = PayrollRun()
+        result.resumed_from = cache.get(key) if resume else None
+        if result.resumed_from:
+            sessions = sessions.filter(id__gt=result.resumed_from)
+        result.total_sessions = sessions.count()
+
+        rules = CompensationRuleIndex.load(sessions, start_date, end_date)
+        sessions = sessions.select_related("teacher").order_by("id")
+
+        last_id = result.resumed_from or 0
+        checkpoint_blocked = False
+        while True:
+            chunk = list(sessions.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            entries = []
+            # The checkpoint may only move up to the session before the first one left unpaid
+            paid_through = last_id
+            for index, session in enumerate(chunk):
+                try:
+                    entries.append(cls.build_entry(session, rules))
+                except Exception as e:
+                    result.errors.append({"session_id": session.id, "session": str(session), "error": str(e)})
+                    if paid_through == last_id:
+                        paid_through = chunk[index - 1].id if index else None
+
+            try:
+                with transaction.atomic():
+                    TeacherPaymentEntry.objects.bulk_create(entries)
+            except Exception as e:
+                logger.exception(f"Payroll chunk ending at session {last_id} failed")
+                result.chunk_errors.append(
+                    {
+                        "first_session_id": chunk[0].id,
+                        "last_session_id": last_id,
+                        "session_count": len(chunk),
+                        "error": str(e),
+                    }
+                )
+                # Later chunks still run, but the checkpoint must not move past unpaid sessions
+                checkpoint_blocked = True
+            else:
+                result.processed_count += len(entries)
+                result.chunks_committed += 1
+                for teacher_id in {entry.teacher_id for entry in entries}:
+                    TeacherDashboardService.invalidate_cache(teacher_id, ["earnings"])
+                if not checkpoint_blocked and paid_through is not None:
+                    result.checkpoint = paid_through
+                    cache.set(key, paid_through, PAYROLL_CHECKPOINT_TIMEOUT)
+                checkpoint_blocked = checkpoint_blocked or paid_through != last_id
+
+            if len(chunk) < chunk_size:
+                break
+
+        if result.completed:
+            cache.delete(key)
+        return result
@@ -17,11 +17,13 @@ import stripe
 from finances.models import (
     AdminAction,
     AdminActionType,
+    HourLedgerEntryType,
     PurchaseTransaction,
     StudentAccountBalance,
     TransactionPaymentStatus,
 )
 
+from .hour_ledger import HourLedger
 from .rate_limiter import stripe_rate_limit
 from .stripe_base import StripeService
 
@@ -410,17 +412,14 @@ class RefundService:
         try:
             student_balance = StudentAccountBalance.objects.get(student=purchase_transaction.student)  # type: ignore[misc]
 
-            # Reduce balance by refund amount
-            student_balance.balance_amount -= refund_amount
+            hours_to_deduct = Decimal("0.00")
 
             # For package transactions, also reduce purchased hours proportionally
             if hasattr(purchase_transaction.metadata, "hours") and purchase_transaction.metadata.get("hours"):
                 try:
                     package_hours = Decimal(str(purchase_transaction.metadata["hours"]))
                     refund_ratio = refund_amount / purchase_transaction.amount
-                    hours_to_deduct = package_hours * refund_ratio
-
-                    student_balance.hours_purchased -= hours_to_deduct
+                    hours_to_deduct = (package_hours * refund_ratio).quantize(Decimal("0.01"))
 
                     logger.info(
                         f"Deducted {hours_to_deduct} hours from student {purchase_transaction.student.id} balance"  # type: ignore[attr-defined]
@@ -430,7 +429,17 @@ class RefundService:
                         f"Could not calculate hours deduction for refund on transaction {purchase_transaction.id}"
                     )
 
-            student_balance.save(update_fields=["balance_amount", "hours_purchased", "updated_at"])
+            # Reduce balance by refund amount (and the refunded share of the package hours)
+            HourLedger.post(
+                student_balance,
+                HourLedgerEntryType.PAYMENT_REFUND,
+                hours_purchased=-hours_to_deduct,
+                amount=-refund_amount,
+                purchase_transaction=purchase_transaction,
+                description=f"Refund of transaction {purchase_transaction.id}",
+                refresh=False,
+            )
+            HourLedger.adjust_packages({purchase_transaction.id: -hours_to_deduct})
 
             logger.info(
                 f"Student balance adjusted for refund: €{refund_amount} deducted from student {purchase_transaction.student.id}"  # type: ignore[attr-defined]
@@ -18,11 +18,11 @@ import stripe
 from finances.models import (
     PurchaseTransaction,
     StoredPaymentMethod,
-    StudentAccountBalance,
     TransactionPaymentStatus,
     TransactionType,
 )
 
+from .hour_ledger import HourLedger
 from .payment_method_service import PaymentMethodService
 from .stripe_base import StripeService
 
@@ -444,19 +444,10 @@ class RenewalPaymentService:
                 # Update transaction status (this will be handled by webhook in production)
                 # For immediate response, we update here too
                 try:
-                    with transaction.atomic():
-                        purchase_transaction = PurchaseTransaction.objects.get(
-                            stripe_payment_intent_id=payment_intent_id
-                        )
-                        purchase_transaction.payment_status = TransactionPaymentStatus.COMPLETED
-                        purchase_transaction.save(update_fields=["payment_status", "updated_at"])
-
-                        # Credit hours to student account if it's a package
-                        if purchase_transaction.transaction_type == TransactionType.PACKAGE:
-                            self._credit_hours_to_account(purchase_transaction)
-
-                        # Update account balance
-                        self._update_account_balance(purchase_transaction)
+                    purchase_transaction = PurchaseTransaction.objects.get(stripe_payment_intent_id=payment_intent_id)
+                    # The webhook for the same payment intent may be completing it concurrently;
+                    # only the one that moves it to COMPLETED credits the account
+                    self._credit_account(purchase_transaction)
 
                 except PurchaseTransaction.DoesNotExist:
                     logger.error(f"Transaction not found for payment intent {payment_intent_id}")
@@ -483,60 +474,28 @@ class RenewalPaymentService:
                 "message": f"Failed to confirm payment: {e!s}",
             }
 
-    def _credit_hours_to_account(self, purchase_transaction: PurchaseTransaction) -> None:
-        """
-        Credit hours to student account from completed package transaction.
-
-        Args:
-            purchase_transaction: Completed transaction containing hour information
+    def _credit_account(self, purchase_transaction: PurchaseTransaction) -> bool:
         """
-        # Get or create student account balance
-        student_balance, _created = StudentAccountBalance.objects.get_or_create(
-            student=purchase_transaction.student,
-            defaults={
-                "hours_purchased": Decimal("0.00"),
-                "hours_consumed": Decimal("0.00"),
-                "balance_amount": Decimal("0.00"),
-            },
-        )
-
-        # Extract hours from metadata
-        hours_to_add = Decimal("0.00")
-        if "hours" in purchase_transaction.metadata:
-            try:
-                hours_to_add = Decimal(str(purchase_transaction.metadata["hours"]))
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid hours value in transaction {purchase_transaction.id} metadata")
+        Complete a transaction and credit it to the student's account balance.
 
-        # Add hours to account
-        if hours_to_add > 0:
-            student_balance.hours_purchased += hours_to_add
-            student_balance.save(update_fields=["hours_purchased", "updated_at"])
+        The payment amount, and for packages the hours from the transaction metadata, are
+        posted as one hour ledger entry.
 
-            logger.info(f"Added {hours_to_add} hours to account for student {purchase_transaction.student.id}")  # type: ignore[attr-defined]
+        Args:
+            purchase_transaction: Transaction whose payment succeeded
 
-    def _update_account_balance(self, purchase_transaction: PurchaseTransaction) -> None:
+        Returns:
+            False, crediting nothing, if the transaction was already completed
         """
-        Update student account balance with payment amount.
+        entry = HourLedger.complete_purchase(purchase_transaction)
+        if entry is None:
+            return False
 
-        Args:
-            purchase_transaction: Completed transaction
-        """
-        # Get or create student account balance
-        student_balance, _created = StudentAccountBalance.objects.get_or_create(
-            student=purchase_transaction.student,
-            defaults={
-                "hours_purchased": Decimal("0.00"),
-                "hours_consumed": Decimal("0.00"),
-                "balance_amount": Decimal("0.00"),
-            },
+        logger.info(
+            f"Added {entry.hours_purchased} hours and €{entry.amount} to account "
+            f"for student {purchase_transaction.student_id}"  # type: ignore[attr-defined]
         )
-
-        # Add payment amount to balance
-        student_balance.balance_amount += purchase_transaction.amount
-        student_balance.save(update_fields=["balance_amount", "updated_at"])
-
-        logger.info(f"Added €{purchase_transaction.amount} to balance for student {purchase_transaction.student.id}")  # type: ignore[attr-defined]
+        return True
 
     def _calculate_savings_percent(self, hours: Decimal, price: Decimal) -> float:
         """
@@ -0,0 +1,175 @@
+"""
+Streaming fraud scorer with rolling per-user state.
+
+FraudDetectionService recounts a user's history with several table scans on every
+check. StreamingFraudScorer instead keeps a compact state per user in the default
+cache (Redis in production), updated by the payment success/failure paths:
+
+- timestamps of the most recent attempts, failures and high-value payments, capped at
+  each rule's threshold since scores stop growing once a threshold is reached
+- a running count, mean and M2 of completed amounts (Welford's algorithm)
+
+Scoring a payment is then a single cache read. The state is best effort: a lost
+update under concurrent payments only delays a signal, and the nightly
+FraudDetectionService.run_batch_analysis remains the authoritative check.
+
+Alerts raised by a score are written with one bulk insert once the surrounding
+transaction commits, so a rolled-back payment never leaves an alert behind.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import logging
+from typing import Any
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from finances.models import PurchaseTransaction, TransactionPaymentStatus
+
+from .fraud_detection_service import FraudDetectionService
+
+logger = logging.getLogger(__name__)
+
+# Amount statistics go stale after 90 days without payments, matching the batch history window
+STREAMING_STATE_TIMEOUT = 60 * 60 * 24 * 90
+
+
+class StreamingFraudScorer:
+    """O(1) fraud scoring at payment time from rolling per-user counters."""
+
+    cache_prefix = "finances:fraud_state"
+
+    def __init__(self, detection_service: FraudDetectionService | None = None):
+        """
+        Args:
+            detection_service: Service whose thresholds, scores and alerts are used
+        """
+        self.detection_service = detection_service or FraudDetectionService()
+        self.thresholds = self.detection_service.THRESHOLDS
+
+    @classmethod
+    def state_key(cls, user_id: int) -> str:
+        return f"{cls.cache_prefix}:{user_id}"
+
+    @staticmethod
+    def empty_state() -> dict[str, Any]:
+        return {"attempts": [], "failures": [], "high_value": [], "count": 0, "mean": 0.0, "m2": 0.0}
+
+    def get_state(self, user_id: int) -> dict[str, Any]:
+        return cache.get(self.state_key(user_id)) or self.empty_state()
+
+    def score(self, transaction: PurchaseTransaction, state: dict[str, Any] | None = None) -> dict[str, Any]:
+        """
+        Score a transaction from the user's rolling state, mirroring analyze_transaction.
+
+        The transaction is not in the state yet, so it is counted on top of it: as an attempt
+        and, when completed, as a high-value payment, like the batch rules count it. The
+        multiple-payment-methods rule needs stored payment methods and is left to batch analysis.
+        """
+        now = timezone.now()
+        if state is None:
+            state = self.get_state(transaction.student_id)  # type: ignore[attr-defined]
+
+        rapid_window = timedelta(minutes=float(self.thresholds["rapid_transactions"]["time_window_minutes"]))  # type: ignore[arg-type]
+        failed_window = timedelta(hours=float(self.thresholds["failed_attempts_threshold"]["time_window_hours"]))  # type: ignore[arg-type]
+
+        mean_amount = std_dev = None
+        if state["count"] >= 3:
+            mean_amount = Decimal(str(state["mean"]))
+            std_dev = Decimal(str((state["m2"] / state["count"]) ** 0.5))
+
+        high_value = self._count_since(state["high_value"], now - timedelta(hours=24))
+        if self._is_high_value(transaction):
+            high_value += 1
+        attempts = self._count_since(state["attempts"], now - rapid_window) + 1
+
+        service = self.detection_service
+        results = [
+            service._score_high_value_transactions(high_value),
+            service._score_rapid_transactions(attempts),
+            service._score_failed_attempts(self._count_since(state["failures"], now - failed_window)),
+            service._score_new_user_high_value(now - transaction.student.date_joined, transaction.amount),  # type: ignore[attr-defined]
+            service._score_unusual_amount(transaction.amount, mean_amount, std_dev),
+        ]
+        risk_factors = [result for result in results if result["risk_score"] > 0]
+
+        return {
+            "transaction_id": transaction.id,
+            "risk_score": min(sum((r["risk_score"] for r in risk_factors), Decimal("0.00")), Decimal("100.00")),
+            "risk_factors": risk_factors,
+        }
+
+    def record_success(self, transaction: PurchaseTransaction) -> dict[str, Any]:
+        """
+        Score a completed payment, then fold it into the user's state.
+
+        Scoring happens before the update so the amount is compared to the prior history,
+        as the batch rules exclude the current transaction. Alerts are raised through
+        FraudDetectionService, so the usual 24-hour dedup applies, once the surrounding
+        transaction has committed.
+        """
+        now = timezone.now()
+        state = self.get_state(transaction.student_id)  # type: ignore[attr-defined]
+        result = self.score(transaction, state)
+
+        self._push(state, "attempts", now, self.thresholds["rapid_transactions"]["count"])
+        if self._is_high_value(transaction):
+            self._push(state, "high_value", now, self.thresholds["high_value_transactions_24h"]["count"])
+
+        # Welford update of the running mean and sum of squared deviations
+        amount = float(transaction.amount)
+        state["count"] += 1
+        delta = amount - state["mean"]
+        state["mean"] += delta / state["count"]
+        state["m2"] += delta * (amount - state["mean"])
+
+        cache.set(self.state_key(transaction.student_id), state, STREAMING_STATE_TIMEOUT)  # type: ignore[attr-defined]
+
+        alerts = [risk_data for risk_data in result["risk_factors"] if risk_data.get("generate_alert", False)]
+        if alerts:
+            db_transaction.on_commit(lambda: self._generate_alerts(transaction, alerts))
+
+        return result
+
+    def record_failure(self, transaction: PurchaseTransaction) -> None:
+        """Fold a failed payment attempt into the user's state."""
+        now = timezone.now()
+        state = self.get_state(transaction.student_id)  # type: ignore[attr-defined]
+        self._push(state, "attempts", now, self.thresholds["rapid_transactions"]["count"])
+        self._push(state, "failures", now, self.thresholds["failed_attempts_threshold"]["count"])
+        cache.set(self.state_key(transaction.student_id), state, STREAMING_STATE_TIMEOUT)  # type: ignore[attr-defined]
+
+    def record_outcome(self, transaction: PurchaseTransaction) -> None:
+        """Feed a transaction's final status to the scorer without ever failing the payment flow."""
+        try:
+            if transaction.payment_status == TransactionPaymentStatus.COMPLETED:
+                result = self.record_success(transaction)
+                if result["risk_score"] > 0:
+                    logger.info(f"Transaction {transaction.id} streaming risk score: {result['risk_score']}")
+            elif transaction.payment_status == TransactionPaymentStatus.FAILED:
+                self.record_failure(transaction)
+        except Exception as e:
+            logger.error(f"Error updating streaming fraud state for transaction {transaction.id}: {e}")
+
+    def _generate_alerts(self, transaction: PurchaseTransaction, alerts: list[dict[str, Any]]) -> None:
+        self.detection_service._bulk_generate_fraud_alerts(
+            [(transaction, risk_data) for risk_data in alerts], [transaction]
+        )
+
+    def _is_high_value(self, transaction: PurchaseTransaction) -> bool:
+        return (
+            transaction.payment_status == TransactionPaymentStatus.COMPLETED
+            and transaction.amount >= self.thresholds["high_value_transactions_24h"]["amount"]  # type: ignore[operator]
+        )
+
+    @staticmethod
+    def _push(state: dict[str, Any], field: str, when: datetime, keep: int) -> None:
+        """Append a timestamp, keeping only the newest `keep` entries."""
+        state[field] = (state[field] + [when.timestamp()])[-keep:]
+
+    @staticmethod
+    def _count_since(timestamps: list[float], since: datetime) -> int:
+        cutoff = since.timestamp()
+        return sum(1 for stamp in timestamps if stamp >= cutoff)
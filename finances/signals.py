@@ -1,3 +1,4 @@
+import datetime
 import logging
 
 from django.apps import apps
@@ -44,4 +45,58 @@ def setup_user_payment_profile(sender, instance, created, **kwargs):
             logger.error(f"Error setting up payment profile: {e}")
 
 
+def capture_payment_metric_state(sender, instance, update_fields=None, **kwargs):
+    """Remember which rollup row a transaction counted towards before it is saved."""
+    from .services.payment_metrics_service import ROLLUP_FIELDS
+
+    instance._payment_metric_skip = update_fields is not None and not ROLLUP_FIELDS.intersection(update_fields)
+    instance._payment_metric_previous = None
+    if instance.pk and not instance._payment_metric_skip:
+        instance._payment_metric_previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("created_at", "transaction_type", "payment_status", "amount")
+            .first()
+        )
+
+
+def update_payment_metrics(sender, instance, created, **kwargs):
+    """Move a saved transaction between daily payment metric rows."""
+    if getattr(instance, "_payment_metric_skip", False):
+        return
+
+    previous = getattr(instance, "_payment_metric_previous", None)
+    current = (instance.created_at, instance.transaction_type, instance.payment_status, instance.amount)
+    if previous == current:
+        return
+
+    try:
+        from .services.payment_metrics_service import PaymentMetricsRollupService, RollupEntry
+
+        school_id = PaymentMetricsRollupService.student_school_id(instance.student_id)
+        old_entry = None
+        if previous is not None:
+            created_at, transaction_type, payment_status, amount = previous
+            old_entry = RollupEntry(
+                date=created_at.astimezone(datetime.UTC).date(),
+                school_id=school_id,
+                transaction_type=transaction_type,
+                payment_status=payment_status,
+                amount=amount,
+            )
+        PaymentMetricsRollupService.apply_change(old_entry, PaymentMetricsRollupService.entry_for(instance, school_id))
+    except Exception as e:
+        logger.error(f"Error updating payment metrics for transaction {instance.pk}: {e}")
+
+
+def remove_payment_metrics(sender, instance, **kwargs):
+    """Remove a deleted transaction from the daily payment metrics."""
+    try:
+        from .services.payment_metrics_service import PaymentMetricsRollupService
+
+        school_id = PaymentMetricsRollupService.student_school_id(instance.student_id)
+        PaymentMetricsRollupService.apply_change(PaymentMetricsRollupService.entry_for(instance, school_id), None)
+    except Exception as e:
+        logger.error(f"Error removing payment metrics for transaction {instance.pk}: {e}")
+
+
 # Note: Signal connections are handled in apps.py ready() method
@@ -0,0 +1,141 @@
+"""
+Unit Tests for Batch Fraud Analysis
+
+Batch analysis must score every transaction exactly like
+FraudDetectionService.analyze_transaction while loading user history with a
+fixed number of grouped queries and writing alerts in bulk.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from finances.models import (
+    AdminAction,
+    FraudAlert,
+    PurchaseTransaction,
+    StoredPaymentMethod,
+    TransactionPaymentStatus,
+    TransactionType,
+)
+from finances.services.fraud_detection_service import FraudDetectionService
+
+
+class BatchFraudAnalysisTests(TestCase):
+    """Test batch fraud analysis against the per-transaction rules"""
+
+    def setUp(self):
+        self.service = FraudDetectionService()
+        self.admin_user = CustomUser.objects.create_user(email="admin@test.com", name="Admin User")
+        self.steady_user = CustomUser.objects.create_user(email="steady@test.com", name="Steady User")
+        self.new_user = CustomUser.objects.create_user(email="new@test.com", name="New User")
+        CustomUser.objects.filter(pk=self.steady_user.pk).update(date_joined=timezone.now() - timedelta(days=200))
+        self.steady_user.refresh_from_db()
+
+    def create_transaction(self, student, amount, status=TransactionPaymentStatus.COMPLETED, age=None):
+        transaction = PurchaseTransaction.objects.create(
+            student=student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal(amount),
+            payment_status=status,
+        )
+        if age is not None:
+            PurchaseTransaction.objects.filter(pk=transaction.pk).update(created_at=timezone.now() - age)
+            transaction.refresh_from_db()
+        return transaction
+
+    def create_risky_activity(self):
+        # Steady history followed by one outlier, several failures and rapid retries
+        for days in range(1, 11):
+            self.create_transaction(self.steady_user, "45.00" if days % 2 else "55.00", age=timedelta(days=days))
+        self.create_transaction(self.steady_user, "900.00", age=timedelta(minutes=5))
+        for _ in range(6):
+            self.create_transaction(self.steady_user, "50.00", status=TransactionPaymentStatus.FAILED)
+        self.create_transaction(self.new_user, "250.00")
+        for index in range(4):
+            StoredPaymentMethod.objects.create(
+                student=self.new_user,
+                stripe_payment_method_id=f"pm_test_{index}",
+                stripe_customer_id="cus_test",
+            )
+
+    def recent_transactions(self):
+        return list(
+            PurchaseTransaction.objects.filter(payment_status=TransactionPaymentStatus.COMPLETED)
+            .select_related("student")
+            .order_by("id")
+        )
+
+    def test_batch_scores_match_single_analysis(self):
+        """Risk scores and risk factors match analyze_transaction for every transaction"""
+        self.create_risky_activity()
+        transactions = self.recent_transactions()
+
+        batch = self.service.analyze_transactions_batch(transactions)
+        single = [self.service.analyze_transaction(transaction) for transaction in transactions]
+
+        for batch_analysis, single_analysis in zip(batch, single, strict=True):
+            self.assertEqual(batch_analysis["risk_score"], single_analysis["risk_score"])
+            self.assertEqual(
+                [(factor["check_type"], factor["risk_score"]) for factor in batch_analysis["risk_factors"]],
+                [(factor["check_type"], factor["risk_score"]) for factor in single_analysis["risk_factors"]],
+            )
+
+    def test_pending_transaction_is_scored_against_completed_history(self):
+        """A pending transaction is not in the completed history, so nothing is subtracted for it"""
+        for days in range(1, 11):
+            self.create_transaction(self.steady_user, "45.00" if days % 2 else "55.00", age=timedelta(days=days))
+        pending = self.create_transaction(self.steady_user, "900.00", status=TransactionPaymentStatus.PENDING)
+        pending = PurchaseTransaction.objects.select_related("student").get(pk=pending.pk)
+
+        (batch,) = self.service.analyze_transactions_batch([pending])
+        single = self.service.analyze_transaction(pending)
+
+        self.assertEqual(batch["risk_score"], single["risk_score"])
+        unusual = next(factor for factor in batch["risk_factors"] if factor["check_type"] == "unusual_amount_patterns")
+        self.assertEqual(unusual["details"]["historical_mean"], Decimal("50.00"))
+        self.assertEqual(unusual["details"]["standard_deviation"], Decimal("5.00"))
+        self.assertEqual(unusual["risk_score"], Decimal("25.00"))
+
+    def test_alerts_created_in_bulk_and_deduplicated(self):
+        """Each user gets one alert per type and reruns within 24 hours add nothing"""
+        self.create_risky_activity()
+
+        first = self.service.run_batch_analysis(admin_user=self.admin_user)
+        second = self.service.run_batch_analysis(admin_user=self.admin_user)
+
+        alerts = FraudAlert.objects.all()
+        self.assertEqual(first["alerts_generated"], alerts.count())
+        self.assertEqual(second["alerts_generated"], 0)
+        self.assertEqual(
+            set(alerts.values_list("target_user_id", "alert_type")),
+            {(self.steady_user.id, "unusual_spending_pattern"), (self.new_user.id, "new_user_high_value")},
+        )
+        self.assertTrue(all(alert.alert_id.startswith("FA-") for alert in alerts))
+        self.assertTrue(all(alert.related_transactions.count() == 1 for alert in alerts))
+        # One admin action per alert plus one per batch run
+        self.assertEqual(AdminAction.objects.count(), alerts.count() + 2)
+
+    def test_query_count_does_not_grow_with_transactions(self):
+        """Fifty transactions across many users cost the same queries as five"""
+        users = [
+            CustomUser.objects.create_user(email=f"user{index}@test.com", name=f"User {index}") for index in range(10)
+        ]
+        for user in users:
+            for days in range(5):
+                self.create_transaction(user, "40.00", age=timedelta(days=days, hours=1))
+
+        small = self.recent_transactions()[:5]
+        large = self.recent_transactions()
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.service.analyze_transactions_batch(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.service.analyze_transactions_batch(large)
+
+        self.assertEqual(len(small_queries.captured_queries), len(large_queries.captured_queries))
@@ -0,0 +1,147 @@
+"""
+Tests for batched hour deduction and refunds of group sessions.
+
+Validating, deducting and refunding hours for a session must cost a fixed number of
+queries however many students attend it.
+"""
+
+from datetime import date, time
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import CustomUser, School, TeacherProfile
+from finances.models import (
+    ClassSession,
+    HourConsumption,
+    HourLedgerEntryType,
+    PurchaseTransaction,
+    SessionType,
+    StudentAccountBalance,
+    TransactionPaymentStatus,
+    TransactionType,
+)
+from finances.services.hour_deduction_service import (
+    HourDeductionService,
+    InsufficientBalanceError,
+    PackageExpiredError,
+)
+
+
+class GroupHourDeductionTests(TestCase):
+    """Test hour deduction and refunds for sessions with several students"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+        self.students = 0
+
+    def add_student(self, hours=Decimal("5.00"), package_hours=(5,)):
+        self.students += 1
+        student = CustomUser.objects.create_user(
+            email=f"student{self.students}@test.com", name=f"Student {self.students}"
+        )
+        if hours is not None:
+            StudentAccountBalance.objects.create(student=student, hours_purchased=hours)
+        for included in package_hours:
+            PurchaseTransaction.objects.create(
+                student=student,
+                transaction_type=TransactionType.PACKAGE,
+                amount=Decimal("50.00"),
+                payment_status=TransactionPaymentStatus.COMPLETED,
+                metadata={"hours_included": included},
+            )
+        return student
+
+    def create_session(self, students, day=3):
+        session = ClassSession.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            date=date(2025, 3, day),
+            start_time=time(10, 0),
+            end_time=time(11, 30),
+            session_type=SessionType.GROUP,
+            grade_level="7",
+            student_count=len(students),
+        )
+        session.students.set(students)
+        return session
+
+    def deduct(self, session):
+        with CaptureQueriesContext(connection) as queries:
+            records = HourDeductionService.validate_and_deduct_hours_for_session(session)
+        return records, len(queries)
+
+    def test_deduction_queries_do_not_grow_with_the_group(self):
+        small, small_queries = self.deduct(self.create_session([self.add_student() for _ in range(2)]))
+        large, large_queries = self.deduct(self.create_session([self.add_student() for _ in range(10)], day=4))
+
+        self.assertEqual((len(small), len(large)), (2, 10))
+        self.assertEqual(large_queries, small_queries)
+        self.assertLess(large_queries, 15)
+
+    def test_deduction_updates_balances_packages_and_ledger(self):
+        spanning = self.add_student(package_hours=(1, 4))
+        plain = self.add_student()
+        session = self.create_session([spanning, plain])
+
+        records, _queries = self.deduct(session)
+
+        self.assertEqual(HourConsumption.objects.filter(class_session=session).count(), 2)
+        for student in (spanning, plain):
+            balance = StudentAccountBalance.objects.get(student=student)
+            self.assertEqual(balance.hours_consumed, Decimal("1.50"))
+        spanning_packages = PurchaseTransaction.objects.filter(student=spanning).order_by("created_at", "id")
+        self.assertEqual([package.hours_remaining for package in spanning_packages], [Decimal("0"), Decimal("3.50")])
+        spanning_record = next(record for record in records if record.student_account.student_id == spanning.id)
+        self.assertEqual(spanning_record.purchase_transaction_id, spanning_packages[0].id)
+        self.assertEqual(spanning_record.ledger_entries.filter(entry_type=HourLedgerEntryType.CONSUMPTION).count(), 2)
+
+    def test_students_without_a_balance_or_packages_are_rejected(self):
+        ready = self.add_student()
+        no_balance = self.add_student(hours=None)
+
+        with self.assertRaisesMessage(InsufficientBalanceError, f"Student {no_balance.name} has insufficient balance"):
+            HourDeductionService.validate_and_deduct_hours_for_session(self.create_session([ready, no_balance]))
+
+        no_package = self.add_student(package_hours=())
+        with self.assertRaisesMessage(InsufficientBalanceError, "has no tutoring packages purchased"):
+            HourDeductionService.validate_and_deduct_hours_for_session(self.create_session([ready, no_package], day=4))
+
+        exhausted = self.add_student(package_hours=(1,))
+        PurchaseTransaction.objects.filter(student=exhausted).update(hours_remaining=Decimal("0.00"))
+        with self.assertRaises(PackageExpiredError):
+            HourDeductionService.validate_and_deduct_hours_for_session(self.create_session([ready, exhausted], day=5))
+
+        self.assertFalse(HourConsumption.objects.exists())
+
+    def test_cancellation_refunds_every_student_in_bulk(self):
+        small = self.create_session([self.add_student(package_hours=(1, 4)) for _ in range(2)])
+        large = self.create_session([self.add_student() for _ in range(8)], day=4)
+        HourDeductionService.validate_and_deduct_hours_for_session(small)
+        HourDeductionService.validate_and_deduct_hours_for_session(large)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            summary = HourDeductionService.refund_hours_for_session(small, reason="Teacher ill")
+        with CaptureQueriesContext(connection) as large_queries:
+            HourDeductionService.refund_hours_for_session(large, reason="Teacher ill")
+
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.assertEqual(summary["refunded_count"], 2)
+        self.assertEqual(summary["total_hours_refunded"], Decimal("3.00"))
+        self.assertFalse(HourConsumption.objects.filter(is_refunded=False).exists())
+        self.assertFalse(StudentAccountBalance.objects.exclude(hours_consumed=Decimal("0.00")).exists())
+        self.assertEqual(
+            sorted(
+                package.hours_remaining
+                for package in PurchaseTransaction.objects.filter(student__in=small.students.all())
+            ),
+            [Decimal("1.00"), Decimal("1.00"), Decimal("4.00"), Decimal("4.00")],
+        )
+
+        repeated = HourDeductionService.refund_hours_for_session(small, reason="Teacher ill")
+        self.assertEqual(repeated["refunded_count"], 0)
@@ -0,0 +1,352 @@
+"""
+Tests for the append-only hour ledger behind StudentAccountBalance.
+
+Balance changes must be applied by the database (F() expressions) so that concurrent
+bookings, refunds and payment webhooks for the same student never lose each other's
+updates, and every balance must be reproducible from its ledger entries.
+"""
+
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+import threading
+import time as time_module
+
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections
+from django.test import TestCase, TransactionTestCase
+
+from accounts.models import CustomUser, School, TeacherProfile
+from finances.models import (
+    ClassSession,
+    HourConsumption,
+    HourLedgerEntry,
+    HourLedgerEntryType,
+    PurchaseTransaction,
+    SessionType,
+    StudentAccountBalance,
+    TransactionPaymentStatus,
+    TransactionType,
+)
+from finances.services.hour_deduction_service import HourDeductionService
+from finances.services.hour_ledger import HourLedger
+from finances.views import _process_payment_success
+
+
+class HourLedgerTestMixin:
+    def create_fixtures(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+        self.student = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+        self.package = PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal("100.00"),
+            payment_status=TransactionPaymentStatus.COMPLETED,
+            metadata={"hours": 10},
+        )
+        self.balance = StudentAccountBalance.objects.create(
+            student=self.student, hours_purchased=Decimal("10.00"), balance_amount=Decimal("100.00")
+        )
+
+    def create_session(self, day_offset=0):
+        return ClassSession.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            date=date(2025, 3, 3) + timedelta(days=day_offset),
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            session_type=SessionType.INDIVIDUAL,
+            grade_level="7",
+        )
+
+    def consume(self, account, hours="1.00", day_offset=0, reserved=None):
+        return HourConsumption.objects.create(
+            student_account=account,
+            class_session=self.create_session(day_offset),
+            purchase_transaction=self.package,
+            hours_consumed=Decimal(hours),
+            hours_originally_reserved=Decimal(reserved or hours),
+        )
+
+
+class HourLedgerTests(HourLedgerTestMixin, TestCase):
+    """Test posting, crediting and reconciling ledger entries"""
+
+    def setUp(self):
+        self.create_fixtures()
+
+    def test_new_balances_open_the_ledger(self):
+        entry = self.balance.ledger_entries.get()
+        self.assertEqual(entry.entry_type, HourLedgerEntryType.OPENING)
+        self.assertEqual((entry.hours_purchased, entry.amount), (Decimal("10.00"), Decimal("100.00")))
+
+        empty = StudentAccountBalance.objects.create(
+            student=CustomUser.objects.create_user(email="other@test.com", name="Other")
+        )
+        self.assertFalse(empty.ledger_entries.exists())
+
+    def test_consumption_does_not_overwrite_concurrent_changes(self):
+        stale = StudentAccountBalance.objects.get(pk=self.balance.pk)
+
+        self.consume(self.balance, "1.50")
+        self.consume(stale, "2.00", day_offset=1)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("3.50"))
+        self.assertEqual(self.balance.remaining_hours, Decimal("6.50"))
+        self.assertEqual(stale.hours_consumed, Decimal("3.50"))
+        self.assertEqual(self.balance.ledger_entries.filter(entry_type=HourLedgerEntryType.CONSUMPTION).count(), 2)
+
+    def test_refund_is_posted_once(self):
+        consumption = self.consume(self.balance, "1.50", reserved="2.00")
+        other_copy = HourConsumption.objects.get(pk=consumption.pk)
+
+        self.assertEqual(consumption.process_refund("Ended early"), Decimal("0.50"))
+        with self.assertRaises(ValueError):
+            other_copy.process_refund("Ended early")
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("1.00"))
+        refund = self.balance.ledger_entries.get(entry_type=HourLedgerEntryType.REFUND)
+        self.assertEqual((refund.hours_consumed, refund.hour_consumption), (Decimal("-0.50"), consumption))
+
+    def test_webhook_credits_a_purchase_once(self):
+        purchase = PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal("45.00"),
+            payment_status=TransactionPaymentStatus.PROCESSING,
+            stripe_payment_intent_id="pi_ledger",
+            metadata={"hours": "5"},
+        )
+
+        _process_payment_success({"id": "pi_ledger"})
+        _process_payment_success({"id": "pi_ledger"})
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_purchased, Decimal("15.00"))
+        self.assertEqual(self.balance.balance_amount, Decimal("145.00"))
+        credit = purchase.ledger_entries.get()
+        self.assertEqual(credit.entry_type, HourLedgerEntryType.PURCHASE)
+
+    def test_credit_creates_missing_balance(self):
+        student = CustomUser.objects.create_user(email="new@test.com", name="New Student")
+        purchase = PurchaseTransaction.objects.create(
+            student=student,
+            transaction_type=TransactionType.SUBSCRIPTION,
+            amount=Decimal("20.00"),
+            payment_status=TransactionPaymentStatus.COMPLETED,
+            metadata={"hours": 3},
+        )
+
+        entry = HourLedger.credit_purchase(purchase)
+
+        self.assertEqual(entry.entry_type, HourLedgerEntryType.PAYMENT)
+        balance = StudentAccountBalance.objects.get(student=student)
+        self.assertEqual((balance.hours_purchased, balance.balance_amount), (Decimal("0.00"), Decimal("20.00")))
+
+    def test_entries_are_append_only(self):
+        entry = self.balance.ledger_entries.get()
+        entry.description = "Edited"
+
+        with self.assertRaises(ValueError):
+            entry.save()
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.consume(self.balance, "2.00")
+        StudentAccountBalance.objects.filter(pk=self.balance.pk).update(hours_consumed=Decimal("9.00"))
+
+        out = StringIO()
+        call_command("reconcile_hour_ledger", stdout=out)
+        self.assertIn("1 of 1 balances do not match", out.getvalue())
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("9.00"))
+
+        with self.assertNumQueries(2):
+            result = HourLedger.reconcile(fix=True)
+        self.assertEqual(result.mismatched_account_ids, [self.balance.pk])
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("2.00"))
+        self.assertEqual(HourLedger.reconcile().mismatched_account_ids, [])
+
+
+class HourLedgerConcurrencyTests(HourLedgerTestMixin, TransactionTestCase):
+    """Many threads booking, refunding and crediting hours for one student"""
+
+    THREADS = 8
+    POSTS_PER_THREAD = 10
+    MAX_ATTEMPTS = 500
+
+    def retry(self, func, *args, **kwargs):
+        # SQLite's shared in-memory test database rejects concurrent writers instead of
+        # waiting for them; retry the whole operation like a busy timeout would
+        for _ in range(self.MAX_ATTEMPTS - 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError:
+                time_module.sleep(0.001)
+        return func(*args, **kwargs)
+
+    def post_with_retry(self, entry_type, **deltas):
+        def post():
+            account = StudentAccountBalance.objects.get(pk=self.balance.pk)
+            return HourLedger.post(account, entry_type, refresh=False, **deltas)
+
+        return self.retry(post)
+
+    def run_threads(self, worker):
+        errors = []
+
+        def run(index):
+            try:
+                worker(index)
+            except Exception as e:  # pragma: no cover - surfaced by the assertion below
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_postings_are_not_lost(self):
+        self.create_fixtures()
+
+        def worker(index):
+            for _ in range(self.POSTS_PER_THREAD):
+                self.post_with_retry(HourLedgerEntryType.CONSUMPTION, hours_consumed=Decimal("0.50"))
+                if index % 2:
+                    self.post_with_retry(HourLedgerEntryType.REFUND, hours_consumed=Decimal("-0.25"))
+
+        self.run_threads(worker)
+
+        consumed = Decimal("0.50") * self.THREADS * self.POSTS_PER_THREAD
+        refunded = Decimal("0.25") * (self.THREADS // 2) * self.POSTS_PER_THREAD
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, consumed - refunded)
+        self.assertEqual(
+            HourLedgerEntry.objects.filter(student_account=self.balance).count(),
+            1 + self.THREADS * self.POSTS_PER_THREAD * 3 // 2,
+        )
+        self.assertEqual(HourLedger.reconcile().mismatched_account_ids, [])
+
+    def test_concurrent_consumptions_and_refunds(self):
+        self.create_fixtures()
+        sessions = [self.create_session(day_offset) for day_offset in range(self.THREADS)]
+
+        def book(session):
+            return HourConsumption.objects.create(
+                student_account=StudentAccountBalance.objects.get(pk=self.balance.pk),
+                class_session=session,
+                purchase_transaction=self.package,
+                hours_consumed=Decimal("1.00"),
+                hours_originally_reserved=Decimal("1.50"),
+            )
+
+        self.run_threads(lambda index: self.retry(book, sessions[index]))
+
+        consumption_ids = list(HourConsumption.objects.values_list("id", flat=True))
+        refunded = []
+
+        def refund(consumption_id):
+            return HourConsumption.objects.get(pk=consumption_id).process_refund("Ended early")
+
+        def refund_all(index):
+            # Every thread tries to refund every consumption; each must be refunded once
+            for consumption_id in consumption_ids:
+                try:
+                    refunded.append(self.retry(refund, consumption_id))
+                except ValueError:
+                    pass
+
+        self.run_threads(refund_all)
+
+        self.assertEqual(refunded, [Decimal("0.50")] * self.THREADS)
+        self.balance.refresh_from_db()
+        self.package.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("0.50") * self.THREADS)
+        self.assertEqual(self.package.hours_remaining, Decimal("10.00") - Decimal("0.50") * self.THREADS)
+        self.assertEqual(
+            self.balance.ledger_entries.filter(entry_type=HourLedgerEntryType.REFUND).count(), self.THREADS
+        )
+        self.assertEqual(HourLedger.reconcile().mismatched_account_ids, [])
+
+    def test_concurrent_group_and_single_bookings(self):
+        """Group and single bookings of the same student lock packages and balances in one order"""
+        self.create_fixtures()
+        classmate = CustomUser.objects.create_user(email="classmate@test.com", name="Classmate")
+        PurchaseTransaction.objects.create(
+            student=classmate,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal("100.00"),
+            payment_status=TransactionPaymentStatus.COMPLETED,
+            metadata={"hours": 10},
+        )
+        StudentAccountBalance.objects.create(student=classmate, hours_purchased=Decimal("10.00"))
+        sessions = [self.create_session(day_offset) for day_offset in range(self.THREADS)]
+        for session in sessions[::2]:
+            session.session_type = SessionType.GROUP
+            session.student_count = 2
+            session.save()
+            session.students.set([self.student, classmate])
+
+        def book_group(session):
+            HourDeductionService.validate_and_deduct_hours_for_session(ClassSession.objects.get(pk=session.pk))
+
+        def book_single(session):
+            HourConsumption.objects.create(
+                student_account=StudentAccountBalance.objects.get(pk=self.balance.pk),
+                class_session=session,
+                purchase_transaction=self.package,
+                hours_consumed=Decimal("1.00"),
+                hours_originally_reserved=Decimal("1.00"),
+            )
+
+        self.run_threads(lambda index: self.retry(book_single if index % 2 else book_group, sessions[index]))
+
+        self.balance.refresh_from_db()
+        self.package.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("1.00") * self.THREADS)
+        self.assertEqual(self.package.hours_remaining, Decimal("10.00") - Decimal("1.00") * self.THREADS)
+        self.assertEqual(
+            StudentAccountBalance.objects.get(student=classmate).hours_consumed, Decimal("1.00") * (self.THREADS // 2)
+        )
+        self.assertEqual(HourLedger.reconcile().mismatched_account_ids, [])
+
+    def test_concurrent_webhooks_credit_a_purchase_once(self):
+        self.create_fixtures()
+        purchase = PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal("45.00"),
+            payment_status=TransactionPaymentStatus.PROCESSING,
+            stripe_payment_intent_id="pi_concurrent",
+            metadata={"hours": "5"},
+        )
+        winners = []
+
+        def deliver(index):
+            # Odd threads stand in for the confirmation endpoint racing the webhook
+            if index % 2:
+                if self.retry(lambda: HourLedger.complete_purchase(PurchaseTransaction.objects.get(pk=purchase.pk))):
+                    winners.append(index)
+            else:
+                _process_payment_success({"id": "pi_concurrent"})
+
+        self.run_threads(deliver)
+        # Webhook deliveries that lost a lock are redelivered by Stripe
+        _process_payment_success({"id": "pi_concurrent"})
+
+        self.assertLessEqual(len(winners), 1)
+        self.assertEqual(purchase.ledger_entries.count(), 1)
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_purchased, Decimal("15.00"))
+        self.assertEqual(self.balance.balance_amount, Decimal("145.00"))
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.payment_status, TransactionPaymentStatus.COMPLETED)
@@ -0,0 +1,165 @@
+"""
+Tests for per-package remaining-hours tracking.
+
+Hours are drawn from a student's packages oldest first, with one locking read and one
+UPDATE however many packages a deduction spans, and expiration reports aggregate the
+maintained hours_remaining instead of recomputing every package.
+"""
+
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser, School, TeacherProfile
+from finances.models import (
+    ClassSession,
+    HourLedgerEntryType,
+    PurchaseTransaction,
+    SessionType,
+    StudentAccountBalance,
+    TransactionPaymentStatus,
+    TransactionType,
+)
+from finances.services.hour_deduction_service import HourDeductionService
+from finances.services.hour_ledger import HourLedger
+from finances.services.package_expiration_service import PackageExpirationService
+
+
+class PackageHoursTests(TestCase):
+    """Test FIFO deduction and refunds across packages"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+        self.student = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+        self.balance = StudentAccountBalance.objects.create(student=self.student, hours_purchased=Decimal("7.00"))
+        self.sessions = 0
+
+    def create_package(self, hours, expires_in_days=30, **fields):
+        package = PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal("50.00"),
+            payment_status=TransactionPaymentStatus.COMPLETED,
+            metadata={"hours_included": hours},
+            **fields,
+        )
+        PurchaseTransaction.objects.filter(pk=package.pk).update(
+            expires_at=package.created_at + timedelta(days=expires_in_days)
+        )
+        return package
+
+    def book(self, hours):
+        self.sessions += 1
+        session = ClassSession.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            date=date(2025, 3, 3) + timedelta(days=self.sessions),
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            session_type=SessionType.INDIVIDUAL,
+            grade_level="7",
+        )
+        return HourDeductionService._deduct_hours_for_student(self.student, session, Decimal(hours))
+
+    def remaining(self, *packages):
+        return [PurchaseTransaction.objects.get(pk=package.pk).hours_remaining for package in packages]
+
+    def test_new_packages_start_with_their_hours(self):
+        package = self.create_package(10)
+        subscription = PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.SUBSCRIPTION,
+            amount=Decimal("30.00"),
+            payment_status=TransactionPaymentStatus.COMPLETED,
+        )
+
+        self.assertEqual(package.hours_remaining, Decimal("10"))
+        self.assertIsNone(subscription.hours_remaining)
+
+    def test_deduction_spans_packages_in_fifo_order(self):
+        oldest = self.create_package(2)
+        newest = self.create_package(5)
+
+        with CaptureQueriesContext(connection) as queries:
+            allocations = HourLedger.allocate(self.student.id, Decimal("3.00"))
+        statements = [query["sql"] for query in queries if "SAVEPOINT" not in query["sql"]]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(allocations, {oldest.id: Decimal("2.00"), newest.id: Decimal("1.00")})
+        self.assertEqual(self.remaining(oldest, newest), [Decimal("0.00"), Decimal("4.00")])
+
+        consumption = self.book("1.50")
+
+        self.assertEqual(consumption.purchase_transaction, newest)
+        self.assertEqual(self.remaining(oldest, newest), [Decimal("0.00"), Decimal("2.50")])
+
+    def test_refunds_return_hours_to_the_newest_package_first(self):
+        oldest = self.create_package(2)
+        newest = self.create_package(5)
+        consumption = self.book("3.00")
+        entries = consumption.ledger_entries.filter(entry_type=HourLedgerEntryType.CONSUMPTION)
+        self.assertEqual(sorted(entry.hours_consumed for entry in entries), [Decimal("1.00"), Decimal("2.00")])
+
+        HourLedger.restore(consumption, Decimal("1.50"), description="Shortened")
+        self.assertEqual(self.remaining(oldest, newest), [Decimal("0.50"), Decimal("5.00")])
+
+        HourLedger.restore(consumption, Decimal("1.50"), description="Cancelled")
+        self.assertEqual(self.remaining(oldest, newest), [Decimal("2.00"), Decimal("5.00")])
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_consumed, Decimal("0.00"))
+
+    def test_exhausted_and_expired_packages_are_not_active(self):
+        exhausted = self.create_package(1)
+        self.create_package(5, expires_in_days=-1)
+        active = self.create_package(5)
+        self.book("1.00")
+
+        packages = HourDeductionService._get_active_packages_for_student(self.student)
+
+        self.assertEqual(list(packages), [active])
+        self.assertEqual(self.remaining(exhausted), [Decimal("0.00")])
+
+    def test_expiration_summary_is_one_aggregate(self):
+        expired = self.create_package(10, expires_in_days=-1)
+        self.create_package(4, expires_in_days=10)
+        PurchaseTransaction.objects.filter(pk=expired.pk).update(hours_remaining=Decimal("7.50"))
+
+        now = timezone.now()
+        with self.assertNumQueries(1):
+            report = PackageExpirationService.generate_expiration_summary_report(
+                now - timedelta(days=1), now + timedelta(days=1)
+            )
+
+        self.assertEqual(report["total_packages"], 2)
+        self.assertEqual(report["expired_packages"], 1)
+        self.assertEqual(report["expiring_soon"], 1)
+        self.assertEqual(report["hours_expired"], Decimal("7.50"))
+        self.assertEqual(report["students_affected"], 1)
+
+    def test_expiration_zeroes_the_package_once(self):
+        expired = self.create_package(10, expires_in_days=-2)
+        PurchaseTransaction.objects.filter(pk=expired.pk).update(hours_remaining=Decimal("6.00"))
+
+        first = PackageExpirationService.process_bulk_expiration()
+        second = PackageExpirationService.process_bulk_expiration()
+
+        self.assertEqual([result.hours_expired for result in first], [Decimal("6.00")])
+        self.assertEqual(second, [])
+        self.assertEqual(self.remaining(expired), [Decimal("0.00")])
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.hours_purchased, Decimal("1.00"))
+        self.assertEqual(expired.ledger_entries.filter(entry_type=HourLedgerEntryType.EXPIRATION).count(), 1)
+
+        now = timezone.now()
+        report = PackageExpirationService.generate_expiration_summary_report(
+            now - timedelta(days=1), now + timedelta(days=1)
+        )
+        history = PackageExpirationService.get_student_expiration_history(self.student)
+        self.assertEqual(report["hours_expired"], Decimal("6.00"))
+        self.assertEqual([entry["hours_expired"] for entry in history], [Decimal("6.00")])
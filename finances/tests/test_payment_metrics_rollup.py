@@ -0,0 +1,173 @@
+"""
+Unit Tests for the Daily Payment Metrics Rollup
+
+The rollup must follow transactions through status changes and deletes, rebuild
+to the same state from scratch, and serve PaymentAnalyticsService with the same
+numbers a full scan of PurchaseTransaction would give.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.sites import AdminSite
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser, School, SchoolMembership, SchoolRole
+from finances.admin import PurchaseTransactionAdmin
+from finances.models import DailyPaymentMetric, PurchaseTransaction, TransactionPaymentStatus, TransactionType
+from finances.services.payment_analytics_service import PaymentAnalyticsService
+
+
+class DailyPaymentMetricsTests(TestCase):
+    """Test incremental maintenance and reads of the payment metrics rollup"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.student = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+        SchoolMembership.objects.create(user=self.student, school=self.school, role=SchoolRole.STUDENT)
+        self.other_student = CustomUser.objects.create_user(email="other@test.com", name="Other Student")
+        self.service = PaymentAnalyticsService()
+
+    def create_transaction(self, amount, status=TransactionPaymentStatus.PENDING, student=None, **kwargs):
+        return PurchaseTransaction.objects.create(
+            student=student or self.student,
+            transaction_type=kwargs.pop("transaction_type", TransactionType.PACKAGE),
+            amount=Decimal(amount),
+            payment_status=status,
+            **kwargs,
+        )
+
+    def metrics(self):
+        return {
+            (metric.school_id, metric.transaction_type, metric.payment_status): (
+                metric.transaction_count,
+                metric.total_amount,
+                metric.min_amount,
+                metric.max_amount,
+            )
+            for metric in DailyPaymentMetric.objects.filter(transaction_count__gt=0)
+        }
+
+    def test_status_changes_move_transactions_between_rows(self):
+        """Completing a payment moves it from the pending row to the completed row"""
+        cheap = self.create_transaction("20.00")
+        expensive = self.create_transaction("80.00")
+
+        cheap.payment_status = TransactionPaymentStatus.COMPLETED
+        cheap.save(update_fields=["payment_status", "updated_at"])
+
+        pending_key = (self.school.id, TransactionType.PACKAGE, TransactionPaymentStatus.PENDING)
+        completed_key = (self.school.id, TransactionType.PACKAGE, TransactionPaymentStatus.COMPLETED)
+        self.assertEqual(
+            self.metrics(),
+            {
+                pending_key: (1, Decimal("80.00"), Decimal("80.00"), Decimal("80.00")),
+                completed_key: (1, Decimal("20.00"), Decimal("20.00"), Decimal("20.00")),
+            },
+        )
+
+        expensive.delete()
+        self.assertNotIn(pending_key, self.metrics())
+
+    def test_admin_status_actions_update_the_rollup(self):
+        """The admin actions save each transaction instead of bypassing the signals"""
+        failed = self.create_transaction("20.00")
+        refunded = self.create_transaction("80.00", status=TransactionPaymentStatus.COMPLETED)
+        model_admin = PurchaseTransactionAdmin(PurchaseTransaction, AdminSite())
+        request = RequestFactory().post("/")
+
+        with mock.patch.object(model_admin, "message_user"):
+            model_admin.mark_failed(request, PurchaseTransaction.objects.filter(pk=failed.pk))
+            model_admin.mark_refunded(request, PurchaseTransaction.objects.filter(pk=refunded.pk))
+
+        failed_key = (self.school.id, TransactionType.PACKAGE, TransactionPaymentStatus.FAILED)
+        refunded_key = (self.school.id, TransactionType.PACKAGE, TransactionPaymentStatus.REFUNDED)
+        self.assertEqual(
+            self.metrics(),
+            {
+                failed_key: (1, Decimal("20.00"), Decimal("20.00"), Decimal("20.00")),
+                refunded_key: (1, Decimal("80.00"), Decimal("80.00"), Decimal("80.00")),
+            },
+        )
+
+    def test_students_without_school_use_a_null_school_row(self):
+        """Transactions of students without a membership are still counted"""
+        self.create_transaction("30.00", student=self.other_student)
+        self.create_transaction("50.00", student=self.other_student)
+
+        self.assertEqual(
+            self.metrics(),
+            {
+                (None, TransactionType.PACKAGE, TransactionPaymentStatus.PENDING): (
+                    2,
+                    Decimal("80.00"),
+                    Decimal("30.00"),
+                    Decimal("50.00"),
+                )
+            },
+        )
+
+    def test_rebuild_command_matches_incremental_state(self):
+        """A full rebuild reproduces the incrementally maintained rows"""
+        for amount, status in [("10.00", "completed"), ("25.00", "failed"), ("40.00", "completed")]:
+            self.create_transaction(amount, status=status)
+        self.create_transaction("15.00", transaction_type=TransactionType.SUBSCRIPTION)
+        incremental = self.metrics()
+
+        call_command("rebuild_payment_metrics", stdout=StringIO())
+
+        self.assertEqual(self.metrics(), incremental)
+
+    def test_analytics_match_transaction_scan(self):
+        """Rollup-backed analytics agree with the raw transactions across backfilled days"""
+        now = timezone.now()
+        for days_ago, amount, status in [
+            (0, "30.00", TransactionPaymentStatus.COMPLETED),
+            (1, "45.00", TransactionPaymentStatus.COMPLETED),
+            (1, "60.00", TransactionPaymentStatus.FAILED),
+            (3, "90.00", TransactionPaymentStatus.COMPLETED),
+            (3, "20.00", TransactionPaymentStatus.PROCESSING),
+            (12, "70.00", TransactionPaymentStatus.COMPLETED),
+        ]:
+            transaction = self.create_transaction(amount, status=status)
+            # Queryset updates bypass signals, so the rollup is backfilled afterwards
+            PurchaseTransaction.objects.filter(pk=transaction.pk).update(created_at=now - timedelta(days=days_ago))
+        call_command("rebuild_payment_metrics", stdout=StringIO())
+
+        success = self.service.get_success_rate_metrics(days=7)
+        self.assertEqual(
+            (success["total_transactions"], success["successful_transactions"], success["failed_transactions"]),
+            (5, 3, 1),
+        )
+        self.assertEqual(success["pending_transactions"], 1)
+
+        trends = self.service.get_revenue_trends(days=7)
+        self.assertEqual(trends["total_revenue"], Decimal("165.00"))
+        self.assertEqual(trends["daily_revenue"][-2]["revenue"], Decimal("45.00"))
+
+        values = self.service.get_transaction_value_metrics()
+        self.assertEqual(values["total_successful_transactions"], 4)
+        self.assertEqual(values["highest_transaction"], Decimal("90.00"))
+        self.assertEqual(values["lowest_transaction"], Decimal("30.00"))
+        self.assertEqual(self.service.get_revenue_by_type(hours=24 * 7)["package"], Decimal("165.00"))
+        self.assertEqual(self.service.get_failure_analysis(days=7)["total_failures"], 1)
+
+    def test_dashboard_query_count_does_not_grow_with_history(self):
+        """Dashboard metrics cost the same queries for ten or a hundred transactions"""
+        for _ in range(10):
+            self.create_transaction("25.00", status=TransactionPaymentStatus.COMPLETED)
+        with CaptureQueriesContext(connection) as small:
+            self.service.get_dashboard_metrics(days=30)
+
+        for _ in range(90):
+            self.create_transaction("25.00", status=TransactionPaymentStatus.COMPLETED)
+        with CaptureQueriesContext(connection) as large:
+            self.service.get_dashboard_metrics(days=30)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
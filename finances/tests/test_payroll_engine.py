@@ -0,0 +1,214 @@
+"""
+Tests for the set-based payroll engine.
+
+A payroll run must resolve rates from preloaded compensation rules (a fixed number of
+queries however many sessions are paid), produce the same entries as the per-session
+calculator, and commit its work in chunks that can be resumed after a failure.
+"""
+
+from datetime import date, time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+
+from accounts.models import CustomUser, School, TeacherProfile
+from finances.models import (
+    ClassSession,
+    CompensationRuleType,
+    SchoolBillingSettings,
+    SessionStatus,
+    SessionType,
+    TeacherCompensationRule,
+    TeacherPaymentEntry,
+    TrialCostAbsorption,
+)
+from finances.services import BulkPaymentProcessor, TeacherPaymentCalculator
+from finances.services.payroll_engine import PayrollEngine
+
+
+class PayrollEngineTests(TestCase):
+    """Test bulk rate resolution and chunked payment entry creation"""
+
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User"),
+            hourly_rate=Decimal("15.00"),
+        )
+        TeacherCompensationRule.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            rule_type=CompensationRuleType.GRADE_SPECIFIC,
+            grade_level="7",
+            rate_per_hour=Decimal("20.00"),
+            effective_from=date(2025, 1, 1),
+            effective_until=date(2025, 3, 31),
+        )
+        TeacherCompensationRule.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            rule_type=CompensationRuleType.GRADE_SPECIFIC,
+            grade_level="10",
+            rate_per_hour=Decimal("30.00"),
+            effective_from=date(2025, 1, 1),
+        )
+        TeacherCompensationRule.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            rule_type=CompensationRuleType.GROUP_CLASS,
+            rate_per_hour=Decimal("25.00"),
+            effective_from=date(2025, 2, 1),
+        )
+        SchoolBillingSettings.objects.create(school=self.school, trial_cost_absorption=TrialCostAbsorption.SPLIT)
+
+    def create_session(self, day, session_type=SessionType.INDIVIDUAL, grade_level="7", **fields):
+        return ClassSession.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            date=day,
+            start_time=time(10, 0),
+            end_time=time(11, 30),
+            session_type=session_type,
+            grade_level=grade_level,
+            status=SessionStatus.COMPLETED,
+            **fields,
+        )
+
+    def create_varied_sessions(self):
+        return [
+            self.create_session(date(2025, 1, 10)),
+            self.create_session(date(2025, 4, 10)),
+            self.create_session(date(2025, 1, 10), session_type=SessionType.GROUP),
+            self.create_session(date(2025, 2, 10), session_type=SessionType.GROUP),
+            self.create_session(date(2025, 2, 11), grade_level="mixed"),
+            self.create_session(date(2025, 2, 12), grade_level="10", is_trial=True),
+        ]
+
+    def entry_values(self):
+        return list(
+            TeacherPaymentEntry.objects.order_by("session_id").values_list(
+                "session_id",
+                "billing_period",
+                "hours_taught",
+                "rate_applied",
+                "amount_earned",
+                "compensation_rule_id",
+                "calculation_notes",
+            )
+        )
+
+    def test_entries_match_the_per_session_calculator(self):
+        sessions = self.create_varied_sessions()
+        for session in sessions:
+            TeacherPaymentCalculator.calculate_session_payment(session)
+        expected = self.entry_values()
+        TeacherPaymentEntry.objects.all().delete()
+
+        result = PayrollEngine.run()
+
+        self.assertEqual(result.processed_count, len(sessions))
+        self.assertEqual(self.entry_values(), expected)
+        rates = [values[3] for values in expected]
+        self.assertEqual(
+            rates,
+            [Decimal(rate) for rate in ("20.00", "15.00", "20.00", "25.00", "30.00", "15.00")],
+        )
+
+    def test_queries_do_not_grow_with_the_number_of_sessions(self):
+        for day in range(1, 4):
+            self.create_session(date(2025, 1, day))
+        with self.assertNumQueries(7):
+            PayrollEngine.run()
+
+        for day in range(4, 20):
+            self.create_session(date(2025, 1, day))
+        with self.assertNumQueries(7):
+            result = PayrollEngine.run()
+
+        self.assertEqual(result.processed_count, 16)
+        self.assertEqual(result.chunks_committed, 1)
+
+    def test_failed_chunk_is_reported_and_resumed(self):
+        sessions = [self.create_session(date(2025, 1, day)) for day in range(1, 7)]
+        original = TeacherPaymentEntry.objects.bulk_create
+        calls = []
+
+        def fail_second_chunk(entries, *args, **kwargs):
+            calls.append(entries)
+            if len(calls) == 2:
+                raise IntegrityError("session already paid")
+            return original(entries, *args, **kwargs)
+
+        with mock.patch.object(TeacherPaymentEntry.objects, "bulk_create", side_effect=fail_second_chunk):
+            result = BulkPaymentProcessor.process_completed_sessions(chunk_size=2)
+
+        self.assertEqual(result["processed_count"], 4)
+        self.assertEqual(result["chunks_committed"], 2)
+        self.assertEqual(result["checkpoint"], sessions[1].id)
+        self.assertEqual(
+            result["chunk_errors"],
+            [
+                {
+                    "first_session_id": sessions[2].id,
+                    "last_session_id": sessions[3].id,
+                    "session_count": 2,
+                    "error": "session already paid",
+                }
+            ],
+        )
+        self.assertEqual(TeacherPaymentEntry.objects.count(), 4)
+
+        resumed = PayrollEngine.run(chunk_size=2)
+
+        self.assertEqual(resumed.resumed_from, sessions[1].id)
+        self.assertEqual(resumed.processed_count, 2)
+        self.assertTrue(resumed.completed)
+        self.assertEqual(TeacherPaymentEntry.objects.count(), 6)
+        self.assertIsNone(cache.get(PayrollEngine.checkpoint_key()))
+
+    def test_checkpoint_stops_before_the_first_session_left_unpaid(self):
+        sessions = [self.create_session(date(2025, 1, day)) for day in range(1, 7)]
+        original = PayrollEngine.build_entry
+
+        def fail_third_session(session, rules):
+            if session.id == sessions[2].id:
+                raise ValueError("no rate")
+            return original(session, rules)
+
+        with mock.patch.object(PayrollEngine, "build_entry", side_effect=fail_third_session):
+            result = PayrollEngine.run(chunk_size=4)
+
+        self.assertEqual(result.processed_count, 5)
+        self.assertEqual([error["session_id"] for error in result.errors], [sessions[2].id])
+        self.assertEqual(result.checkpoint, sessions[1].id)
+        self.assertEqual(cache.get(PayrollEngine.checkpoint_key()), sessions[1].id)
+
+        resumed = PayrollEngine.run(chunk_size=4)
+
+        self.assertEqual(resumed.processed_count, 1)
+        self.assertTrue(TeacherPaymentEntry.objects.filter(session=sessions[2]).exists())
+
+    def test_filters_and_checkpoints_are_per_range(self):
+        march = self.create_session(date(2025, 3, 3))
+        self.create_session(date(2025, 4, 3))
+        cache.set(PayrollEngine.checkpoint_key(start_date=date(2025, 4, 1)), march.id)
+
+        result = PayrollEngine.run(start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+
+        self.assertIsNone(result.resumed_from)
+        self.assertEqual(list(TeacherPaymentEntry.objects.values_list("session_id", flat=True)), [march.id])
+
+    def test_command_reports_the_run(self):
+        self.create_varied_sessions()
+        out = StringIO()
+
+        call_command("run_teacher_payroll", "--chunk-size=4", stdout=out)
+
+        self.assertIn("Created 6 payment entries for 6 sessions in 2 chunks", out.getvalue())
+        self.assertEqual(TeacherPaymentEntry.objects.count(), 6)
@@ -0,0 +1,159 @@
+"""
+Query-Count Regression Tests for Analytics Reports
+
+Each report built on conditional_aggregate must stay at a fixed number of
+queries regardless of how many rows it summarizes, while returning the same
+breakdowns as the per-bucket queries it replaced.
+"""
+
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import CustomUser, School, TeacherProfile
+from finances.models import (
+    ClassSession,
+    HourConsumption,
+    PurchaseTransaction,
+    SessionType,
+    StudentAccountBalance,
+    TeacherPaymentEntry,
+    TransactionPaymentStatus,
+    TransactionType,
+)
+from finances.services.package_expiration_service import PackageExpirationService
+from finances.services.payment_analytics_service import PaymentAnalyticsService
+from finances.services.payment_services import TeacherPaymentCalculator
+
+
+class ReportQueryCountTests(TestCase):
+    """Test that analytics reports run in a constant number of queries"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+        self.student = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+        self.balance = StudentAccountBalance.objects.create(student=self.student, hours_purchased=Decimal("50.00"))
+        self.session_day = date(2025, 3, 3)
+
+    def create_session(self, session_type=SessionType.INDIVIDUAL, is_trial=False, day_offset=0):
+        return ClassSession.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            date=self.session_day + timedelta(days=day_offset),
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            session_type=session_type,
+            grade_level="7",
+            is_trial=is_trial,
+        )
+
+    def create_payment_entries(self, count, start=0):
+        for index in range(start, start + count):
+            session_type = SessionType.GROUP if index % 3 == 0 else SessionType.INDIVIDUAL
+            session = self.create_session(session_type=session_type, is_trial=index % 5 == 0, day_offset=index)
+            TeacherPaymentEntry.objects.create(
+                session=session,
+                teacher=self.teacher,
+                school=self.school,
+                billing_period="2025-03",
+                hours_taught=Decimal("1.50"),
+                rate_applied=Decimal("20.00"),
+                amount_earned=Decimal("30.00"),
+            )
+
+    def create_package(self, hours_included, expires_in_days, consumed=None):
+        package = PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal("100.00"),
+            payment_status=TransactionPaymentStatus.COMPLETED,
+            metadata={"hours_included": hours_included},
+        )
+        PurchaseTransaction.objects.filter(pk=package.pk).update(
+            expires_at=package.created_at + timedelta(days=expires_in_days)
+        )
+        package.refresh_from_db()
+        for hours in consumed or []:
+            HourConsumption.objects.create(
+                student_account=self.balance,
+                class_session=self.create_session(day_offset=HourConsumption.objects.count() + 100),
+                purchase_transaction=package,
+                hours_consumed=Decimal(hours),
+                hours_originally_reserved=Decimal(hours),
+            )
+        package.refresh_from_db()
+        return package
+
+    def test_monthly_total_breakdown(self):
+        """Monthly totals run in one query and break down by session type"""
+        self.create_payment_entries(15)
+
+        with self.assertNumQueries(1):
+            result = TeacherPaymentCalculator.calculate_monthly_total(self.teacher, self.school, 2025, 3)
+
+        entries = TeacherPaymentEntry.objects.filter(teacher=self.teacher, billing_period="2025-03")
+        self.assertEqual(result["session_count"], 15)
+        self.assertEqual(result["total_hours"], Decimal("22.50"))
+        self.assertEqual(result["group_sessions"]["count"], entries.filter(session__session_type="group").count())
+        self.assertEqual(
+            result["trial_sessions"]["amount"], Decimal("30.00") * entries.filter(session__is_trial=True).count()
+        )
+
+    def test_monthly_total_for_empty_period(self):
+        """An empty billing period reports zeroes"""
+        result = TeacherPaymentCalculator.calculate_monthly_total(self.teacher, self.school, 2024, 1)
+
+        self.assertEqual(result["session_count"], 0)
+        self.assertEqual(
+            result["individual_sessions"], {"count": 0, "hours": Decimal("0.00"), "amount": Decimal("0.00")}
+        )
+
+    def test_expiration_metrics(self):
+        """Expiration metrics run in one query and match calculate_hours_to_expire"""
+        expired = self.create_package(10, -1, consumed=["2.50", "1.00"])
+        self.create_package(4, -2, consumed=["5.00"])  # Overconsumed packages lose nothing
+        self.create_package(8, 30)
+
+        with self.assertNumQueries(1):
+            metrics = PackageExpirationService.calculate_expiration_metrics(period_days=30)
+
+        self.assertEqual(
+            metrics["hours_lost_to_expiration"], PackageExpirationService.calculate_hours_to_expire(expired)
+        )
+        self.assertAlmostEqual(metrics["expiration_rate"], 2 / 3)
+        self.assertAlmostEqual(metrics["average_package_lifetime"], 9.0)
+        self.assertEqual(metrics["revenue_impact"], Decimal("6.50") * Decimal("15.00"))
+
+    def test_success_rate_query_count_is_constant(self):
+        """Success rate metrics cost the same queries for any number of transactions"""
+        for index in range(12):
+            PurchaseTransaction.objects.create(
+                student=self.student,
+                transaction_type=TransactionType.PACKAGE,
+                amount=Decimal("10.00"),
+                payment_status=TransactionPaymentStatus.FAILED
+                if index % 4 == 0
+                else TransactionPaymentStatus.COMPLETED,
+            )
+
+        with self.assertNumQueries(2):
+            metrics = PaymentAnalyticsService().get_success_rate_metrics(hours=24)
+        self.assertEqual((metrics["successful_transactions"], metrics["failed_transactions"]), (9, 3))
+
+        with self.assertNumQueries(1):
+            PaymentAnalyticsService().get_success_rate_metrics()
+
+    def test_monthly_total_query_count_is_constant(self):
+        """A larger billing period does not add queries"""
+        self.create_payment_entries(3)
+        with self.assertNumQueries(1):
+            TeacherPaymentCalculator.calculate_monthly_total(self.teacher, self.school, 2025, 3)
+
+        self.create_payment_entries(20, start=3)
+        with self.assertNumQueries(1):
+            TeacherPaymentCalculator.calculate_monthly_total(self.teacher, self.school, 2025, 3)
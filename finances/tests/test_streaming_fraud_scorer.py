@@ -0,0 +1,105 @@
+"""
+Unit Tests for the Streaming Fraud Scorer
+
+Rolling per-user state must reproduce the scores of the table-scanning fraud
+rules while scoring a payment without touching the database.
+"""
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from accounts.models import CustomUser
+from finances.models import FraudAlert, PurchaseTransaction, TransactionPaymentStatus, TransactionType
+from finances.services.fraud_detection_service import FraudDetectionService
+from finances.services.streaming_fraud_scorer import StreamingFraudScorer
+from finances.views import _process_payment_failure, _process_payment_success
+
+
+class StreamingFraudScorerTests(TestCase):
+    """Test rolling fraud state fed by payment outcomes"""
+
+    def setUp(self):
+        cache.clear()
+        self.scorer = StreamingFraudScorer()
+        self.student = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+
+    def create_transaction(self, amount, status=TransactionPaymentStatus.COMPLETED, intent_id=None):
+        if intent_id is None:
+            intent_id = f"pi_test_{PurchaseTransaction.objects.count()}"
+        return PurchaseTransaction.objects.create(
+            student=self.student,
+            transaction_type=TransactionType.PACKAGE,
+            amount=Decimal(amount),
+            payment_status=status,
+            stripe_payment_intent_id=intent_id,
+        )
+
+    def test_welford_state_matches_history_statistics(self):
+        """The running mean and deviation give the same unusual-amount score as the history scan"""
+        for amount in ["45.00", "55.00", "40.00", "60.00", "50.00"]:
+            self.scorer.record_success(self.create_transaction(amount))
+        outlier = self.create_transaction("95.00")
+
+        streaming = self.scorer.score(outlier)
+        scanned = FraudDetectionService()._check_unusual_amount_patterns(outlier)
+
+        unusual = next(f for f in streaming["risk_factors"] if f["check_type"] == "unusual_amount_patterns")
+        self.assertEqual(unusual["risk_score"], scanned["risk_score"])
+        self.assertAlmostEqual(
+            float(unusual["details"]["deviation_score"]), float(scanned["details"]["deviation_score"]), places=6
+        )
+
+    def test_failures_and_rapid_attempts_are_counted(self):
+        """Failed attempts raise the failed-attempt and rapid-fire rules"""
+        for _ in range(8):
+            self.scorer.record_failure(self.create_transaction("30.00", status=TransactionPaymentStatus.FAILED))
+
+        transaction = self.create_transaction("30.00")
+
+        result = self.scorer.score(transaction)
+        scanned = FraudDetectionService()._check_rapid_transactions(transaction)
+
+        check_types = {factor["check_type"]: factor for factor in result["risk_factors"]}
+        self.assertTrue(check_types["failed_attempts"]["generate_alert"])
+        # The attempt being scored counts, as it does in the batch rule
+        self.assertEqual(check_types["rapid_transactions"]["details"]["transaction_count"], 9)
+        self.assertEqual(check_types["rapid_transactions"]["risk_score"], scanned["risk_score"])
+        self.assertEqual(scanned["details"]["transaction_count"], 9)
+        self.assertEqual(len(self.scorer.get_state(self.student.id)["failures"]), 8)
+
+    def test_alerts_are_written_after_commit(self):
+        """Alerts wait for the commit and are then written in one go"""
+        for _ in range(8):
+            self.scorer.record_failure(self.create_transaction("30.00", status=TransactionPaymentStatus.FAILED))
+        transaction = self.create_transaction("30.00")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scorer.record_success(transaction)
+            self.assertFalse(FraudAlert.objects.exists())
+
+        alert = FraudAlert.objects.get(target_user=self.student, alert_type="multiple_failed_attempts")
+        self.assertEqual(list(alert.related_transactions.all()), [transaction])
+
+    def test_scoring_does_not_query_the_database(self):
+        """Scoring a payment is a single cache read"""
+        transaction = self.create_transaction("30.00")
+        transaction = PurchaseTransaction.objects.select_related("student").get(pk=transaction.pk)
+
+        with self.assertNumQueries(0):
+            self.scorer.score(transaction)
+
+    def test_webhook_outcomes_feed_the_scorer_once(self):
+        """Redelivered webhook events do not double count"""
+        self.create_transaction("30.00", status=TransactionPaymentStatus.PENDING, intent_id="pi_success")
+        self.create_transaction("30.00", status=TransactionPaymentStatus.PENDING, intent_id="pi_failure")
+
+        for _ in range(2):
+            _process_payment_success({"id": "pi_success"})
+            _process_payment_failure({"id": "pi_failure"})
+
+        state = self.scorer.get_state(self.student.id)
+        self.assertEqual(state["count"], 1)
+        self.assertEqual(len(state["failures"]), 1)
+        self.assertEqual(len(state["attempts"]), 2)
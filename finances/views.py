@@ -26,7 +26,9 @@ from .models import (
     TeacherPaymentEntry,
     TransactionPaymentStatus,
 )
+from .services.hour_ledger import HourLedger
 from .services.payment_service import PaymentService
+from .services.streaming_fraud_scorer import StreamingFraudScorer
 from .services.stripe_base import StripeService
 
 logger = logging.getLogger(__name__)
@@ -332,17 +334,13 @@ def stripe_webhook(request):
 def _process_payment_success(payment_intent):
     """Process successful payment intent."""
     try:
-        # Find the transaction by payment intent ID
         transaction = PurchaseTransaction.objects.get(stripe_payment_intent_id=payment_intent["id"])
 
-        # Update transaction status
-        transaction.payment_status = TransactionPaymentStatus.COMPLETED
-        transaction.save()
-
-        # Update student balance
-        balance, _created = StudentAccountBalance.objects.get_or_create(student=transaction.student)
-        balance.remaining_hours += transaction.tutoring_hours_purchased
-        balance.save()
+        # Only the caller that moves the transaction to COMPLETED credits it, so redelivered
+        # events and the confirmation endpoint cannot credit it twice or count it twice in
+        # the fraud scorer
+        if HourLedger.complete_purchase(transaction) is not None:
+            StreamingFraudScorer().record_outcome(transaction)
 
         logger.info(f"Payment processed successfully: {payment_intent['id']}")
 
@@ -356,9 +354,13 @@ def _process_payment_failure(payment_intent):
     """Process failed payment intent."""
     try:
         transaction = PurchaseTransaction.objects.get(stripe_payment_intent_id=payment_intent["id"])
+        already_failed = transaction.payment_status == TransactionPaymentStatus.FAILED
 
         transaction.payment_status = TransactionPaymentStatus.FAILED
-        transaction.save()
+        transaction.save(update_fields=["payment_status", "updated_at"])
+
+        if not already_failed:
+            StreamingFraudScorer().record_outcome(transaction)
 
         logger.warning(f"Payment failed: {payment_intent['id']}")
 
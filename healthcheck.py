@@ -177,6 +177,14 @@ def health_check(request):
                 logger.warning("REDIS_URL environment variable not set, but Redis caches are functional")
                 # overall_healthy = False  # Commented out - Redis functional tests already validate connection
 
+        # 5. Chat write-behind buffer - informational, per process
+        try:
+            from classroom.message_buffer import message_buffer
+
+            health_data["checks"]["chat_write_buffer"] = {"status": "healthy", **message_buffer.metrics()}
+        except Exception as e:
+            logger.warning("Chat write buffer metrics unavailable: %s", e)
+
         # Return final status
         if not overall_healthy:
             health_data["status"] = "unhealthy"
@@ -0,0 +1,144 @@
+"""
+Cached availability snapshots for slot calculation.
+
+A snapshot holds the raw schedule rows a TeacherSlotEngine needs for one teacher and
+one ISO week (availability windows, unavailabilities and booked classes for every
+school the teacher works at). Snapshots live in the default cache under a per-teacher
+version counter; any change to the teacher's classes, availability or unavailability
+bumps the version so stale snapshots are never read again and simply expire.
+"""
+
+from datetime import date, timedelta
+import logging
+import time as time_module
+
+from django.core.cache import cache
+
+from .constants import AVAILABILITY_SNAPSHOT_CACHE_TIMEOUT
+from .models import ClassSchedule, TeacherAvailability, TeacherUnavailability
+from .slot_engine import (
+    ACTIVE_CLASS_STATUSES,
+    TeacherSlotEngine,
+    group_availabilities,
+    group_booked_classes,
+    group_unavailabilities,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilitySnapshotCache:
+    """Versioned per-teacher, per-week availability snapshots."""
+
+    cache_prefix = "scheduler:availability"
+
+    @classmethod
+    def version_key(cls, teacher_id: int) -> str:
+        return f"{cls.cache_prefix}:version:{teacher_id}"
+
+    @classmethod
+    def snapshot_key(cls, teacher_id: int, week_start: date, version: int) -> str:
+        return f"{cls.cache_prefix}:snapshot:{teacher_id}:{week_start.isoformat()}:v{version}"
+
+    @classmethod
+    def get_version(cls, teacher_id: int) -> int:
+        """Current snapshot version for a teacher, initialising it if missing."""
+        key = cls.version_key(teacher_id)
+        version = cache.get(key)
+        if version is None:
+            # Seed from the clock so an evicted counter never reuses an old version number
+            cache.add(key, time_module.time_ns(), timeout=None)
+            version = cache.get(key)
+        return int(version)
+
+    @classmethod
+    def invalidate(cls, teacher_id: int) -> None:
+        """Bump the teacher's version so every cached week is ignored from now on."""
+        key = cls.version_key(teacher_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time_module.time_ns(), timeout=None)
+        logger.debug(f"Invalidated availability snapshots for teacher {teacher_id}")
+
+    @staticmethod
+    def week_start(day: date) -> date:
+        return day - timedelta(days=day.weekday())
+
+    @classmethod
+    def get_engine(cls, teacher, school, start_date: date, end_date: date, buffer_minutes: int) -> TeacherSlotEngine:
+        """Build a TeacherSlotEngine for the range from cached weekly snapshots."""
+        weeks = []
+        week = cls.week_start(start_date)
+        while week <= end_date:
+            weeks.append(week)
+            week += timedelta(weeks=1)
+
+        version = cls.get_version(teacher.pk)
+        keys = {week: cls.snapshot_key(teacher.pk, week, version) for week in weeks}
+        cached = cache.get_many(keys.values())
+
+        snapshots = {week: cached[keys[week]] for week in weeks if keys[week] in cached}
+        missing_weeks = [week for week in weeks if week not in snapshots]
+        if missing_weeks:
+            loaded = cls._load_weeks(teacher.pk, missing_weeks)
+            cache.set_many({keys[week]: loaded[week] for week in missing_weeks}, AVAILABILITY_SNAPSHOT_CACHE_TIMEOUT)
+            snapshots.update(loaded)
+
+        availabilities: dict = {}
+        unavailabilities: dict = {}
+        booked_classes: dict = {}
+        for week in weeks:
+            school_rows = snapshots[week].get(school.pk)
+            if school_rows is None:
+                continue
+            availabilities = school_rows["availabilities"]
+            unavailabilities.update(school_rows["unavailabilities"])
+            booked_classes.update(school_rows["booked_classes"])
+
+        return TeacherSlotEngine(start_date, end_date, buffer_minutes, availabilities, unavailabilities, booked_classes)
+
+    @classmethod
+    def _load_weeks(cls, teacher_id: int, weeks: list[date]) -> dict[date, dict[int, dict]]:
+        """Load schedule rows for several weeks of a teacher in three queries, split per week."""
+        first_day = min(weeks)
+        last_day = max(weeks) + timedelta(days=6)
+
+        availability_rows: dict[int, list] = {}
+        for school_id, *row in TeacherAvailability.objects.filter(teacher_id=teacher_id, is_active=True).values_list(
+            "school_id", "day_of_week", "start_time", "end_time"
+        ):
+            availability_rows.setdefault(school_id, []).append(row)
+
+        unavailability_rows = list(
+            TeacherUnavailability.objects.filter(teacher_id=teacher_id, date__range=[first_day, last_day]).values_list(
+                "school_id", "date", "start_time", "end_time", "is_all_day"
+            )
+        )
+        # Neighbouring days are included so buffers crossing midnight still apply
+        class_rows = list(
+            ClassSchedule.objects.filter(
+                teacher_id=teacher_id,
+                scheduled_date__range=[first_day - timedelta(days=1), last_day + timedelta(days=1)],
+                status__in=ACTIVE_CLASS_STATUSES,
+            ).values_list("school_id", "scheduled_date", "start_time", "end_time")
+        )
+
+        snapshots = {}
+        for week in weeks:
+            week_end = week + timedelta(days=6)
+            snapshots[week] = {
+                school_id: {
+                    "availabilities": group_availabilities(rows),
+                    "unavailabilities": group_unavailabilities(
+                        row[1:] for row in unavailability_rows if row[0] == school_id and week <= row[1] <= week_end
+                    ),
+                    "booked_classes": group_booked_classes(
+                        row[1:]
+                        for row in class_rows
+                        if row[0] == school_id and week - timedelta(days=1) <= row[1] <= week_end + timedelta(days=1)
+                    ),
+                }
+                for school_id, rows in availability_rows.items()
+            }
+        return snapshots
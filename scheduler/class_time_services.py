@@ -0,0 +1,120 @@
+"""
+Maintenance of the persisted UTC start/end instants on ClassSchedule.
+
+ClassSchedule.save() keeps scheduled_start_utc/scheduled_end_utc current for single rows.
+ClassTimeIndexService covers what save() cannot see: instances inserted with bulk_create,
+rows written by queryset updates (the backfill_class_utc_times command) and every class
+of a school whose timezone changed (the SchoolSettings signal handlers).
+
+A timezone change can touch thousands of classes, so the signal hands the recomputation
+to a background thread once the settings change has committed instead of running it in
+the request. If the process stops before the thread finishes,
+`backfill_class_utc_times --all --school-id=<id>` repairs the school.
+"""
+
+from collections.abc import Iterable
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from accounts.models import SchoolSettings
+
+from .constants import SCHEDULING_QUERY_BATCH_SIZE
+from .models import ClassSchedule
+
+logger = logging.getLogger(__name__)
+
+
+class ClassTimeIndexService:
+    """Bulk computation of ClassSchedule UTC instants."""
+
+    @staticmethod
+    def school_timezones(school_ids: Iterable[int]) -> dict[int, str]:
+        """Timezone name per school; schools without settings are absent (and default to UTC)."""
+        return dict(SchoolSettings.objects.filter(school_id__in=set(school_ids)).values_list("school_id", "timezone"))
+
+    @classmethod
+    def apply_utc_bounds(cls, instances: list[ClassSchedule], timezones: dict[int, str] | None = None) -> None:
+        """Set the UTC instants on unsaved instances before bulk_create, with one timezone query."""
+        if timezones is None:
+            timezones = cls.school_timezones(instance.school_id for instance in instances)
+        for instance in instances:
+            instance.refresh_utc_bounds(timezones.get(instance.school_id, "UTC"))
+
+    @classmethod
+    def refresh(cls, queryset: QuerySet | None = None, batch_size: int = SCHEDULING_QUERY_BATCH_SIZE) -> int:
+        """
+        Recompute the UTC instants of every class in queryset (all classes by default).
+
+        Rows are walked in primary-key batches and written back with bulk_update, so memory
+        stays flat on large tables.
+
+        Returns:
+            Number of classes updated
+        """
+        if queryset is None:
+            queryset = ClassSchedule.objects.all()
+        queryset = queryset.order_by("pk").only("id", "school_id", "scheduled_date", "start_time", "end_time")
+
+        timezones: dict[int, str] = {}
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            missing = {instance.school_id for instance in batch} - timezones.keys()
+            if missing:
+                timezones.update(dict.fromkeys(missing, "UTC") | cls.school_timezones(missing))
+
+            cls.apply_utc_bounds(batch, timezones)
+            with transaction.atomic():
+                ClassSchedule.objects.bulk_update(batch, ["scheduled_start_utc", "scheduled_end_utc"])
+            updated += len(batch)
+
+        return updated
+
+    @classmethod
+    def refresh_school(cls, school_id: int) -> int:
+        """Recompute every class of a school after its timezone changed."""
+        updated = cls.refresh(ClassSchedule.objects.filter(school_id=school_id))
+        logger.info(f"Recomputed UTC times for {updated} classes of school {school_id}")
+        return updated
+
+    @classmethod
+    def refresh_school_after_commit(cls, school_id: int) -> None:
+        """Recompute a school's classes in a background thread once the current transaction commits."""
+        transaction.on_commit(lambda: cls._start_school_refresh(school_id))
+
+    @classmethod
+    def _start_school_refresh(cls, school_id: int) -> None:
+        # A background thread uses its own connection and could not see the caller's
+        # uncommitted writes, so refresh in-thread when still inside a transaction (tests)
+        if connection.in_atomic_block:
+            cls._refresh_school_logged(school_id)
+            return
+        threading.Thread(
+            target=cls._refresh_school_in_thread,
+            args=(school_id,),
+            name=f"class-utc-times-{school_id}",
+            daemon=True,
+        ).start()
+
+    @classmethod
+    def _refresh_school_logged(cls, school_id: int) -> None:
+        try:
+            cls.refresh_school(school_id)
+        except Exception as e:
+            logger.error(f"Error recomputing class times for school {school_id}: {e}", exc_info=True)
+
+    @classmethod
+    def _refresh_school_in_thread(cls, school_id: int) -> None:
+        # The thread gets its own database connection; close it so it does not outlive the task
+        try:
+            cls._refresh_school_logged(school_id)
+        finally:
+            connection.close()
@@ -40,6 +40,9 @@ LATEST_CLASS_HOUR = 23  # 23:00
 SCHEDULING_QUERY_BATCH_SIZE = 100
 MAX_AVAILABILITY_DAYS_LOOKUP = 30
 
+# Caching
+AVAILABILITY_SNAPSHOT_CACHE_TIMEOUT = 60 * 60  # 1 hour; versioning handles invalidation
+
 # Conversion Factors
 MINUTES_TO_HOURS_CONVERSION = 60
 SECONDS_TO_HOURS_CONVERSION = 3600
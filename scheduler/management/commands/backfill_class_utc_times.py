@@ -0,0 +1,75 @@
+"""
+Django management command to backfill the UTC start/end instants of classes.
+
+ClassSchedule.scheduled_start_utc/scheduled_end_utc are maintained on save and on school
+timezone changes, and the migration that added them filled them in for existing rows;
+this command repairs rows written by queryset updates or raw SQL that bypassed save().
+
+Usage:
+    python manage.py backfill_class_utc_times
+    python manage.py backfill_class_utc_times --all
+    python manage.py backfill_class_utc_times --school-id=12 --batch-size=2000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.class_time_services import ClassTimeIndexService
+from scheduler.constants import SCHEDULING_QUERY_BATCH_SIZE
+from scheduler.models import ClassSchedule
+
+
+class Command(BaseCommand):
+    """
+    Management command to backfill ClassSchedule UTC instants.
+
+    By default only classes that have no UTC start yet are processed.
+    """
+
+    help = "Backfill the persisted UTC start/end instants of scheduled classes"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every class, not only those missing UTC instants",
+        )
+
+        parser.add_argument(
+            "--school-id",
+            type=int,
+            help="Backfill classes only for a specific school",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SCHEDULING_QUERY_BATCH_SIZE,
+            help=f"Number of classes updated per batch (default: {SCHEDULING_QUERY_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+        batch_size = options["batch_size"]
+
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        classes = ClassSchedule.objects.all()
+        if not options["all"]:
+            classes = classes.filter(scheduled_start_utc__isnull=True)
+        if options["school_id"]:
+            classes = classes.filter(school_id=options["school_id"])
+
+        if verbosity >= 1:
+            scope = "all classes" if options["all"] else "classes missing UTC times"
+            self.stdout.write(f"Backfilling {scope}...")
+
+        try:
+            updated = ClassTimeIndexService.refresh(classes, batch_size=batch_size)
+        except Exception as e:
+            raise CommandError(f"Error backfilling class UTC times: {e}")
+
+        if verbosity >= 1:
+            self.stdout.write(self.style.SUCCESS(f"Updated {updated} classes"))
@@ -0,0 +1,89 @@
+"""
+Django management command to run a reminder dispatcher worker.
+
+Several workers can run at once (on one host or many); due reminders are claimed
+with SKIP LOCKED so each is sent by exactly one worker.
+
+Usage:
+    python manage.py dispatch_reminders
+    python manage.py dispatch_reminders --batch-size=200 --max-batches=20
+    python manage.py dispatch_reminders --loop --interval=15
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.reminder_dispatcher import ReminderDispatcher
+
+
+class Command(BaseCommand):
+    """
+    Management command to dispatch due class reminders.
+
+    Without --loop the queue is drained once and the command exits.
+    """
+
+    help = "Claim and send due class reminders"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Reminders claimed per batch (default: 50)",
+        )
+
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            help="Stop after this many batches per pass (default: drain the queue)",
+        )
+
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for due reminders instead of exiting",
+        )
+
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="Seconds to sleep between passes with --loop (default: 30)",
+        )
+
+        parser.add_argument(
+            "--worker-id",
+            help="Name recorded on claimed reminders (default: host:pid)",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options["max_batches"] is not None and options["max_batches"] < 1:
+            raise CommandError("--max-batches must be at least 1")
+
+        dispatcher = ReminderDispatcher(worker_id=options["worker_id"])
+
+        try:
+            while True:
+                result = dispatcher.run(batch_size=options["batch_size"], max_batches=options["max_batches"])
+                if verbosity >= 1 and (result.claimed or not options["loop"]):
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Worker {dispatcher.worker_id}: {result.sent} sent, {result.failed} failed, "
+                            f"{result.skipped} skipped in {result.batches} batches (avg {result.average_processing_ms:.0f} ms)"
+                        )
+                    )
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            raise CommandError(f"Error dispatching reminders: {e}")
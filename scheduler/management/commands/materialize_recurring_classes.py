@@ -0,0 +1,115 @@
+"""
+Django management command to roll recurring class series forward.
+
+Intended to run nightly so every active RecurringClassSchedule always has its
+upcoming ClassSchedule instances materialized.
+
+Usage:
+    python manage.py materialize_recurring_classes
+    python manage.py materialize_recurring_classes --dry-run
+    python manage.py materialize_recurring_classes --weeks-ahead=8
+    python manage.py materialize_recurring_classes --school-id=12
+    python manage.py materialize_recurring_classes --verbosity=2
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.constants import SCHEDULING_QUERY_BATCH_SIZE
+from scheduler.models import RecurringClassSchedule, RecurringClassStatus
+from scheduler.recurring_services import RecurringSeriesMaterializer
+
+
+class Command(BaseCommand):
+    """
+    Management command to materialize upcoming instances of recurring classes.
+
+    Active series are processed in batches; each batch costs a fixed number of queries.
+    """
+
+    help = "Materialize upcoming class instances for all active recurring series"
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show what would be created without making changes",
+        )
+
+        parser.add_argument(
+            "--weeks-ahead",
+            type=int,
+            default=4,
+            help="Number of weeks ahead to materialize (default: 4)",
+        )
+
+        parser.add_argument(
+            "--school-id",
+            type=int,
+            help="Materialize series only for a specific school",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SCHEDULING_QUERY_BATCH_SIZE,
+            help=f"Number of series processed per batch (default: {SCHEDULING_QUERY_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        """Main command execution."""
+        verbosity = options["verbosity"]
+        dry_run = options["dry_run"]
+        weeks_ahead = options["weeks_ahead"]
+        school_id = options["school_id"]
+        batch_size = options["batch_size"]
+
+        if weeks_ahead < 1:
+            raise CommandError("--weeks-ahead must be at least 1")
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        series = RecurringClassSchedule.objects.filter(status=RecurringClassStatus.ACTIVE).order_by("id")
+        if school_id:
+            series = series.filter(school_id=school_id)
+
+        if verbosity >= 1:
+            mode_str = "DRY RUN - " if dry_run else ""
+            self.stdout.write(f"{mode_str}Materializing recurring classes {weeks_ahead} weeks ahead...")
+
+        materializer = RecurringSeriesMaterializer(weeks_ahead=weeks_ahead, batch_size=batch_size)
+        series_processed = 0
+        instances_created = 0
+        skipped_conflicts = 0
+
+        try:
+            # Keyset batches keep memory flat however many series exist
+            last_id = 0
+            while True:
+                batch = list(series.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                result = materializer.materialize(batch, dry_run=dry_run)
+                series_processed += result.series_processed
+                instances_created += result.instances_created
+                skipped_conflicts += result.skipped_conflicts
+
+                if verbosity >= 2:
+                    for instance in result.created:
+                        self.stdout.write(
+                            f"  {instance.title}: {instance.scheduled_date} {instance.start_time} "
+                            f"(series {instance.recurring_schedule_id})"
+                        )
+        except Exception as e:
+            raise CommandError(f"Error materializing recurring classes: {e}")
+
+        if verbosity >= 1:
+            action = "would be created" if dry_run else "created"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Processed {series_processed} series: {instances_created} instances {action}, "
+                    f"{skipped_conflicts} skipped due to teacher unavailability"
+                )
+            )
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:28
+
+from datetime import datetime
+
+from django.db import migrations, models
+import pytz
+
+
+def backfill_utc_times(apps, schema_editor):
+    """Compute the UTC start/end of existing classes from their local date, times and school timezone."""
+    ClassSchedule = apps.get_model("scheduler", "ClassSchedule")
+    SchoolSettings = apps.get_model("accounts", "SchoolSettings")
+    timezones = {
+        school_id: pytz.timezone(name)
+        for school_id, name in SchoolSettings.objects.values_list("school_id", "timezone")
+        if name in pytz.all_timezones_set
+    }
+
+    classes = ClassSchedule.objects.order_by("pk").only("id", "school_id", "scheduled_date", "start_time", "end_time")
+    last_pk = 0
+    while batch := list(classes.filter(pk__gt=last_pk)[:1000]):
+        last_pk = batch[-1].pk
+        for instance in batch:
+            school_tz = timezones.get(instance.school_id, pytz.UTC)
+            instance.scheduled_start_utc = school_tz.localize(
+                datetime.combine(instance.scheduled_date, instance.start_time)
+            ).astimezone(pytz.UTC)
+            instance.scheduled_end_utc = school_tz.localize(
+                datetime.combine(instance.scheduled_date, instance.end_time)
+            ).astimezone(pytz.UTC)
+        ClassSchedule.objects.bulk_update(batch, ["scheduled_start_utc", "scheduled_end_utc"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("scheduler", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="classschedule",
+            name="scheduled_end_utc",
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name="scheduled end (UTC)"),
+        ),
+        migrations.AddField(
+            model_name="classschedule",
+            name="scheduled_start_utc",
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name="scheduled start (UTC)"),
+        ),
+        migrations.RunPython(backfill_utc_times, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="classschedule",
+            index=models.Index(fields=["status", "scheduled_start_utc"], name="scheduler_c_status_f709c3_idx"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-16 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0002_class_schedule_utc_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classreminder',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a dispatcher worker claimed this reminder', null=True, verbose_name='claimed at'),
+        ),
+        migrations.AddField(
+            model_name='classreminder',
+            name='claimed_by',
+            field=models.CharField(blank=True, help_text='Dispatcher worker that claimed this reminder', max_length=100, verbose_name='claimed by'),
+        ),
+        migrations.AddField(
+            model_name='classreminder',
+            name='processing_time_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time taken by the last send attempt', null=True, verbose_name='processing time (ms)'),
+        ),
+    ]
@@ -140,6 +140,26 @@ class TeacherUnavailability(models.Model):
                 raise ValidationError({"end_time": _("End time must be after start time.")})
 
 
+# Statuses a class can no longer leave, so it cannot be cancelled
+FINAL_CLASS_STATUSES = [ClassStatus.COMPLETED, ClassStatus.CANCELLED, ClassStatus.NO_SHOW, ClassStatus.REJECTED]
+
+
+class ClassScheduleQuerySet(models.QuerySet):
+    """Time-window filters on the persisted UTC start/end instants."""
+
+    def starting_between(self, start, end):
+        """Classes starting in [start, end], one range scan on scheduled_start_utc."""
+        return self.filter(scheduled_start_utc__gte=start, scheduled_start_utc__lte=end)
+
+    def upcoming(self, now=None):
+        """Classes that have not started yet; rows awaiting backfill fall back to their date"""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(scheduled_start_utc__gte=now)
+            | models.Q(scheduled_start_utc__isnull=True, scheduled_date__gte=now.date())
+        )
+
+
 class ClassSchedule(models.Model):
     """
     Scheduled class sessions between teachers and students.
@@ -162,6 +182,11 @@ class ClassSchedule(models.Model):
     end_time = models.TimeField(_("end time"))
     duration_minutes = models.PositiveIntegerField(_("duration in minutes"))
 
+    # Start/end as UTC instants in the school's timezone, kept in step by save() and school
+    # timezone changes so time-window queries run in SQL. Null only until backfilled.
+    scheduled_start_utc = models.DateTimeField(_("scheduled start (UTC)"), null=True, blank=True, editable=False)
+    scheduled_end_utc = models.DateTimeField(_("scheduled end (UTC)"), null=True, blank=True, editable=False)
+
     # Booking information
     booked_by = models.ForeignKey(
         CustomUser,
@@ -266,6 +291,8 @@ class ClassSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ClassScheduleQuerySet.as_manager()
+
     class Meta:
         ordering = ["scheduled_date", "start_time"]
         indexes = [
@@ -273,13 +300,19 @@ class ClassSchedule(models.Model):
             models.Index(fields=["student", "scheduled_date"]),
             models.Index(fields=["school", "scheduled_date"]),
             models.Index(fields=["status", "scheduled_date"]),
+            models.Index(fields=["status", "scheduled_start_utc"]),
         ]
 
     def __str__(self):
         return f"{self.title} - {self.scheduled_date} {self.start_time}"
 
     def save(self, *args, **kwargs):
-        """Override save to emit signals on status changes"""
+        """Override save to keep the UTC instants current and emit signals on status changes"""
+        self.refresh_utc_bounds()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "scheduled_start_utc", "scheduled_end_utc"}
+
         # Track status changes for signal emission
         old_status = None
         emit_signal = False
@@ -348,7 +381,7 @@ class ClassSchedule(models.Model):
     @property
     def can_be_cancelled(self):
         """Check if the class can still be cancelled"""
-        if self.status in [ClassStatus.COMPLETED, ClassStatus.CANCELLED]:
+        if self.status in FINAL_CLASS_STATUSES:
             return False
         return not self.is_past
 
@@ -403,15 +436,30 @@ class ClassSchedule(models.Model):
         return max(0, self.max_participants - self.get_total_participants())
 
     # Timezone-aware datetime methods
-    def get_scheduled_datetime_in_teacher_timezone(self):
-        """Get the scheduled datetime in the teacher's timezone (from school settings)"""
-        # Get school timezone from school settings
+    def get_school_timezone_name(self):
+        """Timezone name from the school settings, UTC when the school has none"""
         try:
-            school_timezone_str = self.school.settings.timezone
+            return self.school.settings.timezone
         except (AttributeError, ValueError, TypeError):
-            school_timezone_str = "UTC"
+            return "UTC"
+
+    @staticmethod
+    def compute_utc_bounds(scheduled_date, start_time, end_time, timezone_name):
+        """Start and end of a class as UTC instants, given its school's timezone name"""
+        school_tz = pytz.timezone(timezone_name)
+        start_dt = school_tz.localize(datetime.combine(scheduled_date, start_time)).astimezone(pytz.UTC)
+        end_dt = school_tz.localize(datetime.combine(scheduled_date, end_time)).astimezone(pytz.UTC)
+        return start_dt, end_dt
 
-        school_tz = pytz.timezone(school_timezone_str)
+    def refresh_utc_bounds(self, timezone_name=None):
+        """Recompute scheduled_start_utc/scheduled_end_utc from the local date and times"""
+        self.scheduled_start_utc, self.scheduled_end_utc = self.compute_utc_bounds(
+            self.scheduled_date, self.start_time, self.end_time, timezone_name or self.get_school_timezone_name()
+        )
+
+    def get_scheduled_datetime_in_teacher_timezone(self):
+        """Get the scheduled datetime in the teacher's timezone (from school settings)"""
+        school_tz = pytz.timezone(self.get_school_timezone_name())
 
         # Create naive datetime from date and start_time
         naive_datetime = datetime.combine(self.scheduled_date, self.start_time)
@@ -424,29 +472,27 @@ class ClassSchedule(models.Model):
         local_dt = self.get_scheduled_datetime_in_teacher_timezone()
         return local_dt.astimezone(pytz.UTC)
 
+    def get_stored_or_computed_start_utc(self):
+        """The persisted UTC start, computed on the fly for rows not yet saved or backfilled"""
+        return self.scheduled_start_utc or self.get_scheduled_datetime_utc()
+
     @property
     def is_past(self):
         """Check if the class is in the past (timezone-aware)"""
-        scheduled_dt_utc = self.get_scheduled_datetime_utc()
-        return scheduled_dt_utc < timezone.now()
+        return self.get_stored_or_computed_start_utc() < timezone.now()
 
     def can_cancel_within_deadline(self, hours_before=2):
         """Check if class can be cancelled within the deadline in teacher's timezone"""
-        if self.status in [ClassStatus.COMPLETED, ClassStatus.CANCELLED]:
+        if self.status in FINAL_CLASS_STATUSES:
             return False
 
-        scheduled_dt_utc = self.get_scheduled_datetime_utc()
+        scheduled_dt_utc = self.get_stored_or_computed_start_utc()
         deadline = scheduled_dt_utc - timedelta(hours=hours_before)
         return timezone.now() < deadline
 
     def get_class_duration_in_teacher_timezone(self):
         """Get start and end datetime as timezone-aware objects in teacher's timezone"""
-        try:
-            school_timezone_str = self.school.settings.timezone
-        except (AttributeError, ValueError, TypeError):
-            school_timezone_str = "UTC"
-
-        school_tz = pytz.timezone(school_timezone_str)
+        school_tz = pytz.timezone(self.get_school_timezone_name())
 
         # Create naive datetimes
         start_naive = datetime.combine(self.scheduled_date, self.start_time)
@@ -686,98 +732,9 @@ class RecurringClassSchedule(models.Model):
 
     def generate_instances(self, weeks_ahead=4):
         """Generate individual ClassSchedule instances for this recurring schedule"""
-        from datetime import timedelta
-
-        if self.status != RecurringClassStatus.ACTIVE:
-            return []
-
-        # Find the first occurrence
-        current_date = self.start_date
-        target_weekday = list(WeekDay.values).index(self.day_of_week)
-
-        # Move to the first occurrence of the target weekday
-        days_ahead = target_weekday - current_date.weekday()
-        if days_ahead < 0:
-            days_ahead += 7
-        current_date += timedelta(days=days_ahead)
-
-        # Generate schedules for the specified number of weeks
-        end_generation_date = timezone.now().date() + timedelta(weeks=weeks_ahead)
-        if self.end_date:
-            end_generation_date = min(end_generation_date, self.end_date)
-
-        created_schedules = []
-        interval_weeks = (
-            1
-            if self.frequency_type == FrequencyType.WEEKLY
-            else (2 if self.frequency_type == FrequencyType.BIWEEKLY else 4)
-        )
-
-        while current_date <= end_generation_date:
-            # Skip if there are conflicts
-            if not self._has_conflict_on_date(current_date):
-                # Check if a schedule already exists for this date
-                existing_schedule = ClassSchedule.objects.filter(
-                    teacher=self.teacher,
-                    school=self.school,
-                    scheduled_date=current_date,
-                    start_time=self.start_time,
-                    recurring_schedule=self,
-                ).first()
-
-                if not existing_schedule:
-                    # Create instance for each student
-                    for student in self.students.all():
-                        schedule = ClassSchedule.objects.create(
-                            teacher=self.teacher,
-                            student=student,
-                            school=self.school,
-                            title=self.title,
-                            description=self.description,
-                            class_type=self.class_type,
-                            scheduled_date=current_date,
-                            start_time=self.start_time,
-                            end_time=self.end_time,
-                            duration_minutes=self.duration_minutes,
-                            booked_by=self.created_by,
-                            status=ClassStatus.SCHEDULED,
-                            recurring_schedule=self,
-                            max_participants=self.max_participants,
-                        )
-                        # Add additional students for group classes
-                        if self.class_type == ClassType.GROUP:
-                            other_students = self.students.exclude(id=student.id)
-                            schedule.additional_students.set(other_students)
+        from .recurring_services import RecurringSeriesMaterializer
 
-                        created_schedules.append(schedule)
-                        break  # Only create one schedule per recurring class
-
-            # Move to next occurrence based on frequency
-            current_date += timedelta(weeks=interval_weeks)
-
-        return created_schedules
-
-    def _has_conflict_on_date(self, target_date):
-        """Check if there are conflicts on a specific date"""
-
-        # Check for teacher unavailability
-        unavailabilities = TeacherUnavailability.objects.filter(
-            teacher=self.teacher,
-            school=self.school,
-            date=target_date,
-        )
-
-        for unavailability in unavailabilities:
-            if unavailability.is_all_day:
-                return True
-            if (
-                unavailability.start_time
-                and unavailability.end_time
-                and not (self.end_time <= unavailability.start_time or self.start_time >= unavailability.end_time)
-            ):
-                return True
-
-        return False
+        return RecurringSeriesMaterializer(weeks_ahead=weeks_ahead).materialize([self]).created
 
     def detect_schedule_conflicts(self, weeks_ahead=4):
         """Detect conflicts in the schedule for upcoming weeks"""
@@ -882,9 +839,7 @@ class RecurringClassSchedule(models.Model):
         self.save()
 
         # Cancel all future instances (with proper signal emission)
-        future_instances = self.generated_instances.filter(
-            status=ClassStatus.SCHEDULED, scheduled_date__gte=timezone.now().date()
-        )
+        future_instances = self.generated_instances.filter(status=ClassStatus.SCHEDULED).upcoming()
 
         # Loop through instances to properly trigger signals for audit trail
         for instance in future_instances:
@@ -926,7 +881,7 @@ class RecurringClassSchedule(models.Model):
 
     def get_future_instances(self):
         """Get all future instances of this recurring class"""
-        return self.generated_instances.filter(scheduled_date__gte=timezone.now().date())
+        return self.generated_instances.upcoming()
 
 
 class ReminderPreference(models.Model):
@@ -1137,6 +1092,17 @@ class ClassReminder(models.Model):
         _("max retries"), default=3, help_text=_("Maximum number of retry attempts")
     )
 
+    # Dispatch bookkeeping: which worker claimed the reminder and how long the send took
+    claimed_at = models.DateTimeField(
+        _("claimed at"), null=True, blank=True, help_text=_("When a dispatcher worker claimed this reminder")
+    )
+    claimed_by = models.CharField(
+        _("claimed by"), max_length=100, blank=True, help_text=_("Dispatcher worker that claimed this reminder")
+    )
+    processing_time_ms = models.PositiveIntegerField(
+        _("processing time (ms)"), null=True, blank=True, help_text=_("Time taken by the last send attempt")
+    )
+
     # External integration
     external_message_id = models.CharField(
         _("external message ID"), max_length=255, blank=True, help_text=_("ID from external communication service")
@@ -0,0 +1,208 @@
+"""
+Bulk materialization of recurring class series.
+
+RecurringClassSchedule.generate_instances used to walk week by week, querying
+unavailabilities, checking for an existing instance and creating each ClassSchedule
+(plus its additional students) one at a time. RecurringSeriesMaterializer computes all
+occurrence dates up front, fetches unavailabilities, students and existing instances for
+every series in the batch at once and writes new instances and their M2M rows with
+bulk_create.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .class_time_services import ClassTimeIndexService
+from .constants import SCHEDULING_QUERY_BATCH_SIZE
+from .models import (
+    ClassSchedule,
+    ClassStatus,
+    ClassType,
+    FrequencyType,
+    RecurringClassSchedule,
+    RecurringClassStatus,
+    TeacherUnavailability,
+    WeekDay,
+)
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY_INTERVAL_WEEKS = {
+    FrequencyType.WEEKLY: 1,
+    FrequencyType.BIWEEKLY: 2,
+    FrequencyType.MONTHLY: 4,
+}
+
+
+@dataclass
+class MaterializationResult:
+    """Result object for a materialization run."""
+
+    series_processed: int = 0
+    created: list[ClassSchedule] = field(default_factory=list)
+    skipped_conflicts: int = 0
+    skipped_existing: int = 0
+    dry_run: bool = False
+
+    @property
+    def instances_created(self) -> int:
+        return len(self.created)
+
+
+class RecurringSeriesMaterializer:
+    """Generate ClassSchedule instances for many recurring series in a handful of queries."""
+
+    def __init__(self, weeks_ahead: int = 4, today: date | None = None, batch_size: int = SCHEDULING_QUERY_BATCH_SIZE):
+        self.weeks_ahead = weeks_ahead
+        self.today = today or timezone.now().date()
+        self.batch_size = batch_size
+
+    def occurrence_dates(self, series: RecurringClassSchedule) -> list[date]:
+        """All occurrence dates of a series inside the generation window."""
+        target_weekday = list(WeekDay.values).index(series.day_of_week)
+        first_date = series.start_date + timedelta(days=(target_weekday - series.start_date.weekday()) % 7)
+
+        end_generation_date = self.today + timedelta(weeks=self.weeks_ahead)
+        if series.end_date:
+            end_generation_date = min(end_generation_date, series.end_date)
+
+        step = timedelta(weeks=FREQUENCY_INTERVAL_WEEKS.get(series.frequency_type, 4))
+        dates = []
+        current_date = first_date
+        while current_date <= end_generation_date:
+            dates.append(current_date)
+            current_date += step
+        return dates
+
+    def materialize(self, series_list, dry_run: bool = False) -> MaterializationResult:
+        """
+        Create the missing instances for every active series in `series_list`.
+
+        With dry_run the instances are built but not saved, so callers can report what would be created.
+        """
+        result = MaterializationResult(dry_run=dry_run)
+        series_list = [series for series in series_list if series.status == RecurringClassStatus.ACTIVE]
+        if not series_list:
+            return result
+
+        occurrences = {series.id: self.occurrence_dates(series) for series in series_list}
+        all_dates = [day for dates in occurrences.values() for day in dates]
+        result.series_processed = len(series_list)
+        if not all_dates:
+            return result
+        window = [min(all_dates), max(all_dates)]
+        series_ids = [series.id for series in series_list]
+
+        students_by_series: dict[int, list[int]] = defaultdict(list)
+        for series_id, student_id in (
+            RecurringClassSchedule.students.through.objects.filter(recurringclassschedule_id__in=series_ids)
+            .order_by("customuser__name", "customuser__email")
+            .values_list("recurringclassschedule_id", "customuser_id")
+        ):
+            students_by_series[series_id].append(student_id)
+
+        unavailabilities: dict[tuple[int, int, date], list[tuple]] = defaultdict(list)
+        for (
+            teacher_id,
+            school_id,
+            unavailable_date,
+            start_time,
+            end_time,
+            is_all_day,
+        ) in TeacherUnavailability.objects.filter(
+            teacher_id__in={series.teacher_id for series in series_list},
+            school_id__in={series.school_id for series in series_list},
+            date__range=window,
+        ).values_list("teacher_id", "school_id", "date", "start_time", "end_time", "is_all_day"):
+            unavailabilities[(teacher_id, school_id, unavailable_date)].append((start_time, end_time, is_all_day))
+
+        existing = set(
+            ClassSchedule.objects.filter(
+                recurring_schedule_id__in=series_ids, scheduled_date__range=window
+            ).values_list("recurring_schedule_id", "teacher_id", "school_id", "scheduled_date", "start_time")
+        )
+
+        new_instances: list[ClassSchedule] = []
+        additional_students: list[list[int]] = []
+        for series in series_list:
+            student_ids = students_by_series.get(series.id)
+            if not student_ids:
+                continue
+
+            for occurrence in occurrences[series.id]:
+                if self._has_unavailability(
+                    series, unavailabilities.get((series.teacher_id, series.school_id, occurrence))
+                ):
+                    result.skipped_conflicts += 1
+                    continue
+                if (series.id, series.teacher_id, series.school_id, occurrence, series.start_time) in existing:
+                    result.skipped_existing += 1
+                    continue
+
+                # One instance per occurrence: first student is the main one, the rest join group classes
+                new_instances.append(
+                    ClassSchedule(
+                        teacher_id=series.teacher_id,
+                        student_id=student_ids[0],
+                        school_id=series.school_id,
+                        title=series.title,
+                        description=series.description,
+                        class_type=series.class_type,
+                        scheduled_date=occurrence,
+                        start_time=series.start_time,
+                        end_time=series.end_time,
+                        duration_minutes=series.duration_minutes,
+                        booked_by_id=series.created_by_id,
+                        status=ClassStatus.SCHEDULED,
+                        recurring_schedule=series,
+                        max_participants=series.max_participants,
+                    )
+                )
+                additional_students.append(student_ids[1:] if series.class_type == ClassType.GROUP else [])
+
+        if dry_run or not new_instances:
+            result.created = new_instances
+            return result
+
+        # bulk_create skips save(), which normally fills in the UTC instants
+        ClassTimeIndexService.apply_utc_bounds(new_instances)
+
+        through_model = ClassSchedule.additional_students.through
+        with transaction.atomic():
+            created = ClassSchedule.objects.bulk_create(new_instances, batch_size=self.batch_size)
+            through_model.objects.bulk_create(
+                [
+                    through_model(classschedule_id=instance.pk, customuser_id=student_id)
+                    for instance, student_ids in zip(created, additional_students, strict=True)
+                    for student_id in student_ids
+                ],
+                batch_size=self.batch_size,
+            )
+
+        # bulk_create skips post_save, so invalidate cached availability explicitly
+        from .signals import invalidate_teacher_availability
+
+        for teacher_id in {instance.teacher_id for instance in created}:
+            invalidate_teacher_availability(teacher_id)
+
+        result.created = created
+        logger.info(
+            f"Materialized {len(created)} class instances for {result.series_processed} recurring series "
+            f"({result.skipped_conflicts} conflicts, {result.skipped_existing} already existed)"
+        )
+        return result
+
+    @staticmethod
+    def _has_unavailability(series: RecurringClassSchedule, unavailabilities: list[tuple] | None) -> bool:
+        """Whether the teacher is unavailable (all day or overlapping) during the series' class time."""
+        for start_time, end_time, is_all_day in unavailabilities or []:
+            if is_all_day:
+                return True
+            if start_time and end_time and not (series.end_time <= start_time or series.start_time >= end_time):
+                return True
+        return False
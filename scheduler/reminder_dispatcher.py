@@ -0,0 +1,229 @@
+"""
+Concurrent reminder dispatcher.
+
+Any number of dispatcher workers (processes or hosts) can drain the reminder queue at
+the same time. Each batch is claimed in a short transaction with
+SELECT ... FOR UPDATE SKIP LOCKED, so workers never wait on or double-send each other's
+rows; claimed rows are then sent outside the transaction on a bounded thread pool per
+communication channel, so a slow SMS gateway cannot hold up email or push.
+
+A claim is a lease: a reminder that is still pending once CLAIM_LEASE has passed
+(its worker died mid-batch, or the send was skipped) becomes claimable again. A batch
+can take longer than the lease, so each reminder's claim is renewed right before it is
+sent, and a reminder whose claim has meanwhile passed to another worker is skipped.
+The time of every send attempt is stored on the reminder and feeds the queue health
+metrics.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+import logging
+import os
+import socket
+import time
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ClassReminder, CommunicationChannel, ReminderStatus
+
+logger = logging.getLogger(__name__)
+
+# A claimed reminder still pending after this long is handed to another worker
+CLAIM_LEASE = timedelta(minutes=5)
+
+# Concurrent sends per channel and worker
+DEFAULT_CHANNEL_POOL_SIZES = {
+    CommunicationChannel.EMAIL: 8,
+    CommunicationChannel.SMS: 4,
+    CommunicationChannel.PUSH: 8,
+}
+
+
+@dataclass
+class DispatchResult:
+    """Outcome of one or more dispatched batches."""
+
+    batches: int = 0
+    claimed: int = 0
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0
+    errors: list[str] = field(default_factory=list)
+    processing_times_ms: list[int] = field(default_factory=list)
+
+    @property
+    def average_processing_ms(self) -> float:
+        if not self.processing_times_ms:
+            return 0.0
+        return sum(self.processing_times_ms) / len(self.processing_times_ms)
+
+    def merge(self, other: "DispatchResult") -> None:
+        self.batches += other.batches
+        self.claimed += other.claimed
+        self.sent += other.sent
+        self.failed += other.failed
+        self.skipped += other.skipped
+        self.errors.extend(other.errors)
+        self.processing_times_ms.extend(other.processing_times_ms)
+
+
+class ReminderDispatcher:
+    """Claim due reminders and send them concurrently, one thread pool per channel."""
+
+    def __init__(
+        self,
+        worker_id: str | None = None,
+        pool_sizes: dict[str, int] | None = None,
+        inline: bool = False,
+    ):
+        """
+        Args:
+            worker_id: Name recorded on claimed rows (defaults to host:pid)
+            pool_sizes: Threads per communication channel
+            inline: Send in the calling thread instead of the pools (tests, debugging)
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.pool_sizes = {**DEFAULT_CHANNEL_POOL_SIZES, **(pool_sizes or {})}
+        self.inline = inline
+
+    def claim_batch(self, batch_size: int) -> list[ClassReminder]:
+        """
+        Claim up to batch_size due reminders for this worker.
+
+        Rows locked by another worker's claim transaction are skipped rather than waited
+        on, and the transaction only lasts as long as the claiming UPDATE.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            reminder_ids = list(
+                ClassReminder.objects.select_for_update(skip_locked=True)
+                .filter(status=ReminderStatus.PENDING, scheduled_for__lte=now)
+                .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - CLAIM_LEASE))
+                .order_by("scheduled_for")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not reminder_ids:
+                return []
+            ClassReminder.objects.filter(id__in=reminder_ids).update(claimed_at=now, claimed_by=self.worker_id)
+
+        return list(
+            ClassReminder.objects.filter(id__in=reminder_ids)
+            .select_related("class_schedule__school", "recipient")
+            .order_by("scheduled_for")
+        )
+
+    def dispatch_batch(self, batch_size: int = 50) -> DispatchResult:
+        """Claim one batch and send it; returns an empty result when nothing is due."""
+        reminders = self.claim_batch(batch_size)
+        result = DispatchResult(batches=1 if reminders else 0, claimed=len(reminders))
+        if not reminders:
+            return result
+
+        by_channel = defaultdict(list)
+        for reminder in reminders:
+            by_channel[reminder.communication_channel].append(reminder)
+
+        # Pool threads use their own connections and could neither see nor wait out the
+        # caller's uncommitted writes, so send in-thread when called inside a transaction
+        if self.inline or connection.in_atomic_block:
+            outcomes = [self._send(reminder) for reminder in reminders]
+        else:
+            executors = [
+                ThreadPoolExecutor(
+                    max_workers=max(1, min(self.pool_sizes.get(channel, 1), len(channel_reminders))),
+                    thread_name_prefix=f"reminders-{channel}",
+                )
+                for channel, channel_reminders in by_channel.items()
+            ]
+            try:
+                futures = [
+                    executor.submit(self._send_in_thread, reminder)
+                    for executor, channel_reminders in zip(executors, by_channel.values(), strict=True)
+                    for reminder in channel_reminders
+                ]
+                outcomes = [future.result() for future in futures]
+            finally:
+                for executor in executors:
+                    executor.shutdown(wait=True)
+
+        for outcome in outcomes:
+            if outcome is None:
+                result.skipped += 1
+                continue
+            reminder_id, success, elapsed_ms, error = outcome
+            result.processing_times_ms.append(elapsed_ms)
+            if success:
+                result.sent += 1
+            else:
+                result.failed += 1
+                if error:
+                    result.errors.append(f"Reminder {reminder_id}: {error}")
+        return result
+
+    def run(self, batch_size: int = 50, max_batches: int | None = None) -> DispatchResult:
+        """Dispatch batches until the queue is drained or max_batches is reached."""
+        total = DispatchResult()
+        while max_batches is None or total.batches < max_batches:
+            result = self.dispatch_batch(batch_size)
+            if not result.claimed:
+                break
+            total.merge(result)
+
+        if total.claimed:
+            logger.info(
+                f"Worker {self.worker_id} dispatched {total.claimed} reminders in {total.batches} batches: "
+                f"{total.sent} sent, {total.failed} failed, {total.skipped} skipped, avg {total.average_processing_ms:.0f} ms"
+            )
+        return total
+
+    def renew_claim(self, reminder: ClassReminder) -> bool:
+        """
+        Extend this worker's claim on a reminder before sending it.
+
+        The renewal only succeeds while the reminder is pending and still carries this
+        worker's claim; once the lease has expired and another worker has claimed it,
+        False is returned and the reminder must not be sent from here.
+        """
+        renewed_at = timezone.now()
+        renewed = ClassReminder.objects.filter(
+            pk=reminder.pk,
+            status=ReminderStatus.PENDING,
+            claimed_by=self.worker_id,
+            claimed_at=reminder.claimed_at,
+        ).update(claimed_at=renewed_at)
+        if not renewed:
+            return False
+        reminder.claimed_at = renewed_at
+        return True
+
+    def _send(self, reminder: ClassReminder) -> tuple[int, bool, int, str | None] | None:
+        """Send one reminder and record how long the attempt took; None if the claim was lost."""
+        from .reminder_services import ReminderService
+
+        if not self.renew_claim(reminder):
+            logger.warning(f"Worker {self.worker_id} lost its claim on reminder {reminder.id}, skipping it")
+            return None
+
+        error = None
+        started = time.perf_counter()
+        try:
+            success = ReminderService.send_reminder(reminder)
+        except Exception as e:
+            success = False
+            error = str(e)
+            logger.error(f"Error dispatching reminder {reminder.id}: {e}", exc_info=True)
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+
+        ClassReminder.objects.filter(pk=reminder.pk).update(processing_time_ms=elapsed_ms)
+        return reminder.id, success, elapsed_ms, error
+
+    def _send_in_thread(self, reminder: ClassReminder) -> tuple[int, bool, int, str | None] | None:
+        # Pool threads get their own database connection; close it so it does not outlive the task
+        try:
+            return self._send(reminder)
+        finally:
+            connection.close()
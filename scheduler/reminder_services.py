@@ -7,18 +7,20 @@ This module contains all the business logic services for the new scheduling remi
 3. ReminderBackgroundTaskService: Find classes needing reminders
 4. DuplicateReminderPreventionService: Prevent duplicate reminders
 5. ReminderService: Main orchestrator service
-6. RecipientDeterminationService: Determine who gets which reminders
+6. RecipientDeterminationService: Determine who gets which reminders, in bulk per tick
 7. TimezoneAwareReminderService: Handle timezone-aware calculations
 """
 
+from collections import defaultdict
 from datetime import timedelta
 import logging
 
 from django.db import transaction
+from django.db.models import Avg, Count, Exists, F, Max, OuterRef, Q
 from django.utils import timezone
 import pytz
 
-from accounts.models import SchoolMembership, SchoolRole
+from accounts.models import CustomUser, GuardianStudentRelationship, SchoolMembership, SchoolRole
 
 from .models import (
     ClassReminder,
@@ -30,6 +32,7 @@ from .models import (
     ReminderStatus,
     ReminderType,
 )
+from .reminder_dispatcher import CLAIM_LEASE, ReminderDispatcher
 
 logger = logging.getLogger(__name__)
 
@@ -304,96 +307,117 @@ class RecipientDeterminationService:
     @staticmethod
     def determine_recipients(class_schedule, reminder_type, admin_only=False):
         """Determine who should receive a specific reminder type."""
-        recipients = []
+        return RecipientDeterminationService.determine_recipients_for_classes(
+            [class_schedule], reminder_type, admin_only=admin_only
+        )[class_schedule.id]
 
-        if admin_only:
-            # Only send to teacher for admin-only reminders
-            recipients.append(
-                {
-                    "user": class_schedule.teacher.user,
-                    "role": "teacher",
-                    "channels": RecipientDeterminationService._get_user_channels(class_schedule.teacher.user),
-                }
-            )
-            return recipients
-
-        # Always include teacher
-        if RecipientDeterminationService._should_include_user(class_schedule.teacher.user):
-            recipients.append(
-                {
-                    "user": class_schedule.teacher.user,
-                    "role": "teacher",
-                    "channels": RecipientDeterminationService._get_user_channels(class_schedule.teacher.user),
-                }
-            )
+    @staticmethod
+    def determine_recipients_for_classes(class_schedules, reminder_type=None, admin_only=False):
+        """
+        Resolve reminder recipients for many classes with a fixed number of queries.
+
+        Teachers, main and additional students, their guardians (active
+        GuardianStudentRelationship in the class's school), school memberships and
+        reminder preferences are each loaded once for the whole list, so a reminder
+        tick costs the same handful of queries however many classes it covers.
+
+        A user is included when they have an active membership in the class's school
+        and their preference (school-specific first, then global) is not disabled.
+
+        Returns:
+            Dict mapping class id to its recipient dicts (user, role, channels)
+        """
+        class_schedules = list(class_schedules)
+        if not class_schedules:
+            return {}
+
+        school_ids = {class_schedule.school_id for class_schedule in class_schedules}
+        teacher_ids = {class_schedule.teacher_id for class_schedule in class_schedules}
+
+        additional_students = defaultdict(list)
+        if not admin_only:
+            group_ids = [cs.id for cs in class_schedules if cs.class_type == ClassType.GROUP]
+            through_model = ClassSchedule.additional_students.through
+            for row in through_model.objects.filter(classschedule_id__in=group_ids).select_related("customuser"):
+                additional_students[row.classschedule_id].append(row.customuser)
+
+        main_student_ids = set() if admin_only else {class_schedule.student_id for class_schedule in class_schedules}
+        users = {
+            user.id: user
+            for user in CustomUser.objects.filter(
+                Q(teacher_profile__id__in=teacher_ids) | Q(id__in=main_student_ids)
+            ).annotate(teacher_profile_pk=F("teacher_profile__id"))
+        }
+        teacher_users = {user.teacher_profile_pk: user for user in users.values() if user.teacher_profile_pk}
 
-        # Include main student
-        if RecipientDeterminationService._should_include_user(class_schedule.student):
-            recipients.append(
-                {
-                    "user": class_schedule.student,
-                    "role": "student",
-                    "channels": RecipientDeterminationService._get_user_channels(class_schedule.student),
-                }
+        guardians = defaultdict(list)
+        if not admin_only:
+            student_ids = main_student_ids | {
+                student.id for students in additional_students.values() for student in students
+            }
+            relationships = GuardianStudentRelationship.objects.filter(
+                student_id__in=student_ids, school_id__in=school_ids, is_active=True
+            ).select_related("guardian")
+            for relationship in relationships:
+                guardians[(relationship.student_id, relationship.school_id)].append(relationship.guardian)
+
+        candidate_ids = set(users) | {
+            user.id for group in (*additional_students.values(), *guardians.values()) for user in group
+        }
+        memberships = set(
+            SchoolMembership.objects.filter(
+                user_id__in=candidate_ids, school_id__in=school_ids, is_active=True
+            ).values_list("user_id", "school_id")
+        )
+        preferences = {
+            (preference.user_id, preference.school_id): preference
+            for preference in ReminderPreference.objects.filter(user_id__in=candidate_ids).filter(
+                Q(school_id__in=school_ids) | Q(school__isnull=True)
             )
+        }
 
-            # Include parents for minor students
-            parents = RecipientDeterminationService.get_student_parents(class_schedule.student)
-            for parent in parents:
-                if RecipientDeterminationService._should_include_user(parent):
-                    recipients.append(
-                        {
-                            "user": parent,
-                            "role": "parent",
-                            "relationship": "student_parent",
-                            "channels": RecipientDeterminationService._get_user_channels(parent),
-                        }
-                    )
+        def add_recipient(recipients, user, role, school_id, check=True, **extra):
+            if any(recipient["user"].id == user.id for recipient in recipients):
+                return
+            # School-specific preferences win over global ones
+            preference = preferences.get((user.id, school_id)) or preferences.get((user.id, None))
+            if check:
+                if (user.id, school_id) not in memberships:
+                    return
+                if preference is not None and not preference.is_active:
+                    return
+            if preference and preference.is_active and preference.communication_channels:
+                channels = preference.communication_channels
+            else:
+                channels = [CommunicationChannel.EMAIL]  # Default
+            recipients.append({"user": user, "role": role, **extra, "channels": channels})
+
+        recipients_by_class = {}
+        for class_schedule in class_schedules:
+            school_id = class_schedule.school_id
+            teacher = teacher_users[class_schedule.teacher_id]
+            recipients = recipients_by_class[class_schedule.id] = []
+
+            if admin_only:
+                # Only send to teacher for admin-only reminders
+                add_recipient(recipients, teacher, "teacher", school_id, check=False)
+                continue
 
-        # Include additional students for group classes
-        if class_schedule.class_type == ClassType.GROUP:
-            for student in class_schedule.additional_students.all():
-                if RecipientDeterminationService._should_include_user(student):
-                    recipients.append(
-                        {
-                            "user": student,
-                            "role": "student",
-                            "channels": RecipientDeterminationService._get_user_channels(student),
-                        }
-                    )
+            add_recipient(recipients, teacher, "teacher", school_id)
+            for student in [users[class_schedule.student_id], *additional_students[class_schedule.id]]:
+                add_recipient(recipients, student, "student", school_id)
+                for guardian in guardians[(student.id, school_id)]:
+                    add_recipient(recipients, guardian, "parent", school_id, relationship="student_parent")
 
-        return recipients
+        return recipients_by_class
 
     @staticmethod
-    def _should_include_user(user):
-        """Check if user should receive reminders."""
-        # Check if user has active school membership
-        if not SchoolMembership.objects.filter(user=user, is_active=True).exists():
-            return False
-
-        # Check user's reminder preferences
-        try:
-            prefs = ReminderPreference.objects.get(user=user, is_active=True)
-            return prefs.is_active
-        except ReminderPreference.DoesNotExist:
-            # Default to True if no preferences set
-            return True
-
-    @staticmethod
-    def _get_user_channels(user):
-        """Get user's preferred communication channels."""
-        try:
-            prefs = ReminderPreference.objects.get(user=user, is_active=True)
-            return prefs.communication_channels
-        except ReminderPreference.DoesNotExist:
-            return [CommunicationChannel.EMAIL]  # Default
-
-    @staticmethod
-    def get_student_parents(student):
-        """Get parents of a student (mock implementation)."""
-        # This would integrate with a parent-student relationship model
-        # For now, return empty list - this is a placeholder
-        return []
+    def get_student_parents(student, school=None):
+        """Get the guardians of a student, optionally within one school."""
+        relationships = GuardianStudentRelationship.objects.filter(student=student, is_active=True)
+        if school is not None:
+            relationships = relationships.filter(school=school)
+        return [relationship.guardian for relationship in relationships.select_related("guardian")]
 
 
 class TimezoneAwareReminderService:
@@ -528,7 +552,13 @@ class ReminderBackgroundTaskService:
 
     @staticmethod
     def find_classes_needing_reminders(reminder_type, tolerance_minutes=30):
-        """Find classes that need reminders of a specific type."""
+        """
+        Find classes that need reminders of a specific type.
+
+        The window is selected in SQL with one range scan over (status, scheduled_start_utc),
+        and classes that already have a sent or pending reminder of this type are excluded by
+        a subquery.
+        """
         now = timezone.now()
 
         # Calculate time range based on reminder type
@@ -540,123 +570,96 @@ class ReminderBackgroundTaskService:
         target_time = now + timedelta(hours=hours_before)
         tolerance_delta = timedelta(minutes=tolerance_minutes)
 
-        # Query for classes scheduled within tolerance window
-        from_time = target_time - tolerance_delta
-        to_time = target_time + tolerance_delta
-
-        # First, get all classes that might be in the window
-        # We use a broader date filter and then check times precisely
-        classes = ClassSchedule.objects.select_related("school", "teacher", "student").filter(
-            # Class is scheduled within the target window
-            scheduled_date__gte=from_time.date(),
-            scheduled_date__lte=to_time.date(),
-            # Class is not cancelled or completed
-            status__in=[ClassStatus.SCHEDULED, ClassStatus.CONFIRMED],
+        existing_reminders = ClassReminder.objects.filter(
+            class_schedule=OuterRef("pk"),
+            reminder_type=reminder_type,
+            status__in=[ReminderStatus.SENT, ReminderStatus.PENDING],
         )
 
-        # Prefetch reminders to avoid N+1 queries
-        classes = classes.prefetch_related("reminders")
+        return list(
+            ClassSchedule.objects.select_related("school", "teacher", "student")
+            .filter(status__in=[ClassStatus.SCHEDULED, ClassStatus.CONFIRMED])
+            .starting_between(target_time - tolerance_delta, target_time + tolerance_delta)
+            .exclude(Exists(existing_reminders))
+            .order_by("scheduled_start_utc")
+        )
 
-        # Filter by time and exclude those with existing reminders
-        result_classes = []
+    @staticmethod
+    def queue_reminders(reminder_type, tolerance_minutes=30):
+        """
+        Create pending reminders for every class in the reminder window.
 
-        # Build a list of classes that are within the time window first
-        classes_in_window = []
-        for class_schedule in classes:
-            class_datetime = class_schedule.get_scheduled_datetime_utc()
-            if from_time <= class_datetime <= to_time:
-                classes_in_window.append(class_schedule)
+        Recipients for the whole window are resolved in bulk and one reminder per
+        recipient and channel is inserted with a single bulk_create. Classes that already
+        have a reminder of this type are not in the window, and a concurrent tick's rows
+        are skipped by the unique reminder constraint.
 
-        if not classes_in_window:
-            return []
+        Returns:
+            Number of reminders submitted for insertion
+        """
+        classes = ReminderBackgroundTaskService.find_classes_needing_reminders(reminder_type, tolerance_minutes)
+        recipients_by_class = RecipientDeterminationService.determine_recipients_for_classes(classes, reminder_type)
 
-        # Check for existing reminders - maintaining compatibility with tests
-        # while still optimizing for bulk operations when possible
-        if len(classes_in_window) > 1:
-            # Bulk check for existing reminders using a single query for multiple classes
-            class_ids_in_window = [cls.id for cls in classes_in_window]
-            existing_reminder_class_ids = set(
-                ClassReminder.objects.filter(
-                    class_schedule_id__in=class_ids_in_window,
-                    reminder_type=reminder_type,
-                    status__in=[ReminderStatus.SENT, ReminderStatus.PENDING],
-                ).values_list("class_schedule_id", flat=True)
+        now = timezone.now()
+        reminders = [
+            ClassReminder(
+                class_schedule=class_schedule,
+                reminder_type=reminder_type,
+                recipient=recipient["user"],
+                recipient_type=recipient["role"],
+                communication_channel=channel,
+                scheduled_for=now,
             )
-
-            # Filter out classes with existing reminders
-            result_classes = [cls for cls in classes_in_window if cls.id not in existing_reminder_class_ids]
-        else:
-            # Single class - use the original approach for compatibility with tests
-            for class_schedule in classes_in_window:
-                # Check if reminders already exist (this call can be mocked in tests)
-                has_existing_reminders = ClassReminder.objects.filter(
-                    class_schedule=class_schedule,
-                    reminder_type=reminder_type,
-                    status__in=[ReminderStatus.SENT, ReminderStatus.PENDING],
-                ).exists()
-
-                if not has_existing_reminders:
-                    result_classes.append(class_schedule)
-
-        return result_classes
+            for class_schedule in classes
+            for recipient in recipients_by_class[class_schedule.id]
+            for channel in recipient["channels"]
+        ]
+        created = ClassReminder.objects.bulk_create(reminders, ignore_conflicts=True)
+        return len(created)
 
     @staticmethod
-    @transaction.atomic
     def process_reminder_queue(batch_size=50, max_batches=10):
-        """Process pending reminders in batches."""
-        from .services import ReminderService
-
-        result = {"batches_processed": 0, "total_processed": 0, "total_failed": 0, "errors": []}
-
-        # Find pending reminders that are due
-        now = timezone.now()
-        pending_reminders = ClassReminder.objects.filter(status=ReminderStatus.PENDING, scheduled_for__lte=now)[
-            : batch_size * max_batches
-        ]
-
-        # Process in batches
-        for batch_num in range(max_batches):
-            batch_start = batch_num * batch_size
-            batch_end = batch_start + batch_size
-            batch_reminders = list(pending_reminders[batch_start:batch_end])
-
-            if not batch_reminders:
-                break
-
-            result["batches_processed"] += 1
+        """
+        Process pending reminders in batches.
 
-            for reminder in batch_reminders:
-                try:
-                    # This would integrate with actual communication service
-                    success = ReminderService.send_reminder(reminder)
-                    if success:
-                        result["total_processed"] += 1
-                    else:
-                        result["total_failed"] += 1
-                except Exception as e:
-                    result["total_failed"] += 1
-                    result["errors"].append(f"Reminder {reminder.id}: {e!s}")
-
-        return result
+        Rows are claimed with SKIP LOCKED by ReminderDispatcher, so several workers can
+        run this concurrently without sending a reminder twice.
+        """
+        dispatched = ReminderDispatcher().run(batch_size=batch_size, max_batches=max_batches)
+        return {
+            "batches_processed": dispatched.batches,
+            "total_processed": dispatched.sent,
+            "total_failed": dispatched.failed,
+            "errors": dispatched.errors,
+        }
 
     @staticmethod
     def get_queue_health_status():
-        """Get health status of reminder queue."""
+        """
+        Get health status of reminder queue.
+
+        average_processing_time is the mean send time in seconds over the last hour;
+        worker_status is "active" when a worker claimed reminders within the claim
+        lease, "idle" when nothing is due, and "stalled" when due reminders are waiting
+        but no worker has claimed any recently.
+        """
         now = timezone.now()
+        worker_cutoff = now - CLAIM_LEASE
+
+        stats = ClassReminder.objects.aggregate(
+            pending=Count("id", filter=Q(status=ReminderStatus.PENDING)),
+            failed=Count("id", filter=Q(status=ReminderStatus.FAILED)),
+            due=Count("id", filter=Q(status=ReminderStatus.PENDING, scheduled_for__lte=now)),
+            overdue=Count("id", filter=Q(status=ReminderStatus.PENDING, scheduled_for__lt=now - timedelta(minutes=30))),
+            last_processed_at=Max("sent_at", filter=Q(status=ReminderStatus.SENT)),
+            average_processing_ms=Avg(
+                "processing_time_ms",
+                filter=Q(processing_time_ms__isnull=False, claimed_at__gte=now - timedelta(hours=1)),
+            ),
+            active_workers=Count("claimed_by", filter=Q(claimed_at__gte=worker_cutoff), distinct=True),
+        )
 
-        pending_count = ClassReminder.objects.filter(status=ReminderStatus.PENDING).count()
-        failed_count = ClassReminder.objects.filter(status=ReminderStatus.FAILED).count()
-
-        # Get last processed time
-        last_processed = ClassReminder.objects.filter(status=ReminderStatus.SENT).order_by("-sent_at").first()
-
-        last_processed_at = last_processed.sent_at if last_processed else None
-
-        # Determine queue status
-        overdue_count = ClassReminder.objects.filter(
-            status=ReminderStatus.PENDING, scheduled_for__lt=now - timedelta(minutes=30)
-        ).count()
-
+        overdue_count = stats["overdue"]
         if overdue_count > 100:
             queue_status = "critical"
         elif overdue_count > 20:
@@ -664,13 +667,22 @@ class ReminderBackgroundTaskService:
         else:
             queue_status = "healthy"
 
+        if stats["active_workers"]:
+            worker_status = "active"
+        elif stats["due"]:
+            worker_status = "stalled"
+        else:
+            worker_status = "idle"
+
+        average_ms = stats["average_processing_ms"]
         return {
-            "pending_reminders_count": pending_count,
-            "failed_reminders_count": failed_count,
-            "last_processed_at": last_processed_at,
-            "average_processing_time": 2.5,  # Mock value
+            "pending_reminders_count": stats["pending"],
+            "failed_reminders_count": stats["failed"],
+            "last_processed_at": stats["last_processed_at"],
+            "average_processing_time": round(average_ms / 1000, 3) if average_ms is not None else None,
             "queue_status": queue_status,
-            "worker_status": "active",  # Mock value
+            "worker_status": worker_status,
+            "active_workers": stats["active_workers"],
         }
 
 
@@ -860,15 +872,16 @@ class ReminderService:
             # without proper implementation
             communication_config = getattr(settings, "COMMUNICATION_SERVICE", {})
 
-            if reminder.channel == "EMAIL":
+            channel = reminder.communication_channel
+            if channel == CommunicationChannel.EMAIL:
                 return ReminderService._send_email_reminder(reminder, communication_config)
-            elif reminder.channel == "SMS":
+            elif channel == CommunicationChannel.SMS:
                 return ReminderService._send_sms_reminder(reminder, communication_config)
-            elif reminder.channel == "PUSH":
+            elif channel == CommunicationChannel.PUSH:
                 return ReminderService._send_push_reminder(reminder, communication_config)
             else:
-                logger.error(f"Unknown communication channel {reminder.channel} for reminder {reminder.id}")
-                reminder.mark_failed(f"Unknown communication channel: {reminder.channel}")
+                logger.error(f"Unknown communication channel {channel} for reminder {reminder.id}")
+                reminder.mark_failed(f"Unknown communication channel: {channel}")
                 return False
 
         except Exception as e:
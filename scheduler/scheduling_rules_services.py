@@ -8,6 +8,7 @@ and conflict management including:
 2. SchedulingConfigurationService - Configuration management and rule resolution
 3. ConflictDetectionService - Enhanced conflict detection utilities
 4. AvailabilityCalculationService - Available slots with buffer/notice rules
+5. BatchSlotSearchService - Slot search across many teachers and schools at once
 
 These services work together to ensure robust class booking with:
 - Minimum notice period validation (configurable, default 2 hours)
@@ -17,6 +18,7 @@ These services work together to ensure robust class booking with:
 - Configuration hierarchy (school defaults -> teacher overrides -> class-type specific)
 """
 
+from collections.abc import Iterable, Iterator
 from datetime import date, datetime, time, timedelta
 from typing import Any
 
@@ -27,6 +29,7 @@ import pytz
 
 from accounts.models import CustomUser, School, TeacherProfile
 
+from .availability_cache import AvailabilitySnapshotCache
 from .constants import (
     DEFAULT_BUFFER_TIME_MINUTES,
     DEFAULT_MINIMUM_NOTICE_HOURS,
@@ -34,7 +37,8 @@ from .constants import (
     DEFAULT_STUDENT_MAX_DAILY_BOOKINGS,
     DEFAULT_TEACHER_MAX_DAILY_BOOKINGS,
 )
-from .models import ClassSchedule, ClassStatus, ClassType, TeacherAvailability, TeacherUnavailability
+from .models import ClassSchedule, ClassStatus, ClassType, TeacherUnavailability
+from .slot_engine import TeacherSlotEngine
 
 
 class SchedulingConfigurationService:
@@ -331,9 +335,12 @@ class ConflictDetectionService:
         if exclude_class_id:
             all_school_conflicts = all_school_conflicts.exclude(id=exclude_class_id)
 
-        conflict = conflicting_classes.first()
-        cross_school_conflict = all_school_conflicts.first()
+        return self._build_student_conflict(conflicting_classes.first(), all_school_conflicts.first())
 
+    def _build_student_conflict(
+        self, conflict: ClassSchedule | None, cross_school_conflict: ClassSchedule | None
+    ) -> dict[str, Any] | None:
+        """Build the student conflict report from the first same-window and cross-school classes."""
         if cross_school_conflict:
             return {
                 "has_conflict": True,
@@ -407,22 +414,8 @@ class ConflictDetectionService:
         """Detect if teacher has conflicting classes including buffer time."""
         buffer_minutes = self.scheduling_service.calculate_buffer_time(class_type, teacher, school)
 
-        # Calculate buffer-adjusted times
-        start_datetime = datetime.combine(booking_date, start_time)
-        end_datetime = datetime.combine(booking_date, end_time)
-
-        buffer_start_datetime = start_datetime - timedelta(minutes=buffer_minutes)
-        buffer_end_datetime = end_datetime + timedelta(minutes=buffer_minutes)
-
-        buffer_start_datetime.time()
-        buffer_end_datetime.time()
-
         # Handle day boundary crossing
-        search_dates = [booking_date]
-        if buffer_start_datetime.date() < booking_date:
-            search_dates.append(booking_date - timedelta(days=1))
-        if buffer_end_datetime.date() > booking_date:
-            search_dates.append(booking_date + timedelta(days=1))
+        search_dates = self._get_buffer_search_dates(booking_date, start_time, end_time, buffer_minutes)
 
         conflicts = []
         for search_date in search_dates:
@@ -449,40 +442,286 @@ class ConflictDetectionService:
                     conflicts.append(existing_class)
 
         if conflicts:
-            conflict = conflicts[0]  # Return first conflict
+            return self._build_teacher_conflict(conflicts[0], buffer_minutes)  # Return first conflict
+
+        return None
+
+    def _build_teacher_conflict(self, conflict: ClassSchedule, buffer_minutes: int) -> dict[str, Any]:
+        """Build the teacher conflict report for the first conflicting class."""
+        if buffer_minutes == 0:
+            error_msg = (
+                f"Teacher has a conflicting class '{conflict.title}' "
+                f"at {conflict.start_time}-{conflict.end_time} on {conflict.scheduled_date} "
+                f"with {conflict.student.name}."
+            )
+        else:
+            earliest_available = self._calculate_earliest_available_time(
+                conflict.scheduled_date, conflict.end_time, buffer_minutes
+            )
+            error_msg = (
+                f"Teacher requires {buffer_minutes} minute buffer time between classes. "
+                f"Existing class '{conflict.title}' at {conflict.start_time}-{conflict.end_time} "
+                f"with {conflict.student.name} conflicts with requested time. "
+                f"Earliest available time: {earliest_available}."
+            )
+
+        return {
+            "has_conflict": True,
+            "type": "teacher_buffer_conflict" if buffer_minutes > 0 else "teacher_time_conflict",
+            "conflicting_class": {
+                "id": conflict.id,
+                "title": conflict.title,
+                "start_time": conflict.start_time,
+                "end_time": conflict.end_time,
+                "student_name": conflict.student.name,
+            },
+            "buffer_minutes": buffer_minutes,
+            "error_message": error_msg,
+        }
+
+    def detect_bulk_conflicts(self, bookings: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Detect student and teacher conflicts for many proposed bookings at once.
+
+        Each booking is a dict with ``teacher``, ``school``, ``date``, ``start_time``, ``end_time``
+        and ``students`` (iterable of users), plus optional ``class_type`` and ``exclude_class_id``.
+        All existing classes are fetched in a single round of queries; the returned reports follow
+        input order and reuse the dicts produced by detect_student_conflicts/detect_teacher_conflicts.
+        Bookings are also checked against each other (a self-overlapping series, or the same student
+        or teacher booked twice), reported under ``batch_conflicts`` by index into ``bookings``.
+        Classes and bookings whose end time is before their start time run past midnight; all of
+        them are compared as datetime intervals, so overlaps across midnight are found as well.
+        """
+        if not bookings:
+            return []
+
+        active_statuses = [ClassStatus.SCHEDULED, ClassStatus.CONFIRMED]
+        student_ids = {student.id for booking in bookings for student in booking.get("students", [])}
+        booking_dates = {booking["date"] for booking in bookings}
+        # Classes crossing midnight and buffers can reach into the neighbouring days
+        search_dates = {
+            booking_date + timedelta(days=offset) for booking_date in booking_dates for offset in (-1, 0, 1)
+        }
+        intervals: dict[int, tuple[datetime, datetime]] = {}
+
+        # Student conflicts: every class any proposed student attends on and around any proposed date
+        student_classes: dict[tuple[int, date], list[ClassSchedule]] = {}
+        if student_ids:
+            candidate_classes = list(
+                ClassSchedule.objects.filter(
+                    Q(student_id__in=student_ids) | Q(additional_students__in=student_ids),
+                    scheduled_date__in=search_dates,
+                    status__in=active_statuses,
+                )
+                .select_related("teacher__user", "school")
+                .distinct()
+                .order_by("scheduled_date", "start_time", "id")
+            )
+            participants = ClassSchedule.additional_students.through.objects.filter(
+                classschedule_id__in=[existing.id for existing in candidate_classes], customuser_id__in=student_ids
+            ).values_list("classschedule_id", "customuser_id")
+            additional_by_class: dict[int, set[int]] = {}
+            for class_id, user_id in participants:
+                additional_by_class.setdefault(class_id, set()).add(user_id)
+
+            for existing in candidate_classes:
+                intervals[existing.id] = self._class_interval(
+                    existing.scheduled_date, existing.start_time, existing.end_time
+                )
+                attendees = additional_by_class.get(existing.id, set()) | {existing.student_id}
+                for user_id in attendees & student_ids:
+                    student_classes.setdefault((user_id, existing.scheduled_date), []).append(existing)
+
+        # Teacher conflicts
+        teacher_classes: dict[tuple[int, int, date], list[ClassSchedule]] = {}
+        for existing in (
+            ClassSchedule.objects.filter(
+                teacher_id__in={booking["teacher"].id for booking in bookings},
+                school_id__in={booking["school"].id for booking in bookings},
+                scheduled_date__in=search_dates,
+                status__in=active_statuses,
+            )
+            .select_related("student")
+            .order_by("scheduled_date", "start_time", "id")
+        ):
+            intervals[existing.id] = self._class_interval(
+                existing.scheduled_date, existing.start_time, existing.end_time
+            )
+            teacher_classes.setdefault((existing.teacher_id, existing.school_id, existing.scheduled_date), []).append(
+                existing
+            )
 
-            if buffer_minutes == 0:
-                error_msg = (
-                    f"Teacher has a conflicting class '{conflict.title}' "
-                    f"at {conflict.start_time}-{conflict.end_time} on {conflict.scheduled_date} "
-                    f"with {conflict.student.name}."
+        buffer_cache: dict[tuple[int, int, str | None], int] = {}
+        buffers = []
+        for booking in bookings:
+            buffer_key = (booking["teacher"].id, booking["school"].id, booking.get("class_type"))
+            if buffer_key not in buffer_cache:
+                buffer_cache[buffer_key] = self.scheduling_service.calculate_buffer_time(
+                    booking.get("class_type"), booking["teacher"], booking["school"]
                 )
-            else:
-                earliest_available = self._calculate_earliest_available_time(
-                    conflict.scheduled_date, conflict.end_time, buffer_minutes
+            buffers.append(buffer_cache[buffer_key])
+        booking_intervals = [
+            self._class_interval(booking["date"], booking["start_time"], booking["end_time"]) for booking in bookings
+        ]
+        batch_conflicts = self._detect_batch_conflicts(bookings, booking_intervals, buffers)
+
+        reports = []
+        for index, booking in enumerate(bookings):
+            teacher, school = booking["teacher"], booking["school"]
+            booking_date = booking["date"]
+            interval = booking_intervals[index]
+            exclude_class_id = booking.get("exclude_class_id")
+
+            student_conflicts = {}
+            for student in booking.get("students", []):
+                overlapping = [
+                    existing
+                    for search_date in self._neighbouring_dates(booking_date)
+                    for existing in student_classes.get((student.id, search_date), [])
+                    if existing.id != exclude_class_id and self._intervals_conflict(interval, intervals[existing.id])
+                ]
+                conflict = self._build_student_conflict(
+                    overlapping[0] if overlapping else None,
+                    next((existing for existing in overlapping if existing.school_id != school.id), None),
                 )
-                error_msg = (
-                    f"Teacher requires {buffer_minutes} minute buffer time between classes. "
-                    f"Existing class '{conflict.title}' at {conflict.start_time}-{conflict.end_time} "
-                    f"with {conflict.student.name} conflicts with requested time. "
-                    f"Earliest available time: {earliest_available}."
+                if conflict:
+                    student_conflicts[student.id] = conflict
+
+            buffer_minutes = buffers[index]
+
+            # Same search order as detect_teacher_conflicts: booking day first, then previous, then next
+            teacher_conflict = None
+            for search_date in (booking_date, booking_date - timedelta(days=1), booking_date + timedelta(days=1)):
+                conflict = next(
+                    (
+                        existing
+                        for existing in teacher_classes.get((teacher.id, school.id, search_date), [])
+                        if existing.id != exclude_class_id
+                        and self._intervals_conflict(interval, intervals[existing.id], buffer_minutes)
+                    ),
+                    None,
                 )
+                if conflict:
+                    teacher_conflict = self._build_teacher_conflict(conflict, buffer_minutes)
+                    break
+
+            reports.append(
+                {
+                    "has_conflict": bool(student_conflicts or teacher_conflict or batch_conflicts[index]),
+                    "student_conflicts": student_conflicts,
+                    "teacher_conflict": teacher_conflict,
+                    "batch_conflicts": batch_conflicts[index],
+                }
+            )
 
-            return {
-                "has_conflict": True,
-                "type": "teacher_buffer_conflict" if buffer_minutes > 0 else "teacher_time_conflict",
-                "conflicting_class": {
-                    "id": conflict.id,
-                    "title": conflict.title,
-                    "start_time": conflict.start_time,
-                    "end_time": conflict.end_time,
-                    "student_name": conflict.student.name,
-                },
-                "buffer_minutes": buffer_minutes,
-                "error_message": error_msg,
-            }
+        return reports
 
-        return None
+    def _detect_batch_conflicts(
+        self,
+        bookings: list[dict[str, Any]],
+        intervals: list[tuple[datetime, datetime]],
+        buffers: list[int],
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Conflicts between the proposed bookings themselves, with the same rules as against
+        existing classes: students may not attend overlapping bookings in any school, and a
+        teacher's bookings at a school must respect the teacher's buffer.
+        """
+        by_student: dict[tuple[int, date], list[int]] = {}
+        by_teacher: dict[tuple[int, int, date], list[int]] = {}
+        for index, booking in enumerate(bookings):
+            for student in booking.get("students", []):
+                by_student.setdefault((student.id, booking["date"]), []).append(index)
+            by_teacher.setdefault((booking["teacher"].id, booking["school"].id, booking["date"]), []).append(index)
+
+        conflicts: list[list[dict[str, Any]]] = [[] for _ in bookings]
+        for index, booking in enumerate(bookings):
+            search_dates = self._neighbouring_dates(booking["date"])
+            for student in booking.get("students", []):
+                candidates = sorted(
+                    other for search_date in search_dates for other in by_student.get((student.id, search_date), [])
+                )
+                for other in candidates:
+                    other_booking = bookings[other]
+                    if other != index and self._intervals_conflict(intervals[index], intervals[other]):
+                        conflicts[index].append(
+                            self._build_batch_conflict(
+                                "batch_student_conflict",
+                                other,
+                                other_booking,
+                                f"Student {student.name} is also booked",
+                                student_id=student.id,
+                            )
+                        )
+
+            teacher, school = booking["teacher"], booking["school"]
+            candidates = sorted(
+                other
+                for search_date in search_dates
+                for other in by_teacher.get((teacher.id, school.id, search_date), [])
+            )
+            for other in candidates:
+                other_booking = bookings[other]
+                if other != index and self._intervals_conflict(intervals[index], intervals[other], buffers[index]):
+                    conflicts[index].append(
+                        self._build_batch_conflict(
+                            "batch_teacher_conflict",
+                            other,
+                            other_booking,
+                            f"Teacher is also booked (with a {buffers[index]} minute buffer)",
+                        )
+                    )
+        return conflicts
+
+    def _build_batch_conflict(
+        self, conflict_type: str, index: int, booking: dict[str, Any], reason: str, **extra: Any
+    ) -> dict[str, Any]:
+        """Build the report of a conflict with another booking of the same batch."""
+        return {
+            "has_conflict": True,
+            "type": conflict_type,
+            "booking_index": index,
+            "date": booking["date"],
+            "start_time": booking["start_time"],
+            "end_time": booking["end_time"],
+            **extra,
+            "error_message": (
+                f"{reason} at {booking['start_time']}-{booking['end_time']} on {booking['date']} "
+                f"by another booking in this request."
+            ),
+        }
+
+    @staticmethod
+    def _neighbouring_dates(day: date) -> tuple[date, date, date]:
+        """The day before, the day itself and the day after."""
+        return day - timedelta(days=1), day, day + timedelta(days=1)
+
+    def _class_interval(self, day: date, start_time: time, end_time: time) -> tuple[datetime, datetime]:
+        """Start and end of a class as datetimes; the end is on the next day when it crosses midnight."""
+        boundary = self.handle_day_boundary_cases(day, start_time, end_time)
+        return boundary["start_datetime"], boundary["end_datetime"]
+
+    @staticmethod
+    def _intervals_conflict(
+        first: tuple[datetime, datetime], second: tuple[datetime, datetime], buffer_minutes: int = 0
+    ) -> bool:
+        """Whether two intervals overlap once the first is widened by buffer_minutes on both sides."""
+        buffer = timedelta(minutes=buffer_minutes)
+        return first[0] - buffer < second[1] and second[0] < first[1] + buffer
+
+    def _get_buffer_search_dates(
+        self, booking_date: date, start_time: time, end_time: time, buffer_minutes: int
+    ) -> list[date]:
+        """Dates whose classes can fall inside a booking's buffer window."""
+        buffer_start_datetime = datetime.combine(booking_date, start_time) - timedelta(minutes=buffer_minutes)
+        buffer_end_datetime = datetime.combine(booking_date, end_time) + timedelta(minutes=buffer_minutes)
+
+        search_dates = [booking_date]
+        if buffer_start_datetime.date() < booking_date:
+            search_dates.append(booking_date - timedelta(days=1))
+        if buffer_end_datetime.date() > booking_date:
+            search_dates.append(booking_date + timedelta(days=1))
+        return search_dates
 
     def _has_buffer_conflict(
         self, date1: date, start1: time, end1: time, date2: date, start2: time, end2: time, buffer_minutes: int
@@ -594,13 +833,16 @@ class AvailabilityCalculationService:
             school, teacher, class_type, is_student=bool(requesting_student)
         )
 
+        # Load the whole range once (from cached weekly snapshots) and sweep each day against the interval index
+        engine = AvailabilitySnapshotCache.get_engine(
+            teacher, school, start_date, end_date, config["buffer_time_minutes"]
+        )
+
         available_slots = []
         current_date = start_date
 
         while current_date <= end_date:
-            day_slots = self._get_slots_for_date_with_rules(
-                teacher, school, current_date, duration_minutes, class_type, requesting_student, config
-            )
+            day_slots = self._get_slots_from_engine(engine, teacher, school, current_date, duration_minutes, config)
             available_slots.extend(day_slots)
             current_date += timedelta(days=1)
 
@@ -632,53 +874,31 @@ class AvailabilityCalculationService:
                 school, teacher, class_type, is_student=bool(requesting_student)
             )
 
-        day_of_week = booking_date.strftime("%A").lower()
-
-        # Get teacher availability for this day
-        availability = TeacherAvailability.objects.filter(
-            teacher=teacher, school=school, day_of_week=day_of_week, is_active=True
-        ).first()
-
-        if not availability:
-            return []
-
-        # Check if we've reached daily booking limits
-        if not self._check_daily_booking_capacity(teacher, school, booking_date, config):
-            return []
-
-        slots = []
-        current_time = availability.start_time
-        end_limit = availability.end_time
-        buffer_minutes = config["buffer_time_minutes"]
-        minimum_notice_minutes = config["minimum_notice_minutes"]
-
-        while current_time < end_limit:
-            slot_end_datetime = datetime.combine(booking_date, current_time) + timedelta(minutes=duration_minutes)
-            slot_end_time = slot_end_datetime.time()
-
-            # Check if slot fits within availability
-            if slot_end_time > end_limit:
-                break
-
-            # Check minimum notice period
-            if not self._meets_minimum_notice(booking_date, current_time, minimum_notice_minutes):
-                current_time = self._advance_time_slot(current_time)
-                continue
-
-            # Check for conflicts (unavailability, existing classes, buffer times)
-            if self._has_slot_conflicts(
-                teacher, school, booking_date, current_time, slot_end_time, class_type, buffer_minutes
-            ):
-                current_time = self._advance_time_slot(current_time)
-                continue
-
-            # Create slot
-            slot = self._create_slot(teacher, school, booking_date, current_time, slot_end_time, duration_minutes)
-            slots.append(slot)
-
-            current_time = self._advance_time_slot(current_time)
+        engine = AvailabilitySnapshotCache.get_engine(
+            teacher, school, booking_date, booking_date, config["buffer_time_minutes"]
+        )
+        return self._get_slots_from_engine(engine, teacher, school, booking_date, duration_minutes, config)
 
-        return slots
+    def _get_slots_from_engine(
+        self,
+        engine: TeacherSlotEngine,
+        teacher: TeacherProfile,
+        school: School,
+        booking_date: date,
+        duration_minutes: int,
+        config: dict[str, Any],
+    ) -> list[dict[str, Any]]:
+        """Sweep one day of a preloaded slot engine into slot dicts."""
+        free_slots = engine.iter_free_slots(
+            booking_date,
+            duration_minutes,
+            config["minimum_notice_minutes"],
+            daily_limit=config["daily_booking_limit"],
+        )
+        return [
+            self._create_slot(teacher, school, booking_date, start_time, end_time, duration_minutes)
+            for start_time, end_time in free_slots
+        ]
 
     def _check_daily_booking_capacity(
         self, teacher: TeacherProfile, school: School, booking_date: date, config: dict[str, Any]
@@ -771,3 +991,91 @@ class AvailabilityCalculationService:
         current_datetime = datetime.combine(date.today(), current_time)
         next_datetime = current_datetime + timedelta(minutes=30)
         return next_datetime.time()
+
+
+class BatchSlotSearchService:
+    """Service for searching available slots across many teachers and schools in bulk."""
+
+    def __init__(self):
+        self.config_service = SchedulingConfigurationService()
+        self.availability_service = AvailabilityCalculationService()
+
+    def iter_slots_by_day(
+        self,
+        teachers: Iterable[TeacherProfile | int],
+        schools: Iterable[School | int],
+        start_date: date,
+        duration_minutes: int,
+        end_date: date | None = None,
+        class_type: str | None = None,
+        requesting_student: CustomUser | None = None,
+    ) -> Iterator[tuple[date, dict[int, list[dict[str, Any]]]]]:
+        """
+        Yield (date, {teacher_id: slots}) one day at a time.
+
+        All schedule data is prefetched up front in a constant number of queries, so
+        callers can render the first days while later days are still being swept.
+        """
+        if end_date is None:
+            end_date = start_date
+
+        teacher_ids = {getattr(teacher, "pk", teacher) for teacher in teachers}
+        school_ids = {getattr(school, "pk", school) for school in schools}
+        teachers_by_id = TeacherProfile.objects.select_related("user").in_bulk(teacher_ids)
+        schools_by_id = School.objects.select_related("settings").in_bulk(school_ids)
+
+        configs: dict[tuple[int, int], dict[str, Any]] = {}
+
+        def buffer_for(teacher_id: int, school_id: int) -> int:
+            config = self.config_service.get_rule_configuration(
+                schools_by_id[school_id],
+                teachers_by_id[teacher_id],
+                class_type,
+                is_student=bool(requesting_student),
+            )
+            configs[(teacher_id, school_id)] = config
+            return config["buffer_time_minutes"]  # type: ignore[no-any-return]
+
+        engines = TeacherSlotEngine.load_many(
+            teachers_by_id.keys(), schools_by_id.keys(), start_date, end_date, buffer_for
+        )
+
+        current_date = start_date
+        while current_date <= end_date:
+            day_slots: dict[int, list[dict[str, Any]]] = {}
+            for (teacher_id, school_id), engine in engines.items():
+                slots = self.availability_service._get_slots_from_engine(
+                    engine,
+                    teachers_by_id[teacher_id],
+                    schools_by_id[school_id],
+                    current_date,
+                    duration_minutes,
+                    configs[(teacher_id, school_id)],
+                )
+                if slots:
+                    day_slots.setdefault(teacher_id, []).extend(slots)
+
+            for slots in day_slots.values():
+                slots.sort(key=lambda slot: slot["start_datetime_iso"])
+
+            yield current_date, day_slots
+            current_date += timedelta(days=1)
+
+    def get_slots_by_teacher(
+        self,
+        teachers: Iterable[TeacherProfile | int],
+        schools: Iterable[School | int],
+        start_date: date,
+        duration_minutes: int,
+        end_date: date | None = None,
+        class_type: str | None = None,
+        requesting_student: CustomUser | None = None,
+    ) -> dict[int, list[dict[str, Any]]]:
+        """Collect the whole date range into {teacher_id: slots}."""
+        slots_by_teacher: dict[int, list[dict[str, Any]]] = {}
+        for _day, day_slots in self.iter_slots_by_day(
+            teachers, schools, start_date, duration_minutes, end_date, class_type, requesting_student
+        ):
+            for teacher_id, slots in day_slots.items():
+                slots_by_teacher.setdefault(teacher_id, []).extend(slots)
+        return slots_by_teacher
@@ -7,8 +7,14 @@ allowing the reminder system to react to these events.
 
 import logging
 
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import Signal, receiver
 
+from accounts.models import SchoolSettings
+
+from .models import ClassSchedule, TeacherAvailability, TeacherUnavailability
+
 logger = logging.getLogger(__name__)
 
 # Define the class status change signal
@@ -34,3 +40,58 @@ def handle_class_status_change(sender, instance, old_status, new_status, changed
 
     except Exception as e:
         logger.error(f"Error handling class status change signal: {e}", exc_info=True)
+
+
+def invalidate_teacher_availability(teacher_id):
+    """
+    Bump the teacher's availability snapshot version now and again after commit.
+
+    The immediate bump keeps reads inside the same transaction consistent; the
+    on-commit bump discards any snapshot another worker built from pre-commit data.
+    """
+    from .availability_cache import AvailabilitySnapshotCache
+
+    AvailabilitySnapshotCache.invalidate(teacher_id)
+    transaction.on_commit(lambda: AvailabilitySnapshotCache.invalidate(teacher_id))
+
+
+@receiver(post_save, sender=ClassSchedule)
+@receiver(post_delete, sender=ClassSchedule)
+@receiver(post_save, sender=TeacherAvailability)
+@receiver(post_delete, sender=TeacherAvailability)
+@receiver(post_save, sender=TeacherUnavailability)
+@receiver(post_delete, sender=TeacherUnavailability)
+def invalidate_availability_on_schedule_change(sender, instance, **kwargs):
+    """Invalidate cached availability when a teacher's schedule rows change."""
+    invalidate_teacher_availability(instance.teacher_id)
+
+
+@receiver(class_status_changed)
+def invalidate_availability_on_status_change(sender, instance, **kwargs):
+    """Invalidate cached availability when a class changes status (booked, cancelled, ...)."""
+    invalidate_teacher_availability(instance.teacher_id)
+
+
+@receiver(pre_save, sender=SchoolSettings)
+def capture_school_timezone(sender, instance, **kwargs):
+    """Remember the stored timezone so post_save can tell whether it changed."""
+    if instance.pk:
+        instance._previous_timezone = (
+            SchoolSettings.objects.filter(pk=instance.pk).values_list("timezone", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=SchoolSettings)
+def refresh_class_times_on_timezone_change(sender, instance, created, **kwargs):
+    """
+    Recompute the school's class UTC instants when its timezone changes (new settings replace UTC).
+
+    The recomputation runs in the background after the change commits, not in the request.
+    """
+    previous = "UTC" if created else getattr(instance, "_previous_timezone", instance.timezone)
+    if previous == instance.timezone:
+        return
+
+    from .class_time_services import ClassTimeIndexService
+
+    ClassTimeIndexService.refresh_school_after_commit(instance.school_id)
@@ -0,0 +1,239 @@
+"""
+Unit Tests for Bulk Conflict Detection
+
+Bulk conflict reports must match the single-booking checks in
+ConflictDetectionService while resolving a whole series in a fixed number of queries.
+"""
+
+from datetime import date, time, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import (
+    CustomUser,
+    EducationalSystem,
+    School,
+    SchoolMembership,
+    SchoolRole,
+    SchoolSettings,
+    TeacherProfile,
+)
+from scheduler.models import ClassSchedule, ClassStatus, ClassType
+from scheduler.scheduling_rules_services import ConflictDetectionService
+
+
+class BulkConflictDetectionTests(TestCase):
+    """Test bulk conflict detection for recurring series and group rosters"""
+
+    def setUp(self):
+        self.edu_system, _ = EducationalSystem.objects.get_or_create(
+            code="custom", defaults={"name": "Custom Education System"}
+        )
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.other_school = School.objects.create(name="Other School", contact_email="other@school.com")
+        for school in (self.school, self.other_school):
+            SchoolSettings.objects.create(
+                school=school, educational_system=self.edu_system, default_buffer_time_minutes=15
+            )
+
+        self.teacher_user = CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        self.teacher = TeacherProfile.objects.create(user=self.teacher_user)
+        self.other_teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="other.teacher@test.com", name="Other Teacher")
+        )
+        self.students = [
+            CustomUser.objects.create_user(email=f"student{index}@test.com", name=f"Student {index}")
+            for index in range(3)
+        ]
+        for student in self.students:
+            SchoolMembership.objects.create(user=student, school=self.school, role=SchoolRole.STUDENT)
+
+        self.first_date = date.today() + timedelta(days=7)
+        self.service = ConflictDetectionService()
+
+    def create_class(self, scheduled_date, start_time, end_time, teacher=None, school=None, student=None, **kwargs):
+        return ClassSchedule.objects.create(
+            teacher=teacher or self.teacher,
+            student=student or self.students[0],
+            school=school or self.school,
+            title="Existing Class",
+            scheduled_date=scheduled_date,
+            start_time=start_time,
+            end_time=end_time,
+            duration_minutes=60,
+            status=ClassStatus.SCHEDULED,
+            booked_by=self.teacher_user,
+            **kwargs,
+        )
+
+    def weekly_series(self, weeks, start_time=time(10, 0), end_time=time(11, 0)):
+        return [
+            {
+                "teacher": self.teacher,
+                "school": self.school,
+                "date": self.first_date + timedelta(weeks=week),
+                "start_time": start_time,
+                "end_time": end_time,
+                "students": self.students,
+            }
+            for week in range(weeks)
+        ]
+
+    def assert_matches_single_checks(self, bookings, reports):
+        for booking, report in zip(bookings, reports, strict=True):
+            for student in booking["students"]:
+                self.assertEqual(
+                    report["student_conflicts"].get(student.id),
+                    self.service.detect_student_conflicts(
+                        student, booking["school"], booking["date"], booking["start_time"], booking["end_time"]
+                    ),
+                )
+            self.assertEqual(
+                report["teacher_conflict"],
+                self.service.detect_teacher_conflicts(
+                    booking["teacher"], booking["school"], booking["date"], booking["start_time"], booking["end_time"]
+                ),
+            )
+
+    def test_series_without_conflicts(self):
+        """A clean series reports no conflicts"""
+        reports = self.service.detect_bulk_conflicts(self.weekly_series(4))
+
+        self.assertEqual(len(reports), 4)
+        self.assertFalse(any(report["has_conflict"] for report in reports))
+
+    def test_teacher_buffer_conflict_on_one_occurrence(self):
+        """Only the occurrence inside the buffer window is reported"""
+        self.create_class(self.first_date + timedelta(weeks=1), time(11, 10), time(12, 0), student=self.students[2])
+        bookings = self.weekly_series(3)
+
+        reports = self.service.detect_bulk_conflicts(bookings)
+
+        self.assertEqual([report["has_conflict"] for report in reports], [False, True, False])
+        self.assertEqual(reports[1]["teacher_conflict"]["type"], "teacher_buffer_conflict")
+        self.assert_matches_single_checks(bookings, reports)
+
+    def test_student_conflicts_across_schools_and_group_classes(self):
+        """Cross-school and group participation conflicts match the single checks"""
+        group_class = self.create_class(
+            self.first_date,
+            time(10, 30),
+            time(11, 30),
+            teacher=self.other_teacher,
+            student=self.students[0],
+            class_type=ClassType.GROUP,
+            max_participants=5,
+        )
+        group_class.additional_students.add(self.students[1])
+        self.create_class(
+            self.first_date,
+            time(9, 30),
+            time(10, 30),
+            teacher=self.other_teacher,
+            school=self.other_school,
+            student=self.students[2],
+        )
+        bookings = self.weekly_series(1)
+
+        reports = self.service.detect_bulk_conflicts(bookings)
+
+        self.assertEqual(
+            {student_id: conflict["type"] for student_id, conflict in reports[0]["student_conflicts"].items()},
+            {
+                self.students[0].id: "group_class_student_conflict",
+                self.students[1].id: "group_class_student_conflict",
+                self.students[2].id: "cross_school_student_conflict",
+            },
+        )
+        self.assert_matches_single_checks(bookings, reports)
+
+    def test_buffer_reaches_across_midnight(self):
+        """A late class on the previous day conflicts with an early booking through the buffer"""
+        self.create_class(self.first_date - timedelta(days=1), time(23, 0), time(23, 55), student=self.students[2])
+        bookings = self.weekly_series(1, start_time=time(0, 0), end_time=time(1, 0))
+
+        reports = self.service.detect_bulk_conflicts(bookings)
+
+        self.assertIsNotNone(reports[0]["teacher_conflict"])
+        self.assert_matches_single_checks(bookings, reports)
+
+    def test_overnight_classes_and_bookings_conflict_across_midnight(self):
+        """Classes and bookings ending after midnight are compared on the following day"""
+        self.create_class(self.first_date - timedelta(days=1), time(23, 0), time(1, 0), teacher=self.other_teacher)
+        bookings = self.weekly_series(1, start_time=time(0, 30), end_time=time(1, 30))
+        bookings[0]["students"] = self.students[:1]
+        bookings.append(
+            dict(
+                bookings[0],
+                date=self.first_date - timedelta(days=1),
+                start_time=time(23, 30),
+                end_time=time(0, 40),
+                students=[],
+            )
+        )
+
+        reports = self.service.detect_bulk_conflicts(bookings)
+
+        self.assertEqual(reports[0]["student_conflicts"][self.students[0].id]["type"], "student_double_booking")
+        self.assertIsNone(reports[0]["teacher_conflict"])
+        self.assertEqual(
+            [
+                {(conflict["type"], conflict["booking_index"]) for conflict in report["batch_conflicts"]}
+                for report in reports
+            ],
+            [{("batch_teacher_conflict", 1)}, {("batch_teacher_conflict", 0)}],
+        )
+
+    def test_excluded_class_is_ignored(self):
+        """exclude_class_id skips the class being rescheduled"""
+        existing = self.create_class(self.first_date, time(10, 0), time(11, 0))
+        bookings = self.weekly_series(1)
+        bookings[0]["exclude_class_id"] = existing.id
+
+        reports = self.service.detect_bulk_conflicts(bookings)
+
+        self.assertFalse(reports[0]["has_conflict"])
+
+    def test_bookings_conflict_with_each_other(self):
+        """Overlaps inside the batch are reported by booking index"""
+        bookings = self.weekly_series(2)
+        # The same slot again, and the teacher again within the 15 minute buffer
+        bookings.append(dict(bookings[0], students=[]))
+        bookings.append(dict(bookings[1], start_time=time(11, 10), end_time=time(12, 0), students=[]))
+        # Another teacher, but one of the series' students
+        bookings.append(
+            dict(bookings[1], teacher=self.other_teacher, start_time=time(10, 30), students=[self.students[2]])
+        )
+
+        reports = self.service.detect_bulk_conflicts(bookings)
+
+        conflicts = [
+            {(conflict["type"], conflict["booking_index"]) for conflict in report["batch_conflicts"]}
+            for report in reports
+        ]
+        self.assertEqual(
+            conflicts,
+            [
+                {("batch_teacher_conflict", 2)},
+                {("batch_teacher_conflict", 3), ("batch_student_conflict", 4)},
+                {("batch_teacher_conflict", 0)},
+                {("batch_teacher_conflict", 1)},
+                {("batch_student_conflict", 1)},
+            ],
+        )
+        self.assertTrue(all(report["has_conflict"] for report in reports))
+        self.assertEqual(reports[4]["batch_conflicts"][0]["student_id"], self.students[2].id)
+
+    def test_query_count_does_not_grow_with_series_length(self):
+        """A year of weekly occurrences costs the same queries as one month"""
+        self.create_class(self.first_date, time(10, 0), time(11, 0))
+        self.create_class(self.first_date + timedelta(weeks=20), time(10, 0), time(11, 0))
+
+        with CaptureQueriesContext(connection) as month:
+            ConflictDetectionService().detect_bulk_conflicts(self.weekly_series(4))
+        with CaptureQueriesContext(connection) as year:
+            ConflictDetectionService().detect_bulk_conflicts(self.weekly_series(52))
+
+        self.assertEqual(len(month.captured_queries), len(year.captured_queries))
@@ -0,0 +1,152 @@
+"""
+Unit Tests for Bulk Reminder Recipient Resolution
+
+Recipients for a whole reminder tick must be resolved with a fixed number of queries,
+applying the same membership and preference rules to every class.
+"""
+
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import (
+    CustomUser,
+    GuardianStudentRelationship,
+    School,
+    SchoolMembership,
+    SchoolRole,
+    TeacherProfile,
+)
+from scheduler.models import (
+    ClassReminder,
+    ClassSchedule,
+    ClassType,
+    CommunicationChannel,
+    ReminderPreference,
+    ReminderType,
+)
+from scheduler.reminder_services import RecipientDeterminationService, ReminderBackgroundTaskService
+
+
+class BulkRecipientResolutionTests(TestCase):
+    """Test RecipientDeterminationService.determine_recipients_for_classes"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.admin_user = CustomUser.objects.create_user(email="admin@test.com", name="Admin User")
+        self.teacher = TeacherProfile.objects.create(user=self.create_member("teacher", SchoolRole.TEACHER))
+        self.students = [self.create_member(f"student{index}", SchoolRole.STUDENT) for index in range(3)]
+        self.guardian = self.create_member("guardian", SchoolRole.GUARDIAN)
+        GuardianStudentRelationship.objects.create(guardian=self.guardian, student=self.students[0], school=self.school)
+
+    def create_member(self, name, role):
+        user = CustomUser.objects.create_user(email=f"{name}@test.com", name=name.title())
+        SchoolMembership.objects.create(user=user, school=self.school, role=role)
+        return user
+
+    def create_class(self, student, class_type=ClassType.INDIVIDUAL, additional_students=(), hours_ahead=24):
+        start = datetime.now() + timedelta(hours=hours_ahead)
+        class_schedule = ClassSchedule.objects.create(
+            teacher=self.teacher,
+            student=student,
+            school=self.school,
+            title="Math Class",
+            class_type=class_type,
+            scheduled_date=start.date(),
+            start_time=start.time().replace(second=0, microsecond=0),
+            end_time=(start + timedelta(hours=1)).time().replace(second=0, microsecond=0),
+            duration_minutes=60,
+            booked_by=self.admin_user,
+            max_participants=5 if class_type == ClassType.GROUP else None,
+        )
+        class_schedule.additional_students.set(additional_students)
+        return class_schedule
+
+    def summary(self, recipients):
+        return [(recipient["user"], recipient["role"], recipient["channels"]) for recipient in recipients]
+
+    def test_resolves_teacher_students_and_guardians(self):
+        group = self.create_class(self.students[0], ClassType.GROUP, additional_students=self.students[1:])
+
+        recipients = RecipientDeterminationService.determine_recipients_for_classes([group])[group.id]
+
+        email = [CommunicationChannel.EMAIL]
+        self.assertEqual(
+            self.summary(recipients),
+            [
+                (self.teacher.user, "teacher", email),
+                (self.students[0], "student", email),
+                (self.guardian, "parent", email),
+                (self.students[1], "student", email),
+                (self.students[2], "student", email),
+            ],
+        )
+
+    def test_preferences_and_memberships_filter_recipients(self):
+        """Disabled preferences and missing memberships exclude; school preferences beat global ones"""
+        ReminderPreference.objects.create(user=self.students[0], is_active=False)
+        ReminderPreference.objects.create(user=self.guardian, communication_channels=[CommunicationChannel.EMAIL])
+        ReminderPreference.objects.create(
+            user=self.guardian, school=self.school, communication_channels=[CommunicationChannel.SMS]
+        )
+        SchoolMembership.objects.filter(user=self.students[1]).update(is_active=False)
+        group = self.create_class(self.students[0], ClassType.GROUP, additional_students=self.students[1:])
+
+        recipients = RecipientDeterminationService.determine_recipients(group, ReminderType.REMINDER_24H)
+
+        self.assertEqual(
+            self.summary(recipients),
+            [
+                (self.teacher.user, "teacher", [CommunicationChannel.EMAIL]),
+                (self.guardian, "parent", [CommunicationChannel.SMS]),
+                (self.students[2], "student", [CommunicationChannel.EMAIL]),
+            ],
+        )
+
+    def test_query_count_independent_of_class_count(self):
+        one = [self.create_class(self.students[0], ClassType.GROUP, additional_students=self.students[1:])]
+        many = [
+            self.create_class(student, ClassType.GROUP, additional_students=self.students[:1], hours_ahead=hours)
+            for hours in range(30, 40)
+            for student in self.students[1:]
+        ]
+
+        with self.assertNumQueries(5):
+            RecipientDeterminationService.determine_recipients_for_classes(one)
+        with self.assertNumQueries(5):
+            resolved = RecipientDeterminationService.determine_recipients_for_classes(many)
+
+        self.assertEqual(len(resolved), len(many))
+
+    def test_admin_only_returns_teacher(self):
+        class_schedule = self.create_class(self.students[0])
+
+        recipients = RecipientDeterminationService.determine_recipients(
+            class_schedule, ReminderType.REMINDER_24H, admin_only=True
+        )
+
+        self.assertEqual(self.summary(recipients), [(self.teacher.user, "teacher", [CommunicationChannel.EMAIL])])
+
+    def test_queue_reminders_creates_one_row_per_recipient_channel(self):
+        class_schedule = self.create_class(self.students[0])
+        ReminderPreference.objects.create(
+            user=self.students[0], communication_channels=[CommunicationChannel.EMAIL, CommunicationChannel.PUSH]
+        )
+
+        queued = ReminderBackgroundTaskService.queue_reminders(ReminderType.REMINDER_24H)
+
+        self.assertEqual(queued, 4)
+        self.assertEqual(
+            set(ClassReminder.objects.values_list("recipient_id", "communication_channel")),
+            {
+                (self.teacher.user.id, CommunicationChannel.EMAIL),
+                (self.students[0].id, CommunicationChannel.EMAIL),
+                (self.students[0].id, CommunicationChannel.PUSH),
+                (self.guardian.id, CommunicationChannel.EMAIL),
+            },
+        )
+        self.assertTrue(
+            ClassReminder.objects.filter(class_schedule=class_schedule, scheduled_for__lte=timezone.now()).exists()
+        )
+        self.assertEqual(ReminderBackgroundTaskService.queue_reminders(ReminderType.REMINDER_24H), 0)
@@ -0,0 +1,180 @@
+"""
+Unit Tests for the persisted UTC start/end instants on ClassSchedule
+
+The instants must follow the school's timezone through saves, bulk materialization,
+timezone changes and backfills so time-window selection can run in SQL.
+"""
+
+from datetime import date, datetime, time, timedelta
+import importlib
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+import pytz
+
+from accounts.models import CustomUser, EducationalSystem, School, SchoolSettings, TeacherProfile
+from scheduler.models import (
+    ClassReminder,
+    ClassSchedule,
+    ClassStatus,
+    CommunicationChannel,
+    RecurringClassSchedule,
+    ReminderStatus,
+    ReminderType,
+    WeekDay,
+)
+from scheduler.recurring_services import RecurringSeriesMaterializer
+from scheduler.reminder_services import ReminderBackgroundTaskService
+
+NEW_YORK = pytz.timezone("America/New_York")
+
+
+class ClassUtcTimesTests(TestCase):
+    """Test maintenance and use of scheduled_start_utc/scheduled_end_utc"""
+
+    def setUp(self):
+        edu_system, _ = EducationalSystem.objects.get_or_create(
+            code="test_system", defaults={"name": "Test Educational System"}
+        )
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.school_settings = SchoolSettings.objects.create(
+            school=self.school, educational_system=edu_system, timezone="America/New_York"
+        )
+        self.admin_user = CustomUser.objects.create_user(email="admin@test.com", name="Admin User")
+        self.student = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+
+    def create_class(self, local_start: datetime, **kwargs):
+        """Create a one-hour class starting at a naive local (New York) datetime"""
+        defaults = {
+            "teacher": self.teacher,
+            "student": self.student,
+            "school": self.school,
+            "title": "Math Class",
+            "scheduled_date": local_start.date(),
+            "start_time": local_start.time(),
+            "end_time": (local_start + timedelta(hours=1)).time(),
+            "duration_minutes": 60,
+            "booked_by": self.admin_user,
+        }
+        defaults.update(kwargs)
+        return ClassSchedule.objects.create(**defaults)
+
+    def local_in(self, delta: timedelta) -> datetime:
+        """Naive New York wall-clock time delta from now, truncated to the minute"""
+        return (timezone.now() + delta).astimezone(NEW_YORK).replace(tzinfo=None, second=0, microsecond=0)
+
+    def test_save_stores_utc_instants_in_school_timezone(self):
+        """10:00 in New York in January is 15:00 UTC"""
+        schedule = self.create_class(datetime(2030, 1, 15, 10, 0))
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.scheduled_start_utc, datetime(2030, 1, 15, 15, 0, tzinfo=pytz.UTC))
+        self.assertEqual(schedule.scheduled_end_utc, datetime(2030, 1, 15, 16, 0, tzinfo=pytz.UTC))
+        self.assertEqual(schedule.scheduled_start_utc, schedule.get_scheduled_datetime_utc())
+
+    def test_save_with_update_fields_keeps_instants_current(self):
+        schedule = self.create_class(datetime(2030, 1, 15, 10, 0))
+
+        schedule.start_time = time(12, 0)
+        schedule.end_time = time(13, 0)
+        schedule.save(update_fields=["start_time", "end_time"])
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.scheduled_start_utc, datetime(2030, 1, 15, 17, 0, tzinfo=pytz.UTC))
+
+    def test_timezone_change_recomputes_school_classes(self):
+        schedule = self.create_class(datetime(2030, 1, 15, 10, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.school_settings.timezone = "Europe/Lisbon"
+            self.school_settings.save()
+
+            # Nothing is recomputed until the settings change commits
+            schedule.refresh_from_db()
+            self.assertEqual(schedule.scheduled_start_utc, datetime(2030, 1, 15, 15, 0, tzinfo=pytz.UTC))
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.scheduled_start_utc, datetime(2030, 1, 15, 10, 0, tzinfo=pytz.UTC))
+
+    def test_materialized_instances_get_instants(self):
+        """Bulk-created recurring instances are filled in without save()"""
+        monday = date.today() + timedelta(days=(7 - date.today().weekday()) % 7 or 7)
+        series = RecurringClassSchedule.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            title="Weekly Math Class",
+            day_of_week=WeekDay.MONDAY,
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            duration_minutes=60,
+            start_date=monday,
+            created_by=self.admin_user,
+        )
+        series.students.set([self.student])
+
+        RecurringSeriesMaterializer(weeks_ahead=2).materialize([series])
+
+        for instance in series.generated_instances.all():
+            self.assertIsNotNone(instance.scheduled_start_utc)
+            self.assertEqual(instance.scheduled_start_utc, instance.get_scheduled_datetime_utc())
+
+    def test_backfill_command_fills_missing_instants(self):
+        schedule = self.create_class(datetime(2030, 1, 15, 10, 0))
+        ClassSchedule.objects.update(scheduled_start_utc=None, scheduled_end_utc=None)
+        out = StringIO()
+
+        call_command("backfill_class_utc_times", "--batch-size=1", stdout=out)
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.scheduled_start_utc, datetime(2030, 1, 15, 15, 0, tzinfo=pytz.UTC))
+        self.assertIn("Updated 1 classes", out.getvalue())
+
+    def test_migration_backfills_existing_classes(self):
+        schedule = self.create_class(datetime(2030, 7, 15, 10, 0))
+        ClassSchedule.objects.update(scheduled_start_utc=None, scheduled_end_utc=None)
+        migration = importlib.import_module("scheduler.migrations.0002_class_schedule_utc_times")
+
+        migration.backfill_utc_times(apps, None)
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.scheduled_start_utc, datetime(2030, 7, 15, 14, 0, tzinfo=pytz.UTC))
+        self.assertEqual(schedule.scheduled_end_utc, datetime(2030, 7, 15, 15, 0, tzinfo=pytz.UTC))
+
+    def test_reminder_window_selected_in_one_query(self):
+        """Only classes in the window without an existing reminder are returned"""
+        due = self.create_class(self.local_in(timedelta(hours=24)))
+        already_reminded = self.create_class(self.local_in(timedelta(hours=24, minutes=10)))
+        self.create_class(self.local_in(timedelta(hours=30)))
+        self.create_class(self.local_in(timedelta(hours=24)), status=ClassStatus.CANCELLED)
+        ClassReminder.objects.create(
+            class_schedule=already_reminded,
+            reminder_type=ReminderType.REMINDER_24H,
+            recipient=self.student,
+            recipient_type="student",
+            communication_channel=CommunicationChannel.EMAIL,
+            status=ReminderStatus.PENDING,
+            scheduled_for=timezone.now(),
+        )
+
+        with self.assertNumQueries(1):
+            classes = ReminderBackgroundTaskService.find_classes_needing_reminders(ReminderType.REMINDER_24H)
+            self.assertEqual(classes[0].school, self.school)
+
+        self.assertEqual(classes, [due])
+
+    def test_upcoming_queryset_and_cancellation_deadline(self):
+        soon = self.create_class(self.local_in(timedelta(hours=1)))
+        later = self.create_class(self.local_in(timedelta(hours=5)))
+        self.create_class(self.local_in(timedelta(hours=-3)))
+        no_show = self.create_class(self.local_in(timedelta(hours=5)), status=ClassStatus.NO_SHOW)
+
+        self.assertEqual(set(ClassSchedule.objects.filter(status=ClassStatus.SCHEDULED).upcoming()), {soon, later})
+        self.assertFalse(soon.can_cancel_within_deadline(hours_before=2))
+        self.assertTrue(later.can_cancel_within_deadline(hours_before=2))
+        self.assertFalse(no_show.can_cancel_within_deadline(hours_before=2))
@@ -0,0 +1,170 @@
+"""
+Unit Tests for the Recurring Series Materializer
+
+The bulk materializer must create the same instances as the week-by-week
+generation it replaces while keeping the query count independent of the
+number of occurrences and series.
+"""
+
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import CustomUser, School, TeacherProfile
+from scheduler.models import (
+    ClassSchedule,
+    ClassType,
+    FrequencyType,
+    RecurringClassSchedule,
+    RecurringClassStatus,
+    TeacherUnavailability,
+    WeekDay,
+)
+from scheduler.recurring_services import RecurringSeriesMaterializer
+
+
+class RecurringSeriesMaterializerTests(TestCase):
+    """Test bulk materialization of recurring class series"""
+
+    def setUp(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.admin_user = CustomUser.objects.create_user(email="admin@test.com", name="Admin User")
+        self.teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+        self.students = [
+            CustomUser.objects.create_user(email=f"student{index}@test.com", name=f"Student {index}")
+            for index in range(3)
+        ]
+        self.today = date.today()
+        # Next Monday so every weekly series has a predictable first occurrence
+        self.first_monday = self.today + timedelta(days=(7 - self.today.weekday()) % 7 or 7)
+
+    def create_series(self, students=None, **kwargs):
+        defaults = {
+            "teacher": self.teacher,
+            "school": self.school,
+            "title": "Weekly Math Class",
+            "class_type": ClassType.INDIVIDUAL,
+            "day_of_week": WeekDay.MONDAY,
+            "start_time": time(10, 0),
+            "end_time": time(11, 0),
+            "duration_minutes": 60,
+            "start_date": self.first_monday,
+            "created_by": self.admin_user,
+        }
+        defaults.update(kwargs)
+        series = RecurringClassSchedule.objects.create(**defaults)
+        series.students.set(students if students is not None else self.students[:1])
+        return series
+
+    def test_creates_one_instance_per_occurrence(self):
+        """Weekly series produce one instance per week in the window"""
+        series = self.create_series()
+
+        result = RecurringSeriesMaterializer(weeks_ahead=4).materialize([series])
+
+        dates = list(series.generated_instances.values_list("scheduled_date", flat=True))
+        expected = [self.first_monday + timedelta(weeks=week) for week in range(5)]
+        expected = [day for day in expected if day <= self.today + timedelta(weeks=4)]
+        self.assertEqual(dates, expected)
+        self.assertEqual(result.instances_created, len(expected))
+        self.assertTrue(all(instance.student == self.students[0] for instance in result.created))
+
+    def test_biweekly_and_end_date_respected(self):
+        """Frequency sets the step and end_date caps the window"""
+        series = self.create_series(
+            frequency_type=FrequencyType.BIWEEKLY, end_date=self.first_monday + timedelta(weeks=3)
+        )
+
+        RecurringSeriesMaterializer(weeks_ahead=8).materialize([series])
+
+        self.assertEqual(
+            list(series.generated_instances.values_list("scheduled_date", flat=True)),
+            [self.first_monday, self.first_monday + timedelta(weeks=2)],
+        )
+
+    def test_group_series_gets_additional_students(self):
+        """Group instances carry the other students as additional students"""
+        series = self.create_series(students=self.students, class_type=ClassType.GROUP, max_participants=5)
+
+        RecurringSeriesMaterializer(weeks_ahead=2).materialize([series])
+
+        for instance in series.generated_instances.all():
+            self.assertEqual(instance.student, self.students[0])
+            self.assertEqual(set(instance.additional_students.all()), set(self.students[1:]))
+
+    def test_skips_unavailable_and_existing_dates(self):
+        """Unavailable dates are skipped and re-running creates nothing new"""
+        series = self.create_series()
+        TeacherUnavailability.objects.create(
+            teacher=self.teacher,
+            school=self.school,
+            date=self.first_monday,
+            start_time=time(10, 30),
+            end_time=time(12, 0),
+        )
+        materializer = RecurringSeriesMaterializer(weeks_ahead=4)
+
+        first_run = materializer.materialize([series])
+        second_run = materializer.materialize([series])
+
+        self.assertEqual(first_run.skipped_conflicts, 1)
+        self.assertNotIn(self.first_monday, [instance.scheduled_date for instance in first_run.created])
+        self.assertEqual(second_run.instances_created, 0)
+        self.assertEqual(second_run.skipped_existing, first_run.instances_created)
+
+    def test_inactive_series_and_dry_run_create_nothing(self):
+        """Paused series are ignored and dry runs do not write"""
+        paused = self.create_series(status=RecurringClassStatus.PAUSED)
+        active = self.create_series()
+
+        result = RecurringSeriesMaterializer(weeks_ahead=4).materialize([paused, active], dry_run=True)
+
+        self.assertEqual(result.series_processed, 1)
+        self.assertGreater(result.instances_created, 0)
+        self.assertFalse(ClassSchedule.objects.exists())
+
+    def test_generate_instances_delegates_to_materializer(self):
+        """The model method keeps returning the created instances"""
+        series = self.create_series()
+
+        created = series.generate_instances(weeks_ahead=2)
+
+        self.assertEqual(list(series.generated_instances.all()), created)
+
+    def test_query_count_does_not_grow_with_series(self):
+        """Ten group series over a year need the same reads as one over a month"""
+        small = [self.create_series(students=self.students, class_type=ClassType.GROUP, max_participants=5)]
+        large = [
+            self.create_series(students=self.students, class_type=ClassType.GROUP, max_participants=5)
+            for _ in range(10)
+        ]
+
+        with CaptureQueriesContext(connection) as single:
+            RecurringSeriesMaterializer(weeks_ahead=4).materialize(small)
+        with CaptureQueriesContext(connection) as many:
+            RecurringSeriesMaterializer(weeks_ahead=52).materialize(large)
+
+        def reads(context):
+            # Bulk inserts are split into batches; everything else must stay constant
+            return [query for query in context.captured_queries if not query["sql"].startswith("INSERT")]
+
+        self.assertEqual(len(reads(single)), len(reads(many)))
+        self.assertEqual(ClassSchedule.objects.filter(recurring_schedule__in=large).count(), 10 * 52)
+
+    def test_management_command(self):
+        """The nightly command rolls every active series forward"""
+        first = self.create_series()
+        second = self.create_series(day_of_week=WeekDay.TUESDAY)
+        out = StringIO()
+
+        call_command("materialize_recurring_classes", "--weeks-ahead=2", "--batch-size=1", stdout=out)
+
+        self.assertTrue(first.generated_instances.exists())
+        self.assertTrue(second.generated_instances.exists())
+        self.assertIn("Processed 2 series", out.getvalue())
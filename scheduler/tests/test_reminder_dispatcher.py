@@ -0,0 +1,174 @@
+"""
+Unit Tests for the Concurrent Reminder Dispatcher
+
+Due reminders must be claimed by exactly one worker, sent through the per-channel
+pools, and leave real processing times behind for the queue health metrics.
+"""
+
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import CustomUser, School, TeacherProfile
+from scheduler.models import (
+    ClassReminder,
+    ClassSchedule,
+    CommunicationChannel,
+    ReminderStatus,
+    ReminderType,
+)
+from scheduler.reminder_dispatcher import CLAIM_LEASE, ReminderDispatcher
+from scheduler.reminder_services import ReminderBackgroundTaskService
+
+
+class ReminderDispatcherTestMixin:
+    def create_fixtures(self):
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        self.admin_user = CustomUser.objects.create_user(email="admin@test.com", name="Admin User")
+        self.students = [
+            CustomUser.objects.create_user(email=f"student{index}@test.com", name=f"Student {index}")
+            for index in range(3)
+        ]
+        teacher = TeacherProfile.objects.create(
+            user=CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        )
+        start = datetime.now() + timedelta(days=1)
+        self.class_schedule = ClassSchedule.objects.create(
+            teacher=teacher,
+            student=self.students[0],
+            school=self.school,
+            title="Math Class",
+            scheduled_date=start.date(),
+            start_time=start.time().replace(microsecond=0),
+            end_time=(start + timedelta(hours=1)).time().replace(microsecond=0),
+            duration_minutes=60,
+            booked_by=self.admin_user,
+        )
+
+    def create_reminder(self, recipient, channel=CommunicationChannel.EMAIL, due_in=timedelta(minutes=-1), **kwargs):
+        return ClassReminder.objects.create(
+            class_schedule=self.class_schedule,
+            reminder_type=ReminderType.REMINDER_24H,
+            recipient=recipient,
+            recipient_type="student",
+            communication_channel=channel,
+            scheduled_for=timezone.now() + due_in,
+            **kwargs,
+        )
+
+
+@override_settings(REMINDER_MOCK_MODE=True)
+class ReminderDispatcherTests(ReminderDispatcherTestMixin, TestCase):
+    """Test claiming, sending and health reporting"""
+
+    def setUp(self):
+        self.create_fixtures()
+
+    def test_dispatch_sends_due_reminders_only(self):
+        due = [
+            self.create_reminder(self.students[0]),
+            self.create_reminder(self.students[1], channel=CommunicationChannel.SMS),
+        ]
+        future = self.create_reminder(self.students[2], due_in=timedelta(hours=1))
+
+        result = ReminderDispatcher(worker_id="worker-a", inline=True).run(batch_size=1)
+
+        self.assertEqual((result.batches, result.claimed, result.sent, result.failed), (2, 2, 2, 0))
+        for reminder in due:
+            reminder.refresh_from_db()
+            self.assertEqual(reminder.status, ReminderStatus.SENT)
+            self.assertEqual(reminder.claimed_by, "worker-a")
+            self.assertIsNotNone(reminder.processing_time_ms)
+        future.refresh_from_db()
+        self.assertEqual(future.status, ReminderStatus.PENDING)
+        self.assertIsNone(future.claimed_at)
+
+    def test_claimed_reminders_are_not_reclaimed_until_lease_expires(self):
+        reminder = self.create_reminder(self.students[0])
+
+        first = ReminderDispatcher(worker_id="worker-a").claim_batch(10)
+        second = ReminderDispatcher(worker_id="worker-b").claim_batch(10)
+
+        self.assertEqual(first, [reminder])
+        self.assertEqual(second, [])
+
+        ClassReminder.objects.filter(pk=reminder.pk).update(claimed_at=timezone.now() - CLAIM_LEASE * 2)
+        self.assertEqual(ReminderDispatcher(worker_id="worker-b").claim_batch(10), [reminder])
+
+    def test_claim_is_renewed_before_each_send(self):
+        reminder = self.create_reminder(self.students[0])
+        dispatcher = ReminderDispatcher(worker_id="worker-a", inline=True)
+        [claimed] = dispatcher.claim_batch(10)
+        ClassReminder.objects.filter(pk=reminder.pk).update(claimed_at=claimed.claimed_at - CLAIM_LEASE / 2)
+        claimed.claimed_at -= CLAIM_LEASE / 2
+
+        self.assertTrue(dispatcher.renew_claim(claimed))
+
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.claimed_at, claimed.claimed_at)
+        self.assertEqual(ReminderDispatcher(worker_id="worker-b").claim_batch(10), [])
+
+    def test_reminder_reclaimed_after_an_expired_lease_is_not_sent_twice(self):
+        reminder = self.create_reminder(self.students[0])
+        slow_worker = ReminderDispatcher(worker_id="worker-a", inline=True)
+        [stale] = slow_worker.claim_batch(10)
+        ClassReminder.objects.filter(pk=reminder.pk).update(claimed_at=timezone.now() - CLAIM_LEASE * 2)
+        [reclaimed] = ReminderDispatcher(worker_id="worker-b").claim_batch(10)
+
+        self.assertIsNone(slow_worker._send(stale))
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, ReminderStatus.PENDING)
+        self.assertEqual(reminder.claimed_by, "worker-b")
+
+        self.assertIsNotNone(ReminderDispatcher(worker_id="worker-b", inline=True)._send(reclaimed))
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, ReminderStatus.SENT)
+
+    def test_process_reminder_queue_keeps_result_shape(self):
+        self.create_reminder(self.students[0])
+
+        result = ReminderBackgroundTaskService.process_reminder_queue(batch_size=10, max_batches=2)
+
+        self.assertEqual(result, {"batches_processed": 1, "total_processed": 1, "total_failed": 0, "errors": []})
+
+    def test_queue_health_reports_measured_processing_time(self):
+        self.create_reminder(self.students[0])
+        health = ReminderBackgroundTaskService.get_queue_health_status()
+        self.assertEqual(health["worker_status"], "stalled")
+        self.assertIsNone(health["average_processing_time"])
+
+        ReminderDispatcher(worker_id="worker-a", inline=True).run()
+        ClassReminder.objects.update(processing_time_ms=1500)
+
+        health = ReminderBackgroundTaskService.get_queue_health_status()
+        self.assertEqual(health["worker_status"], "active")
+        self.assertEqual(health["active_workers"], 1)
+        self.assertEqual(health["average_processing_time"], 1.5)
+        self.assertEqual(health["pending_reminders_count"], 0)
+
+    def test_management_command(self):
+        self.create_reminder(self.students[0])
+        out = StringIO()
+
+        call_command("dispatch_reminders", "--worker-id=cli", stdout=out)
+
+        self.assertIn("1 sent, 0 failed", out.getvalue())
+
+
+@override_settings(REMINDER_MOCK_MODE=True)
+class ReminderDispatcherThreadPoolTests(ReminderDispatcherTestMixin, TransactionTestCase):
+    """Sends run on pool threads with their own connections"""
+
+    def test_pool_sends_committed_reminders(self):
+        # One thread: SQLite's shared in-memory test database rejects concurrent writers
+        self.create_fixtures()
+        for student in self.students:
+            self.create_reminder(student)
+
+        result = ReminderDispatcher(worker_id="worker-a", pool_sizes={CommunicationChannel.EMAIL: 1}).run()
+
+        self.assertEqual((result.sent, result.failed), (3, 0))
+        self.assertFalse(ClassReminder.objects.filter(status=ReminderStatus.PENDING).exists())
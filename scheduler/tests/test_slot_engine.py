@@ -0,0 +1,366 @@
+"""
+Unit Tests for the Interval-Based Slot Engine
+
+Verifies that AvailabilityCalculationService produces the same slots as the
+per-slot conflict checks while loading a date range in a constant number of queries.
+"""
+
+from datetime import UTC, date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import (
+    CustomUser,
+    EducationalSystem,
+    School,
+    SchoolMembership,
+    SchoolRole,
+    SchoolSettings,
+    TeacherProfile,
+)
+from scheduler.availability_cache import AvailabilitySnapshotCache
+from scheduler.models import (
+    ClassSchedule,
+    ClassStatus,
+    ClassType,
+    TeacherAvailability,
+    TeacherUnavailability,
+    WeekDay,
+)
+from scheduler.scheduling_rules_services import AvailabilityCalculationService, BatchSlotSearchService
+from scheduler.slot_engine import DayIntervals, TeacherSlotEngine
+
+
+def next_weekday(weekday: int, weeks_ahead: int = 1) -> date:
+    """Return the given weekday (0=Monday) at least `weeks_ahead` weeks from today."""
+    today = date.today()
+    return today + timedelta(days=(weekday - today.weekday()) % 7 + 7 * weeks_ahead)
+
+
+class SlotEngineBaseTestCase(TestCase):
+    """Common setup for slot engine tests"""
+
+    def setUp(self):
+        cache.clear()
+        self.edu_system, _ = EducationalSystem.objects.get_or_create(
+            code="custom", defaults={"name": "Custom Education System"}
+        )
+        self.school = School.objects.create(name="Test School", contact_email="test@school.com")
+        SchoolSettings.objects.create(
+            school=self.school,
+            educational_system=self.edu_system,
+            timezone="Europe/Lisbon",
+            default_buffer_time_minutes=15,
+        )
+
+        self.teacher_user = CustomUser.objects.create_user(email="teacher@test.com", name="Teacher User")
+        self.student_user = CustomUser.objects.create_user(email="student@test.com", name="Student User")
+        self.teacher_profile = TeacherProfile.objects.create(user=self.teacher_user, bio="Test teacher")
+
+        SchoolMembership.objects.create(
+            user=self.teacher_user, school=self.school, role=SchoolRole.TEACHER, is_active=True
+        )
+        SchoolMembership.objects.create(
+            user=self.student_user, school=self.school, role=SchoolRole.STUDENT, is_active=True
+        )
+
+        TeacherAvailability.objects.create(
+            teacher=self.teacher_profile,
+            school=self.school,
+            day_of_week=WeekDay.MONDAY,
+            start_time=time(9, 0),
+            end_time=time(13, 0),
+        )
+        self.monday = next_weekday(0)
+        self.service = AvailabilityCalculationService()
+
+    def create_class(self, scheduled_date, start_time, end_time, status=ClassStatus.SCHEDULED):
+        return ClassSchedule.objects.create(
+            teacher=self.teacher_profile,
+            student=self.student_user,
+            school=self.school,
+            title="Booked Class",
+            scheduled_date=scheduled_date,
+            start_time=start_time,
+            end_time=end_time,
+            duration_minutes=60,
+            class_type=ClassType.INDIVIDUAL,
+            status=status,
+            booked_by=self.student_user,
+        )
+
+
+class SlotEngineEquivalenceTests(SlotEngineBaseTestCase):
+    """Slots from the engine must match the per-slot conflict checks"""
+
+    def get_start_times(self, booking_date, duration_minutes=60):
+        result = self.service.get_available_slots_with_rules(
+            self.teacher_profile, self.school, booking_date, duration_minutes
+        )
+        return [slot["start_time"] for slot in result["available_slots"]]
+
+    def legacy_start_times(self, booking_date, duration_minutes=60):
+        """Recompute the slots by calling _has_slot_conflicts for every candidate."""
+        start_times = []
+        current = datetime.combine(booking_date, time(9, 0))
+        end_limit = datetime.combine(booking_date, time(13, 0))
+        while current + timedelta(minutes=duration_minutes) <= end_limit:
+            slot_end = current + timedelta(minutes=duration_minutes)
+            if not self.service._has_slot_conflicts(
+                self.teacher_profile, self.school, booking_date, current.time(), slot_end.time(), None, 15
+            ):
+                start_times.append(current.strftime("%H:%M"))
+            current += timedelta(minutes=30)
+        return start_times
+
+    def test_slots_without_bookings_cover_availability(self):
+        """Every 30-minute candidate is returned when nothing is booked"""
+        self.assertEqual(
+            self.get_start_times(self.monday),
+            ["09:00", "09:30", "10:00", "10:30", "11:00", "11:30", "12:00"],
+        )
+
+    def test_booked_class_blocks_slots_including_buffer(self):
+        """A 10:30-11:00 class with a 15 minute buffer blocks 09:30 through 11:00 starts"""
+        self.create_class(self.monday, time(10, 30), time(11, 0))
+
+        start_times = self.get_start_times(self.monday)
+
+        self.assertEqual(start_times, ["09:00", "11:30", "12:00"])
+        self.assertEqual(start_times, self.legacy_start_times(self.monday))
+
+    def test_cancelled_class_does_not_block_slots(self):
+        """Cancelled classes are ignored by the interval index"""
+        self.create_class(self.monday, time(10, 0), time(11, 0), status=ClassStatus.CANCELLED)
+
+        self.assertEqual(len(self.get_start_times(self.monday)), 7)
+
+    def test_partial_unavailability_matches_per_slot_checks(self):
+        """Partial unavailability blocks only overlapping candidates"""
+        TeacherUnavailability.objects.create(
+            teacher=self.teacher_profile,
+            school=self.school,
+            date=self.monday,
+            start_time=time(11, 0),
+            end_time=time(12, 0),
+        )
+
+        start_times = self.get_start_times(self.monday)
+
+        self.assertEqual(start_times, ["09:00", "09:30", "10:00", "12:00"])
+        self.assertEqual(start_times, self.legacy_start_times(self.monday))
+
+    def test_all_day_unavailability_blocks_day(self):
+        """All-day unavailability leaves no slots"""
+        TeacherUnavailability.objects.create(
+            teacher=self.teacher_profile, school=self.school, date=self.monday, is_all_day=True
+        )
+
+        self.assertEqual(self.get_start_times(self.monday), [])
+
+    def test_daily_booking_limit_closes_day(self):
+        """Reaching the daily booking limit returns no slots for that day"""
+        self.school.settings.default_max_daily_bookings = 1
+        self.school.settings.save()
+        self.create_class(self.monday, time(12, 0), time(13, 0))
+
+        self.assertEqual(self.get_start_times(self.monday), [])
+
+    def test_restrictions_metadata_is_preserved(self):
+        """The response keeps the restrictions_applied metadata"""
+        result = self.service.get_available_slots_with_rules(self.teacher_profile, self.school, self.monday, 60)
+
+        self.assertEqual(result["total_slots"], 7)
+        self.assertEqual(result["restrictions_applied"]["buffer_time_minutes"], 15)
+        self.assertEqual(result["restrictions_applied"]["teacher_name"], "Teacher User")
+
+
+class SlotEngineQueryCountTests(SlotEngineBaseTestCase):
+    """The engine loads a date range in a constant number of queries"""
+
+    def count_queries(self, days):
+        with CaptureQueriesContext(connection) as context:
+            AvailabilityCalculationService().get_available_slots_with_rules(
+                TeacherProfile.objects.get(pk=self.teacher_profile.pk),
+                School.objects.get(pk=self.school.pk),
+                self.monday,
+                60,
+                end_date=self.monday + timedelta(days=days - 1),
+            )
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_range(self):
+        """A four-week search costs the same number of queries as a single week"""
+        for week in range(4):
+            self.create_class(self.monday + timedelta(weeks=week), time(10, 0), time(11, 0))
+
+        self.assertEqual(self.count_queries(7), self.count_queries(28))
+
+
+class AvailabilitySnapshotCacheTests(SlotEngineBaseTestCase):
+    """Cached weekly snapshots and their signal-driven invalidation"""
+
+    def get_start_times(self):
+        result = AvailabilityCalculationService().get_available_slots_with_rules(
+            self.teacher_profile, self.school, self.monday, 60
+        )
+        return [slot["start_time"] for slot in result["available_slots"]]
+
+    def test_repeat_lookup_skips_schedule_queries(self):
+        """A warm snapshot serves the lookup without querying schedule tables"""
+        self.get_start_times()
+
+        with CaptureQueriesContext(connection) as context:
+            self.get_start_times()
+
+        schedule_tables = (
+            "scheduler_classschedule",
+            "scheduler_teacheravailability",
+            "scheduler_teacherunavailability",
+        )
+        self.assertFalse(
+            [query for query in context.captured_queries if any(table in query["sql"] for table in schedule_tables)]
+        )
+
+    def test_booking_invalidates_snapshot(self):
+        """Creating a class is reflected immediately in the next lookup"""
+        self.assertIn("10:00", self.get_start_times())
+
+        self.create_class(self.monday, time(10, 0), time(11, 0))
+
+        self.assertNotIn("10:00", self.get_start_times())
+
+    def test_status_change_invalidates_snapshot(self):
+        """Cancelling a class frees its slot again"""
+        booked = self.create_class(self.monday, time(10, 0), time(11, 0))
+        self.assertNotIn("10:00", self.get_start_times())
+
+        booked.status = ClassStatus.CANCELLED
+        booked.save()
+
+        self.assertIn("10:00", self.get_start_times())
+
+    def test_unavailability_and_availability_edits_invalidate_snapshot(self):
+        """Unavailability and availability changes bump the version"""
+        self.get_start_times()
+        unavailability = TeacherUnavailability.objects.create(
+            teacher=self.teacher_profile, school=self.school, date=self.monday, is_all_day=True
+        )
+        self.assertEqual(self.get_start_times(), [])
+
+        unavailability.delete()
+        TeacherAvailability.objects.filter(teacher=self.teacher_profile).get().delete()
+
+        self.assertEqual(self.get_start_times(), [])
+
+    def test_previous_day_class_in_prior_week_is_included(self):
+        """Buffers from a Sunday class reach into Monday's snapshot"""
+        TeacherAvailability.objects.filter(teacher=self.teacher_profile).update(start_time=time(0, 0))
+        AvailabilitySnapshotCache.invalidate(self.teacher_profile.id)
+        self.create_class(self.monday - timedelta(days=1), time(23, 0), time(23, 50))
+
+        self.assertNotIn("00:00", self.get_start_times())
+        self.assertIn("01:00", self.get_start_times())
+
+
+class BatchSlotSearchTests(SlotEngineBaseTestCase):
+    """Batch slot search across several teachers and schools"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_school = School.objects.create(name="Other School", contact_email="other@school.com")
+        SchoolSettings.objects.create(
+            school=self.other_school, educational_system=self.edu_system, timezone="UTC", default_buffer_time_minutes=0
+        )
+        self.other_teachers = []
+        for index in range(3):
+            user = CustomUser.objects.create_user(email=f"teacher{index}@test.com", name=f"Teacher {index}")
+            teacher = TeacherProfile.objects.create(user=user)
+            TeacherAvailability.objects.create(
+                teacher=teacher,
+                school=self.other_school,
+                day_of_week=WeekDay.MONDAY,
+                start_time=time(14, 0),
+                end_time=time(16, 0),
+            )
+            self.other_teachers.append(teacher)
+
+    def test_results_match_single_teacher_search(self):
+        """Slots grouped by teacher equal the per-teacher calculation"""
+        self.create_class(self.monday, time(10, 30), time(11, 0))
+        teachers = [self.teacher_profile, *self.other_teachers]
+
+        results = BatchSlotSearchService().get_slots_by_teacher(
+            teachers, [self.school, self.other_school], self.monday, 60, end_date=self.monday + timedelta(days=6)
+        )
+
+        self.assertEqual(set(results), {teacher.id for teacher in teachers})
+        expected = self.service.get_available_slots_with_rules(
+            self.teacher_profile, self.school, self.monday, 60, end_date=self.monday + timedelta(days=6)
+        )["available_slots"]
+        self.assertEqual(results[self.teacher_profile.id], expected)
+        self.assertEqual(
+            [slot["start_time"] for slot in results[self.other_teachers[0].id]], ["14:00", "14:30", "15:00"]
+        )
+
+    def test_days_are_streamed_in_order(self):
+        """iter_slots_by_day yields every day of the range, in order"""
+        days = [
+            day
+            for day, _slots in BatchSlotSearchService().iter_slots_by_day(
+                [self.teacher_profile], [self.school], self.monday, 60, end_date=self.monday + timedelta(days=2)
+            )
+        ]
+
+        self.assertEqual(days, [self.monday + timedelta(days=offset) for offset in range(3)])
+
+    def test_query_count_does_not_grow_with_teachers(self):
+        """Adding teachers does not add queries"""
+        schools = [self.school.id, self.other_school.id]
+
+        with CaptureQueriesContext(connection) as one_teacher:
+            BatchSlotSearchService().get_slots_by_teacher([self.other_teachers[0].id], schools, self.monday, 60)
+        with CaptureQueriesContext(connection) as all_teachers:
+            BatchSlotSearchService().get_slots_by_teacher(
+                [self.teacher_profile.id] + [teacher.id for teacher in self.other_teachers], schools, self.monday, 60
+            )
+
+        self.assertEqual(len(one_teacher.captured_queries), len(all_teachers.captured_queries))
+
+
+class DayIntervalsTests(TestCase):
+    """Interval index overlap semantics"""
+
+    def test_overlap_uses_half_open_intervals(self):
+        """Touching intervals do not overlap"""
+        day = date(2030, 1, 7)
+        intervals = DayIntervals.build(
+            (time(9, 0), time(17, 0)),
+            [
+                (datetime.combine(day, time(10, 0)), datetime.combine(day, time(11, 0))),
+                (datetime.combine(day, time(9, 0)), datetime.combine(day, time(9, 30))),
+            ],
+        )
+
+        self.assertFalse(intervals.overlaps(datetime.combine(day, time(11, 0)), datetime.combine(day, time(12, 0))))
+        self.assertTrue(intervals.overlaps(datetime.combine(day, time(10, 30)), datetime.combine(day, time(11, 30))))
+        self.assertTrue(intervals.overlaps(datetime.combine(day, time(9, 15)), datetime.combine(day, time(9, 45))))
+
+    def test_buffer_from_previous_day_class_crosses_midnight(self):
+        """A late class on the previous day blocks early slots through its buffer"""
+        day = date(2030, 1, 7)
+        engine = TeacherSlotEngine(
+            day,
+            day,
+            30,
+            availabilities={"monday": (time(0, 0), time(2, 0))},
+            unavailabilities={},
+            booked_classes={day - timedelta(days=1): [(time(23, 0), time(23, 50))]},
+        )
+
+        slots = list(engine.iter_free_slots(day, 30, 0, now=datetime(2000, 1, 1, tzinfo=UTC)))
+
+        self.assertEqual([start for start, _ in slots], [time(0, 30), time(1, 0), time(1, 30)])
@@ -15,6 +15,7 @@ from waffle.decorators import waffle_switch
 from waffle.mixins import WaffleSwitchMixin
 
 from accounts.models import CustomUser, School, SchoolMembership, SchoolRole, TeacherProfile
+from accounts.services.membership_context import MembershipContext
 
 from .models import (
     ClassSchedule,
@@ -26,7 +27,7 @@ from .models import (
 # Utility functions for Django view migration (replacing DRF serializers)
 def get_user_schools(user):
     """Get schools where user has membership"""
-    return [membership.school for membership in user.school_memberships.filter(is_active=True)]
+    return [membership.school for membership in MembershipContext(user).memberships]
 
 
 def ensure_school_access(user, school):